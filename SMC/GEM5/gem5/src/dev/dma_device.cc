@@ -43,6 +43,7 @@
  */
 
 #include "base/chunk_generator.hh"
+#include "base/intmath.hh"
 #include "debug/DMA.hh"
 #include "debug/Drain.hh"
 #include "dev/dma_device.hh"
@@ -52,9 +53,20 @@ DmaPort::DmaPort(MemObject *dev, System *s)
     : MasterPort(dev->name() + ".dma", dev), device(dev), sendEvent(this),
       sys(s), masterId(s->getMasterId(dev->name())),
       pendingCount(0), drainManager(NULL),
-      inRetry(false)
+      inRetry(false), maxInFlight(0), burstSize(0), inFlight(0),
+      windowFull(false), windowStalls(0)
 { }
 
+void
+DmaPort::setWindow(unsigned max_in_flight, unsigned burst_size)
+{
+    if (burst_size && !isPowerOf2(burst_size))
+        fatal("%s: the burst size (%d) must be a power of 2\n", name(),
+              burst_size);
+    maxInFlight = max_in_flight;
+    burstSize = burst_size;
+}
+
 void
 DmaPort::handleResp(PacketPtr pkt, Tick delay)
 {
@@ -75,6 +87,17 @@ DmaPort::handleResp(PacketPtr pkt, Tick delay)
     assert(pendingCount != 0);
     pendingCount--;
 
+    // a slot of the window is free again, continue sending
+    if (sys->isTimingMode()) {
+        assert(inFlight != 0);
+        inFlight--;
+        if (windowFull) {
+            windowFull = false;
+            if (!transmitList.empty() && !inRetry && !sendEvent.scheduled())
+                device->schedule(sendEvent, device->clockEdge(Cycles(1)));
+        }
+    }
+
     // update the number of bytes received based on the request rather
     // than the packet as the latter could be rounded up to line sizes
     state->numBytes += pkt->req->getSize();
@@ -170,7 +193,8 @@ DmaPort::dmaAction(Packet::Command cmd, Addr addr, int size, Event *event,
 
     DPRINTF(DMA, "Starting DMA for addr: %#x size: %d sched: %d\n", addr, size,
             event ? event->scheduled() : -1);
-    for (ChunkGenerator gen(addr, size, sys->cacheLineSize());
+    for (ChunkGenerator gen(addr, size,
+                            burstSize ? burstSize : sys->cacheLineSize());
          !gen.done(); gen.next()) {
         Request *req = new Request(gen.addr(), gen.size(), flag, masterId);
         req->taskId(ContextSwitchTaskId::DMA);
@@ -206,7 +230,8 @@ DmaPort::dmaAction_augmented(unsigned transaction_id, Packet::Command cmd, Addr
 
     DPRINTF(DMA, "Starting DMA for addr: %#x size: %d sched: %d\n", addr, size,
             event ? event->scheduled() : -1);
-    for (ChunkGenerator gen(addr, size, sys->cacheLineSize());
+    for (ChunkGenerator gen(addr, size,
+                            burstSize ? burstSize : sys->cacheLineSize());
          !gen.done(); gen.next()) {
         Request *req = new Request(gen.addr(), gen.size(), flag, masterId);
         req->taskId(ContextSwitchTaskId::DMA);
@@ -246,11 +271,22 @@ DmaPort::trySendTimingReq()
     // following send if it is successful
     PacketPtr pkt = transmitList.front();
 
+    // do not exceed the window, wait for a response instead
+    if (maxInFlight && inFlight >= maxInFlight) {
+        DPRINTF(DMA, "Window full (%d in flight), waiting for a response\n",
+                inFlight);
+        windowFull = true;
+        windowStalls++;
+        inRetry = false;    // the next send is triggered by the response
+        return;
+    }
+
     DPRINTF(DMA, "Trying to send %s addr %#x\n", pkt->cmdString(),
             pkt->getAddr());
 
     inRetry = !sendTimingReq(pkt);
     if (!inRetry) {
+        inFlight++;
         transmitList.pop_front();
         DPRINTF(DMA, "-- Done\n");
         // if there is more to do, then do so
@@ -278,8 +314,9 @@ DmaPort::sendDma()
 
     if (sys->isTimingMode()) {
         // if we are either waiting for a retry or are still waiting
-        // after sending the last packet, then do not proceed
-        if (inRetry || sendEvent.scheduled()) {
+        // after sending the last packet (or for a slot of the window),
+        // then do not proceed
+        if (inRetry || sendEvent.scheduled() || windowFull) {
             DPRINTF(DMA, "Can't send immediately, waiting to send\n");
             return;
         }
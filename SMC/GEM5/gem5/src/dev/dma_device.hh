@@ -137,6 +137,18 @@ class DmaPort : public MasterPort
      * send whatever it is that it's sending. */
     bool inRetry;
 
+    /** Erfan: Maximum number of packets in flight (0: no limit), and
+     * size of the packets (0: cache line size). Adjacent cache lines
+     * of a transfer are coalesced into one packet of this size. */
+    unsigned maxInFlight;
+    unsigned burstSize;
+
+    /** Number of packets sent and not yet responded. */
+    uint32_t inFlight;
+
+    /** If we are waiting for a response because the window is full. */
+    bool windowFull;
+
   protected:
 
     bool recvTimingResp(PacketPtr pkt);
@@ -157,6 +169,12 @@ class DmaPort : public MasterPort
 
     bool dmaPending() const { return pendingCount > 0; }
 
+    // Erfan: Limit the packets in flight and set their size
+    void setWindow(unsigned max_in_flight, unsigned burst_size);
+
+    /** Number of times a packet waited because the window was full. */
+    uint64_t windowStalls;
+
     unsigned int drain(DrainManager *drainManger);
 };
 
@@ -9,4 +9,8 @@ class ethz_DMA(DmaDevice):
     type = 'ethz_DMA'
     cxx_header = "dev/ethz_dma.hh"
     clk_per_ps = Param.Unsigned(1000, "Clock period of the DMA state machine (ps)")
+    num_channels = Param.Unsigned(1, "Number of requests served concurrently (round-robin between their slices)")
+    max_outstanding = Param.Unsigned(0, "Maximum number of bursts in flight (0: no limit)")
+    burst_size = Param.Unsigned(0, "Size of the bursts in bytes, adjacent cache lines are coalesced up to this size (0: cache line size)")
+    ref_bandwidth = Param.Float(0.0, "Reference bandwidth in GB/s (e.g. sum of the vault bandwidths) for the bandwidth utilization stat (0: not reported)")
     PIM_DMA_STATUS_ADDR = Param.Int(0, "DMA Status Register(Absolute Address)");
@@ -44,6 +44,7 @@
 #include "base/trace.hh"
 #include "dev/dma_device.hh"
 #include "mem/ethz_pim_memory.hh"
+#include "mem/ethz_pim_definitions.h"
 #include "dev/ethz_dma.hh"
 #include "debug/ethz_DMA.hh"
 #include "mem/packet.hh"
@@ -63,6 +64,12 @@ ethz_DMA::ethz_DMA(const Params *p)
     isTimingMode(false),
     clk_per_ps(p->clk_per_ps),
     nextStateEvent(this),
+    current(NULL),
+    num_channels(p->num_channels),
+    channels(p->num_channels, (DMARequest*)NULL),
+    last_channel(0),
+    busy_since(0),
+    ref_bandwidth(p->ref_bandwidth),
     dmaPendingNum(0),
     PIM_DMA_STATUS_ADDR(p->PIM_DMA_STATUS_ADDR),
     dmaDoneEventAll(maxOutstandingDma, this),
@@ -72,16 +79,76 @@ ethz_DMA::ethz_DMA(const Params *p)
     //resource_to_wait_for = 0;
     dma_resources = 0;
     //dirty_interrupt = false;
-    pim_cpu = NULL;
     pim_mem = NULL;
-    tc = NULL;
-    current_index = -1;
+    if ( num_channels == 0 )
+        fatal("%s: num_channels must be at least 1\n", name());
     next_state_scheduled = false;
     assert (DMA_STATE_IDLE == 0 );
     current_state = DMA_STATE_IDLE;
     for (int i = 0; i < maxOutstandingDma; ++i)
         dmaDoneEventFree[i] = &dmaDoneEventAll[i];
     handle_packet_required = true;
+    dmaPort.setWindow(p->max_outstanding, p->burst_size);
+}
+
+void
+ethz_DMA::regStats()
+{
+    DmaDevice::regStats();
+
+    bytesRead
+        .name(name() + ".bytes_read")
+        .desc("Number of bytes transferred from the memory to the SPM")
+        ;
+
+    bytesWritten
+        .name(name() + ".bytes_written")
+        .desc("Number of bytes transferred from the SPM to the memory")
+        ;
+
+    bursts
+        .name(name() + ".bursts")
+        .desc("Number of bursts (packets) sent to the memory")
+        ;
+
+    transfers
+        .name(name() + ".transfers")
+        .desc("Number of completed transfers (requests or descriptors)")
+        ;
+
+    busyTicks
+        .name(name() + ".busy_ticks")
+        .desc("Ticks during which at least one transfer was pending")
+        ;
+
+    windowStalls
+        .name(name() + ".window_stalls")
+        .desc("Number of times a burst waited because max_outstanding bursts were in flight")
+        .scalar(dmaPort.windowStalls)
+        ;
+
+    avgBurstSize
+        .name(name() + ".avg_burst_size")
+        .desc("Average size of the bursts (bytes)")
+        .precision(2)
+        ;
+    avgBurstSize = (bytesRead + bytesWritten) / bursts;
+
+    bandwidth
+        .name(name() + ".bandwidth")
+        .desc("Achieved bandwidth while the DMA was busy (GB/s)")
+        .precision(4)
+        ;
+    bandwidth = (bytesRead + bytesWritten) / busyTicks * (SimClock::Frequency / 1e9);
+
+    // Only reported if a reference bandwidth is given (nozero)
+    bwUtilization
+        .name(name() + ".bandwidth_utilization")
+        .desc("Achieved bandwidth / reference bandwidth (ref_bandwidth)")
+        .precision(4)
+        .flags(Stats::nozero | Stats::nonan)
+        ;
+    bwUtilization = bandwidth * (ref_bandwidth > 0 ? 1.0 / ref_bandwidth : 0.0);
 }
 
 ethz_DMA::~ethz_DMA()
@@ -103,12 +170,10 @@ ethz_DMA::nextState()
     if ( requests.empty() )
     {
         current_state = DMA_STATE_IDLE;
-        current_index = -1;
+        current = NULL;
         is_active = false;
     }
-    DMARequest* curr = NULL;
-    if ( current_index != -1 )
-        curr = requests[current_index];
+    DMARequest* curr = current;
 
     switch (current_state)
     {
@@ -123,16 +188,33 @@ ethz_DMA::nextState()
             }
             else
             {
-                current_index = -1;
+                // Give the free channels to the requests which are waiting
                 for ( int i=0; i< requests.size(); i++)
                 {
-                    if ( ! requests[i]->issued )
+                    if ( requests[i]->issued || requests[i]->channel != -1 )
+                        continue;
+                    int c;
+                    for ( c=0; c<num_channels; c++ )
+                        if ( channels[c] == NULL )
+                            break;
+                    if ( c == num_channels )
+                        break;  // All channels are busy
+                    channels[c] = requests[i];
+                    requests[i]->channel = c;
+                }
+                // Serve the channels in round-robin
+                current = NULL;
+                for ( int k=1; k<=num_channels; k++ )
+                {
+                    unsigned c = (last_channel + k) % num_channels;
+                    if ( channels[c] )
                     {
-                        current_index = i;
+                        current = channels[c];
+                        last_channel = c;
                         break;
                     }
                 }
-                if ( current_index != -1 )
+                if ( current )
                     current_state = DMA_STATE_TLBREFILL;
                 // else
                 //     cout << "All requests are previously issued" << endl;
@@ -141,7 +223,6 @@ ethz_DMA::nextState()
         /*********************/
         case DMA_STATE_TLBREFILL:
             assert(curr);
-            curr->issued = true; // This request will be issued
             if (curr->mem_vstart < curr->mem_vend)
             {
                 curr->print("tlb refill");
@@ -158,10 +239,16 @@ ethz_DMA::nextState()
                 current_state = DMA_STATE_TRANSFER;
             }
             else
+            {
+                release_channel(curr);
                 current_state = DMA_STATE_IDLE;
+            }
         break;
         /*********************/
         case DMA_STATE_TRANSFER:
+            assert(curr);
+            if ( dmaDoneEventFree.empty() )
+                break;  // Too many transfers in flight, try again in the next cycle
             pstart = dtlb->remap_check(curr->mem_vstart);
             vend = MIN(dtlb->slice_vend(curr->mem_vstart), curr->mem_vend);
             pend   = dtlb->remap_check(vend);
@@ -171,7 +258,6 @@ ethz_DMA::nextState()
 
             assert ( pend-pstart == vend - curr->mem_vstart );
 
-            assert(!dmaDoneEventFree.empty());
             event = dmaDoneEventFree.back();
             dmaDoneEventFree.pop_back();
             assert(!event->scheduled());
@@ -181,9 +267,13 @@ ethz_DMA::nextState()
             dmaPort.dmaAction((curr->RW?MemCmd::ReadReq:MemCmd::WriteReq), pstart, pend-pstart+1, event, curr->vreg_ptr, 0, Request::UNCACHEABLE);
 
             if ( curr->nextSubRequest(vend+1) )
-                current_state = DMA_STATE_TLBREFILL;
+                // With one channel we continue with the same request, otherwise the next channel is served
+                current_state = ( num_channels == 1 ) ? DMA_STATE_TLBREFILL : DMA_STATE_IDLE;
             else
+            {
+                release_channel(curr);
                 current_state = DMA_STATE_IDLE;
+            }
         break;
         default:
             panic("Illegal state!");
@@ -214,15 +304,16 @@ ethz_DMA::nextState()
         #ifdef ETHZ_DEBUG_DMA
         cout << "[PIM-DMA] [NO RESCHEDULE] status=0x" << hex << (unsigned)dma_resources << dec<<  endl;
         cout << "PIM CPU Status = " <<
-          ((tc->status() == ThreadContext::Status::Suspended)?"Suspended":
-          (tc->status() == ThreadContext::Status::Active)?"Active": "Halted") << endl;
+          ((tcs[0]->status() == ThreadContext::Status::Suspended)?"Suspended":
+          (tcs[0]->status() == ThreadContext::Status::Active)?"Active": "Halted") << endl;
         #endif
-        pim_cpu->postInterrupt(ArmISA::INT_IRQ, 0);
+        for (int i = 0; i < pim_cpus.size(); i++)
+            pim_cpus[i]->postInterrupt(ArmISA::INT_IRQ, 0);
     }
 }
 
 void
-ethz_DMA::wait_on_resource(uint8_t res)
+ethz_DMA::wait_on_resource(uint8_t res, BaseCPU* cpu)
 {
 
     if ( res == 0xFF )
@@ -230,7 +321,7 @@ ethz_DMA::wait_on_resource(uint8_t res)
         #ifdef ETHZ_DEBUG_DMA
         cout << "[PIM-DMA] Clear Interrupt --- Status: 0x" << (unsigned)dma_resources << dec << endl;
         #endif
-        pim_cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
+        cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
         return;
     }
     panic("Illegal value");
@@ -245,7 +336,19 @@ ethz_DMA::wait_on_resource(uint8_t res)
 }
 
 void
-ethz_DMA::initiate_read(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource)
+ethz_DMA::release_channel(DMARequest* req)
+{
+    req->issued = true; // All subrequests of this request have been issued
+    if ( req->channel != -1 )
+    {
+        assert(channels[req->channel] == req);
+        channels[req->channel] = NULL;
+        req->channel = -1;
+    }
+}
+
+void
+ethz_DMA::initiate(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, bool RW, uint8_t dma_resource, unsigned long status_addr)
 {
     assert(dtlb);
     assert(dma_resource);
@@ -259,14 +362,18 @@ ethz_DMA::initiate_read(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned
     cout << "[PIM-DMA] Requested resource: 0x" << hex << (unsigned)dma_resource << " Status: 0x" << (unsigned)dma_resources << dec << endl;
     #endif
 
-    if (dma_resources & dma_resource)
+    // The descriptors of a ring can share their resource
+    if ((dma_resources & dma_resource) && (status_addr == 0 || resource_users[dma_resource] == 0))
     {
-        cout << hex << "READ: dma_resources=" << (unsigned) dma_resources << "  dma_resource=" << (unsigned) dma_resource << dec << endl;
-        panic("[PIM-DMA] READ: DMA resource is already busy!");
+        cout << hex << (RW?"READ":"WRITE") << ": dma_resources=" << (unsigned) dma_resources << "  dma_resource=" << (unsigned) dma_resource << dec << endl;
+        panic("[PIM-DMA] %s: DMA resource is already busy!", RW?"READ":"WRITE");
     }
     dma_resources |= dma_resource;
+    resource_users[dma_resource]++;
     update_status_register();
-    requests.insert(requests.begin(), new DMARequest(vreg_ptr, dma_mem_vaddr, dma_num_bytes, true, dma_resource));
+    if ( requests.empty() )
+        busy_since = curTick();
+    requests.insert(requests.begin(), new DMARequest(vreg_ptr, dma_mem_vaddr, dma_num_bytes, RW, dma_resource, status_addr));
 
     if ( next_state_scheduled )
     {
@@ -277,7 +384,7 @@ ethz_DMA::initiate_read(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned
     else
     {
         #ifdef ETHZ_DEBUG_DMA
-        cout << "[PIM-DMA][INITIATE READ]" << endl;
+        cout << "[PIM-DMA][INITIATE " << (RW?"READ":"WRITE") << "]" << endl;
         #endif
         next_state_scheduled = true;
         nextState();
@@ -285,38 +392,16 @@ ethz_DMA::initiate_read(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned
 }
 
 void
-ethz_DMA::initiate_write(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource)
+ethz_DMA::initiate_read(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource, unsigned long status_addr)
 {
-    assert(dtlb);
-    assert(dma_resource);
-    //pim_cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
-    #ifdef ETHZ_DEBUG_DMA
-    cout << "[PIM-DMA] Requested resource: 0x" << hex << (unsigned)dma_resource << " Status: 0x" << (unsigned)dma_resources << dec << endl;
-    #endif
-
-    if (dma_resources & dma_resource)
-    {
-        cout << hex << "WRITE: dma_resources=" << (unsigned) dma_resources << "  dma_resource=" << (unsigned) dma_resource << dec << endl;
-        panic("[PIM-DMA] WRITE: DMA resource is already busy!");
-    }
-    dma_resources |= dma_resource;
-    update_status_register();
-    requests.insert(requests.begin(), new DMARequest(vreg_ptr, dma_mem_vaddr, dma_num_bytes, false, dma_resource));
+    initiate(vreg_ptr, dma_mem_vaddr, dma_num_bytes, true, dma_resource, status_addr);
+}
 
-    if ( next_state_scheduled )
-    {
-        #ifdef ETHZ_DEBUG_DMA
-        cout << "[PIM-DMA] DMA is already active ... " << endl;
-        #endif
-    }
-    else
-    {
-        #ifdef ETHZ_DEBUG_DMA
-        cout << "[PIM-DMA][INITIATE WRITE]" << endl;
-        #endif
-        next_state_scheduled = true;
-        nextState();
-    }
+void
+ethz_DMA::initiate_write(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource, unsigned long status_addr)
+{
+    //pim_cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
+    initiate(vreg_ptr, dma_mem_vaddr, dma_num_bytes, false, dma_resource, status_addr);
 }
 
 // read registers
@@ -424,6 +509,11 @@ ethz_DMA::handle_packet( PacketPtr pkt, bool last_packet, unsigned tid )
     assert(delete_index != -1);
 
     curr->bytes_completed+= pkt->getSize();
+    bursts++;
+    if ( curr->RW )
+        bytesRead += pkt->getSize();
+    else
+        bytesWritten += pkt->getSize();
     curr->print("response received");
     assert( curr->bytes_completed <= curr->bytes_expected );
     if ( curr->bytes_completed == curr->bytes_expected )
@@ -431,31 +521,45 @@ ethz_DMA::handle_packet( PacketPtr pkt, bool last_packet, unsigned tid )
         #ifdef ETHZ_DEBUG_DMA
         cout << "Transfer completed: resource:0x" << hex << (unsigned) curr->dma_resource << dec <<endl;
         cout << "PIM CPU Status = " <<
-          ((tc->status() == ThreadContext::Status::Suspended)?"Suspended":
-          (tc->status() == ThreadContext::Status::Active)?"Active": "Halted") << endl;
+          ((tcs[0]->status() == ThreadContext::Status::Suspended)?"Suspended":
+          (tcs[0]->status() == ThreadContext::Status::Active)?"Active": "Halted") << endl;
         #endif
 
         // if ((dma_resources & resource_to_wait_for) == 0)
         // {
-            if ( tc->status() == ThreadContext::Status::Suspended )
+            for (int i = 0; i < pim_cpus.size(); i++)
             {
-                #ifdef ETHZ_DEBUG_DMA
-                cout << "CPU woke up!" << endl;
-                #endif
-                //dirty_interrupt = true;
-                pim_cpu->postInterrupt(ArmISA::INT_IRQ, 0);
-                //pim_cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
+                if ( tcs[i]->status() == ThreadContext::Status::Suspended )
+                {
+                    #ifdef ETHZ_DEBUG_DMA
+                    cout << "CPU woke up!" << endl;
+                    #endif
+                    //dirty_interrupt = true;
+                    pim_cpus[i]->postInterrupt(ArmISA::INT_IRQ, 0);
+                    //pim_cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
+                }
             }
         //     resource_to_wait_for = 0;
         // }
 
+        // Completion of a descriptor
+        if ( curr->status_addr )
+            pim_mem->__write_mem_1byte(curr->status_addr, PIM_DMA_DESC_DONE);
+
         assert(dma_resources & curr->dma_resource);
-        dma_resources &= ~(curr->dma_resource);
+        assert(resource_users[curr->dma_resource] > 0);
+        if ( --resource_users[curr->dma_resource] == 0 )
+        {
+            dma_resources &= ~(curr->dma_resource);
+            assert((dma_resources & curr->dma_resource) == 0);
+        }
         update_status_register();
-        assert((dma_resources & curr->dma_resource) == 0);
 
         requests.erase(requests.begin()+delete_index);
         delete curr;
+        transfers++;
+        if ( requests.empty() )
+            busyTicks += curTick() - busy_since;
     }
 }
 
@@ -463,7 +567,7 @@ void
 ethz_DMA::update_status_register()
 {
     assert(pim_mem);
-    pim_mem->__write_mem_1byte(PIM_DMA_STATUS_ADDR, dma_resources);
+    pim_mem->update_dma_status(PIM_DMA_STATUS_ADDR);
 }
 
 AddrRangeList
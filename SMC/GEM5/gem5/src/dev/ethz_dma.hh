@@ -4,7 +4,9 @@
 #include <fstream>
 #include <string>
 #include <queue>
+#include <map>
 
+#include "base/statistics.hh"
 #include "dev/dma_device.hh"
 #include "params/ethz_DMA.hh"
 #include "sim/serialize.hh"
@@ -39,19 +41,23 @@ class ethz_DMA: public DmaDevice
         unsigned long mem_vend;             // Virtual end address of the memory location
         uint8_t dma_resource;              // Which DMA resource is used by this request
         bool RW;                            // true: (R) MEM-->V    false: (W) V-->MEM
+        unsigned long status_addr;          // Status word of the descriptor of this request (0: not a descriptor)
 
         /* Internal Parameters */
         vector<unsigned long> mem_pstart;   // pstart addresses of injected transactions
         vector<unsigned long> mem_pend;     // pend addresses of injected transactions
         unsigned long bytes_expected;       // Expected number of bytes to transfer
         unsigned long bytes_completed;      // Number of bytes transferred up to now
-        bool issued;
+        bool issued;                        // All subrequests have been issued
+        int channel;                        // Channel serving this request (-1: none)
 
         /* Methods */
-        DMARequest(uint8_t*vreg, unsigned long start, unsigned long num_bytes, bool dir, uint8_t dma_res)
+        DMARequest(uint8_t*vreg, unsigned long start, unsigned long num_bytes, bool dir, uint8_t dma_res, unsigned long status)
         {
             vreg_ptr=vreg;
             dma_resource = dma_res;
+            status_addr = status;
+            channel = -1;
             mem_vstart = start;
             RW = dir;
             mem_vend =  mem_vstart+num_bytes-1;
@@ -81,13 +87,45 @@ class ethz_DMA: public DmaDevice
     };
     //////////////////////////////
     vector<DMARequest*> requests;   // List of pending requests
-    long int current_index;         // Index of current requst being served
+    DMARequest* current;            // Current request being served
+
+    /*
+    Channels: up to num_channels requests are served at the same time, the
+    state machine issues one slice of each of them in round-robin
+    */
+    unsigned num_channels;
+    vector<DMARequest*> channels;
+    unsigned last_channel;
+    void release_channel(DMARequest* req);
+
+    /*
+    Requests launched from a descriptor ring can share a resource, which is
+    released when its last request completes
+    */
+    map<uint8_t, unsigned> resource_users;
+
+    /* The DMA is busy from the first request until the last one completes */
+    Tick busy_since;
+    double ref_bandwidth;
+
+    // Stats
+    Stats::Scalar bytesRead;
+    Stats::Scalar bytesWritten;
+    Stats::Scalar bursts;
+    Stats::Scalar transfers;
+    Stats::Scalar busyTicks;
+    Stats::Value windowStalls;
+    Stats::Formula avgBurstSize;
+    Stats::Formula bandwidth;
+    Stats::Formula bwUtilization;
+    void initiate(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, bool RW, uint8_t dma_resource, unsigned long status_addr);
 
   public:
     /* Request for DMA operations */
-    void initiate_write(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource);
-    void initiate_read (uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource);
-    void wait_on_resource(uint8_t res);
+    /* status_addr: status word of the descriptor, written with PIM_DMA_DESC_DONE on completion (0: not a descriptor) */
+    void initiate_write(uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource, unsigned long status_addr = 0);
+    void initiate_read (uint8_t* vreg_ptr, unsigned long dma_mem_vaddr, unsigned long dma_num_bytes, uint8_t dma_resource, unsigned long status_addr = 0);
+    void wait_on_resource(uint8_t res, BaseCPU* cpu);
 
     // uint8_t resource_to_wait_for;
     //bool dirty_interrupt;
@@ -104,8 +142,13 @@ class ethz_DMA: public DmaDevice
     unsigned current_state;
     bool next_state_scheduled;
     EventWrapper<ethz_DMA, &ethz_DMA::nextState> nextStateEvent;
-    BaseCPU* pim_cpu;
-    ThreadContext* tc; // Thread context of the processor
+    /*
+    The PIM cores served by this DMA (one for a private DMA, all of them
+    for a DMA shared by the cluster) and their thread contexts
+    */
+    std::vector<BaseCPU*> pim_cpus;
+    std::vector<ThreadContext*> tcs;
+    uint8_t get_resources() const { return dma_resources; }
     ethz_PIMMemory* pim_mem;
 
   protected:
@@ -195,6 +238,8 @@ class ethz_DMA: public DmaDevice
     virtual Tick read(PacketPtr pkt);
     virtual Tick write(PacketPtr pkt);
 
+    virtual void regStats();
+
     virtual void serialize(std::ostream &os);
     virtual void unserialize(Checkpoint *cp, const std::string &section);
 
@@ -61,3 +61,23 @@ class AbstractMemory(MemObject):
     # configuration information about the physical memory layout to
     # the kernel, e.g. using ATAG or ACPI
     conf_table_reported = Param.Bool(True, "Report to configuration table")
+
+    # HMC atomic commands executed in the memory (one entry per command,
+    # the opcodes are the HMC_CMD_* values of ethz_pim_definitions.h).
+    # Width is the operand width in bytes (0: size of the request), the
+    # latency is added to the response and the energy (pJ) is accumulated
+    # in the atomic_energy statistic
+    hmc_atomic_names = VectorParam.String(
+        ['inc', 'fadd', 'min', 'cas', 'or', 'and', 'add16', 'minr'],
+        "Names of the HMC atomic commands")
+    hmc_atomic_opcodes = VectorParam.Unsigned(
+        [ord(c) for c in '12345678'], "Opcodes of the HMC atomic commands")
+    hmc_atomic_widths = VectorParam.Unsigned([0, 4, 4, 0, 0, 0, 16, 4],
+        "Operand width of the HMC atomic commands (bytes)")
+    hmc_atomic_returns = VectorParam.Bool(
+        [False, False, False, True, True, True, False, True],
+        "The HMC atomic command returns the old value of the memory")
+    hmc_atomic_latency = VectorParam.Latency(['0ns'] * 8,
+        "Latency of the HMC atomic commands")
+    hmc_atomic_energy = VectorParam.Float([0.0] * 8,
+        "Energy of the HMC atomic commands (pJ)")
@@ -43,8 +43,16 @@ from m5.params import *
 from AbstractMemory import *
 
 # Enum for memory scheduling algorithms, currently First-Come
-# First-Served and a First-Row Hit then First-Come First-Served
-class MemSched(Enum): vals = ['fcfs', 'frfcfs']
+# First-Served and a First-Row Hit then First-Come First-Served, plus
+# three variants of the latter:
+#  frfcfs_cap: the oldest request is bypassed by at most frfcfs_cap
+#              younger requests
+#  parbs:      the reads are served in batches (PAR-BS), each batch
+#              holding at most batch_cap requests per master and bank
+#  priority:   the requests of the low_priority_masters are only
+#              served when no other request is waiting
+class MemSched(Enum): vals = ['fcfs', 'frfcfs', 'frfcfs_cap', 'parbs',
+                              'priority']
 
 # Enum for the address mapping. With Ch, Ra, Ba, Ro and Co denoting
 # channel, rank, bank, row and column, respectively, and going from
@@ -59,6 +67,18 @@ class AddrMap(Enum): vals = ['RoRaBaChCo', 'RoRaBaCoCh', 'RoCoRaBaCh']
 class PageManage(Enum): vals = ['open', 'open_adaptive', 'close',
                                 'close_adaptive']
 
+# Enum for the trigger of the row prefetch buffer: the rest of a row is
+# prefetched when a read follows another read to the same row of the
+# bank (sequential), or on every read that activates a row
+# (every_activate).
+class RowPrefetch(Enum): vals = ['sequential', 'every_activate']
+
+# Enum for the refresh policy: all the banks of the channel are
+# refreshed at once every tREFI (all_bank), or one bank at a time every
+# tREFI / (ranks x banks), while the other banks keep serving requests
+# (per_bank).
+class RefreshPolicy(Enum): vals = ['all_bank', 'per_bank']
+
 # DRAMCtrl is a single-channel single-ported DRAM controller model
 # that aims to model the most important system-level performance
 # effects of a DRAM without getting into too much detail of the DRAM
@@ -89,6 +109,12 @@ class DRAMCtrl(AbstractMemory):
 
     # scheduler, address map and page policy
     mem_sched_policy = Param.MemSched('frfcfs', "Memory scheduling policy")
+    frfcfs_cap = Param.Unsigned(4, "Younger requests allowed to bypass "
+                                "the oldest one (frfcfs_cap)")
+    batch_cap = Param.Unsigned(5, "Requests per master and bank marked in "
+                               "a batch (parbs)")
+    low_priority_masters = VectorParam.String([], "Name prefixes of the "
+                                              "masters served last (priority)")
     addr_mapping = Param.AddrMap('RoRaBaChCo', "Address mapping policy")
     page_policy = Param.PageManage('open_adaptive', "Page management policy")
 
@@ -106,6 +132,18 @@ class DRAMCtrl(AbstractMemory):
     static_frontend_latency = Param.Latency("10ns", "Static frontend latency")
     static_backend_latency = Param.Latency("10ns", "Static backend latency")
 
+    # optional row prefetch buffer (SRAM in the controller), holding
+    # whole rows and serving the reads that hit in them, like the
+    # write queue does, with only the frontend contribution
+    prefetch_buffer_entries = Param.Unsigned(0, "Rows held in the prefetch "
+                                             "buffer (0: no prefetch)")
+    prefetch_trigger = Param.RowPrefetch('sequential', "When to prefetch "
+                                         "the rest of a row")
+    prefetch_latency = Param.Latency("1ns", "Latency of a read served by "
+                                     "the prefetch buffer")
+    prefetch_energy = Param.Float(0.0, "Energy of a burst written to or "
+                                  "read from the prefetch buffer (pJ)")
+
     # the physical organisation of the DRAM
     device_bus_width = Param.Unsigned("data bus width in bits for each DRAM "\
                                       "device/chip")
@@ -182,6 +220,21 @@ class DRAMCtrl(AbstractMemory):
     # to be sent. It is 7.8 us for a 64ms refresh requirement
     tREFI = Param.Latency("Refresh command interval")
 
+    # refresh policy, and the refresh cycle time of a single bank
+    # with per-bank refresh
+    refresh_policy = Param.RefreshPolicy('all_bank', "Refresh policy")
+    tRFC_pb = Param.Latency("0ns", "Per-bank refresh cycle time "
+                            "(per_bank, 0: tRFC)")
+
+    # refresh pausing (all_bank): a refresh is split in
+    # refresh_pause_segments parts, and the remaining parts are
+    # postponed when reads are waiting at the end of one of them (they
+    # are done at the latest tREFI / 2 after the refresh was due)
+    refresh_pausing = Param.Bool(False, "Pause the refreshes to serve "
+                                 "waiting reads (all_bank)")
+    refresh_pause_segments = Param.Unsigned(4, "Parts of a refresh between "
+                                            "which it can be paused")
+
     # write-to-read, same rank turnaround penalty
     tWTR = Param.Latency("Write to read, same rank switching time")
 
@@ -4,8 +4,17 @@ from XBar import *
 # Written by Erfan
 # This class was previously called: ethz_SMCController
 
+# How the requests are distributed among the serial links
+#  round_robin:       one link after the other (regardless of the address)
+#  least_outstanding: the link with the smallest number of pending responses
+#  address_hash:      hash of the block address (same block -> same link)
+#  vault_affinity:    the vault field of the address selects the link
+class LoadDistributionPolicy(Enum): vals = ['round_robin', 'least_outstanding', 'address_hash', 'vault_affinity']
+
 class LoadDistributor(NoncoherentXBar):
 	type = 'LoadDistributor'
 	cxx_header = "mem/load_distributor.hh"
 	port = SlavePort("Slave ports")
-	
+	distribution_policy = Param.LoadDistributionPolicy('round_robin', "Policy to distribute the requests among the links")
+	vault_bits = Param.Unsigned(4, "Number of vault bits in the address (NBITS_CH)")
+	offset_bits = Param.Unsigned(6, "Number of offset bits below the vault bits (NBITS_OF)")
@@ -0,0 +1,23 @@
+from m5.params import *
+from MemObject import MemObject
+
+# HMC-like serial link: packets are split into flits and serialized on
+#  separate request and response lanes, with token (credit) based flow
+#  control and link-level retry of the packets which fail the CRC check.
+#  Notice: the clk_domain of this component is the clock of the lanes
+#  (one bit per lane per cycle).
+class SerialLink(MemObject):
+    type = 'SerialLink'
+    cxx_header = "mem/serial_link.hh"
+    slave = SlavePort('Slave port')
+    master = MasterPort('Master port')
+    req_size = Param.Unsigned(144, "Request flits buffered at the receiver (request tokens)")
+    resp_size = Param.Unsigned(144, "Response flits buffered at the receiver (response tokens)")
+    delay = Param.Latency('0ns', "Static latency of the link (SERDES + PCB)")
+    ranges = VectorParam.AddrRange([AllMemory],
+                                   "Address ranges to pass through the link")
+    serialization_unit = Param.Unsigned(16, "Number of lanes in each direction of the link")
+    flit_size = Param.Unsigned(16, "Flit size (bytes), one flit of each packet is header + tail")
+    credit_delay = Param.Latency('0ns', "Latency of returning the tokens to the sender")
+    error_rate = Param.Float(0.0, "Probability of a packet failing the CRC check, in [0, 1)")
+    retry_delay = Param.Latency('0ns', "Time lost on the lane before a failed packet is sent again")
@@ -70,6 +70,21 @@ class NoncoherentXBar(BaseXBar):
     type = 'NoncoherentXBar'
     cxx_header = "mem/noncoherent_xbar.hh"
 
+    # Quality of service, with one entry per slave port (i.e. per
+    # connected master, in the order of connection). The weights are
+    # used to pick the master that gets a request layer when several
+    # of them are waiting (weighted round robin), and the token
+    # buckets cap the request bandwidth of each master. Empty vectors
+    # keep the plain FIFO arbitration without any cap.
+    qos_weights = VectorParam.Unsigned([], "Arbitration weight of each "
+                                       "slave port (0: only served when "
+                                       "no one else is waiting)")
+    qos_bandwidth = VectorParam.MemoryBandwidth([], "Request bandwidth cap "
+                                                "of each slave port "
+                                                "(0: no cap)")
+    qos_burst = VectorParam.MemorySize([], "Token bucket size of each "
+                                       "slave port")
+
 class CoherentXBar(BaseXBar):
     type = 'CoherentXBar'
     cxx_header = "mem/coherent_xbar.hh"
@@ -83,6 +98,9 @@ class PIMXBar(BaseXBar):
 
     ideal_instr_fetch = Param.Bool(False, "Ideal Instruction Fetch using functional accesses")
     ideal_spm_access = Param.Bool(False, "Ideal Access to the Multiported SPM")
+    spm_banks = Param.Unsigned(0, "Number of banks of the SPM (0: not banked)")
+    spm_bank_interleave = Param.Unsigned(4, "Interleaving of the SPM banks (bytes)")
+    spm_bank_busy = Param.Cycles(1, "Cycles for which a bank is busy with an access")
 
     system = Param.System(Parent.any, "System that the crossbar belongs to.")
     snoop_filter = Param.SnoopFilter(NULL, "Selected snoop filter.")
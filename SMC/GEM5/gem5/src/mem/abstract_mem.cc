@@ -66,6 +66,33 @@ AbstractMemory::AbstractMemory(const Params *p) :
     confTableReported(p->conf_table_reported), inAddrMap(p->in_addr_map),
     _system(NULL)
 {
+    fatal_if(p->hmc_atomic_opcodes.size() != p->hmc_atomic_names.size() ||
+             p->hmc_atomic_widths.size() != p->hmc_atomic_names.size() ||
+             p->hmc_atomic_returns.size() != p->hmc_atomic_names.size() ||
+             p->hmc_atomic_latency.size() != p->hmc_atomic_names.size() ||
+             p->hmc_atomic_energy.size() != p->hmc_atomic_names.size(),
+             "%s: the columns of the HMC atomic table differ in length\n",
+             name());
+    for (size_t i = 0; i < p->hmc_atomic_names.size(); i++) {
+        HMCAtomicOp op;
+        op.index = i;
+        op.width = p->hmc_atomic_widths[i];
+        op.returns = p->hmc_atomic_returns[i];
+        op.latency = p->hmc_atomic_latency[i];
+        op.energy = p->hmc_atomic_energy[i];
+        fatal_if(p->hmc_atomic_opcodes[i] == HMC_CMD_NOP ||
+                 p->hmc_atomic_opcodes[i] > 0xFF,
+                 "%s: invalid opcode for the HMC atomic command %s\n",
+                 name(), p->hmc_atomic_names[i]);
+        fatal_if(op.width != 0 && op.width != 4 && op.width != 8 &&
+                 op.width != 16,
+                 "%s: invalid width for the HMC atomic command %s\n",
+                 name(), p->hmc_atomic_names[i]);
+        if (!hmcAtomicOps.insert(std::make_pair(
+                (uint8_t)p->hmc_atomic_opcodes[i], op)).second)
+            fatal("%s: HMC atomic opcode %d is used twice\n", name(),
+                  p->hmc_atomic_opcodes[i]);
+    }
 }
 
 void
@@ -94,17 +121,20 @@ AbstractMemory::regStats()
     // for (int i = 0; i < system()->maxMasters(); i++)
     //     cout << system()->name() << "\t" << system()->getMasterId(system()->getMasterName(i)) << "\t" << system()->getMasterName(i) << endl;
 
-    atomic_fadd_count
-        .name(name() + ".atomic_fadd_count")
-        .desc("atomic fadd count")
-        ;
-    atomic_min_count
-        .name(name() + ".atomic_min_count")
-        .desc("atomic min count")
-        ;
-    atomic_inc_count
-        .name(name() + ".atomic_inc_count")
-        .desc("atomic inc count")
+    if (!hmcAtomicOps.empty()) {
+        atomic_count
+            .init(hmcAtomicOps.size())
+            .name(name() + ".atomic_count")
+            .desc("Number of HMC atomic commands per command")
+            .flags(total)
+            ;
+        for (size_t i = 0; i < params()->hmc_atomic_names.size(); i++) {
+            atomic_count.subname(i, params()->hmc_atomic_names[i]);
+        }
+    }
+    atomic_energy
+        .name(name() + ".atomic_energy")
+        .desc("Energy of the HMC atomic commands (pJ)")
         ;
 
     bytesRead
@@ -343,6 +373,97 @@ AbstractMemory::checkLockedAddrList(PacketPtr pkt)
 
 #endif
 
+// Integer read-modify-write of the HMC atomic commands, returns the old value
+template <typename T>
+static T
+hmcIntegerAtomic(uint8_t cmd, T* mem, T operand, T operand2)
+{
+    T old = *mem;
+    switch (cmd)
+    {
+        case HMC_CMD_INC:   *mem = old + 1; break;
+        case HMC_CMD_MIN:
+        case HMC_CMD_MINR:  if ( operand < old ) *mem = operand; break;
+        case HMC_CMD_CAS:   if ( old == operand ) *mem = operand2; break;
+        case HMC_CMD_OR:    *mem = old | operand; break;
+        case HMC_CMD_AND:   *mem = old & operand; break;
+        default:
+            panic("Unsupported integer atomic command: %c", cmd);
+    }
+    return old;
+}
+
+// Sign extension of an operand written by a PIM with words of s bytes
+static int64_t
+hmcSignExtend(unsigned long operand, unsigned s)
+{
+    return (s == 4) ? (int64_t)(int32_t)operand : (int64_t)operand;
+}
+
+const AbstractMemory::HMCAtomicOp&
+AbstractMemory::hmcAtomicOp(uint8_t opcode) const
+{
+    std::map<uint8_t, HMCAtomicOp>::const_iterator it =
+        hmcAtomicOps.find(opcode);
+    if (it == hmcAtomicOps.end())
+        panic("%s: unsupported atomic command: %c", name(), opcode);
+    return it->second;
+}
+
+Tick
+AbstractMemory::hmcAtomicLatency(PacketPtr pkt) const
+{
+    if (!pkt->ATOMIC_HMC_COMMAND || !pkt->isWrite())
+        return 0;
+    return hmcAtomicOp(pkt->ATOMIC_HMC_COMMAND).latency;
+}
+
+void
+AbstractMemory::executeHMCAtomic(PacketPtr pkt, uint8_t* host_addr)
+{
+    const HMCAtomicOp& op = hmcAtomicOp(pkt->ATOMIC_HMC_COMMAND);
+    unsigned s = op.width ? op.width : pkt->getSize();
+    if (pkt->getAddr() % s != 0 ||
+        !AddrRange(pkt->getAddr(), pkt->getAddr() + s - 1).isSubset(range))
+        panic("%s: unaligned atomic command %c (%d bytes) at 0x%x",
+              name(), pkt->ATOMIC_HMC_COMMAND, s, pkt->getAddr());
+
+    unsigned long old = 0;
+    switch (pkt->ATOMIC_HMC_COMMAND)
+    {
+        case HMC_CMD_FADD: // Atomic Float Add
+            assert(s == 4);
+            old = *((uint32_t*)host_addr);
+            (*((float*)host_addr)) += *((float*)&(pkt->ATOMIC_HMC_OPERAND));
+        break;
+        case HMC_CMD_ADD16: // Two signed 8-byte lanes
+            assert(s == 16);
+            ((int64_t*)host_addr)[0] += hmcSignExtend(pkt->ATOMIC_HMC_OPERAND, pkt->getSize());
+            ((int64_t*)host_addr)[1] += hmcSignExtend(pkt->ATOMIC_HMC_OPERAND2, pkt->getSize());
+        break;
+        default:
+            if (s == 4)
+                old = hmcIntegerAtomic<uint32_t>(pkt->ATOMIC_HMC_COMMAND,
+                          (uint32_t*)host_addr, pkt->ATOMIC_HMC_OPERAND,
+                          pkt->ATOMIC_HMC_OPERAND2);
+            else
+            if (s == 8)
+                old = hmcIntegerAtomic<uint64_t>(pkt->ATOMIC_HMC_COMMAND,
+                          (uint64_t*)host_addr, pkt->ATOMIC_HMC_OPERAND,
+                          pkt->ATOMIC_HMC_OPERAND2);
+            else
+                panic("Unsupported size for atomic command %c: %d",
+                      pkt->ATOMIC_HMC_COMMAND, s);
+    }
+
+    if (op.returns) {
+        pkt->ATOMIC_HMC_RESULT = old;
+        pkt->ATOMIC_HMC_RETURNED = true;
+    }
+    atomic_count[op.index]++;
+    atomic_energy += op.energy;
+}
+
 void
 AbstractMemory::access(PacketPtr pkt)
 {
@@ -438,48 +559,7 @@ AbstractMemory::access(PacketPtr pkt)
                         cout << name() << " ATOMIC HMC CMD:" << pkt->ATOMIC_HMC_COMMAND << " addr:" << hex << pkt->getAddr() << " hostaddr:" << (unsigned long)hostAddr << dec << " SIZE:" << pkt->getSize() << "(B)" << endl;
                     #endif
 
-                    unsigned s = pkt->getSize();
-                    switch (pkt->ATOMIC_HMC_COMMAND)
-                    {
-                        case HMC_CMD_INC: // Atomic increment command
-                            atomic_inc_count++;
-                            if (s == 4)
-                                (*((uint32_t*)hostAddr))++;
-                            else
-                            if (s == 8)
-                                (*((uint64_t*)hostAddr))++;
-                            else
-                                panic("Unsupported size for atomic increment");
-                        break;
-                        case HMC_CMD_FADD: // Atomic Float Add
-                            atomic_fadd_count++;
-                            //assert(pkt->getSize()==4);
-                            //cout << "<Atomic Float Add> addr:0x" << hex << pkt->getAddr() << " operand:0x" << pkt->ATOMIC_HMC_OPERAND << " data:0x" << pkt->getPtr<uint32_t>() << endl;
-                            (*((float*)hostAddr)) += *((float*)&(pkt->ATOMIC_HMC_OPERAND));
-                        break;
-                        case HMC_CMD_MIN: // Atomic increment command
-                            atomic_min_count++;
-                            if (s == 4)
-                            {
-                                uint32_t m = (*((uint32_t*)hostAddr));
-                                uint32_t n = pkt->ATOMIC_HMC_OPERAND;
-                                if ( n < m )
-                                    (*((uint32_t*)hostAddr)) = n;
-                                // cout << "<Atomic Min> addr:0x" << hex << pkt->getAddr() << " operand:0x" << pkt->ATOMIC_HMC_OPERAND << " data:0x" << pkt->getPtr<uint32_t>() << dec << endl;
-                                // cout << "n = " << n << endl;
-                                // cout << "m = " << m << endl;
-                                // cout << "result = " << (*((uint32_t*)hostAddr)) << endl;
-                            }
-                            else
-                            if (s == 8)
-                                panic("not implemented yet!");
-                            else
-                                panic("Unsupported size for atomic increment");
-                        break;
-                        default:
-                            cout << "Atomic Command: " << pkt->ATOMIC_HMC_COMMAND << endl;
-                            panic("Unsupported atomic command!");
-                    }
+                    executeHMCAtomic(pkt, hostAddr);
                     pkt->ATOMIC_HMC_COMMAND = 0;
                 }
                 /**************************************************************************/
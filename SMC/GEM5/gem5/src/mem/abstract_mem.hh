@@ -49,6 +49,8 @@
 #ifndef __ABSTRACT_MEMORY_HH__
 #define __ABSTRACT_MEMORY_HH__
 
+#include <map>
+
 #include "mem/mem_object.hh"
 #include "params/AbstractMemory.hh"
 #include "sim/stats.hh"
@@ -151,10 +153,29 @@ class AbstractMemory : public MemObject
         }
     }
 
+    /**
+     * An HMC atomic command of the table given by the configuration,
+     * looked up by the opcode carried in the packet
+     */
+    struct HMCAtomicOp
+    {
+        int index;          // Index of the command in the table (and its stats)
+        unsigned width;     // Operand width (bytes), 0: size of the request
+        bool returns;       // Sends back the old value of the memory
+        Tick latency;       // Latency of the read-modify-write
+        double energy;      // Energy of one command (pJ)
+    };
+    std::map<uint8_t, HMCAtomicOp> hmcAtomicOps;
+
+    /** Look up the command of an atomic packet (panics if unknown) */
+    const HMCAtomicOp& hmcAtomicOp(uint8_t opcode) const;
+
+    /** Do the read-modify-write of an atomic command in host memory */
+    void executeHMCAtomic(PacketPtr pkt, uint8_t* host_addr);
+
     /** Statistics related to atomic hmc commands */
-    Stats::Scalar atomic_fadd_count;
-    Stats::Scalar atomic_min_count;
-    Stats::Scalar atomic_inc_count;
+    Stats::Vector atomic_count;
+    Stats::Scalar atomic_energy;
 
     /** Number of total bytes read from this memory */
     Stats::Vector bytesRead;
@@ -257,6 +278,16 @@ class AbstractMemory : public MemObject
      */
     AddrRange getAddrRange() const;
 
+    /**
+     * Latency of the HMC atomic command carried by a packet (if any),
+     * to be added by the memory controllers to the access latency.
+     * Must be called before access(), which consumes the command.
+     *
+     * @param pkt Packet about to be performed
+     * @return the latency of its atomic command, or 0
+     */
+    Tick hmcAtomicLatency(PacketPtr pkt) const;
+
     /**
      * Get the memory size.
      *
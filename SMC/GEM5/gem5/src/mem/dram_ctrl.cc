@@ -42,6 +42,9 @@
  *          Neha Agarwal
  */
 
+#include <algorithm>
+#include <map>
+
 #include "base/bitfield.hh"
 #include "base/trace.hh"
 #include "debug/DRAM.hh"
@@ -65,7 +68,8 @@ DRAMCtrl::DRAMCtrl(const DRAMCtrlParams* p) :
     retryRdReq(false), retryWrReq(false),
     busState(READ),
     nextReqEvent(this), respondEvent(this), activateEvent(this),
-    prechargeEvent(this), refreshEvent(this), powerEvent(this),
+    prechargeEvent(this), refreshEvent(this), bankRefreshEvent(this),
+    powerEvent(this),
     drainManager(NULL),
     deviceSize(p->device_size),
     deviceBusWidth(p->device_bus_width), burstLength(p->burst_length),
@@ -89,12 +93,28 @@ DRAMCtrl::DRAMCtrl(const DRAMCtrlParams* p) :
     tCCD_L(p->tCCD_L), tRCD(p->tRCD), tCL(p->tCL), tRP(p->tRP), tRAS(p->tRAS),
     tWR(p->tWR), tRTP(p->tRTP), tRFC(p->tRFC), tREFI(p->tREFI), tRRD(p->tRRD),
     tRRD_L(p->tRRD_L), tXAW(p->tXAW), activationLimit(p->activation_limit),
-    memSchedPolicy(p->mem_sched_policy), addrMapping(p->addr_mapping),
+    memSchedPolicy(p->mem_sched_policy),
+    frfcfsCap(p->frfcfs_cap), readBypasses(0), writeBypasses(0),
+    batchCap(p->batch_cap), lowPriorityMasters(p->low_priority_masters),
+    addrMapping(p->addr_mapping),
     pageMgmt(p->page_policy),
     maxAccessesPerRow(p->max_accesses_per_row),
     frontendLatency(p->static_frontend_latency),
     backendLatency(p->static_backend_latency),
+    prefetchEntries(p->prefetch_buffer_entries),
+    prefetchTrigger(p->prefetch_trigger),
+    prefetchLatency(p->prefetch_latency),
+    prefetchBurstEnergy(p->prefetch_energy),
     busBusyUntil(0), refreshDueAt(0), refreshState(REF_IDLE),
+    refreshPolicy(p->refresh_policy),
+    tRFCpb(p->tRFC_pb ? p->tRFC_pb : p->tRFC),
+    tREFIpb(p->tREFI / (p->ranks_per_channel * p->banks_per_rank)),
+    refreshBank(0), refreshPausing(p->refresh_pausing),
+    refreshSegments(p->refresh_pausing ? p->refresh_pause_segments : 1),
+    refreshSegmentsLeft(0),
+    bankRefreshEnergy(p->VDD * (p->IDD5 - p->IDD3N) * tRFCpb /
+                      p->banks_per_rank * p->devices_per_rank),
+    rankRefreshEnergy(p->ranks_per_channel, 0.0),
     pwrStateTrans(PWR_IDLE), pwrState(PWR_IDLE), prevArrival(0),
     nextReqTime(0), pwrStateTick(0), numBanksActive(0),
     activeRank(0), timeStampOffset(0)
@@ -142,6 +162,10 @@ DRAMCtrl::DRAMCtrl(const DRAMCtrlParams* p) :
               "high threshold %d\n", p->write_low_thresh_perc,
               p->write_high_thresh_perc);
 
+    if (memSchedPolicy == Enums::parbs && batchCap == 0)
+        fatal("%s: batch_cap must be at least 1 with the parbs policy\n",
+              name());
+
     // determine the rows per bank by looking at the total capacity
     uint64_t capacity = ULL(1) << ceilLog2(AbstractMemory::size());
 
@@ -209,6 +233,20 @@ DRAMCtrl::DRAMCtrl(const DRAMCtrlParams* p) :
               tREFI, tRP, tRFC);
     }
 
+    if (refreshPolicy == Enums::per_bank && tREFIpb <= tRFCpb) {
+        fatal("tREFI / (ranks x banks) (%d) must be larger than the "
+              "per-bank refresh cycle time (%d)\n", tREFIpb, tRFCpb);
+    }
+
+    if (refreshPausing) {
+        if (refreshPolicy == Enums::per_bank)
+            fatal("Refresh pausing of %s needs the all_bank refresh "
+                  "policy\n", name());
+        if (refreshSegments == 0 || tRFC / refreshSegments == 0)
+            fatal("Refresh of %s cannot be paused in %d parts\n",
+                  name(), refreshSegments);
+    }
+
     // basic bank group architecture checks ->
     if (bankGroupArch) {
         // must have at least one bank per bank group
@@ -314,8 +352,11 @@ DRAMCtrl::startup()
     busBusyUntil = curTick() + tRP + tRCD + tCL;
 
     // kick off the refresh, and give ourselves enough time to
-    // precharge
-    schedule(refreshEvent, curTick() + tREFI - tRP);
+    // precharge (the per-bank refresh precharges the bank itself)
+    if (refreshPolicy == Enums::per_bank)
+        schedule(bankRefreshEvent, curTick() + tREFIpb);
+    else
+        schedule(refreshEvent, curTick() + tREFI - tRP);
 }
 
 Tick
@@ -323,14 +364,16 @@ DRAMCtrl::recvAtomic(PacketPtr pkt)
 {
     DPRINTF(DRAM, "recvAtomic: %s 0x%x\n", pkt->cmdString(), pkt->getAddr());
 
+    // the atomic commands are consumed by the access
+    Tick latency = hmcAtomicLatency(pkt);
+
     // do the actual memory access and turn the packet into a response
     access(pkt);
 
-    Tick latency = 0;
     if (!pkt->memInhibitAsserted() && pkt->hasData()) {
         // this value is not supposed to be accurate, just enough to
         // keep things going, mimic a closed page
-        latency = tRP + tRCD + tCL;
+        latency += tRP + tRCD + tCL;
     }
     return latency;
 }
@@ -460,7 +503,8 @@ DRAMCtrl::decodeAddr(PacketPtr pkt, Addr dramPktAddr, unsigned size,
     // later
     uint16_t bank_id = banksPerRank * rank + bank;
     return new DRAMPacket(pkt, isRead, rank, bank, row, bank_id, dramPktAddr,
-                          size, banks[rank][bank]);
+                          size, banks[rank][bank],
+                          isLowPriority(pkt->req->masterId()));
 }
 
 void
@@ -480,6 +524,8 @@ DRAMCtrl::addToReadQueue(PacketPtr pkt, unsigned int pktCount)
     // check read packets against packets in write queue.
     Addr addr = pkt->getAddr();
     unsigned pktsServicedByWrQ = 0;
+    unsigned pktsServicedByPrefetch = 0;
+    Tick prefetch_ready = curTick();
     BurstHelper* burst_helper = NULL;
     for (int cnt = 0; cnt < pktCount; ++cnt) {
         unsigned size = std::min((addr | (burstSize - 1)) + 1,
@@ -506,9 +552,35 @@ DRAMCtrl::addToReadQueue(PacketPtr pkt, unsigned int pktCount)
         }
 
         // If not found in the write q, make a DRAM packet and
-        // push it onto the read queue
+        // push it onto the read queue, unless its row is in the
+        // prefetch buffer
         if (!foundInWrQ) {
 
+            DRAMPacket* dram_pkt = decodeAddr(pkt, addr, size, true);
+
+            auto entry = prefetchBuffer.end();
+            if (prefetchEntries > 0)
+                entry = findPrefetch(dram_pkt->rank, dram_pkt->bank,
+                                     dram_pkt->row);
+            if (entry != prefetchBuffer.end()) {
+                DPRINTF(DRAM, "Read to addr %lld with size %d serviced by "
+                        "the prefetch buffer\n", addr, size);
+                pktsServicedByPrefetch++;
+                prefetchHits++;
+                prefetchEnergy += prefetchBurstEnergy;
+                prefetch_ready = std::max(prefetch_ready, entry->readyAt);
+
+                // move the entry to the most recently used position
+                PrefetchEntry hit = *entry;
+                hit.hits++;
+                prefetchBuffer.erase(entry);
+                prefetchBuffer.push_back(hit);
+
+                delete dram_pkt;
+                addr = (addr | (burstSize - 1)) + 1;
+                continue;
+            }
+
             // Make the burst helper for split packets
             if (pktCount > 1 && burst_helper == NULL) {
                 DPRINTF(DRAM, "Read to addr %lld translates to %d "
@@ -516,7 +588,6 @@ DRAMCtrl::addToReadQueue(PacketPtr pkt, unsigned int pktCount)
                 burst_helper = new BurstHelper(pktCount);
             }
 
-            DRAMPacket* dram_pkt = decodeAddr(pkt, addr, size, true);
             dram_pkt->burstHelper = burst_helper;
 
             assert(!readQueueFull(1));
@@ -534,15 +605,22 @@ DRAMCtrl::addToReadQueue(PacketPtr pkt, unsigned int pktCount)
         addr = (addr | (burstSize - 1)) + 1;
     }
 
-    // If all packets are serviced by write queue, we send the repsonse back
-    if (pktsServicedByWrQ == pktCount) {
-        accessAndRespond(pkt, frontendLatency);
+    // If all packets are serviced by write queue (or the prefetch
+    // buffer), we send the repsonse back, once the prefetched data
+    // has arrived
+    if (pktsServicedByWrQ + pktsServicedByPrefetch == pktCount) {
+        Tick latency = frontendLatency;
+        if (pktsServicedByPrefetch > 0)
+            latency += prefetch_ready - curTick() + prefetchLatency;
+        accessAndRespond(pkt, latency);
         return;
     }
 
-    // Update how many split packets are serviced by write queue
+    // Update how many split packets are serviced by write queue (or
+    // the prefetch buffer)
     if (burst_helper != NULL)
-        burst_helper->burstsServiced = pktsServicedByWrQ;
+        burst_helper->burstsServiced = pktsServicedByWrQ +
+            pktsServicedByPrefetch;
 
     // If we are not already scheduled to get a request out of the
     // queue, do so now
@@ -632,6 +710,14 @@ DRAMCtrl::addToWriteQueue(PacketPtr pkt, unsigned int pktCount)
         if (!merged) {
             DRAMPacket* dram_pkt = decodeAddr(pkt, addr, size, false);
 
+            // a copy of the row in the prefetch buffer is stale now
+            if (prefetchEntries > 0) {
+                auto entry = findPrefetch(dram_pkt->rank, dram_pkt->bank,
+                                          dram_pkt->row);
+                if (entry != prefetchBuffer.end())
+                    dropPrefetch(entry);
+            }
+
             assert(writeQueue.size() < writeBufferSize);
             wrQLenPdf[writeQueue.size()]++;
 
@@ -822,10 +908,94 @@ DRAMCtrl::chooseNext(std::deque<DRAMPacket*>& queue, bool switched_cmd_type)
         // Do nothing, since the correct request is already head
     } else if (memSchedPolicy == Enums::frfcfs) {
         reorderQueue(queue, switched_cmd_type);
+    } else if (memSchedPolicy == Enums::frfcfs_cap) {
+        uint32_t& bypasses = (&queue == &readQueue) ? readBypasses :
+                                                      writeBypasses;
+        DRAMPacket* oldest = queue.front();
+        reorderQueue(queue, switched_cmd_type);
+        if (queue.front() == oldest) {
+            bypasses = 0;
+        } else if (++bypasses > frfcfsCap) {
+            // The oldest request has been bypassed too many times,
+            // it goes next regardless of the row hits
+            DPRINTF(DRAM, "Bypass cap reached, serving the oldest request\n");
+            queue.erase(std::find(queue.begin(), queue.end(), oldest));
+            queue.push_front(oldest);
+            bypasses = 0;
+            cappedBypasses++;
+        }
+    } else if (memSchedPolicy == Enums::parbs) {
+        // The reads are served in batches, the writes are drained
+        // with FR-FCFS
+        if (&queue == &readQueue &&
+            std::none_of(queue.begin(), queue.end(), inBatch))
+            formBatch(queue);
+        reorderClass(queue, switched_cmd_type, inBatch);
+    } else if (memSchedPolicy == Enums::priority) {
+        if (reorderClass(queue, switched_cmd_type, normalPriority))
+            lowPriorityBypasses++;
     } else
         panic("No scheduling policy chosen\n");
 }
 
+bool
+DRAMCtrl::reorderClass(std::deque<DRAMPacket*>& queue, bool switched_cmd_type,
+                       bool (*in_class)(const DRAMPacket*))
+{
+    std::deque<DRAMPacket*> prioritized;
+    for (auto i = queue.begin(); i != queue.end() ; ++i) {
+        if (in_class(*i))
+            prioritized.push_back(*i);
+    }
+
+    // Either nobody or everybody is in the class: plain FR-FCFS
+    if (prioritized.empty() || prioritized.size() == queue.size()) {
+        reorderQueue(queue, switched_cmd_type);
+        return false;
+    }
+
+    reorderQueue(prioritized, switched_cmd_type);
+    DRAMPacket* selected_pkt = prioritized.front();
+    queue.erase(std::find(queue.begin(), queue.end(), selected_pkt));
+    queue.push_front(selected_pkt);
+    return true;
+}
+
+void
+DRAMCtrl::formBatch(std::deque<DRAMPacket*>& queue)
+{
+    // Requests marked so far for each master in each bank
+    std::map<std::pair<MasterID, uint16_t>, uint32_t> marked;
+    for (auto i = queue.begin(); i != queue.end() ; ++i) {
+        uint32_t& n = marked[std::make_pair((*i)->masterId, (*i)->bankId)];
+        if (n < batchCap) {
+            (*i)->marked = true;
+            n++;
+        }
+    }
+    DPRINTF(DRAM, "New batch formed from %d requests\n", queue.size());
+    batches++;
+}
+
+bool
+DRAMCtrl::isLowPriority(MasterID id)
+{
+    if (lowPriorityMasters.empty())
+        return false;
+    if (id >= masterPriority.size())
+        masterPriority.resize(id + 1, -1);
+    if (masterPriority[id] < 0) {
+        std::string master = system()->getMasterName(id);
+        masterPriority[id] = 0;
+        for (auto p = lowPriorityMasters.begin();
+             p != lowPriorityMasters.end(); ++p) {
+            if (master.compare(0, p->size(), *p) == 0)
+                masterPriority[id] = 1;
+        }
+    }
+    return masterPriority[id] == 1;
+}
+
 void
 DRAMCtrl::reorderQueue(std::deque<DRAMPacket*>& queue, bool switched_cmd_type)
 {
@@ -886,6 +1056,8 @@ DRAMCtrl::accessAndRespond(PacketPtr pkt, Tick static_latency)
     DPRINTF(DRAM, "Responding to Address %lld.. ",pkt->getAddr());
 
     bool needsResponse = pkt->needsResponse();
+    // the read-modify-write of an HMC atomic command delays its response
+    static_latency += hmcAtomicLatency(pkt);
     // do the actual memory access which also turns the packet into a
     // response
     access(pkt);
@@ -1189,6 +1361,26 @@ DRAMCtrl::doDRAMAccess(DRAMPacket* dram_pkt)
     bank.preAllowedAt = std::max(bank.preAllowedAt,
                                  dram_pkt->isRead ? cmd_at + tRTP :
                                  dram_pkt->readyTime + tWR);
+
+    // copy the rest of the row to the prefetch buffer (this also
+    // keeps the row open until the last column is read)
+    Tick prefetch_done = 0;
+    if (dram_pkt->isRead && prefetchEntries > 0 && columnsPerRowBuffer > 1) {
+        bool trigger = prefetchTrigger == Enums::every_activate ?
+            !row_hit : bank.lastReadRow == dram_pkt->row;
+        if (trigger && findPrefetch(dram_pkt->rank, dram_pkt->bank,
+                                    dram_pkt->row) == prefetchBuffer.end())
+            prefetch_done = prefetchRow(dram_pkt, cmd_at);
+    }
+    if (dram_pkt->isRead)
+        bank.lastReadRow = dram_pkt->row;
+
+    // reads that had to wait for a refresh of their bank
+    if (dram_pkt->isRead && bank.refreshDoneAt > dram_pkt->entryTime) {
+        ++refreshCollisions;
+        refreshCollisionLat.sample(dram_pkt->readyTime -
+                                   dram_pkt->entryTime);
+    }
     
     #ifdef ENABLE_TIMING_CHECKS
     if ( ! dram_pkt->isRead )
@@ -1265,8 +1457,8 @@ DRAMCtrl::doDRAMAccess(DRAMPacket* dram_pkt)
         DPRINTF(DRAM, "Auto-precharged bank: %d\n", dram_pkt->bankId);
     }
 
-    // Update bus state
-    busBusyUntil = dram_pkt->readyTime;
+    // Update bus state (the prefetched columns follow the burst)
+    busBusyUntil = std::max(dram_pkt->readyTime, prefetch_done);
 
     DPRINTF(DRAM, "Access to %lld, ready at %lld bus busy until %lld.\n",
             dram_pkt->addr, dram_pkt->readyTime, busBusyUntil);
@@ -1294,6 +1486,9 @@ DRAMCtrl::doDRAMAccess(DRAMPacket* dram_pkt)
 
         // Update latency stats
         totMemAccLat += dram_pkt->readyTime - dram_pkt->entryTime;
+        perMasterReadBursts[dram_pkt->masterId]++;
+        perMasterReadLat[dram_pkt->masterId] +=
+            dram_pkt->readyTime - dram_pkt->entryTime;
         totBusLat += tBURST;
         totQLat += cmd_at - dram_pkt->entryTime;
     } else {
@@ -1305,6 +1500,74 @@ DRAMCtrl::doDRAMAccess(DRAMPacket* dram_pkt)
     }
 }
 
+std::deque<DRAMCtrl::PrefetchEntry>::iterator
+DRAMCtrl::findPrefetch(uint8_t rank, uint8_t bank, uint32_t row)
+{
+    return std::find_if(prefetchBuffer.begin(), prefetchBuffer.end(),
+                        [=](const PrefetchEntry& e) {
+                            return e.rank == rank && e.bank == bank &&
+                                e.row == row; });
+}
+
+Tick
+DRAMCtrl::prefetchRow(DRAMPacket* dram_pkt, Tick cmd_at)
+{
+    Bank& bank = dram_pkt->bankRef;
+    const uint32_t bursts = columnsPerRowBuffer - 1;
+
+    // one read command per remaining column, back to back behind the
+    // burst of the packet
+    for (uint32_t i = 1; i <= bursts; i++) {
+        rankPower[dram_pkt->rank].powerlib.doCommand(MemCommand::RD,
+                                                     dram_pkt->bank,
+                                                     divCeil(cmd_at +
+                                                             i * tBURST,
+                                                             tCK) -
+                                                     timeStampOffset);
+    }
+
+    Tick last_cmd_at = cmd_at + bursts * tBURST;
+    Tick done_at = dram_pkt->readyTime + bursts * tBURST;
+
+    // no other column command before the prefetch is done, and no
+    // precharge before the last read
+    for (int j = 0; j < ranksPerChannel; j++)
+        for (int i = 0; i < banksPerRank; i++)
+            banks[j][i].colAllowedAt = std::max(banks[j][i].colAllowedAt,
+                                                last_cmd_at + tBURST);
+    bank.preAllowedAt = std::max(bank.preAllowedAt, last_cmd_at + tRTP);
+    bank.bytesAccessed += bursts * burstSize;
+
+    // make room for the new row
+    if (prefetchBuffer.size() == prefetchEntries)
+        dropPrefetch(prefetchBuffer.begin());
+
+    PrefetchEntry entry;
+    entry.rank = dram_pkt->rank;
+    entry.bank = dram_pkt->bank;
+    entry.row = dram_pkt->row;
+    entry.readyAt = done_at;
+    entry.hits = 0;
+    prefetchBuffer.push_back(entry);
+
+    DPRINTF(DRAM, "Prefetching rank/bank/row %d %d %d, ready at %lld\n",
+            entry.rank, entry.bank, entry.row, done_at);
+
+    ++prefetches;
+    prefetchBursts += bursts;
+    prefetchEnergy += bursts * prefetchBurstEnergy;
+
+    return done_at;
+}
+
+void
+DRAMCtrl::dropPrefetch(std::deque<PrefetchEntry>::iterator entry)
+{
+    if (entry->hits == 0)
+        ++prefetchUnused;
+    prefetchBuffer.erase(entry);
+}
+
 void
 DRAMCtrl::processNextReqEvent()
 {
@@ -1354,6 +1617,13 @@ DRAMCtrl::processNextReqEvent()
         return;
     }
 
+    // resume a paused refresh as soon as there are no reads waiting
+    if (refreshSegmentsLeft > 0 && readQueue.empty() &&
+        refreshEvent.when() > curTick()) {
+        DPRINTF(DRAM, "Reads served, resuming the refresh\n");
+        reschedule(refreshEvent, curTick());
+    }
+
     // when we get here it is either a read or a write
     if (busState == READ) {
 
@@ -1574,8 +1844,12 @@ DRAMCtrl::processRefreshEvent()
 {
     // when first preparing the refresh, remember when it was due
     if (refreshState == REF_IDLE) {
-        // remember when the refresh is due
-        refreshDueAt = curTick();
+        // remember when the refresh is due, a paused refresh keeps
+        // the time it was originally due
+        if (refreshSegmentsLeft == 0) {
+            refreshDueAt = curTick();
+            refreshSegmentsLeft = refreshSegments;
+        }
 
         // proceed to drain
         refreshState = REF_DRAIN;
@@ -1665,43 +1939,36 @@ DRAMCtrl::processRefreshEvent()
         assert(numBanksActive == 0);
         assert(pwrState == PWR_REF);
 
-        Tick ref_done_at = curTick() + tRFC;
+        // with refresh pausing only one part of the refresh is done
+        // at a time, DRAMPower sees a single REF for the whole of it
+        bool first_segment = refreshSegmentsLeft == refreshSegments;
+        Tick ref_done_at = curTick() + tRFC / refreshSegments;
+        --refreshSegmentsLeft;
 
         for (int i = 0; i < ranksPerChannel; i++) {
             for (int j = 0; j < banksPerRank; j++) {
                 banks[i][j].actAllowedAt = ref_done_at;
+                banks[i][j].refreshDoneAt = ref_done_at;
             }
 
-            // at the moment this affects all ranks
-            rankPower[i].powerlib.doCommand(MemCommand::REF, 0,
-                                            divCeil(curTick(), tCK) -
-                                            timeStampOffset);
+            if (first_segment) {
+                // at the moment this affects all ranks
+                rankPower[i].powerlib.doCommand(MemCommand::REF, 0,
+                                                divCeil(curTick(), tCK) -
+                                                timeStampOffset);
 
-            // at the moment sort the list of commands and update the counters
-            // for DRAMPower libray when doing a refresh
-            sort(rankPower[i].powerlib.cmdList.begin(),
-                 rankPower[i].powerlib.cmdList.end(), DRAMCtrl::sortTime);
-
-            // update the counters for DRAMPower, passing false to
-            // indicate that this is not the last command in the
-            // list. DRAMPower requires this information for the
-            // correct calculation of the background energy at the end
-            // of the simulation. Ideally we would want to call this
-            // function with true once at the end of the
-            // simulation. However, the discarded energy is extremly
-            // small and does not effect the final results.
-            rankPower[i].powerlib.updateCounters(false);
-
-            // call the energy function
-            rankPower[i].powerlib.calcEnergy();
-
-            // Update the stats
-            updatePowerStats(i);
-
-            DPRINTF(DRAMPower, "%llu,REF,0,%d\n", divCeil(curTick(), tCK) -
-                    timeStampOffset, i);
+                flushPowerCommands(i);
+
+                DPRINTF(DRAMPower, "%llu,REF,0,%d\n",
+                        divCeil(curTick(), tCK) - timeStampOffset, i);
+            }
         }
 
+        if (first_segment)
+            ++refreshes;
+        refreshBlockedCycles += divCeil(ref_done_at - curTick(), tCK) *
+            ranksPerChannel * banksPerRank;
+
         // make sure we did not wait so long that we cannot make up
         // for it
         if (refreshDueAt + tREFI < ref_done_at) {
@@ -1709,8 +1976,10 @@ DRAMCtrl::processRefreshEvent()
         }
 
         // compensate for the delay in actually performing the refresh
-        // when scheduling the next one
-        schedule(refreshEvent, refreshDueAt + tREFI - tRP);
+        // when scheduling the next one, a paused refresh is resumed
+        // from the power event instead
+        if (refreshSegmentsLeft == 0)
+            schedule(refreshEvent, refreshDueAt + tREFI - tRP);
 
         assert(!powerEvent.scheduled());
 
@@ -1724,6 +1993,57 @@ DRAMCtrl::processRefreshEvent()
     }
 }
 
+Tick
+DRAMCtrl::refreshResumeAt() const
+{
+    // the remaining parts must be done by tREFI / 2 after the
+    // refresh was due
+    return refreshDueAt + tREFI / 2 -
+        refreshSegmentsLeft * (tRFC / refreshSegments);
+}
+
+bool
+DRAMCtrl::pauseRefresh() const
+{
+    return refreshPausing && !readQueue.empty() &&
+        curTick() < refreshResumeAt();
+}
+
+void
+DRAMCtrl::processBankRefreshEvent()
+{
+    uint8_t rank = refreshBank / banksPerRank;
+    Bank& bank = banks[rank][refreshBank % banksPerRank];
+
+    // close the row of the bank once the ongoing accesses allow it,
+    // the other banks are not affected
+    if (bank.openRow != Bank::NO_ROW)
+        prechargeBank(bank, std::max(bank.preAllowedAt, curTick()));
+
+    Tick ref_at = std::max(bank.actAllowedAt, curTick());
+    Tick ref_done_at = ref_at + tRFCpb;
+    bank.actAllowedAt = ref_done_at;
+    bank.refreshDoneAt = ref_done_at;
+
+    // DRAMPower has no per-bank refresh, its energy is added to the
+    // results of DRAMPower instead
+    rankRefreshEnergy[rank] += bankRefreshEnergy;
+
+    ++refreshes;
+    refreshBlockedCycles += divCeil(tRFCpb, tCK);
+
+    DPRINTF(DRAMState, "Refreshing bank %d of rank %d from %llu to %llu\n",
+            bank.bank, rank, ref_at, ref_done_at);
+
+    // once all the banks of the rank are refreshed, let DRAMPower
+    // catch up with the commands of the rank
+    if (refreshBank % banksPerRank == banksPerRank - 1)
+        flushPowerCommands(rank);
+
+    refreshBank = (refreshBank + 1) % (ranksPerChannel * banksPerRank);
+    schedule(bankRefreshEvent, curTick() + tREFIpb);
+}
+
 void
 DRAMCtrl::schedulePowerEvent(PowerState pwr_state, Tick tick)
 {
@@ -1766,10 +2086,26 @@ DRAMCtrl::processPowerEvent()
             DPRINTF(DRAMState, "Was refreshing for %llu ticks\n", duration);
             assert(pwrState == PWR_IDLE);
 
-            // kick things into action again
-            refreshState = REF_IDLE;
-            assert(!nextReqEvent.scheduled());
-            schedule(nextReqEvent, curTick());
+            if (refreshSegmentsLeft > 0 && !pauseRefresh()) {
+                // carry on with the next part of the refresh right
+                // away, and proceed below
+                pwrState = PWR_REF;
+            } else {
+                if (refreshSegmentsLeft > 0) {
+                    // let the waiting reads go first, the rest of the
+                    // refresh is done once they are served, or at the
+                    // latest when it cannot be postponed any more
+                    DPRINTF(DRAMState, "Pausing refresh, %d parts left\n",
+                            refreshSegmentsLeft);
+                    ++refreshPauses;
+                    schedule(refreshEvent, refreshResumeAt());
+                }
+
+                // kick things into action again
+                refreshState = REF_IDLE;
+                assert(!nextReqEvent.scheduled());
+                schedule(nextReqEvent, curTick());
+            }
         } else {
             assert(prev_state == PWR_ACT);
 
@@ -1817,6 +2153,43 @@ DRAMCtrl::updatePowerStats(uint8_t rank)
     preBackEnergy[rank] = energy.pre_stdby_energy * devicesPerRank;
     totalEnergy[rank] = energy.total_energy * devicesPerRank;
     averagePower[rank] = power.average_power * devicesPerRank;
+
+    // add the per-bank refreshes, which DRAMPower does not see, and
+    // scale the average power accordingly
+    if (rankRefreshEnergy[rank] > 0) {
+        double total = energy.total_energy * devicesPerRank;
+        refreshEnergy[rank] = energy.ref_energy * devicesPerRank +
+            rankRefreshEnergy[rank];
+        totalEnergy[rank] = total + rankRefreshEnergy[rank];
+        if (total > 0)
+            averagePower[rank] = power.average_power * devicesPerRank *
+                (total + rankRefreshEnergy[rank]) / total;
+    }
+}
+
+void
+DRAMCtrl::flushPowerCommands(uint8_t rank)
+{
+    // at the moment sort the list of commands and update the counters
+    // for DRAMPower libray when doing a refresh
+    sort(rankPower[rank].powerlib.cmdList.begin(),
+         rankPower[rank].powerlib.cmdList.end(), DRAMCtrl::sortTime);
+
+    // update the counters for DRAMPower, passing false to
+    // indicate that this is not the last command in the
+    // list. DRAMPower requires this information for the
+    // correct calculation of the background energy at the end
+    // of the simulation. Ideally we would want to call this
+    // function with true once at the end of the
+    // simulation. However, the discarded energy is extremly
+    // small and does not effect the final results.
+    rankPower[rank].powerlib.updateCounters(false);
+
+    // call the energy function
+    rankPower[rank].powerlib.calcEnergy();
+
+    // Update the stats
+    updatePowerStats(rank);
 }
 
 void
@@ -1889,26 +2262,119 @@ DRAMCtrl::regStats()
         .desc("Total ticks spent from burst creation until serviced "
               "by the DRAM");
 
+    perMasterReadBursts
+        .init(system()->maxMasters())
+        .name(name() + ".perMasterReadBursts")
+        .desc("Read bursts serviced by the DRAM per master")
+        .flags(nozero | nonan)
+        ;
+
+    perMasterReadLat
+        .init(system()->maxMasters())
+        .name(name() + ".perMasterReadLat")
+        .desc("Total ticks from burst creation until serviced by the "
+              "DRAM per master")
+        .flags(nozero | nonan)
+        ;
+
+    perMasterAvgReadLat
+        .name(name() + ".perMasterAvgReadLat")
+        .desc("Average memory access latency per DRAM burst per master")
+        .flags(nozero | nonan)
+        .precision(2);
+
+    for (int i = 0; i < system()->maxMasters(); i++) {
+        perMasterReadBursts.subname(i, system()->getMasterName(i));
+        perMasterReadLat.subname(i, system()->getMasterName(i));
+        perMasterAvgReadLat.subname(i, system()->getMasterName(i));
+    }
+
+    perMasterAvgReadLat = perMasterReadLat / perMasterReadBursts;
+
+    cappedBypasses
+        .name(name() + ".cappedBypasses")
+        .desc("Times the oldest request was served because of the "
+              "bypass cap (frfcfs_cap)");
+
+    batches
+        .name(name() + ".batches")
+        .desc("Number of batches of reads (parbs)");
+
+    lowPriorityBypasses
+        .name(name() + ".lowPriorityBypasses")
+        .desc("Times a request was chosen while the low priority masters "
+              "were waiting (priority)");
+
+    prefetches
+        .name(name() + ".prefetches")
+        .desc("Rows copied to the prefetch buffer");
+
+    prefetchBursts
+        .name(name() + ".prefetchBursts")
+        .desc("Bursts read from the DRAM by the prefetches");
+
+    prefetchHits
+        .name(name() + ".prefetchHits")
+        .desc("Read bursts serviced by the prefetch buffer");
+
+    prefetchHitRate
+        .name(name() + ".prefetchHitRate")
+        .desc("Read bursts serviced by the prefetch buffer (%)")
+        .precision(2);
+
+    prefetchHitRate = 100 * prefetchHits / readBursts;
+
+    prefetchUnused
+        .name(name() + ".prefetchUnused")
+        .desc("Prefetched rows dropped without any hit");
+
+    prefetchEnergy
+        .name(name() + ".prefetchEnergy")
+        .desc("Energy of the prefetch buffer accesses (pJ)");
+
+    refreshes
+        .name(name() + ".refreshes")
+        .desc("Number of refreshes (all-bank or per-bank)");
+
+    refreshPauses
+        .name(name() + ".refreshPauses")
+        .desc("Number of refreshes paused to serve reads");
+
+    refreshBlockedCycles
+        .name(name() + ".refreshBlockedCycles")
+        .desc("Cycles the banks were blocked by refreshes (sum over "
+              "the banks)");
+
+    refreshCollisions
+        .name(name() + ".refreshCollisions")
+        .desc("Number of reads which waited for a refresh of their bank");
+
+    refreshCollisionLat
+        .init(20)
+        .name(name() + ".refreshCollisionLat")
+        .desc("Latency of the reads which waited for a refresh (ticks)")
+        .flags(nozero);
+
     avgQLat
         .name(name() + ".avgQLat")
         .desc("Average queueing delay per DRAM burst")
         .precision(2);
 
-    avgQLat = totQLat / (readBursts - servicedByWrQ);
+    avgQLat = totQLat / (readBursts - servicedByWrQ - prefetchHits);
 
     avgBusLat
         .name(name() + ".avgBusLat")
         .desc("Average bus latency per DRAM burst")
         .precision(2);
 
-    avgBusLat = totBusLat / (readBursts - servicedByWrQ);
+    avgBusLat = totBusLat / (readBursts - servicedByWrQ - prefetchHits);
 
     avgMemAccLat
         .name(name() + ".avgMemAccLat")
         .desc("Average memory access latency per DRAM burst")
         .precision(2);
 
-    avgMemAccLat = totMemAccLat / (readBursts - servicedByWrQ);
+    avgMemAccLat = totMemAccLat / (readBursts - servicedByWrQ - prefetchHits);
 
     numRdRetry
         .name(name() + ".numRdRetry")
@@ -1931,7 +2397,8 @@ DRAMCtrl::regStats()
         .desc("Row buffer hit rate for reads")
         .precision(2);
 
-    readRowHitRate = (readRowHits / (readBursts - servicedByWrQ)) * 100;
+    readRowHitRate = (readRowHits / (readBursts - servicedByWrQ -
+                                     prefetchHits)) * 100;
 
     writeRowHitRate
         .name(name() + ".writeRowHitRate")
@@ -2072,7 +2539,8 @@ DRAMCtrl::regStats()
         .precision(2);
 
     pageHitRate = (writeRowHits + readRowHits) /
-        (writeBursts - mergedWrBursts + readBursts - servicedByWrQ) * 100;
+        (writeBursts - mergedWrBursts + readBursts - servicedByWrQ -
+         prefetchHits) * 100;
 
     pwrStateTime
         .init(5)
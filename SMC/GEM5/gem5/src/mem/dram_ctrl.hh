@@ -181,10 +181,17 @@ class DRAMCtrl : public AbstractMemory
         uint32_t rowAccesses;
         uint32_t bytesAccessed;
 
+        /** Row of the last read burst (for the prefetch trigger) */
+        uint32_t lastReadRow;
+
+        /** End of the last refresh of the bank */
+        Tick refreshDoneAt;
+
         Bank() :
             openRow(NO_ROW), rank(0), bank(0), bankgr(0),
             colAllowedAt(0), preAllowedAt(0), actAllowedAt(0),
-            rowAccesses(0), bytesAccessed(0)
+            rowAccesses(0), bytesAccessed(0), lastReadRow(NO_ROW),
+            refreshDoneAt(0)
         { }
     };
 
@@ -261,13 +268,21 @@ class DRAMCtrl : public AbstractMemory
         BurstHelper* burstHelper;
         Bank& bankRef;
 
+        /** Master of the request, and its scheduling class */
+        const MasterID masterId;
+        const bool lowPriority;
+
+        /** Part of the current batch (parbs) */
+        bool marked;
+
         DRAMPacket(PacketPtr _pkt, bool is_read, uint8_t _rank, uint8_t _bank,
                    uint32_t _row, uint16_t bank_id, Addr _addr,
-                   unsigned int _size, Bank& bank_ref)
+                   unsigned int _size, Bank& bank_ref, bool low_priority)
             : entryTime(curTick()), readyTime(curTick()),
               pkt(_pkt), isRead(is_read), rank(_rank), bank(_bank), row(_row),
               bankId(bank_id), addr(_addr), size(_size), burstHelper(NULL),
-              bankRef(bank_ref)
+              bankRef(bank_ref), masterId(_pkt->req->masterId()),
+              lowPriority(low_priority), marked(false)
         { }
 
     };
@@ -293,6 +308,15 @@ class DRAMCtrl : public AbstractMemory
     void processRefreshEvent();
     EventWrapper<DRAMCtrl, &DRAMCtrl::processRefreshEvent> refreshEvent;
 
+    /**
+     * Per-bank refresh: refresh the next bank (round robin over the
+     * ranks and banks of the channel) while the other banks keep
+     * serving requests.
+     */
+    void processBankRefreshEvent();
+    EventWrapper<DRAMCtrl, &DRAMCtrl::processBankRefreshEvent>
+    bankRefreshEvent;
+
     void processPowerEvent();
     EventWrapper<DRAMCtrl,&DRAMCtrl::processPowerEvent> powerEvent;
 
@@ -402,6 +426,74 @@ class DRAMCtrl : public AbstractMemory
      */
     void reorderQueue(std::deque<DRAMPacket*>& queue, bool switched_cmd_type);
 
+    /**
+     * FR-FCFS among the requests of the queue which belong to the
+     * class given by the predicate (or among all of them if none
+     * does). The chosen request is moved to the head of the queue.
+     *
+     * @param queue Queued requests to consider
+     * @param switched_cmd_type Command type is changing
+     * @param in_class Predicate selecting the prioritized requests
+     * @return true if some requests were left out of the choice
+     */
+    bool reorderClass(std::deque<DRAMPacket*>& queue, bool switched_cmd_type,
+                      bool (*in_class)(const DRAMPacket*));
+
+    /** Classes of requests used with reorderClass */
+    static bool inBatch(const DRAMPacket* dram_pkt)
+    { return dram_pkt->marked; }
+    static bool normalPriority(const DRAMPacket* dram_pkt)
+    { return !dram_pkt->lowPriority; }
+
+    /**
+     * Mark the requests of a new batch (parbs): the oldest batchCap
+     * ones of each master in each bank.
+     *
+     * @param queue Queued requests to consider
+     */
+    void formBatch(std::deque<DRAMPacket*>& queue);
+
+    /**
+     * Is this master served after all the others (priority)?
+     * The answer is computed from its name on first use.
+     */
+    bool isLowPriority(MasterID id);
+
+    /**
+     * An entry of the row prefetch buffer: a DRAM row copied to the
+     * SRAM of the controller, available from readyAt onwards.
+     */
+    struct PrefetchEntry {
+        uint8_t rank;
+        uint8_t bank;
+        uint32_t row;
+        Tick readyAt;
+        uint32_t hits;
+    };
+
+    /**
+     * Look up a row in the prefetch buffer.
+     *
+     * @return The entry, or prefetchBuffer.end() if the row is not there
+     */
+    std::deque<PrefetchEntry>::iterator findPrefetch(uint8_t rank,
+                                                     uint8_t bank,
+                                                     uint32_t row);
+
+    /**
+     * Read the remaining columns of the row accessed by a read burst
+     * into the prefetch buffer, right behind the burst on the data
+     * bus, evicting the least recently used entry if needed.
+     *
+     * @param dram_pkt The read burst that triggered the prefetch
+     * @param cmd_at Tick of its column command
+     * @return Tick at which the prefetched data is in the buffer
+     */
+    Tick prefetchRow(DRAMPacket* dram_pkt, Tick cmd_at);
+
+    /** Drop an entry of the prefetch buffer (eviction or stale row) */
+    void dropPrefetch(std::deque<PrefetchEntry>::iterator entry);
+
     /**
      * Find which are the earliest banks ready to issue an activate
      * for the enqueued requests. Assumes maximum of 64 banks per DIMM
@@ -527,6 +619,17 @@ class DRAMCtrl : public AbstractMemory
      * values.
      */
     Enums::MemSched memSchedPolicy;
+
+    /**
+     * Parameters and state of the frfcfs_cap, parbs and priority
+     * policies.
+     */
+    const uint32_t frfcfsCap;
+    uint32_t readBypasses;
+    uint32_t writeBypasses;
+    const uint32_t batchCap;
+    const std::vector<std::string> lowPriorityMasters;
+    std::vector<int8_t> masterPriority;   // -1: unknown, 0: normal, 1: low
     Enums::AddrMap addrMapping;
     Enums::PageManage pageMgmt;
 
@@ -550,6 +653,16 @@ class DRAMCtrl : public AbstractMemory
      */
     const Tick backendLatency;
 
+    /**
+     * Row prefetch buffer, with the most recently used entry at the
+     * back, and its configuration (no prefetch with 0 entries).
+     */
+    std::deque<PrefetchEntry> prefetchBuffer;
+    const uint32_t prefetchEntries;
+    Enums::RowPrefetch prefetchTrigger;
+    const Tick prefetchLatency;
+    const double prefetchBurstEnergy;
+
     /**
      * Till when has the main data bus been spoken for already?
      */
@@ -578,6 +691,38 @@ class DRAMCtrl : public AbstractMemory
 
     RefreshState refreshState;
 
+    /**
+     * Refresh policy, the per-bank refresh cycle time and interval,
+     * and the next bank to refresh (counting ranks x banks)
+     */
+    Enums::RefreshPolicy refreshPolicy;
+    const Tick tRFCpb;
+    const Tick tREFIpb;
+    uint32_t refreshBank;
+
+    /**
+     * Refresh pausing: a refresh is done in refreshSegments parts,
+     * and refreshSegmentsLeft of them are still to do
+     */
+    const bool refreshPausing;
+    const uint32_t refreshSegments;
+    uint32_t refreshSegmentsLeft;
+
+    /**
+     * Energy of a per-bank refresh (pJ), and the energy of the
+     * per-bank refreshes of each rank, which DRAMPower does not see
+     */
+    const double bankRefreshEnergy;
+    std::vector<double> rankRefreshEnergy;
+
+    /**
+     * With refresh pausing, the latest tick at which the remaining
+     * parts of the refresh can be done, and whether the refresh
+     * should give way to the waiting reads
+     */
+    Tick refreshResumeAt() const;
+    bool pauseRefresh() const;
+
     /**
      * The power state captures the different operational states of
      * the DRAM and interacts with the bus read/write state machine,
@@ -662,6 +807,31 @@ class DRAMCtrl : public AbstractMemory
     Stats::Scalar totMemAccLat;
     Stats::Scalar totBusLat;
 
+    // Latency of the reads per master (interference between masters)
+    Stats::Vector perMasterReadBursts;
+    Stats::Vector perMasterReadLat;
+    Stats::Formula perMasterAvgReadLat;
+
+    // Scheduling policies
+    Stats::Scalar cappedBypasses;
+    Stats::Scalar batches;
+    Stats::Scalar lowPriorityBypasses;
+
+    // Row prefetch buffer
+    Stats::Scalar prefetches;
+    Stats::Scalar prefetchBursts;
+    Stats::Scalar prefetchHits;
+    Stats::Formula prefetchHitRate;
+    Stats::Scalar prefetchUnused;
+    Stats::Scalar prefetchEnergy;
+
+    // Refresh
+    Stats::Scalar refreshes;
+    Stats::Scalar refreshPauses;
+    Stats::Scalar refreshBlockedCycles;
+    Stats::Scalar refreshCollisions;
+    Stats::Histogram refreshCollisionLat;
+
     // Average latencies per request
     Stats::Formula avgQLat;
     Stats::Formula avgBusLat;
@@ -738,6 +908,14 @@ class DRAMCtrl : public AbstractMemory
       */
     void updatePowerStats(uint8_t rank);
 
+    /**
+     * Let DRAMPower process the commands of a rank issued so far and
+     * update the power stats.
+     *
+     * @param rank Currrent rank
+     */
+    void flushPowerCommands(uint8_t rank);
+
     /**
      * Function for sorting commands in the command list of DRAMPower.
      *
@@ -30,6 +30,11 @@ class ethz_PIMMemory(SimpleMemory):
     PIM_DMA_NUMBYTES_ADDR =  Param.Int(0, "Number of words to transfer using DMA (Absolute Address)");
     PIM_DMA_COMMAND_ADDR = Param.Int(0, "DMA Command Register(Absolute Address)");
     PIM_DMA_CLI_ADDR = Param.Int(0, "DMA Clear Interrupt Register(Absolute Address)");
+    PIM_DMA_DESC_ADDR_ADDR = Param.Int(0, "DMA Descriptor Ring Pointer Register(Absolute Address)");
+    PIM_DMA_DESC_COUNT_ADDR = Param.Int(0, "DMA Descriptor Count Register, writing launches the descriptors(Absolute Address)");
     PIM_COPROCESSOR_CMD_ADDR = Param.Int(0, "Command to the PIM Coprocessor");
     pim_arch = Param.Int(32, "Determine whether PIM is a 32b (ARMv7-a) or a 64b (ARMv8-a) processor");
     HMC_ATOMIC_INCR_ADDR = Param.Int(0, "Sending atomic command to the HMC");
+    PIM_NUM_CORES = Param.Int(1, "Number of cores in the PIM device (system.pim_sys.cpu0, cpu1, ... if more than one)");
+    PIM_DMA_PER_CORE = Param.Bool(False, "Each core has its own DMA (system.pim_sys.dma0, dma1, ...), otherwise the DMA is shared");
+    PIM_HOST_IRQ = Param.Int(0, "Interrupt of the host (system.realview.gic) raised when PIM_STATUS_REG becomes PIM_STATUS_DONE (0: no interrupt)");
@@ -1,11 +1,29 @@
 from m5.params import *
 from AddrMapper import *
 
+# Replacement policy of the dynamic rules in each level of the TLB
+class ethz_TLBReplacement(Enum): vals = ['LRU', 'PLRU', 'Random']
+
+# Prefetcher of the slice-table entries (into the walk cache)
+#  NextSlice: the slice right after the one which has been walked
+#  Stride:    pages at a constant distance from the last demand misses
+class ethz_TLBPrefetcher(Enum): vals = ['NoPrefetch', 'NextSlice', 'Stride']
+
 class ethz_TLB(RangeAddrMapper):
     type = 'ethz_TLB'
     cxx_header = "mem/ethz_tlb.hh"
 
     TLB_SIZE = Param.Int(4, "Number of rules in the TLB");
+    TLB_ASSOC = Param.Int(0, "Associativity of the TLB (0: fully associative with hash index)");
+    TLB_REPLACEMENT = Param.ethz_TLBReplacement('LRU', "Replacement policy of the TLB rules");
+    TLB_HIT_LATENCY = Param.Cycles(0, "Hit latency of the TLB");
+    L2_TLB_SIZE = Param.Int(0, "Number of rules in the second-level TLB (0: no second level)");
+    L2_TLB_ASSOC = Param.Int(0, "Associativity of the second-level TLB (0: fully associative)");
+    L2_TLB_HIT_LATENCY = Param.Cycles(4, "Hit latency of the second-level TLB");
+    WALK_CACHE_SIZE = Param.Int(0, "Number of slices in the walk cache (0: no walk cache)");
+    WALK_CACHE_LATENCY = Param.Cycles(1, "Hit latency of the walk cache");
+    PREFETCHER = Param.ethz_TLBPrefetcher('NoPrefetch', "Prefetcher of the slice-table entries (needs the walk cache)");
+    PREFETCH_DEGREE = Param.Int(1, "Number of slices prefetched on each trigger");
     OS_PAGE_SHIFT = Param.Int(0, "Page Shift of the guest OS (usually 12)");
     DUMP_ADDRESS = Param.Bool(False, "Dump Accessed addresses to file");
     IDEAL_REFILL = Param.Bool(False, "Ideal refill");
@@ -14,4 +32,8 @@ class ethz_TLB(RangeAddrMapper):
     HMC_ATOMIC_IMIN = Param.Int(0, "Register for HMC atomic commands");
     HMC_ATOMIC_FADD = Param.Int(0, "Register for HMC atomic commands");
     HMC_OPERAND = Param.Int(0, "Register as an HMC atomic operand");
+    HMC_SWAP_OPERAND = Param.Int(0, "Register as the second HMC atomic operand");
+    HMC_ATOMIC_OPCODE = Param.Int(0, "Register for the opcode of the generic HMC atomic command");
+    HMC_ATOMIC_TARGET = Param.Int(0, "Register for the generic HMC atomic command (target address)");
+    HMC_RESULT = Param.Int(0, "Register with the value returned by the last HMC atomic command");
     pim_arch = Param.Int(32, "Determine whether PIM is a 32b (ARMv7-a) or a 64b (ARMv8-a) processor");
@@ -11,6 +11,7 @@
 #include "sim/pseudo_inst.hh"
 #include <fstream>
 #include "dev/ethz_dma.hh"
+#include "dev/arm/base_gic.hh"
 using namespace std;
 
 // This Memory is devoted to the single-processor PIM
@@ -52,15 +53,25 @@ ethz_PIMMemory::ethz_PIMMemory(const ethz_PIMMemoryParams* p) :
     PIM_DMA_NUMBYTES_ADDR(p->PIM_DMA_NUMBYTES_ADDR),
     PIM_DMA_COMMAND_ADDR(p->PIM_DMA_COMMAND_ADDR),
     PIM_DMA_CLI_ADDR(p->PIM_DMA_CLI_ADDR),
+    PIM_DMA_DESC_ADDR_ADDR(p->PIM_DMA_DESC_ADDR_ADDR),
+    PIM_DMA_DESC_COUNT_ADDR(p->PIM_DMA_DESC_COUNT_ADDR),
     PIM_COPROCESSOR_CMD_ADDR(p->PIM_COPROCESSOR_CMD_ADDR),
 	SYSTEM_NUM_CPU(p->SYSTEM_NUM_CPU),
     pim_arch(p->pim_arch),
     HMC_ATOMIC_INCR_ADDR(p->HMC_ATOMIC_INCR_ADDR),
+    PIM_NUM_CORES(p->PIM_NUM_CORES),
+    PIM_DMA_PER_CORE(p->PIM_DMA_PER_CORE),
+    PIM_HOST_IRQ(p->PIM_HOST_IRQ),
     pim_system(nullptr),
-    pim_cpu(nullptr)
+    pim_cpu(nullptr),
+    host_gic(nullptr),
+    _dma_num_bytes(p->PIM_NUM_CORES, 0),
+    _dma_mem_addr(p->PIM_NUM_CORES, 0),
+    _dma_spm_addr(p->PIM_NUM_CORES, 0),
+    _dma_desc_addr(p->PIM_NUM_CORES, 0)
 {
-    _dma_num_bytes = 0;
-    _dma_mem_addr = 0;
+    if ( PIM_NUM_CORES < 1 )
+        fatal("ethz_PIMMemory: PIM_NUM_CORES must be at least 1\n");
 	prev_time_stamp = 0;
 	prev_time_stamp_id = '?';
 	if ( PIM_DEBUG_ADDR )
@@ -92,38 +103,64 @@ void ethz_PIMMemory::init()
 	
 	if ( ! STANDALONE_SIMULATION )
 	{
-		SimObject* f = SimObject::find("system.pim_sys.dtlb");
-		if ( f )
-			dtlb = (ethz_TLB*) f;
-		else
-			panic("Cannot find a pointer to system.pim_sys.dtlb");
-
-        f = SimObject::find("system.pim_sys.dma");
-        if ( f )
-            dma = (ethz_DMA*) f;
-        else
-            panic("Cannot find a pointer to system.pim_sys.dma");
+		for ( int i=0; i<PIM_NUM_CORES; i++ )
+		{
+			SimObject* f = find_core_object("dtlb", i);
+			if ( f )
+				dtlbs.push_back((ethz_TLB*) f);
+			else
+				panic("Cannot find a pointer to system.pim_sys.dtlb (core %d)", i);
+		}
+		for ( int i=0; i<(PIM_DMA_PER_CORE?PIM_NUM_CORES:1); i++ )
+		{
+			SimObject* f = find_core_object("dma", i);
+			if ( f )
+				dmas.push_back((ethz_DMA*) f);
+			else
+				panic("Cannot find a pointer to system.pim_sys.dma (core %d)", i);
+		}
 	}
 	else
 	{
+		if ( PIM_NUM_CORES != 1 )
+			panic("The standalone simulation of the PIM system supports only one core");
 		SimObject* f = SimObject::find("system.dtlb");
 		if ( f )
-			dtlb = (ethz_TLB*) f;
+			dtlbs.push_back((ethz_TLB*) f);
 		else
 			panic("Cannot find a pointer to system.dtlb");
 
         f = SimObject::find("system.dma");
         if ( f )
-            dma = (ethz_DMA*) f;
+            dmas.push_back((ethz_DMA*) f);
         else
             panic("Cannot find a pointer to system.dma");
 	}
 	
 	std::vector<ThreadContext *> &tcvec = pim_system->threadContexts;
-	pim_cpu = tcvec[0]->getCpuPtr(); // cpu_id = 0
+	if ( tcvec.size() < PIM_NUM_CORES )
+		panic("ethz_PIMMemory: PIM_NUM_CORES=%d but the PIM system has %d thread contexts", PIM_NUM_CORES, tcvec.size());
+	for ( int i=0; i<PIM_NUM_CORES; i++ )
+		pim_cpus.push_back(tcvec[i]->getCpuPtr()); // cpu_id = i
+	pim_cpu = pim_cpus[0];
+	dtlb = dtlbs[0];
+	dma = dmas[0];
     assert( pim_cpu );
 	//cout << "PIMMemory: CPU Name: " << pim_cpu->name() << endl;
 
+	/*
+	Get a pointer to the interrupt controller of the host, so that we
+	can signal the completion of the commands
+	*/
+	if ( PIM_HOST_IRQ && ! STANDALONE_SIMULATION )
+	{
+		SimObject* f = SimObject::find("system.realview.gic");
+		if ( f )
+			host_gic = (BaseGic*) f;
+		else
+			cout << "Warning: system.realview.gic is not present! The host will not be interrupted" << endl;
+	}
+
 	/*
 	Get a pointer to system caches, so that we can flush them
 	*/
@@ -156,12 +193,71 @@ void ethz_PIMMemory::init()
 			cout << "Warning: " << name << " is not present!" << endl;
 	}
 
-    dma->dtlb = dtlb;   // Pass the pointer of DTLB to DMA
-    dma->pim_cpu = pim_cpu;
-    dtlb->dma = dma;    // Pass the pointer of DMA to DTLB
-    dma->isTimingMode = pim_system->isTimingMode();
-    dma->tc = tcvec[0];
-    dma->pim_mem = this;
+    for ( int i=0; i<PIM_NUM_CORES; i++ )
+    {
+        ethz_DMA* d = dma_of(i);
+        if ( d->pim_cpus.empty() )
+            d->dtlb = dtlbs[i];   // Pass the pointer of DTLB to DMA (a shared DMA uses the DTLB of core 0)
+        d->pim_cpus.push_back(pim_cpus[i]);
+        d->tcs.push_back(tcvec[i]);
+        dtlbs[i]->dma = d;    // Pass the pointer of DMA to DTLB
+        d->isTimingMode = pim_system->isTimingMode();
+        d->pim_mem = this;
+    }
+}
+
+void
+ethz_PIMMemory::dma_transfer(unsigned core, unsigned long spm_addr, unsigned long mem_addr, unsigned long num_bytes, uint8_t cmd, unsigned long status_addr)
+{
+    assert(num_bytes != 0 );
+    assert(mem_addr != 0 );
+    assert (pim_system->isTimingMode());
+    // Translate to physical address (a simple remapping)
+    spm_addr += PIM_ADDRESS_BASE;
+    if ( spm_addr < PIM_VREG_ADDR || spm_addr + num_bytes > PIM_VREG_ADDR + PIM_VREG_SIZE )
+    {
+        cout << "panic: VREG=[0x" << hex << PIM_VREG_ADDR << ", 0x" << PIM_VREG_ADDR + PIM_VREG_SIZE-1 
+            << "] Access=[0x" << spm_addr << ", 0x" << spm_addr + num_bytes-1 << "]" << dec << endl;
+        panic( "DMA access must be within the PIM's Vector Register File");
+    }
+    uint8_t *vreg_ptr = pmemAddr + spm_addr - range.start();
+    if ( (cmd & 0b10000000) == PIM_DMA_READ )
+        dma_of(core)->initiate_read(vreg_ptr, mem_addr, num_bytes, (cmd & 0b01111111), status_addr);
+    else
+    if ( (cmd & 0b10000000) == PIM_DMA_WRITE )
+        dma_of(core)->initiate_write(vreg_ptr, mem_addr, num_bytes, (cmd & 0b01111111), status_addr);
+    else
+        panic("Illegal DMA command!");
+}
+
+unsigned
+ethz_PIMMemory::core_of(PacketPtr pkt) const
+{
+    // The context ID of the PIM cores is their cpu_id
+    if ( PIM_NUM_CORES == 1 || !pkt->req->hasContextId() )
+        return 0;
+    int id = pkt->req->contextId();
+    if ( id < 0 || id >= PIM_NUM_CORES )
+        return 0;
+    return id;
+}
+
+SimObject*
+ethz_PIMMemory::find_core_object(string name, unsigned core) const
+{
+    string n = "system.pim_sys." + name;
+    if ( PIM_NUM_CORES != 1 && ( name != "dma" || PIM_DMA_PER_CORE ) )
+        n += to_string(core);
+    return SimObject::find(n.c_str());
+}
+
+void
+ethz_PIMMemory::update_dma_status(unsigned long int address)
+{
+    uint8_t res = 0;
+    for ( auto it = dmas.begin(); it != dmas.end(); it++ )
+        res |= (*it)->get_resources();
+    __write_mem_1byte(address, res);
 }
 
 Tick
@@ -171,8 +267,11 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
 	#ifdef DEBUG_ETHZ_PIM_MEMORY
 	cout << "PIMMemory: [Atomic]" << pkt->cmdString() << " " << hex << pkt->getAddr() << dec << " DATA[0]:" << (int)(*pkt->getPtr<uint8_t>())<< " SIZE:" << pkt->getSize() << endl;
 	#endif
+	bool raise_host_irq = false;
 	if ( pkt ->isWrite() )
 	{
+		unsigned core = core_of(pkt); // The DMA registers are latched per core
+
 		//************************
 		// DEBUG THE PIM REGISTERS
 		#ifdef DEBUG_ETHZ_PIM_MEMORY		
@@ -212,6 +311,14 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
                 cout << " <PIM_ERROR_REG="<< (int)code << "> Ignored" << endl;
 		}
 		else
+        ////////////////////////////////////////        
+		if ( pkt-> getAddr() == PIM_STATUS_ADDR )
+		{
+            assert(pkt->getSize() == 1);
+            // Interrupt the host once the command is done
+            raise_host_irq = ( host_gic && *pkt->getPtr<uint8_t>() == PIM_STATUS_DONE );
+		}
+		else
         ////////////////////////////////////////        
 		if ( pkt-> getAddr() == PIM_INTR_ADDR )
 		{
@@ -221,8 +328,12 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
                 cout << " <PIM_INTR_REG=0> Ignored" << endl;
             else
             {
-                pim_cpu->postInterrupt(ArmISA::INT_IRQ, 0);
-                pim_cpu->clearInterrupt(ArmISA::INT_IRQ, 0);
+                // Wake up all cores
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    pim_cpus[i]->postInterrupt(ArmISA::INT_IRQ, 0);
+                    pim_cpus[i]->clearInterrupt(ArmISA::INT_IRQ, 0);
+                }
             }
 		}
 		else
@@ -233,13 +344,21 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             if ( pim_arch == 32 ) // 32b PIM
 			{
                 uint32_t* c = pkt->getPtr<uint32_t>();
-                dtlb->PIM_SLICETABLE_PTR = *c;
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    dtlbs[i]->PIM_SLICETABLE_PTR = *c;
+                    dtlbs[i]->flush_slices();   // The rules of the previous slice table are stale
+                }
                 cout << " <PIM_SLICETABLE_PTR=0x" << hex << dtlb->PIM_SLICETABLE_PTR << dec << ">" << endl;
             }
             else  // 64b PIM
             {
                 uint64_t* c = pkt->getPtr<uint64_t>();
-                dtlb->PIM_SLICETABLE_PTR = *c;
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    dtlbs[i]->PIM_SLICETABLE_PTR = *c;
+                    dtlbs[i]->flush_slices();   // The rules of the previous slice table are stale
+                }
                 cout << " <PIM_SLICETABLE_PTR=0x" << hex << dtlb->PIM_SLICETABLE_PTR << dec << ">" << endl;
             }
 		}
@@ -251,13 +370,21 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             if ( pim_arch == 32 ) // 32b PIM
             {
                 uint32_t* c = pkt->getPtr<uint32_t>();
-                dtlb->PIM_SLICECOUNT = *c;
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    dtlbs[i]->PIM_SLICECOUNT = *c;
+                    dtlbs[i]->flush_slices();   // The rules of the previous slice table are stale
+                }
                 cout << " <PIM_SLICECOUNT=0x" << hex << dtlb->PIM_SLICECOUNT << dec << ">" << endl;
             }
             else  // 64b PIM
             {
                 uint64_t* c = pkt->getPtr<uint64_t>();
-                dtlb->PIM_SLICECOUNT = *c;
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    dtlbs[i]->PIM_SLICECOUNT = *c;
+                    dtlbs[i]->flush_slices();   // The rules of the previous slice table are stale
+                }
                 cout << " <PIM_SLICECOUNT=0x" << hex << dtlb->PIM_SLICECOUNT << dec << ">" << endl;
             }
 		}
@@ -269,13 +396,21 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             if ( pim_arch == 32 ) // 32b PIM
             {
                 uint32_t* c = pkt->getPtr<uint32_t>();
-                dtlb->PIM_SLICEVSTART = *c;
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    dtlbs[i]->PIM_SLICEVSTART = *c;
+                    dtlbs[i]->flush_slices();   // The rules of the previous slice table are stale
+                }
                 cout << " <PIM_SLICEVSTART=0x" << hex << dtlb->PIM_SLICEVSTART << dec << ">" << endl;
             }
             else  // 64b PIM
             {
                 uint64_t* c = pkt->getPtr<uint64_t>();
-                dtlb->PIM_SLICEVSTART = *c;
+                for ( int i=0; i<PIM_NUM_CORES; i++ )
+                {
+                    dtlbs[i]->PIM_SLICEVSTART = *c;
+                    dtlbs[i]->flush_slices();   // The rules of the previous slice table are stale
+                }
                 cout << " <PIM_SLICEVSTART=0x" << hex << dtlb->PIM_SLICEVSTART << dec << ">" << endl;
             }
 		}
@@ -287,15 +422,15 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             if ( pim_arch == 32 ) // 32b PIM
             {
                 uint32_t* c = pkt->getPtr<uint32_t>();
-                _dma_num_bytes = *c;
+                _dma_num_bytes[core] = *c;
             }
             else  // 64b PIM
             {
                 uint64_t* c = pkt->getPtr<uint64_t>();
-                _dma_num_bytes = *c;
+                _dma_num_bytes[core] = *c;
             }
             #ifdef DEBUG_ETHZ_DMA
-            cout << " <PIM_DMA_NUMBYTES=0x" << hex << (unsigned) _dma_num_bytes << dec << ">" << endl;
+            cout << " <PIM_DMA_NUMBYTES=0x" << hex << (unsigned) _dma_num_bytes[core] << dec << ">" << endl;
             #endif
         }
         else
@@ -306,15 +441,15 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             if ( pim_arch == 32 ) // 32b PIM
             {
                 uint32_t* c = pkt->getPtr<uint32_t>();
-                _dma_mem_addr = *c;
+                _dma_mem_addr[core] = *c;
             }
             else  // 64b PIM
             {
                 uint64_t* c = pkt->getPtr<uint64_t>();
-                _dma_mem_addr = *c;
+                _dma_mem_addr[core] = *c;
             }
             #ifdef DEBUG_ETHZ_DMA
-            cout << " <PIM_DMA_MEM_ADDR=0x" << hex << (unsigned) _dma_mem_addr << dec << ">" << endl;
+            cout << " <PIM_DMA_MEM_ADDR=0x" << hex << (unsigned) _dma_mem_addr[core] << dec << ">" << endl;
             #endif
         }
         else
@@ -325,15 +460,15 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             if ( pim_arch == 32 ) // 32b PIM
             {
                 uint32_t* c = pkt->getPtr<uint32_t>();
-                _dma_spm_addr = *c;
+                _dma_spm_addr[core] = *c;
             }
             else  // 64b PIM
             {
                 uint64_t* c = pkt->getPtr<uint64_t>();
-                _dma_spm_addr = *c;
+                _dma_spm_addr[core] = *c;
             }
             #ifdef DEBUG_ETHZ_DMA
-            cout << " <PIM_DMA_SPM_ADDR=0x" << hex << (unsigned) _dma_spm_addr << dec << ">" << endl;
+            cout << " <PIM_DMA_SPM_ADDR=0x" << hex << (unsigned) _dma_spm_addr[core] << dec << ">" << endl;
             #endif
         }
         else
@@ -359,28 +494,49 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
             else
             {
                 #ifdef DEBUG_ETHZ_DMA
-                cout << " <PIM_DMA_COMMAND=0x" << hex << (unsigned)cmd << " _dma_spm_addr=0x" << _dma_spm_addr << " _dma_mem_addr=0x" << _dma_mem_addr << " _dma_num_bytes=" << dec << _dma_num_bytes << ">" << endl;
+                cout << " <PIM_DMA_COMMAND=0x" << hex << (unsigned)cmd << " _dma_spm_addr=0x" << _dma_spm_addr[core] << " _dma_mem_addr=0x" << _dma_mem_addr[core] << " _dma_num_bytes=" << dec << _dma_num_bytes[core] << ">" << endl;
                 #endif
 
-                assert(_dma_num_bytes != 0 );
-                assert(_dma_mem_addr != 0 );
-                assert (pim_system->isTimingMode());
-                // Translate to physical address (a simple remapping)
-                _dma_spm_addr += PIM_ADDRESS_BASE;
-                if ( _dma_spm_addr < PIM_VREG_ADDR || _dma_spm_addr + _dma_num_bytes > PIM_VREG_ADDR + PIM_VREG_SIZE )
-                {
-                    cout << "panic: VREG=[0x" << hex << PIM_VREG_ADDR << ", 0x" << PIM_VREG_ADDR + PIM_VREG_SIZE-1 
-                        << "] Access=[0x" << _dma_spm_addr << ", 0x" << _dma_spm_addr + _dma_num_bytes-1 << "]" << dec << endl;
-                    panic( "DMA access must be within the PIM's Vector Register File");
-                }
-                uint8_t *vreg_ptr = pmemAddr + _dma_spm_addr - range.start();
-                if ( (cmd & 0b10000000) == PIM_DMA_READ )
-                    dma->initiate_read(vreg_ptr, _dma_mem_addr, _dma_num_bytes, (cmd & 0b01111111));
-                else
-                if ( (cmd & 0b10000000) == PIM_DMA_WRITE )
-                    dma->initiate_write(vreg_ptr, _dma_mem_addr, _dma_num_bytes, (cmd & 0b01111111));
-                else
-                    panic("Illegal DMA command!");
+                dma_transfer(core, _dma_spm_addr[core], _dma_mem_addr[core], _dma_num_bytes[core], cmd, 0);
+            }
+        }
+        else
+        ////////////////////////////////////////        
+        if ( pkt-> getAddr() == PIM_DMA_DESC_ADDR_ADDR )
+        {
+            assert(pkt->getSize() == pim_arch/8);
+            if ( pim_arch == 32 ) // 32b PIM
+                _dma_desc_addr[core] = *(pkt->getPtr<uint32_t>());
+            else  // 64b PIM
+                _dma_desc_addr[core] = *(pkt->getPtr<uint64_t>());
+        }
+        else
+        ////////////////////////////////////////        
+        if ( pkt-> getAddr() == PIM_DMA_DESC_COUNT_ADDR )
+        {
+            assert(pkt->getSize() == pim_arch/8);
+            unsigned long count;
+            if ( pim_arch == 32 ) // 32b PIM
+                count = *(pkt->getPtr<uint32_t>());
+            else  // 64b PIM
+                count = *(pkt->getPtr<uint64_t>());
+            #ifdef DEBUG_ETHZ_DMA
+            cout << " <PIM_DMA_DESC_COUNT=" << count << " PIM_DMA_DESC_ADDR=0x" << hex << _dma_desc_addr[core] << dec << ">" << endl;
+            #endif
+            // Launch the descriptors (in order), each one is PIM_DMA_DESC_WORDS words
+            unsigned long desc = _dma_desc_addr[core] + PIM_ADDRESS_BASE;
+            for ( unsigned long i=0; i<count; i++, desc += PIM_DMA_DESC_WORDS*pim_arch/8 )
+            {
+                if ( desc < range.start() || desc + PIM_DMA_DESC_WORDS*pim_arch/8 > range.end() + 1 )
+                    panic("DMA descriptor 0x%x is not in the SPM", desc);
+                unsigned long status_addr = desc + PIM_DMA_DESC_STATUS*pim_arch/8;
+                __write_mem_1byte(status_addr, PIM_DMA_DESC_PENDING);
+                dma_transfer(core,
+                    __read_mem_1word(desc + PIM_DMA_DESC_SPM_ADDR*pim_arch/8),
+                    __read_mem_1word(desc + PIM_DMA_DESC_MEM_ADDR*pim_arch/8),
+                    __read_mem_1word(desc + PIM_DMA_DESC_NUMBYTES*pim_arch/8),
+                    __read_mem_1word(desc + PIM_DMA_DESC_COMMAND*pim_arch/8),
+                    status_addr);
             }
         }
         else
@@ -397,7 +553,7 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
                 #ifdef DEBUG_ETHZ_DMA
                 cout << " <PIM_DMA_CLI=0x" << hex << (unsigned)cmd << dec << endl;
                 #endif
-                dma->wait_on_resource(cmd);
+                dma_of(core)->wait_on_resource(cmd, pim_cpus[core]);
             }
         }
         else
@@ -491,7 +647,11 @@ ethz_PIMMemory::recvAtomic(PacketPtr pkt)
 
 		}
 	}
-	return SimpleMemory::recvAtomic(pkt);
+	Tick latency = SimpleMemory::recvAtomic(pkt);
+	// The status register is updated before the host is interrupted
+	if ( raise_host_irq )
+		host_gic->sendInt(PIM_HOST_IRQ);
+	return latency;
 }
 
 void
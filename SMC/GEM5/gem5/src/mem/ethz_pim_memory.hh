@@ -18,6 +18,7 @@
 #include "cpu/base.hh"
 
 class ethz_DMA;
+class BaseGic;
 
 class ethz_PIMMemory : public SimpleMemory
 {
@@ -28,6 +29,9 @@ public:
     unsigned long __read_mem_1word(unsigned long int address);
     void          __write_mem_1byte(unsigned long int address, uint8_t value);
 
+    // Write the status of all DMA resources (of all DMAs) to the status register
+    void update_dma_status(unsigned long int address);
+
 protected:
 	virtual Tick recvAtomic(PacketPtr pkt);
 	virtual void recvFunctional(PacketPtr pkt);
@@ -60,15 +64,32 @@ private:
     unsigned long int PIM_DMA_NUMBYTES_ADDR;
     unsigned long int PIM_DMA_COMMAND_ADDR;
     unsigned long int PIM_DMA_CLI_ADDR;
+    unsigned long int PIM_DMA_DESC_ADDR_ADDR;
+    unsigned long int PIM_DMA_DESC_COUNT_ADDR;
     unsigned long int PIM_COPROCESSOR_CMD_ADDR;
 	unsigned long int SYSTEM_NUM_CPU;
     unsigned pim_arch;
     unsigned long int HMC_ATOMIC_INCR_ADDR;
+    unsigned long int PIM_NUM_CORES;
+    bool PIM_DMA_PER_CORE;
+    unsigned long int PIM_HOST_IRQ;
 
 	System* pim_system;
 	BaseCPU* pim_cpu;
 	ethz_TLB* dtlb;	// Pointer to the DTLB inside PIM
     ethz_DMA* dma;  // Pointer to the DMA inside PIM
+    BaseGic* host_gic;  // Interrupt controller of the host (completion interrupt)
+
+    /*
+    Multi-core PIM: one CPU and one DTLB per core, and either one DMA per
+    core or a shared one. The pointers above belong to core 0.
+    */
+    vector<BaseCPU*> pim_cpus;
+    vector<ethz_TLB*> dtlbs;
+    vector<ethz_DMA*> dmas;
+    unsigned core_of(PacketPtr pkt) const; // The core which has sent this packet
+    ethz_DMA* dma_of(unsigned core) const { return PIM_DMA_PER_CORE ? dmas[core] : dmas[0]; }
+    SimObject* find_core_object(string name, unsigned core) const; // system.pim_sys.<name> or <name><core>
 
 	Tick prev_time_stamp;
 	char prev_time_stamp_id;
@@ -76,9 +97,14 @@ private:
 	// Hack: caches to be flushed
 	vector<SimObject*> system_caches;
 
-    unsigned long _dma_num_bytes;
-    unsigned long _dma_mem_addr;
-    unsigned long _dma_spm_addr;
+    // The DMA registers are latched per core
+    vector<unsigned long> _dma_num_bytes;
+    vector<unsigned long> _dma_mem_addr;
+    vector<unsigned long> _dma_spm_addr;
+    vector<unsigned long> _dma_desc_addr;
+
+    // Start a DMA transfer for a core (from the DMA registers or from a descriptor)
+    void dma_transfer(unsigned core, unsigned long spm_addr, unsigned long mem_addr, unsigned long num_bytes, uint8_t cmd, unsigned long status_addr);
 
     void run_coprocessor_32b(uint8_t cmd);
     void run_coprocessor_64b(uint8_t cmd);
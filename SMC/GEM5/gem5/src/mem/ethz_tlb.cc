@@ -1,3 +1,5 @@
+#include "base/intmath.hh"
+#include "base/random.hh"
 #include "base/trace.hh"
 #include "debug/ethz_TLB.hh"
 #include "mem/ethz_tlb.hh"
@@ -17,13 +19,28 @@ ethz_TLB::ethz_TLB(const ethz_TLBParams* p) :
     RangeAddrMapper(p),
     OS_PAGE_SHIFT(p->OS_PAGE_SHIFT),
     TLB_SIZE(p->TLB_SIZE),
+    TLB_HIT_LATENCY(p->TLB_HIT_LATENCY),
+    L2_TLB_HIT_LATENCY(p->L2_TLB_HIT_LATENCY),
     DUMP_ADDRESS(p->DUMP_ADDRESS),
     IDEAL_REFILL(p->IDEAL_REFILL),
+    latency_paid_pkt(NULL),
+    lookupEvent(this),
+    WALK_CACHE_LATENCY(p->WALK_CACHE_LATENCY),
+    PREFETCHER(p->PREFETCHER),
+    PREFETCH_DEGREE(p->PREFETCH_DEGREE),
+    last_miss_page(0),
+    last_stride(0),
+    prefetch_blocked(false),
+    slave_waiting_retry(false),
     PIM_DTLB_IDEAL_REFILL_REG(p->PIM_DTLB_IDEAL_REFILL_REG),
     HMC_ATOMIC_INCR(p->HMC_ATOMIC_INCR),
     HMC_ATOMIC_IMIN(p->HMC_ATOMIC_IMIN),
     HMC_ATOMIC_FADD(p->HMC_ATOMIC_FADD),
     HMC_OPERAND(p->HMC_OPERAND),
+    HMC_SWAP_OPERAND(p->HMC_SWAP_OPERAND),
+    HMC_ATOMIC_OPCODE(p->HMC_ATOMIC_OPCODE),
+    HMC_ATOMIC_TARGET(p->HMC_ATOMIC_TARGET),
+    HMC_RESULT(p->HMC_RESULT),
     dequeueEvent(this),
     pim_arch(p->pim_arch)
 {
@@ -31,6 +48,9 @@ ethz_TLB::ethz_TLB(const ethz_TLBParams* p) :
     PIM_SLICECOUNT = 0;
     TLBDynamicAccess = 0;
     hmc_operand = 0;
+    hmc_swap_operand = 0;
+    hmc_opcode = HMC_CMD_NOP;
+    hmc_result = 0;
     //retry_belongs_to_dma = false;
     dma = NULL;
     pim_system = NULL;
@@ -63,7 +83,248 @@ ethz_TLB::ethz_TLB(const ethz_TLBParams* p) :
         DUMP_FILE = new ofstream(n);
     }
 
-    lastUsed.push_back((Tick)-1);
+    // The static rules occupy the first entries of the TLB
+    int dynamic_rules = TLB_SIZE - (int)originalRanges.size();
+    if ( dynamic_rules < 1 )
+        dynamic_rules = 1;
+    L1 = new ethz_TLBArray(dynamic_rules, p->TLB_ASSOC, p->TLB_REPLACEMENT, OS_PAGE_SHIFT);
+    L2 = NULL;
+    if ( p->L2_TLB_SIZE > 0 )
+        L2 = new ethz_TLBArray(p->L2_TLB_SIZE, p->L2_TLB_ASSOC, p->TLB_REPLACEMENT, OS_PAGE_SHIFT);
+    WC = NULL;
+    if ( p->WALK_CACHE_SIZE > 0 )
+        WC = new ethz_TLBArray(p->WALK_CACHE_SIZE, 0, Enums::LRU, OS_PAGE_SHIFT);
+    if ( PREFETCHER != Enums::NoPrefetch && WC == NULL )
+        fatal("ethz_TLB %s: the prefetcher needs a walk cache (WALK_CACHE_SIZE > 0)\n", name());
+}
+
+/*******************************************************************************
+ethz_TLBArray
+*******************************************************************************/
+
+ethz_TLBArray::ethz_TLBArray(int size, int assoc, Enums::ethz_TLBReplacement policy, unsigned page_shift) :
+    POLICY(policy),
+    PAGE_SHIFT(page_shift)
+{
+    if ( assoc <= 0 || assoc >= size )
+    {
+        NUM_SETS = 1;
+        ASSOC = size;
+    }
+    else
+    {
+        if ( size % assoc != 0 )
+            fatal("ethz_TLB: size (%d) must be a multiple of the associativity (%d)\n", size, assoc);
+        NUM_SETS = size / assoc;
+        ASSOC = assoc;
+    }
+    if ( POLICY == Enums::PLRU && ( !isPowerOf2(ASSOC) || ASSOC > 64 ) )
+        fatal("ethz_TLB: PLRU replacement needs a power of 2 associativity (at most 64), not %d\n", ASSOC);
+
+    Entry e;
+    e.valid = false;
+    e.vstart = e.vend = e.pstart = e.key = 0;
+    e.lastUsed = 0;
+    entries.resize(NUM_SETS*ASSOC, e);
+    plru.resize(NUM_SETS, 0);
+}
+
+ethz_TLBArray::Entry*
+ethz_TLBArray::lookup(Addr vaddr, bool update)
+{
+    int index = -1;
+    Addr page = vaddr >> PAGE_SHIFT;
+
+    // The pages which have already hit are found in O(1)
+    auto it = pageIndex.find(page);
+    if ( it != pageIndex.end() && entries[it->second].vstart <= vaddr && vaddr <= entries[it->second].vend )
+        index = it->second;
+
+    // Otherwise the rules do not overlap, so only the closest base below vaddr can match
+    if ( index < 0 )
+    {
+        auto b = baseSet.upper_bound(vaddr);
+        if ( b == baseSet.begin() )
+            return NULL;
+        --b;
+        int set = b->second;
+        for ( int w=0; w<ASSOC; w++ )
+        {
+            Entry& e = entries[set*ASSOC+w];
+            if ( e.valid && e.vstart <= vaddr && vaddr <= e.vend )
+            {
+                index = set*ASSOC+w;
+                break;
+            }
+        }
+        if ( index < 0 )
+            return NULL;
+        if ( pageIndex.insert(make_pair(page, index)).second )
+            entries[index].pages.push_back(page);
+    }
+
+    if ( update )
+        touch(index);
+    return &entries[index];
+}
+
+bool
+ethz_TLBArray::insert(Addr vaddr, Addr vstart, Addr vend, Addr pstart, Entry* victim)
+{
+    int set = set_of(vstart);
+    int index = set*ASSOC + victim_of(set);
+    bool evicted = entries[index].valid;
+    if ( evicted )
+    {
+        *victim = entries[index];
+        invalidate(&entries[index]);
+    }
+
+    Entry& e = entries[index];
+    e.valid = true;
+    e.vstart = vstart;
+    e.vend = vend;
+    e.pstart = pstart;
+    e.key = vaddr;
+    baseSet[vstart] = set;
+    touch(index);
+    return evicted;
+}
+
+void
+ethz_TLBArray::invalidate(Entry* e)
+{
+    for ( auto it = e->pages.begin(); it != e->pages.end(); it++ )
+        pageIndex.erase(*it);
+    e->pages.clear();
+    if ( e->valid )
+        baseSet.erase(e->vstart);
+    e->valid = false;
+}
+
+void
+ethz_TLBArray::flush()
+{
+    for ( int i=0; i<entries.size(); i++ )
+    {
+        entries[i].valid = false;
+        entries[i].pages.clear();
+    }
+    pageIndex.clear();
+    baseSet.clear();
+    plru.assign(plru.size(), 0);
+}
+
+void
+ethz_TLBArray::touch(int index)
+{
+    entries[index].lastUsed = curTick();
+    if ( POLICY == Enums::PLRU )
+    {
+        // Make the nodes on the path of this way point to the other half
+        int set = index / ASSOC;
+        int way = index % ASSOC;
+        int node = 1;
+        for ( int l=floorLog2(ASSOC)-1; l>=0; l-- )
+        {
+            int dir = (way >> l) & 1;
+            if ( dir )
+                plru[set] &= ~(1ULL << node);
+            else
+                plru[set] |= (1ULL << node);
+            node = 2*node + dir;
+        }
+    }
+}
+
+int
+ethz_TLBArray::victim_of(int set)
+{
+    for ( int w=0; w<ASSOC; w++ )
+        if ( !entries[set*ASSOC+w].valid )
+            return w;
+
+    switch ( POLICY )
+    {
+    case Enums::PLRU:
+    {
+        int node = 1;
+        for ( int l=0; l<floorLog2(ASSOC); l++ )
+            node = 2*node + ((plru[set] >> node) & 1);
+        return node - ASSOC;
+    }
+    case Enums::Random:
+        return random_mt.random<int>(0, ASSOC-1);
+    default:
+    {
+        int victim = 0;
+        for ( int w=1; w<ASSOC; w++ )
+            if ( entries[set*ASSOC+w].lastUsed < entries[set*ASSOC+victim].lastUsed )
+                victim = w;
+        return victim;
+    }
+    }
+}
+
+/*******************************************************************************
+ethz_TLB
+*******************************************************************************/
+
+ethz_TLBArray::Entry*
+ethz_TLB::find_rule(Addr addr, bool update, Cycles* latency)
+{
+    ethz_TLBArray::Entry* e = L1->lookup(addr, update);
+    if ( e != NULL )
+    {
+        if ( latency )
+            *latency = TLB_HIT_LATENCY;
+        return e;
+    }
+    if ( L2 == NULL )
+        return NULL;
+    e = L2->lookup(addr, update);
+    if ( e == NULL )
+        return NULL;
+    if ( latency )
+        *latency = L2_TLB_HIT_LATENCY;
+    if ( update )
+    {
+        // Move the rule to the first level
+        TLBL2Hit++;
+        ethz_TLBArray::Entry rule = *e;
+        L2->invalidate(e);
+        e = insert_rule(addr, rule.vstart, rule.vend, rule.pstart);
+    }
+    return e;
+}
+
+ethz_TLBArray::Entry*
+ethz_TLB::insert_rule(Addr addr, Addr vstart, Addr vend, Addr pstart)
+{
+    ethz_TLBArray::Entry victim;
+    if ( L1->insert(addr, vstart, vend, pstart, &victim) && L2 != NULL )
+    {
+        ethz_TLBArray::Entry dropped;
+        L2->insert(victim.key, victim.vstart, victim.vend, victim.pstart, &dropped);
+    }
+    return L1->lookup(addr, false);
+}
+
+Cycles
+ethz_TLB::lookup_latency(Addr addr)
+{
+    for (int i = 0; i < originalRanges.size(); ++i)
+        if (originalRanges[i].contains(addr))
+            return Cycles(0);
+    Cycles latency(0);
+    find_rule(addr, false, &latency);
+    return latency;
+}
+
+void
+ethz_TLB::sendLookupRetry()
+{
+    slavePort.sendRetry();
 }
 
 Addr
@@ -75,6 +336,9 @@ ethz_TLB::remap_check(Addr addr)
             return offset + remappedRanges[i].start();
         }
     }
+    ethz_TLBArray::Entry* e = find_rule(addr, false, NULL);
+    if ( e != NULL )
+        return addr - e->vstart + e->pstart;
     return -1;
 }
 
@@ -90,6 +354,9 @@ ethz_TLB::slice_vend(Addr addr)
             return e;
         }
     }
+    ethz_TLBArray::Entry* e = find_rule(addr, false, NULL);
+    if ( e != NULL )
+        return e->vend;
     panic("This method should never fail: slice_vend() ");
 }
 
@@ -105,6 +372,9 @@ ethz_TLB::slice_vstart(Addr addr)
             return e;
         }
     }
+    ethz_TLBArray::Entry* e = find_rule(addr, false, NULL);
+    if ( e != NULL )
+        return e->vstart;
     panic("This method should never fail: slice_vstart() ");
 }
 
@@ -114,18 +384,22 @@ ethz_TLB::remap(Addr addr)
     DPRINTF(ethz_TLB, "remap: addr 0x%x\n", addr );
     TLBAccess++;
 	
+    // Static rules
     for (int i = 0; i < originalRanges.size(); ++i) {
         if (originalRanges[i].contains(addr)) {
-            if ( i > 0)
-            {
-                lastUsed[i] = curTick(); // Update last used (LRU Algorithm)
-                TLBDynamicAccess++;
-            }
             Addr offset = addr - originalRanges[i].start();
             return offset + remappedRanges[i].start();
         }
     }
 
+    // Dynamic rules (updates the replacement state)
+    ethz_TLBArray::Entry* e = find_rule(addr, true, NULL);
+    if ( e != NULL )
+    {
+        TLBDynamicAccess++;
+        return addr - e->vstart + e->pstart;
+    }
+
     /*
     We have three TLBs: ITLB, DTLB, STLB
     Among these, only DTLB needs a reference to the SliceTable
@@ -170,100 +444,93 @@ ethz_TLB::recvFunctional(PacketPtr pkt)
     pkt->setAddr(orig_addr);
 }
 
+unsigned long
+ethz_TLB::read_word(PacketPtr pkt)
+{
+    if ( pkt->getSize() == 8 )
+        return *(pkt->getPtr<uint64_t>());
+    else if ( pkt->getSize() == 4 )
+        return *(pkt->getPtr<uint32_t>());
+    else
+        return *(pkt->getPtr<uint8_t>());
+}
+
+void
+ethz_TLB::write_word(PacketPtr pkt, unsigned long value)
+{
+    if ( pkt->getSize() == 8 )
+        *(pkt->getPtr<uint64_t>()) = value;
+    else if ( pkt->getSize() == 4 )
+        *(pkt->getPtr<uint32_t>()) = value;
+    else
+        panic("Unsupported size for reading an HMC register: %d", pkt->getSize());
+}
+
 Addr
 ethz_TLB::check_hmc_command(PacketPtr pkt)
 {
     Addr orig_addr = pkt->getAddr();
-    Addr remapped_addr = 0;
+    uint8_t command = HMC_CMD_NOP;
 
-    if ( orig_addr == 0 ) // Ignore
+    if ( orig_addr == 0 || !pkt->isWrite() ) // Ignore
         return 0;
 
     /* Atomic HMC Command */
-    if (orig_addr == HMC_ATOMIC_INCR && pkt->isWrite())
+    if (orig_addr == HMC_ATOMIC_INCR)
+        command = HMC_CMD_INC;
+    else if (orig_addr == HMC_ATOMIC_FADD)
+        command = HMC_CMD_FADD;
+    else if (orig_addr == HMC_ATOMIC_IMIN)
+        command = HMC_CMD_MIN;
+    else if (orig_addr == HMC_ATOMIC_TARGET)
     {
-        assert(pkt->getSize() == pim_arch/8);
-        if ( pim_arch == 32 ) // 32b PIM
-        {
-            uint32_t* c = pkt->getPtr<uint32_t>();
-            remapped_addr = *c;
-        }
-        else  // 64b PIM
-        {
-            uint64_t* c = pkt->getPtr<uint64_t>();
-            remapped_addr = *c;
-        }
-        assert(remapped_addr!=(Addr)-1);
-        if ( remapped_addr == 0 )
-            return 0;
-        pkt->ATOMIC_HMC_COMMAND = HMC_CMD_INC;
-        #ifdef ETHZ_DEBUG_PIM_TLB
-        cout << "HMC Command = " << HMC_CMD_INC << " Remapped Addr = " << hex << remapped_addr << dec << endl;
-        #endif
+        command = hmc_opcode;
+        if ( command == HMC_CMD_NOP )
+            panic("HMC_ATOMIC_TARGET has been written before HMC_ATOMIC_OPCODE!");
     }
-    else
-    /* Atomic HMC Command */
-    if (orig_addr == HMC_ATOMIC_FADD && pkt->isWrite())
-    {
-        assert(pkt->getSize() == pim_arch/8);
-        if ( pim_arch == 32 ) // 32b PIM
-        {
-            uint32_t* c = pkt->getPtr<uint32_t>();
-            remapped_addr = *c;
-        }
-        else  // 64b PIM
-        {
-            uint64_t* c = pkt->getPtr<uint64_t>();
-            remapped_addr = *c;
-        }
-        assert(remapped_addr!=(Addr)-1);
-        if ( remapped_addr == 0 )
-            return 0;
-        pkt->ATOMIC_HMC_COMMAND = HMC_CMD_FADD;
-        pkt->ATOMIC_HMC_OPERAND = hmc_operand;
 
-        #ifdef ETHZ_DEBUG_PIM_TLB
-        cout << "HMC Command = " << HMC_CMD_FADD << " Remapped Addr = " << hex << remapped_addr << dec << endl;
-        #endif
-    }
-    else
-    /* Atomic HMC Command */
-    if (orig_addr == HMC_ATOMIC_IMIN && pkt->isWrite())
+    if ( command != HMC_CMD_NOP )
     {
         assert(pkt->getSize() == pim_arch/8);
-        if ( pim_arch == 32 ) // 32b PIM
-        {
-            uint32_t* c = pkt->getPtr<uint32_t>();
-            remapped_addr = *c;
-        }
-        else  // 64b PIM
-        {
-            uint64_t* c = pkt->getPtr<uint64_t>();
-            remapped_addr = *c;
-        }
+        Addr remapped_addr = read_word(pkt);
         assert(remapped_addr!=(Addr)-1);
         if ( remapped_addr == 0 )
             return 0;
-        pkt->ATOMIC_HMC_COMMAND = HMC_CMD_MIN;
+        pkt->ATOMIC_HMC_COMMAND = command;
         pkt->ATOMIC_HMC_OPERAND = hmc_operand;
+        pkt->ATOMIC_HMC_OPERAND2 = hmc_swap_operand;
 
         #ifdef ETHZ_DEBUG_PIM_TLB
-        cout << "HMC Command = " << HMC_CMD_MIN << " Remapped Addr = " << hex << remapped_addr << dec << endl;
+        cout << "HMC Command = " << command << " Remapped Addr = " << hex << remapped_addr << dec << endl;
         #endif
+        return remapped_addr;
     }
 
-    /* Atomic HMC Operand */
-    if (orig_addr == HMC_OPERAND && pkt->isWrite())
+    /* Atomic HMC Operands */
+    if (orig_addr == HMC_OPERAND)
     {
-        //assert(pkt->getSize() == 4); // Currently, this register is used only as a float operand which is always 4 bytes
-        uint32_t* c = pkt->getPtr<uint32_t>();
-        hmc_operand= *c;
+        hmc_operand = read_word(pkt);
         #ifdef ETHZ_DEBUG_PIM_TLB
         cout << " <HMC_Operand int=" << hmc_operand << " float=" << *(float*)&hmc_operand << ">" << endl;
         #endif
     }
+    else if (orig_addr == HMC_SWAP_OPERAND)
+        hmc_swap_operand = read_word(pkt);
+    else if (orig_addr == HMC_ATOMIC_OPCODE)
+        hmc_opcode = *(pkt->getPtr<uint8_t>());
 
-    return remapped_addr;
+    return 0;
+}
+
+bool
+ethz_TLB::check_hmc_result(PacketPtr pkt)
+{
+    if ( HMC_RESULT == 0 || pkt->getAddr() != HMC_RESULT || !pkt->isRead() )
+        return false;
+    write_word(pkt, hmc_result);
+    if (pkt->needsResponse())
+        pkt->makeResponse();
+    return true;
 }
 
 
@@ -300,13 +567,24 @@ ethz_TLB::recvAtomic(PacketPtr pkt)
         return 1; // TODO: Later: Latency of refill request
     }
 
+    // The value returned by the last atomic HMC command
+    if ( check_hmc_result(pkt) )
+        return clockPeriod();
+
     // Registers for Supporting HMC Commands
     Addr remapped_addr = 0;
+    Cycles latency(0);
     remapped_addr = check_hmc_command(pkt);
     if ( remapped_addr == 0 )
+    {
+        latency = lookup_latency(orig_addr);
         remapped_addr = remap(orig_addr);
+    }
     else
+    {
+        latency = lookup_latency(remapped_addr);
         remapped_addr = remap(remapped_addr);
+    }
 
     if ( remapped_addr == (Addr)-1 )
     {
@@ -328,7 +606,9 @@ ethz_TLB::recvAtomic(PacketPtr pkt)
     pkt->setAddr(remapped_addr);
     Tick ret_tick =  masterPort.sendAtomic(pkt);
     pkt->setAddr(orig_addr);
-    return ret_tick;
+    if ( pkt->ATOMIC_HMC_RETURNED )
+        hmc_result = pkt->ATOMIC_HMC_RESULT;
+    return ret_tick + latency * clockPeriod();
 }
 
 bool
@@ -380,6 +660,17 @@ ethz_TLB::recvTimingReq(PacketPtr pkt)
         }
         return true;       
     }
+
+    /*******************************************
+    The value returned by the last atomic HMC command
+    ********************************************/
+    if ( !pkt->IS_REMAPPED && check_hmc_result(pkt) )
+    {
+        pkt->firstWordDelay = pkt->lastWordDelay = 0;
+        packetQueue.push_back(pkt);
+        schedule(dequeueEvent, clockEdge(Cycles(1)));
+        return true;
+    }
     bool needsResponse = pkt->needsResponse();
     bool memInhibitAsserted = pkt->memInhibitAsserted();
     //cout << "ethz_TLB::recvTimingReq 0x" << hex << pkt->getAddr() << " IS_REMAPPED:" << pkt->IS_REMAPPED << " CMD:" << pkt->cmdString()<< endl;
@@ -394,6 +685,21 @@ ethz_TLB::recvTimingReq(PacketPtr pkt)
         remapped_addr = check_hmc_command(pkt);
         if ( remapped_addr != 0 ) // This means that an HMC command has been received, so we must remap original address
             orig_addr = remapped_addr;
+
+        // Pay the hit latency: the master retries once the lookup is done
+        if ( pkt != latency_paid_pkt )
+        {
+            Cycles latency = lookup_latency(orig_addr);
+            if ( latency > 0 )
+            {
+                assert(!lookupEvent.scheduled());
+                latency_paid_pkt = pkt;
+                schedule(lookupEvent, clockEdge(latency));
+                return false;
+            }
+        }
+        latency_paid_pkt = NULL;
+
         remapped_addr = remap(orig_addr);
 
         if ( remapped_addr == (Addr)-1 )
@@ -407,7 +713,26 @@ ethz_TLB::recvTimingReq(PacketPtr pkt)
             else
             {
                 //cout << "ethz_TLB::TLB Miss (Timing)" << hex << pkt->getAddr() << dec << " Pending Refills:" << pending_refills.size() << endl;
-                refillTLB_timing(orig_addr);
+                if ( PREFETCHER == Enums::Stride )
+                {
+                    long page = (orig_addr - PIM_SLICEVSTART) >> OS_PAGE_SHIFT;
+                    long stride = page - last_miss_page;
+                    if ( stride != 0 && stride == last_stride )
+                        for (int i = 1; i <= PREFETCH_DEGREE; ++i)
+                            prefetch_slice(orig_addr + ((stride*i) << OS_PAGE_SHIFT), PREFETCH_DEGREE);
+                    last_stride = stride;
+                    last_miss_page = page;
+                }
+                if ( walk_cache_refill(orig_addr) )
+                {
+                    // The walk cache pays for the lookup as well
+                    latency_paid_pkt = pkt;
+                    if ( !lookupEvent.scheduled() )
+                        schedule(lookupEvent, clockEdge(WALK_CACHE_LATENCY));
+                }
+                else if ( !refillTLB_timing(orig_addr) )
+                    slave_waiting_retry = true;
+                trySendPrefetch();
                 return false; // Not successful, retry later (I am responsible for sending the retry whenever the data is ready)
             }
         }
@@ -443,6 +768,8 @@ ethz_TLB::recvTimingReq(PacketPtr pkt)
     if (!successful && needsResponse) {
         delete pkt->popSenderState();
     }
+    if (!successful)
+        slave_waiting_retry = true;
 
     return successful;
 }
@@ -459,9 +786,21 @@ ethz_TLB::recvTimingResp(PacketPtr pkt)
         //panic("AddrMapper %s got a response without sender state\n", name());
         //cout << "refillTLB (timing): Response received" << endl;
         assert(pkt->getSize() == 3*pim_arch/8);
-        bool success = remove_pending_refill(pkt->getAddr());
-        if ( !success )
+        m5::hash_map<Addr, PendingRefill>::iterator it = pending_refills.find(pkt->getAddr());
+        if ( it == pending_refills.end() )
             panic("success = remove_pending_refill(pkt->getAddr()) failed!");
+        PendingRefill refill = it->second;
+        pending_refills.erase(it);
+
+        // The slice table has been replaced: drop the entry, and let the master walk the new one
+        if ( refill.stale )
+        {
+            delete pkt;
+            trySendPrefetch();
+            if ( refill.demand )
+                slavePort.sendRetry();
+            return true;
+        }
         unsigned long vaddr = (pim_arch==32)?
             (unsigned long)(pkt->getPtr<uint32_t>()[0]):    // 32b PIM
             (unsigned long)(pkt->getPtr<uint64_t>()[0]);    // 64b PIM
@@ -475,19 +814,51 @@ ethz_TLB::recvTimingResp(PacketPtr pkt)
         #ifdef ETHZ_DEBUG_PIM_TLB
         cout << "ethz_TLB::recvTimingResp (timing): Rule: vaddr=0x" << hex << vaddr << " paddr=0x" << paddr << " size=" << dec << size << " pending_refills" << pending_refills.size() << dec << endl;
         #endif
-        updateTLB(vaddr, paddr, size);
-
+        // The page which has missed (See refillTLB_timing)
+        Addr addr = PIM_SLICEVSTART + (((pkt->getAddr() - PIM_SLICETABLE_PTR) / pkt->getSize()) << OS_PAGE_SHIFT);
         delete pkt; // Packet will delete its request and its data
+
+        // A gap between the ranges offloaded by the host: only a demand walk is an error (see updateTLB)
+        if ( size == 0 && !refill.demand )
+        {
+            trySendPrefetch();
+            return true;
+        }
+
+        if ( WC != NULL )
+        {
+            ethz_TLBArray::Entry victim;
+            if ( WC->insert(addr, vaddr, vaddr + size-1, paddr, &victim) )
+                prefetched_rules.erase(victim.vstart);
+        }
+        if ( PREFETCHER == Enums::NextSlice && refill.depth < PREFETCH_DEGREE )
+            prefetch_slice(vaddr + size, refill.depth + 1);
+
+        if ( refill.demand )
+        {
+            Walks++;
+            WalkLatency += curTick() - refill.issued;
+            updateTLB(addr, vaddr, paddr, size);
+        }
+        else
+            prefetched_rules.insert(vaddr);
+        trySendPrefetch();
+
         /*
         Now we must ask the master to retry its previous access
         */
-        slavePort.sendRetry();
+        if ( refill.demand )
+            slavePort.sendRetry();
 
         return true;
     }
 
     Addr remapped_addr = pkt->getAddr();
 
+    // Value returned by an atomic HMC command
+    if ( pkt->ATOMIC_HMC_RETURNED )
+        hmc_result = pkt->ATOMIC_HMC_RESULT;
+
     // Restore the state and address
     pkt->senderState = receivedState->predecessor;
     pkt->setAddr(receivedState->origAddr);
@@ -538,12 +909,10 @@ ethz_TLB::recvTimingSnoopResp(PacketPtr pkt)
 bool ethz_TLB::pending_refill(Addr addr)
 {
     // Check if a request for this rule is already in flight:
-    std::vector<Addr>::iterator it;
-    it = std::find(pending_refills.begin(), pending_refills.end(), addr);
-    if ( it != pending_refills.end() ) // found
+    if ( pending_refills.find(addr) != pending_refills.end() ) // found
     {
         #ifdef ETHZ_DEBUG_PIM_TLB
-        cout << "ethz_TLB::pending_refill = true  address: " << hex << *it << dec << endl;
+        cout << "ethz_TLB::pending_refill = true  address: " << hex << addr << dec << endl;
         #endif
         return true;
     }
@@ -552,44 +921,126 @@ bool ethz_TLB::pending_refill(Addr addr)
 
 bool ethz_TLB::remove_pending_refill(Addr addr)
 {
-    // Check if a request for this rule is already in flight:
-    std::vector<Addr>::iterator it;
-    it = std::find(pending_refills.begin(), pending_refills.end(), addr);
-    if ( it != pending_refills.end() ) // found
-    {
-        pending_refills.erase(it);
-        return true;
-    }
-    return false; // Not found in the pending list
+    return pending_refills.erase(addr) > 0; // Not found in the pending list: false
 }
 
-bool ethz_TLB::refillTLB_timing(Addr addr)
+void ethz_TLB::flush_slices()
+{
+    L1->flush();
+    if ( L2 != NULL )
+        L2->flush();
+    if ( WC != NULL )
+        WC->flush();
+    prefetch_queue.clear();
+    prefetched_rules.clear();
+    last_miss_page = 0;
+    last_stride = 0;
+    // The entries in flight are still received, but they are not used
+    for ( auto it = pending_refills.begin(); it != pending_refills.end(); it++ )
+        it->second.stale = true;
+}
+
+Addr ethz_TLB::slice_entry(Addr addr)
 {
     int length = 3*pim_arch/8; // Each slice has 3 entries
     assert( addr >= PIM_SLICEVSTART );
-    unsigned long index = ((addr - PIM_SLICEVSTART) >> OS_PAGE_SHIFT)*length;
-    #ifdef ETHZ_DEBUG_PIM_TLB
-    cout << "ethz_TLB::refillTLB (timing): Requesting rule for address: 0x" << hex << addr << " Index:" << dec << index << endl;
-    #endif
+    return PIM_SLICETABLE_PTR + ((addr - PIM_SLICEVSTART) >> OS_PAGE_SHIFT)*length;
+}
 
+PacketPtr ethz_TLB::create_refill_packet(Addr entry)
+{
+    int length = 3*pim_arch/8; // Each slice has 3 entries
     Request::Flags flags = 0;
-
-    // Check if a request for this rule is already in flight:
-    if ( pending_refill(PIM_SLICETABLE_PTR+index) )
-    {
-        cout << "ethz_TLB: Request is already issued. Nothing to do (addr=0x" << hex << addr << dec << ")" << endl;
-        return true;
-    }
-
-    pending_refills.push_back(PIM_SLICETABLE_PTR+index);
-    Request *req = new Request(PIM_SLICETABLE_PTR+index, length, flags, masterId); // Each slice is 3 words
+    Request *req = new Request(entry, length, flags, masterId); // Each slice is 3 words
     PacketPtr pkt = new Packet(req, MemCmd::ReadReq);
     pkt->setSrc(0);
     uint8_t* empty = new uint8_t[length];
     *empty = 0;
 
     pkt->dataDynamicArray(empty);
+    return pkt;
+}
+
+bool ethz_TLB::walk_cache_refill(Addr addr)
+{
+    if ( WC == NULL )
+        return false;
+    ethz_TLBArray::Entry* e = WC->lookup(addr, true);
+    if ( e == NULL )
+    {
+        WalkCacheMiss++;
+        return false;
+    }
+    WalkCacheHit++;
+    if ( prefetched_rules.erase(e->vstart) )
+        PrefetchUseful++;
+    updateTLB(addr, e->vstart, e->pstart, e->vend - e->vstart + 1);
+    return true;
+}
+
+void ethz_TLB::prefetch_slice(Addr vaddr, int depth)
+{
+    // Only the slices of the slice table, which are neither cached nor in flight
+    if ( vaddr < PIM_SLICEVSTART || ((vaddr - PIM_SLICEVSTART) >> OS_PAGE_SHIFT) >= PIM_SLICECOUNT )
+        return;
+    Addr entry = slice_entry(vaddr);
+    if ( find_rule(vaddr, false, NULL) != NULL || WC->lookup(vaddr, false) != NULL || pending_refill(entry) )
+        return;
+    for (int i = 0; i < prefetch_queue.size(); ++i)
+        if ( prefetch_queue[i].first == entry )
+            return;
+    if ( prefetch_queue.size() >= 16 ) // Drop the oldest prefetch
+        prefetch_queue.pop_front();
+    prefetch_queue.push_back(std::make_pair(entry, depth));
+}
+
+void ethz_TLB::trySendPrefetch()
+{
+    while ( !prefetch_blocked && !prefetch_queue.empty() )
+    {
+        std::pair<Addr, int> p = prefetch_queue.front();
+        if ( pending_refill(p.first) ) // A demand miss has been faster
+        {
+            prefetch_queue.pop_front();
+            continue;
+        }
+        PacketPtr pkt = create_refill_packet(p.first);
+        if ( ! masterPort.sendTimingReq(pkt) )
+        {
+            prefetch_blocked = true;
+            delete pkt; // Packet will delete its request and its data
+            return;
+        }
+        prefetch_queue.pop_front();
+        PendingRefill refill = { curTick(), false, p.second, false };
+        pending_refills[p.first] = refill;
+        PrefetchIssued++;
+    }
+}
 
+bool ethz_TLB::refillTLB_timing(Addr addr)
+{
+    Addr entry = slice_entry(addr);
+    #ifdef ETHZ_DEBUG_PIM_TLB
+    cout << "ethz_TLB::refillTLB (timing): Requesting rule for address: 0x" << hex << addr << " Entry:0x" << entry << dec << endl;
+    #endif
+
+    // Check if a request for this rule is already in flight (coalesce with it):
+    m5::hash_map<Addr, PendingRefill>::iterator it = pending_refills.find(entry);
+    if ( it != pending_refills.end() )
+    {
+        TLBCoalescedMiss++;
+        if ( !it->second.demand )
+        {
+            // The prefetch has been issued, but not early enough
+            PrefetchLate++;
+            it->second.demand = true;
+            it->second.issued = curTick();
+        }
+        return true;
+    }
+
+    PacketPtr pkt = create_refill_packet(entry);
     bool successful = false;
     // if ( ! masterPortBusy )
     // {
@@ -607,11 +1058,15 @@ bool ethz_TLB::refillTLB_timing(Addr addr)
         Notice: if DMA was the source of this packet, it will retry
         on its next clock cycle
         */
+        #ifdef ETHZ_DEBUG_PIM_TLB
         cout << "[STALL] refillTLB_timing.sendTimingReq was not successful" << endl;
-        pending_refills.pop_back();
+        #endif
+        WalkStalls++;
         delete pkt; // Packet will delete its request and its data
         return false;
     }
+    PendingRefill refill = { curTick(), true, 0, false };
+    pending_refills[entry] = refill;
     return true;
 }
 
@@ -623,6 +1078,8 @@ bool ethz_TLB::refillTLB_atomic(Addr addr)
     #ifdef ETHZ_DEBUG_PIM_TLB
     cout << "ethz_TLB::refillTLB (atomic): Refilling rule for address: 0x" << hex << addr << " Index:" << dec << index << endl;
     #endif
+    if ( walk_cache_refill(addr) )
+        return true;
 
     bool status = pending_refill(PIM_SLICETABLE_PTR+index); // atomic and timing cannot coexist!
     if ( status )
@@ -656,40 +1113,31 @@ bool ethz_TLB::refillTLB_atomic(Addr addr)
     #ifdef ETHZ_DEBUG_PIM_TLB
     cout << "ethz_TLB::refillTLB (atomic): Rule: vaddr=0x" << hex << vaddr << " paddr=0x" << paddr << " size=" << dec << size << endl;
     #endif
-    updateTLB(vaddr, paddr, size);
+    updateTLB(addr, vaddr, paddr, size);
+    if ( WC != NULL )
+    {
+        ethz_TLBArray::Entry victim;
+        if ( WC->insert(addr, vaddr, vaddr + size-1, paddr, &victim) )
+            prefetched_rules.erase(victim.vstart);
+    }
 
     delete pkt; // Packet will delete its request and its data
     return true;
 }
 
-void ethz_TLB::updateTLB(unsigned long vaddr, unsigned long paddr, unsigned long size)
+void ethz_TLB::updateTLB(Addr addr, unsigned long vaddr, unsigned long paddr, unsigned long size)
 {
-    if ( originalRanges.size() >= TLB_SIZE )
+    /*
+    The victim of the first level (selected by TLB_REPLACEMENT) moves to the
+    second level, if there is one. The static rules are never replaced
+    */
+    if ( size == 0 )
     {
-        /* 
-        Remove the LRU Rule
-        The first rule should never be replaced
-         */
-        Tick min = lastUsed[1];
-        long min_index = 1;
-        for (int i=1; i<lastUsed.size(); i++)
-        {
-            if (min>lastUsed[i])
-            {
-                min = lastUsed[i];
-                min_index = i;
-            }
-        }
-        #ifdef ETHZ_DEBUG_PIM_TLB
-        cout << "TLB:Replace[" << min_index << "]: Last Used:" << min << endl;
-        #endif
-        lastUsed.erase(lastUsed.begin()+min_index);
-        originalRanges.erase(originalRanges.begin()+min_index);
-        remappedRanges.erase(remappedRanges.begin()+min_index);
+        // The slices of the gaps between the ranges offloaded by the host are empty
+        cout << name() << " Address 0x" << hex << addr << dec << " has not been offloaded by the host" << endl;
+        panic("TLB: Access to a page which has not been offloaded!");
     }
-    originalRanges.push_back(AddrRange(vaddr, vaddr + size-1));
-    remappedRanges.push_back(AddrRange(paddr, paddr + size-1));
-    lastUsed.push_back(curTick());
+    insert_rule(addr, vaddr, vaddr + size-1, paddr);
 
     #ifdef ETHZ_DEBUG_PIM_TLB
     //printTLB();
@@ -702,7 +1150,17 @@ void ethz_TLB::printTLB()
     cout << "---------------------------------" << endl;
     cout << "TLB: " << name() << endl;
     for (int i = 0; i < originalRanges.size(); ++i)
-       cout << "  RULE: " << originalRanges[i].to_string() << " ==> " << remappedRanges[i].to_string() << "   Used @" << lastUsed[i] << endl;
+       cout << "  RULE: " << originalRanges[i].to_string() << " ==> " << remappedRanges[i].to_string() << "   (static)" << endl;
+    for (int l = 0; l < 2; ++l)
+    {
+        ethz_TLBArray* a = (l == 0) ? L1 : L2;
+        for (int i = 0; a != NULL && i < a->size(); ++i)
+        {
+            ethz_TLBArray::Entry& e = a->entry(i);
+            if ( e.valid )
+                cout << "  L" << l+1 << "[" << i << "]: " << hex << e.vstart << ":" << e.vend << " ==> " << e.pstart << dec << "   Used @" << e.lastUsed << endl;
+        }
+    }
     cout << "---------------------------------" << endl;
 }
 
@@ -727,6 +1185,11 @@ ethz_TLB::regStats()
         .desc("Number of TLB accesses")
         ;
 
+    TLBL2Hit
+        .name(name() + ".tlb_l2_hit")
+        .desc("Number of hits in the second-level TLB")
+        ;
+
     TLBHitRate
         .name(name() + ".tlb_hit_rate")
         .desc("TLB hit rate")
@@ -740,6 +1203,65 @@ ethz_TLB::regStats()
         .precision(2);
 
     TLBDynamicHitRate = (1.0 - TLBMiss / TLBDynamicAccess) * 100.0;
+
+    TLBCoalescedMiss
+        .name(name() + ".tlb_coalesced_miss")
+        .desc("Number of TLB misses coalesced with a refill in flight")
+        ;
+
+    WalkCacheHit
+        .name(name() + ".walk_cache_hit")
+        .desc("Number of TLB misses served by the walk cache")
+        ;
+
+    WalkCacheMiss
+        .name(name() + ".walk_cache_miss")
+        .desc("Number of TLB misses not found in the walk cache")
+        ;
+
+    Walks
+        .name(name() + ".walks")
+        .desc("Number of timing walks of the slice table (demand)")
+        ;
+
+    WalkLatency
+        .name(name() + ".walk_latency")
+        .desc("Total latency of the timing walks (ticks)")
+        ;
+
+    AvgWalkLatency
+        .name(name() + ".avg_walk_latency")
+        .desc("Average latency of the timing walks (ticks)")
+        .precision(2);
+
+    AvgWalkLatency = WalkLatency / Walks;
+
+    PrefetchIssued
+        .name(name() + ".prefetch_issued")
+        .desc("Number of slice-table prefetches issued")
+        ;
+
+    PrefetchUseful
+        .name(name() + ".prefetch_useful")
+        .desc("Number of prefetched slices used by a TLB miss")
+        ;
+
+    PrefetchLate
+        .name(name() + ".prefetch_late")
+        .desc("Number of TLB misses to a prefetch in flight")
+        ;
+
+    WalkStalls
+        .name(name() + ".walk_stalls")
+        .desc("Number of walks which could not be sent (the requester retries)")
+        ;
+
+    PrefetchAccuracy
+        .name(name() + ".prefetch_accuracy")
+        .desc("Percentage of the prefetches used by a TLB miss")
+        .precision(2);
+
+    PrefetchAccuracy = (PrefetchUseful + PrefetchLate) / PrefetchIssued * 100.0;
 }
 
 bool ethz_TLB::refillTLB_functional(Addr addr)
@@ -750,6 +1272,8 @@ bool ethz_TLB::refillTLB_functional(Addr addr)
     #ifdef ETHZ_DEBUG_PIM_TLB
     cout << "ethz_TLB::refillTLB (functional): Refilling rule for address: 0x" << hex << addr << " Index:" << dec << index << endl;
     #endif
+    if ( walk_cache_refill(addr) )
+        return true;
 
     bool status = pending_refill(PIM_SLICETABLE_PTR+index); // This situation is not very bad, but we avoid it for now
     if ( status )
@@ -779,7 +1303,13 @@ bool ethz_TLB::refillTLB_functional(Addr addr)
     #ifdef ETHZ_DEBUG_PIM_TLB
     cout << "ethz_TLB::refillTLB (functional): Rule: vaddr=0x" << hex << vaddr << " paddr=0x" << paddr << " size=" << dec << size << endl;
     #endif
-    updateTLB(vaddr, paddr, size);
+    updateTLB(addr, vaddr, paddr, size);
+    if ( WC != NULL )
+    {
+        ethz_TLBArray::Entry victim;
+        if ( WC->insert(addr, vaddr, vaddr + size-1, paddr, &victim) )
+            prefetched_rules.erase(victim.vstart);
+    }
 
     delete pkt; // Packet will delete its request and its data
     return true;
@@ -818,7 +1348,16 @@ void ethz_TLB::recvRetryMaster()
     //         cout << "   [TLB: DMA is already active]" << endl;
     // }
     // else
-        AddrMapper::recvRetryMaster();
+    // The retry may belong to a prefetch, the master of this TLB may not be waiting
+    if ( prefetch_blocked )
+    {
+        prefetch_blocked = false;
+        trySendPrefetch();
+        if ( !slave_waiting_retry )
+            return;
+    }
+    slave_waiting_retry = false;
+    AddrMapper::recvRetryMaster();
 }
 
 void ethz_TLB::recvRetrySlave()
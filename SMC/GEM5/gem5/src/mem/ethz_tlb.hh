@@ -9,10 +9,69 @@
 #include "sim/system.hh"
 #include "sim/stats.hh"
 #include "dev/ethz_dma.hh"
+#include "base/hashmap.hh"
+#include "enums/ethz_TLBPrefetcher.hh"
+#include "enums/ethz_TLBReplacement.hh"
 #include <deque>
+#include <map>
 
 using namespace std;
 
+/*
+One level of the TLB: an array of dynamic rules (slices) organized in sets
+The set of a rule is selected by the base of its slice (vstart), so every
+slice is held only once. A lookup first tries a hash table of the pages
+which have already hit (O(1)). Otherwise the base of the only rule which
+may contain the address (the closest one below it) gives the set, and just
+the ways of that set are probed
+*/
+class ethz_TLBArray
+{
+public:
+    struct Entry
+    {
+        bool valid;
+        Addr vstart;
+        Addr vend;
+        Addr pstart;
+        Addr key;                   // The address whose miss has inserted the rule
+        Tick lastUsed;
+        std::vector<Addr> pages;    // Pages indexed in pageIndex
+    };
+
+    ethz_TLBArray(int size, int assoc, Enums::ethz_TLBReplacement policy, unsigned page_shift);
+
+    // Return the rule containing vaddr, or NULL. update: update the replacement state
+    Entry* lookup(Addr vaddr, bool update);
+
+    // Insert a rule after a miss on vaddr. If a valid rule is evicted, it is copied to victim and true is returned
+    bool insert(Addr vaddr, Addr vstart, Addr vend, Addr pstart, Entry* victim);
+
+    // Remove a rule from the array
+    void invalidate(Entry* e);
+
+    // Remove all rules from the array
+    void flush();
+
+    int size() { return entries.size(); }
+    Entry& entry(int i) { return entries[i]; }
+
+private:
+    int NUM_SETS;
+    int ASSOC;
+    Enums::ethz_TLBReplacement POLICY;
+    unsigned PAGE_SHIFT;
+
+    std::vector<Entry> entries;             // Set s occupies entries [s*ASSOC, (s+1)*ASSOC)
+    std::vector<uint64_t> plru;             // Tree-PLRU bits of each set
+    m5::hash_map<Addr, int> pageIndex;      // page -> entry
+    std::map<Addr, int> baseSet;            // vstart -> set of the valid rules
+
+    int set_of(Addr vstart) { return (vstart >> PAGE_SHIFT) % NUM_SETS; }
+    void touch(int index);
+    int victim_of(int set);
+};
+
 
 class ethz_TLB : public RangeAddrMapper
 {
@@ -29,6 +88,9 @@ public:
     Addr slice_vend(Addr addr);  // (Does not modify the internal state of the TLB) - Returns the end vaddress in current slice
     Addr slice_vstart(Addr addr);  // (Does not modify the internal state of the TLB) - Returns the start vaddress in current slice
     Addr check_hmc_command(PacketPtr pkt);  // Check if this packet is an atomic hmc command
+    unsigned long read_word(PacketPtr pkt);   // Word of the PIM written by a packet
+    void write_word(PacketPtr pkt, unsigned long value);  // Fill a read packet with a word of the PIM
+    bool check_hmc_result(PacketPtr pkt);   // Serve a read of HMC_RESULT (returns true if it was)
 
     /*
     Refill the rules in the TLB from the Slice Table
@@ -39,6 +101,13 @@ public:
     bool pending_refill(Addr addr); // Is there a refil for this address pending?
     bool remove_pending_refill(Addr addr); // Remove an address from pending refill rule, return success
 
+    /*
+    Drop all rules of the slice table (both levels, the walk cache and the
+    prefetches). Called when the host replaces the slice table, since the
+    pages of the previous one may have been released
+    */
+    void flush_slices();
+
 
     // Override receive functions
     virtual void recvFunctional(PacketPtr pkt);
@@ -64,32 +133,98 @@ public:
     Stats::Scalar TLBAccess;
     Stats::Scalar TLBDynamicAccess;
     Stats::Scalar TLBMiss;
+    Stats::Scalar TLBL2Hit;
+    Stats::Scalar TLBCoalescedMiss;
+    Stats::Scalar WalkCacheHit;
+    Stats::Scalar WalkCacheMiss;
+    Stats::Scalar Walks;
+    Stats::Scalar WalkLatency;
+    Stats::Formula AvgWalkLatency;
+    Stats::Scalar PrefetchIssued;
+    Stats::Scalar PrefetchUseful;
+    Stats::Scalar PrefetchLate;
+    Stats::Scalar WalkStalls;
+    Stats::Formula PrefetchAccuracy;
     Stats::Formula TLBHitRate;
     Stats::Formula TLBDynamicHitRate;
 
 
 private:
-    // Update TLB Rules (LRU)
-    void updateTLB(unsigned long vaddr, unsigned long paddr, unsigned long size);
+    // Update TLB Rules (addr: the address which has missed)
+    void updateTLB(Addr addr, unsigned long vaddr, unsigned long paddr, unsigned long size);
     int TLB_SIZE;
+    Cycles TLB_HIT_LATENCY;
+    Cycles L2_TLB_HIT_LATENCY;
     bool DUMP_ADDRESS;
     bool IDEAL_REFILL;
     ofstream* DUMP_FILE;
 
     void printTLB();
     /*
-    To implement the ideal LRU algorithm, we need the Tick which each rule has been
-    used last
+    The static rules (original_ranges from the configuration) are kept in
+    originalRanges/remappedRanges and are never replaced. The dynamic rules
+    (slices) are kept in the first level and the optional second level
+    (victims of the first level)
+    */
+    ethz_TLBArray* L1;
+    ethz_TLBArray* L2;
+    ethz_TLBArray::Entry* find_rule(Addr addr, bool update, Cycles* latency); // Look in both levels
+    ethz_TLBArray::Entry* insert_rule(Addr addr, Addr vstart, Addr vend, Addr pstart); // Insert in L1, its victim goes to L2
+    Cycles lookup_latency(Addr addr); // Hit latency of this address (Does not modify the internal state of the TLB)
+
+    // Timing requests pay the hit latency by being retried after it
+    PacketPtr latency_paid_pkt;
+    void sendLookupRetry();
+    EventWrapper<ethz_TLB, &ethz_TLB::sendLookupRetry> lookupEvent;
+
+    /*
+    Slice-table entries in flight (demand misses and prefetches). The misses
+    to an entry which is already in flight are coalesced with it
+    */
+    struct PendingRefill
+    {
+        Tick issued;
+        bool demand;    // A miss is waiting for this entry
+        int depth;      // Prefetches issued in a row before this one (NextSlice)
+        bool stale;     // The slice table has been replaced since it was issued
+    };
+    m5::hash_map<Addr, PendingRefill> pending_refills;
+    Addr slice_entry(Addr addr); // Address of the slice-table entry of this page
+    PacketPtr create_refill_packet(Addr entry); // Read request for one entry of the slice table
+
+    /*
+    Walk cache: the slices which have been read from the slice table (or
+    prefetched), so that a miss in the TLB does not always go to memory
     */
-    std::vector<Tick> lastUsed;
-    std::vector<Addr> pending_refills; // Multiple pending addresses refill the rule for
+    ethz_TLBArray* WC;
+    Cycles WALK_CACHE_LATENCY;
+    bool walk_cache_refill(Addr addr); // Refill the TLB from the walk cache, return success
+
+    // Prefetcher
+    Enums::ethz_TLBPrefetcher PREFETCHER;
+    int PREFETCH_DEGREE;
+    long last_miss_page;
+    long last_stride;
+    std::deque<std::pair<Addr, int> > prefetch_queue; // Entries (and their depth) waiting to be sent
+    bool prefetch_blocked;                  // Waiting for a retry from the master port
+    bool slave_waiting_retry;               // The master of this TLB is waiting for a retry from the master port
+    m5::hash_set<Addr> prefetched_rules;    // Prefetched slices (vstart) not used yet
+    void prefetch_slice(Addr vaddr, int depth);
+    void trySendPrefetch();
 
     unsigned long int PIM_DTLB_IDEAL_REFILL_REG; // Register for refill request from software
     unsigned long int HMC_ATOMIC_INCR;
     unsigned long int HMC_ATOMIC_IMIN;
     unsigned long int HMC_ATOMIC_FADD;
     unsigned long int HMC_OPERAND; // Address of the operand register
+    unsigned long int HMC_SWAP_OPERAND;  // Address of the second operand register
+    unsigned long int HMC_ATOMIC_OPCODE; // Opcode of the commands sent through HMC_ATOMIC_TARGET
+    unsigned long int HMC_ATOMIC_TARGET;
+    unsigned long int HMC_RESULT;   // Address of the result register
     unsigned long int hmc_operand; // Value of the operand
+    unsigned long int hmc_swap_operand;
+    uint8_t hmc_opcode;
+    unsigned long int hmc_result;  // Old value returned by the last atomic command
     System* pim_system;
 
     // ID of the current master
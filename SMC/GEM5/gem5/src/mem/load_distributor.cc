@@ -1,13 +1,20 @@
 #include "base/random.hh"
 #include "mem/load_distributor.hh"
+#include "sim/stats.hh"
 
 LoadDistributor::LoadDistributor(const LoadDistributorParams* p) :
     NoncoherentXBar(p),
-    N_MASTER_PORTS(p->port_master_connection_count)
+    N_MASTER_PORTS(p->port_master_connection_count),
+    POLICY(p->distribution_policy),
+    VAULT_BITS(p->vault_bits),
+    OFFSET_BITS(p->offset_bits),
+    outstanding(p->port_master_connection_count, 0)
 {
 	assert(p->port_slave_connection_count == 1);
 	//cout << "LoadDistributor: Load distributor for HMC serial links" << endl;
 	ROUND_ROBIN_COUNTER = 0;
+	if ( POLICY == Enums::vault_affinity && VAULT_BITS == 0 )
+		fatal("LoadDistributor %s: vault_affinity needs vault_bits > 0\n", name());
 }
 
 LoadDistributor*
@@ -38,6 +45,44 @@ int LoadDistributor::rotate_counter()
 	return current_value;
 }
 
+PortID LoadDistributor::select_link(PacketPtr pkt)
+{
+	Addr block = pkt->getAddr() >> OFFSET_BITS;
+	switch ( POLICY )
+	{
+	case Enums::least_outstanding:
+	{
+		// Ties are broken in round-robin order
+		PortID start = rotate_counter();
+		PortID link = start;
+		for ( int i=1; i<N_MASTER_PORTS; i++ )
+		{
+			PortID p = (start + i) % N_MASTER_PORTS;
+			if ( outstanding[p] < outstanding[link] )
+				link = p;
+		}
+		return link;
+	}
+	case Enums::address_hash:
+	{
+		// Fold the upper bits of the block address into the lower ones
+		uint64_t h = block;
+		h ^= h >> 17;
+		h ^= h >> 9;
+		h ^= h >> 4;
+		return h % N_MASTER_PORTS;
+	}
+	case Enums::vault_affinity:
+	{
+		// Consecutive vaults share a link (e.g. one link per quadrant)
+		uint64_t vault = block & ((1ULL << VAULT_BITS) - 1);
+		return (vault * N_MASTER_PORTS) >> VAULT_BITS;
+	}
+	default:
+		return rotate_counter();
+	}
+}
+
 bool LoadDistributor::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
 {
     // determine the source port based on the id
@@ -55,11 +100,12 @@ bool LoadDistributor::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
     //***************************** ERFAN: INTERLEAVING METHOD
 //     long LINK = ( pkt->getAddr() >> 8 ) % 16 / 4; // 4 is serial links
 //     PortID master_port_id = LINK;
-    //***************************** ERFAN: ROUND-ROBIN METHOD
-    PortID master_port_id = rotate_counter();
+    //***************************** ERFAN: ROUND-ROBIN METHOD (or the other policies)
+    PortID master_port_id = select_link(pkt);
     //********************************************************
     
-    
+    // remember the first attempt of this packet, to measure its queueing delay
+    first_attempt.insert(make_pair(pkt, curTick()));
 
     // test if the layer should be considered occupied for the current
     // port
@@ -76,6 +122,7 @@ bool LoadDistributor::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
     // forwarding the packet
     unsigned int pkt_size = pkt->hasData() ? pkt->getSize() : 0;
     unsigned int pkt_cmd = pkt->cmdToIndex();
+    bool needs_response = pkt->needsResponse();
 
     // set the source port for routing of the response
     pkt->setSrc(slave_port_id);
@@ -110,5 +157,76 @@ bool LoadDistributor::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
     pktSize[slave_port_id][master_port_id] += pkt_size;
     transDist[pkt_cmd]++;
 
+    auto it = first_attempt.find(pkt);
+    linkQueueingDelay[master_port_id] += curTick() - it->second;
+    first_attempt.erase(it);
+    linkReqs[master_port_id]++;
+    linkBytes[master_port_id] += pkt_size;
+    linkOccupancy[master_port_id] += packetFinishTime - curTick();
+    if ( needs_response )
+    {
+        outstanding[master_port_id]++;
+        if ( outstanding[master_port_id] > linkMaxOutstanding[master_port_id].value() )
+            linkMaxOutstanding[master_port_id] = outstanding[master_port_id];
+    }
+
     return true;
 }
+
+bool LoadDistributor::recvTimingResp(PacketPtr pkt, PortID master_port_id)
+{
+	if ( !NoncoherentXBar::recvTimingResp(pkt, master_port_id) )
+		return false;
+	if ( outstanding[master_port_id] > 0 )
+		outstanding[master_port_id]--;
+	return true;
+}
+
+void LoadDistributor::regStats()
+{
+	NoncoherentXBar::regStats();
+
+	linkReqs
+		.init(N_MASTER_PORTS)
+		.name(name() + ".linkReqs")
+		.desc("Number of requests sent on each link")
+		.flags(Stats::total | Stats::nozero | Stats::nonan);
+
+	linkBytes
+		.init(N_MASTER_PORTS)
+		.name(name() + ".linkBytes")
+		.desc("Number of request data bytes sent on each link")
+		.flags(Stats::total | Stats::nozero | Stats::nonan);
+
+	linkOccupancy
+		.init(N_MASTER_PORTS)
+		.name(name() + ".linkOccupancy")
+		.desc("Ticks each link has been busy transferring requests")
+		.flags(Stats::nozero);
+
+	linkUtilization
+		.name(name() + ".linkUtilization")
+		.desc("Request utilization of each link (%)")
+		.precision(1)
+		.flags(Stats::nozero);
+	linkUtilization = 100 * linkOccupancy / simTicks;
+
+	linkQueueingDelay
+		.init(N_MASTER_PORTS)
+		.name(name() + ".linkQueueingDelay")
+		.desc("Total ticks the requests of each link waited before being sent")
+		.flags(Stats::total | Stats::nozero | Stats::nonan);
+
+	avgLinkQueueingDelay
+		.name(name() + ".avgLinkQueueingDelay")
+		.desc("Average queueing delay per request of each link (ticks)")
+		.precision(2)
+		.flags(Stats::nozero | Stats::nonan);
+	avgLinkQueueingDelay = linkQueueingDelay / linkReqs;
+
+	linkMaxOutstanding
+		.init(N_MASTER_PORTS)
+		.name(name() + ".linkMaxOutstanding")
+		.desc("Maximum number of outstanding requests on each link")
+		.flags(Stats::nozero);
+}
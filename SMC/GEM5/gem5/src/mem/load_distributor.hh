@@ -1,6 +1,10 @@
 #ifndef __LOAD_DISTRIBUTOR__
 #define __LOAD_DISTRIBUTOR__
 
+#include <vector>
+
+#include "base/hashmap.hh"
+#include "enums/LoadDistributionPolicy.hh"
 #include "mem/noncoherent_xbar.hh"
 #include "mem/port.hh"
 #include "params/LoadDistributor.hh"
@@ -18,10 +22,37 @@ public:
 	
 	// Receive a request and distribute it among slave ports
 	virtual bool recvTimingReq(PacketPtr pkt, PortID slave_port_id);
+
+	// Receive a response and release the link it has used
+	virtual bool recvTimingResp(PacketPtr pkt, PortID master_port_id);
+
+	virtual void regStats();
 private:	
 	int N_MASTER_PORTS;
 	int ROUND_ROBIN_COUNTER;
 	int rotate_counter();
+
+	Enums::LoadDistributionPolicy POLICY;
+	unsigned VAULT_BITS;
+	unsigned OFFSET_BITS;
+
+	// Select one of the links for this packet based on POLICY
+	PortID select_link(PacketPtr pkt);
+
+	// Number of requests on each link which are waiting for their responses
+	vector<int> outstanding;
+
+	// Tick of the first (refused) attempt of the packets which are being retried
+	m5::hash_map<PacketPtr, Tick> first_attempt;
+
+	// Per-link stats
+	Stats::Vector linkReqs;
+	Stats::Vector linkBytes;
+	Stats::Vector linkOccupancy;
+	Stats::Formula linkUtilization;
+	Stats::Vector linkQueueingDelay;
+	Stats::Formula avgLinkQueueingDelay;
+	Stats::Vector linkMaxOutstanding;
 };
 
 #endif //__LOAD_DISTRIBUTOR__
@@ -53,6 +53,7 @@
 #include "debug/XBar.hh"
 #include "mem/noncoherent_xbar.hh"
 
+#include <cmath>
 #include <iostream>
 using namespace std;
 
@@ -63,7 +64,7 @@ using namespace std;
 bool NoncoherentXBar::enable_packet_log = false;
 
 NoncoherentXBar::NoncoherentXBar(const NoncoherentXBarParams *p)
-    : BaseXBar(p)
+    : BaseXBar(p), throttleRetryEvent(this)
 {
     // create the ports based on the size of the master and slave
     // vector ports, and the presence of the default port, the ports
@@ -97,6 +98,34 @@ NoncoherentXBar::NoncoherentXBar(const NoncoherentXBarParams *p)
                                            csprintf(".respLayer%d", i)));
     }
 
+    // quality of service, with one entry per slave port
+    if (!p->qos_weights.empty()) {
+        fatal_if(p->qos_weights.size() != slavePorts.size(),
+                 "%s: qos_weights has %d entries for %d slave ports\n",
+                 name(), p->qos_weights.size(), slavePorts.size());
+        for (auto l: reqLayers)
+            l->setWeights(p->qos_weights);
+    }
+
+    if (!p->qos_bandwidth.empty()) {
+        fatal_if(p->qos_bandwidth.size() != slavePorts.size() ||
+                 p->qos_burst.size() != slavePorts.size(),
+                 "%s: qos_bandwidth and qos_burst need one entry per "
+                 "slave port\n", name());
+        for (int i = 0; i < slavePorts.size(); ++i) {
+            TokenBucket bucket;
+            bucket.ticksPerByte = p->qos_bandwidth[i];
+            bucket.size = p->qos_burst[i];
+            bucket.tokens = bucket.size;
+            bucket.lastRefill = 0;
+            bucket.needed = 0;
+            fatal_if(bucket.ticksPerByte > 0 && bucket.size == 0,
+                     "%s: the bandwidth cap of slave port %d needs a "
+                     "non-empty token bucket\n", name(), i);
+            buckets.push_back(bucket);
+        }
+    }
+
     clearPortCache();
 }
 
@@ -135,7 +164,20 @@ NoncoherentXBar::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
 
     // determine the destination based on the address
     PortID master_port_id = findPort(pkt->getAddr());
-    
+
+    // remember when the request first showed up (the packet is
+    // presented again after a refusal)
+    if (pkt->needsResponse())
+        reqTick.emplace(pkt, curTick());
+
+    // a master above its bandwidth cap has to wait for its tokens
+    if (!buckets.empty() && !admitRequest(slave_port_id, pkt->getSize())) {
+        DPRINTF(NoncoherentXBar, "recvTimingReq: src %s %s 0x%x "
+                "THROTTLED\n", src_port->name(), pkt->cmdString(),
+                pkt->getAddr());
+        return false;
+    }
+
     // test if the layer should be considered occupied for the current
     // port
     if (!reqLayers[master_port_id]->tryTiming(src_port)) {
@@ -151,6 +193,7 @@ NoncoherentXBar::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
     // forwarding the packet
     unsigned int pkt_size = pkt->hasData() ? pkt->getSize() : 0;
     unsigned int pkt_cmd = pkt->cmdToIndex();
+    unsigned int req_size = pkt->getSize();
 
     // set the source port for routing of the response
     pkt->setSrc(slave_port_id);
@@ -180,10 +223,15 @@ NoncoherentXBar::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
 
     reqLayers[master_port_id]->succeededTiming(packetFinishTime);
 
+    // consume the tokens of the request
+    if (!buckets.empty() && buckets[slave_port_id].ticksPerByte > 0)
+        buckets[slave_port_id].tokens -= req_size;
+
     // stats updates
     pktCount[slave_port_id][master_port_id]++;
     pktSize[slave_port_id][master_port_id] += pkt_size;
     transDist[pkt_cmd]++;
+    qosBytes[slave_port_id] += req_size;
 
     return true;
 }
@@ -227,6 +275,14 @@ NoncoherentXBar::recvTimingResp(PacketPtr pkt, PortID master_port_id)
     calcPacketTiming(pkt);
     Tick packetFinishTime = pkt->lastWordDelay + curTick();
 
+    // latency seen by the master, before the packet is handed over
+    auto req_tick = reqTick.find(pkt);
+    if (req_tick != reqTick.end()) {
+        qosResponses[slave_port_id]++;
+        qosTotalLat[slave_port_id] += curTick() - req_tick->second;
+        reqTick.erase(req_tick);
+    }
+
     // send the packet through the destination slave port
     bool success M5_VAR_USED = slavePorts[slave_port_id]->sendTimingResp(pkt);
 
@@ -244,6 +300,77 @@ NoncoherentXBar::recvTimingResp(PacketPtr pkt, PortID master_port_id)
     return true;
 }
 
+bool
+NoncoherentXBar::admitRequest(PortID slave_port_id, unsigned size)
+{
+    TokenBucket& bucket = buckets[slave_port_id];
+
+    // no cap for this master
+    if (bucket.ticksPerByte == 0)
+        return true;
+
+    refill(bucket);
+
+    // a request larger than the bucket only needs a full bucket
+    double needed = std::min((double)size, bucket.size);
+    if (bucket.tokens >= needed)
+        return true;
+
+    bucket.needed = needed;
+    qosThrottled[slave_port_id]++;
+
+    Tick when = curTick() + (Tick)std::ceil((needed - bucket.tokens) *
+                                            bucket.ticksPerByte);
+    if (!throttleRetryEvent.scheduled())
+        schedule(throttleRetryEvent, when);
+    else if (throttleRetryEvent.when() > when)
+        reschedule(throttleRetryEvent, when);
+
+    return false;
+}
+
+void
+NoncoherentXBar::refill(TokenBucket& bucket)
+{
+    bucket.tokens = std::min(bucket.size, bucket.tokens +
+                             (curTick() - bucket.lastRefill) /
+                             bucket.ticksPerByte);
+    bucket.lastRefill = curTick();
+}
+
+void
+NoncoherentXBar::processThrottleRetry()
+{
+    Tick next = MaxTick;
+
+    for (PortID i = 0; i < buckets.size(); ++i) {
+        TokenBucket& bucket = buckets[i];
+        if (bucket.needed == 0)
+            continue;
+
+        refill(bucket);
+        if (bucket.tokens >= bucket.needed) {
+            DPRINTF(NoncoherentXBar, "processThrottleRetry: retrying %s\n",
+                    slavePorts[i]->name());
+            bucket.needed = 0;
+            slavePorts[i]->sendRetry();
+        } else {
+            next = std::min(next, curTick() +
+                            (Tick)std::ceil((bucket.needed - bucket.tokens) *
+                                            bucket.ticksPerByte));
+        }
+    }
+
+    // the retried masters may have been throttled again in the
+    // meantime and scheduled the event already
+    if (next != MaxTick) {
+        if (!throttleRetryEvent.scheduled())
+            schedule(throttleRetryEvent, next);
+        else if (throttleRetryEvent.when() > next)
+            reschedule(throttleRetryEvent, next);
+    }
+}
+
 void
 NoncoherentXBar::recvRetry(PortID master_port_id)
 {
@@ -374,5 +501,59 @@ NoncoherentXBar::regStats()
         l->regStats();
     for (auto l: respLayers)
         l->regStats();
+
+    using namespace Stats;
+
+    qosBytes
+        .init(slavePorts.size())
+        .name(name() + ".qos_bytes")
+        .desc("Bytes requested by each master (timing mode)")
+        .flags(total | nozero | nonan);
+
+    qosBandwidth
+        .name(name() + ".qos_bandwidth")
+        .desc("Request bandwidth of each master (bytes/s)")
+        .precision(0)
+        .flags(total | nozero | nonan);
+
+    qosBandwidth = qosBytes / simSeconds;
+
+    qosResponses
+        .init(slavePorts.size())
+        .name(name() + ".qos_responses")
+        .desc("Responses forwarded to each master")
+        .flags(total | nozero | nonan);
+
+    qosTotalLat
+        .init(slavePorts.size())
+        .name(name() + ".qos_total_lat")
+        .desc("Total ticks from the arrival of the requests of each master "
+              "until their responses are forwarded")
+        .flags(total | nozero | nonan);
+
+    qosAvgLat
+        .name(name() + ".qos_avg_lat")
+        .desc("Average round trip latency through the crossbar per master "
+              "(ticks)")
+        .precision(2)
+        .flags(nozero | nonan);
+
+    qosAvgLat = qosTotalLat / qosResponses;
+
+    qosThrottled
+        .init(slavePorts.size())
+        .name(name() + ".qos_throttled")
+        .desc("Requests refused because of the bandwidth cap of each master")
+        .flags(total | nozero | nonan);
+
+    for (int i = 0; i < slavePorts.size(); i++) {
+        const std::string master = slavePorts[i]->getMasterPort().name();
+        qosBytes.subname(i, master);
+        qosBandwidth.subname(i, master);
+        qosResponses.subname(i, master);
+        qosTotalLat.subname(i, master);
+        qosAvgLat.subname(i, master);
+        qosThrottled.subname(i, master);
+    }
 }
 
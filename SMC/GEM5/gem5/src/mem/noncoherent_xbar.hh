@@ -51,6 +51,8 @@
 #ifndef __MEM_NONCOHERENT_XBAR_HH__
 #define __MEM_NONCOHERENT_XBAR_HH__
 
+#include <unordered_map>
+
 #include "mem/xbar.hh"
 #include "params/NoncoherentXBar.hh"
 
@@ -197,6 +199,55 @@ class NoncoherentXBar : public BaseXBar
         transaction.*/
     void recvFunctional(PacketPtr pkt, PortID slave_port_id);
 
+    /**
+     * Token bucket capping the request bandwidth of a master (one per
+     * slave port). Each request consumes as many tokens as its size,
+     * and the tokens are refilled at the configured bandwidth up to
+     * the size of the bucket.
+     */
+    struct TokenBucket {
+        /** Ticks to earn one token (byte), 0 if there is no cap */
+        double ticksPerByte;
+        /** Capacity of the bucket (bytes) */
+        double size;
+        /** Available tokens, may be negative after a large request */
+        double tokens;
+        /** Tick of the last refill */
+        Tick lastRefill;
+        /** Tokens needed by the refused request (0 if none) */
+        double needed;
+    };
+
+    /** Token buckets of the slave ports (empty if there is no cap) */
+    std::vector<TokenBucket> buckets;
+
+    /**
+     * Check if the master at a slave port has enough tokens for a
+     * request. If not, the request is refused and a retry is sent as
+     * soon as the tokens have been refilled.
+     *
+     * @param slave_port_id Slave port presenting the request
+     * @param size Size of the request (bytes)
+     * @return True if the request can proceed
+     */
+    bool admitRequest(PortID slave_port_id, unsigned size);
+
+    /** Refill the tokens of a bucket up to the current tick */
+    void refill(TokenBucket& bucket);
+
+    /** Retry the masters which have earned enough tokens */
+    void processThrottleRetry();
+
+    /** Event to retry the throttled masters */
+    EventWrapper<NoncoherentXBar, &NoncoherentXBar::processThrottleRetry>
+        throttleRetryEvent;
+
+    /**
+     * Tick at which each outstanding request first reached the
+     * crossbar, to measure the latency seen by each master
+     */
+    std::unordered_map<PacketPtr, Tick> reqTick;
+
   public:
 
     NoncoherentXBar(const NoncoherentXBarParams *p);
@@ -211,6 +262,14 @@ class NoncoherentXBar : public BaseXBar
     virtual void regStats();
     Stats::Scalar totPktSize;
 
+    /** Per master (slave port) request bytes, latency and throttling */
+    Stats::Vector qosBytes;
+    Stats::Formula qosBandwidth;
+    Stats::Vector qosResponses;
+    Stats::Vector qosTotalLat;
+    Stats::Formula qosAvgLat;
+    Stats::Vector qosThrottled;
+
     // Command comes from the guest os, to enable or disable
     static bool enable_packet_log;
 };
@@ -227,6 +227,9 @@ class Packet : public Printable
     bool IS_REMAPPED;	// Erfan: This has been added only to fix the RETRY problem in AddrMapper, not for any other purpose
     uint8_t ATOMIC_HMC_COMMAND; // Erfan: Added to support atomic HMC commands
     unsigned long ATOMIC_HMC_OPERAND; // Erfan: operand to be used with HMC atomic commands
+    unsigned long ATOMIC_HMC_OPERAND2; // Second operand (e.g. swap value of CAS)
+    unsigned long ATOMIC_HMC_RESULT; // Old value of the memory, sent back by the commands which return a value
+    bool ATOMIC_HMC_RETURNED; // ATOMIC_HMC_RESULT is valid
     typedef uint32_t FlagsType;
     typedef ::Flags<FlagsType> Flags;
 
@@ -606,6 +609,9 @@ class Packet : public Printable
         :  IS_REMAPPED(false),
            ATOMIC_HMC_COMMAND(0),
            ATOMIC_HMC_OPERAND(0),
+           ATOMIC_HMC_OPERAND2(0),
+           ATOMIC_HMC_RESULT(0),
+           ATOMIC_HMC_RETURNED(false),
            cmd(_cmd), req(_req), data(nullptr), addr(0), _isSecure(false),
            size(0), src(InvalidPortID), dest(InvalidPortID),
            bytesValidStart(0), bytesValidEnd(0),
@@ -632,6 +638,9 @@ class Packet : public Printable
         :  IS_REMAPPED(false),
            ATOMIC_HMC_COMMAND(0),
            ATOMIC_HMC_OPERAND(0),
+           ATOMIC_HMC_OPERAND2(0),
+           ATOMIC_HMC_RESULT(0),
+           ATOMIC_HMC_RETURNED(false),
            cmd(_cmd), req(_req), data(nullptr), addr(0), _isSecure(false),
            src(InvalidPortID), dest(InvalidPortID),
            bytesValidStart(0), bytesValidEnd(0),
@@ -658,6 +667,9 @@ class Packet : public Printable
         :  IS_REMAPPED(false),
            ATOMIC_HMC_COMMAND(0),
            ATOMIC_HMC_OPERAND(0),
+           ATOMIC_HMC_OPERAND2(0),
+           ATOMIC_HMC_RESULT(0),
+           ATOMIC_HMC_RETURNED(false),
            cmd(pkt->cmd), req(pkt->req),
            data(pkt->flags.isSet(STATIC_DATA) ? pkt->data : NULL),
            addr(pkt->addr), _isSecure(pkt->_isSecure), size(pkt->size),
@@ -69,9 +69,18 @@ PIMXBar::PIMXBar(const PIMXBarParams *p)
     : BaseXBar(p),
     ideal_instr_fetch(p->ideal_instr_fetch),
     ideal_spm_access(p->ideal_spm_access),
+    spm_banks(p->spm_banks),
+    spm_bank_interleave(p->spm_bank_interleave),
+    spm_bank_busy(p->spm_bank_busy),
+    bankFree(p->spm_banks, 0),
+    bankRespondEvent(this),
     respondEvent(this),
     debugEvent(this)
 {
+    if ( ideal_spm_access && spm_banks > 0 )
+        fatal("%s: ideal_spm_access and spm_banks cannot be used together\n", name());
+    if ( spm_banks > 0 && spm_bank_interleave == 0 )
+        fatal("%s: spm_bank_interleave must be larger than 0\n", name());
     response_scheduled = false;
     spm_master_port = -1;
     // create the ports based on the size of the master and slave
@@ -123,11 +132,12 @@ PIMXBar::init()
     BaseXBar::init();
 
     /* Erfan: Find the SPM port to access it ideally */
-    if ( ideal_spm_access )
+    if ( ideal_spm_access || spm_banks > 0 )
     {
         for (int i = 0; i < masterPorts.size(); i++)
             if ( masterPorts[i]->getSlavePort().name() == "system.Smon-slave" ||
-                 masterPorts[i]->getSlavePort().name() == "system.shared_spm.port" )
+                 masterPorts[i]->getSlavePort().name() == "system.shared_spm.port" ||
+                 masterPorts[i]->getSlavePort().name() == "system.pim_sys.pim_memory.port" )
                 {
                     assert(spm_master_port == -1);
                     cout <<  name() << " SPM Port Number = " << i << " [" << masterPorts[i]->name() 
@@ -199,7 +209,38 @@ PIMXBar::recvTimingReq(PacketPtr pkt, PortID slave_port_id)
         }
         return true;
     }
-    
+
+    if (spm_banks > 0 && master_port_id == spm_master_port )
+    {
+        /* Access the SPM through the port of its bank */
+        unsigned bank = spm_bank(pkt->getAddr());
+        Tick start = std::max(curTick(), bankFree[bank]);
+        if ( start > curTick() )
+        {
+            spmBankConflicts[bank]++;
+            spmConflictDelay += start - curTick();
+        }
+        bankFree[bank] = start + spm_bank_busy * clockPeriod();
+        spmAccesses[slave_port_id]++;
+        spmBankAccesses[bank]++;
+        DPRINTF(PIMXBar, "recvTimingReq: from %s %s 0x%x (SPM bank %d, start @%d)\n", slavePorts[slave_port_id]->name(), pkt->cmdString(), pkt->getAddr(), bank, start);
+
+        bool needsResponse = pkt->needsResponse();
+        Tick latency = recvAtomic(pkt, slave_port_id);
+        if ( needsResponse )
+        {
+            Tick when = start + latency;
+            bankResponses.insert(std::make_pair(when, std::make_pair(slave_port_id, pkt)));
+            if ( !bankRespondEvent.scheduled() )
+                schedule(bankRespondEvent, when);
+            else if ( when < bankRespondEvent.when() )
+                reschedule(bankRespondEvent, when);
+        }
+        else
+            delete pkt;
+        return true;
+    }
+
     // test if the layer should be considered occupied for the current
     // port
     if (!reqLayers[master_port_id]->tryTiming(src_port)) {
@@ -438,6 +479,35 @@ PIMXBar::regStats()
         l->regStats();
     for (auto l: respLayers)
         l->regStats();
+
+    spmAccesses
+        .init(slavePorts.size())
+        .name(name() + ".spm_accesses")
+        .desc("Accesses to the banked SPM per slave port")
+        .flags(Stats::total | Stats::nozero | Stats::nonan)
+        ;
+
+    spmBankAccesses
+        .init(spm_banks > 0 ? spm_banks : 1)
+        .name(name() + ".spm_bank_accesses")
+        .desc("Accesses to each bank of the SPM")
+        .flags(Stats::total | Stats::nozero | Stats::nonan)
+        ;
+
+    spmBankConflicts
+        .init(spm_banks > 0 ? spm_banks : 1)
+        .name(name() + ".spm_bank_conflicts")
+        .desc("Accesses which have found their SPM bank busy")
+        .flags(Stats::total | Stats::nozero | Stats::nonan)
+        ;
+
+    spmConflictDelay
+        .name(name() + ".spm_conflict_delay")
+        .desc("Total time spent waiting for a busy SPM bank (ticks)")
+        ;
+
+    for (int i = 0; i < slavePorts.size(); i++)
+        spmAccesses.subname(i, slavePorts[i]->getMasterPort().name());
 }
 
 // Erfan:
@@ -478,6 +548,27 @@ PIMXBar::respond()
         response_scheduled = false;
 }
 
+void
+PIMXBar::bankRespond()
+{
+    assert(!bankResponses.empty());
+
+    /* Send the responses which are ready (in the order of their ready time) */
+    while ( !bankResponses.empty() && bankResponses.begin()->first <= curTick() )
+    {
+        std::pair<PortID, PacketPtr> r = bankResponses.begin()->second;
+        if ( !slavePorts[r.first]->sendTimingResp(r.second) )
+        {
+            // See respond(): the master is not ready before its next clock edge
+            schedule(bankRespondEvent, curTick() + 1);
+            return;
+        }
+        bankResponses.erase(bankResponses.begin());
+    }
+    if ( !bankResponses.empty() )
+        schedule(bankRespondEvent, bankResponses.begin()->first);
+}
+
 void
 PIMXBar::debug()
 {
@@ -52,6 +52,7 @@ Erfan: This is a special crossbar to be used inside the PIM cluster
 
 #include "mem/xbar.hh"
 #include "params/PIMXBar.hh"
+#include <map>
 #include <queue>
 
 /**
@@ -219,6 +220,26 @@ class PIMXBar : public BaseXBar
     bool ideal_spm_access; // erfan
     int spm_master_port; // erfan: the master port connected to the SPM
 
+    /*
+    Banked SPM: the SPM is accessed through one port per bank (like the
+    multiported SPM), but two accesses to the same bank are serialized.
+    Each bank is busy for spm_bank_busy cycles per access.
+    */
+    unsigned spm_banks;
+    unsigned spm_bank_interleave;
+    Cycles spm_bank_busy;
+    std::vector<Tick> bankFree;    // Each bank is busy until this tick
+    std::multimap<Tick, std::pair<PortID, PacketPtr> > bankResponses; // Ordered by the ready time
+    unsigned spm_bank(Addr addr) const { return (addr / spm_bank_interleave) % spm_banks; }
+    void bankRespond();
+    EventWrapper<PIMXBar, &PIMXBar::bankRespond> bankRespondEvent;
+
+    // Stats of the banked SPM
+    Stats::Vector spmAccesses;      // Per slave port (core)
+    Stats::Vector spmBankAccesses;
+    Stats::Vector spmBankConflicts;
+    Stats::Scalar spmConflictDelay;
+
     // erfan
     void respond();
     void debug(); // erfan
@@ -0,0 +1,480 @@
+/**
+ * @file
+ * Implementation of the serial link (See serial_link.hh)
+ */
+
+#include "base/intmath.hh"
+#include "base/random.hh"
+#include "base/trace.hh"
+#include "debug/SerialLink.hh"
+#include "mem/serial_link.hh"
+#include "params/SerialLink.hh"
+#include "sim/stats.hh"
+
+SerialLink::SerialLinkSlavePort::SerialLinkSlavePort(const std::string& _name,
+                                         SerialLink& _link,
+                                         SerialLinkMasterPort& _masterPort,
+                                         unsigned _req_tokens,
+                                         unsigned _resp_limit,
+                                         std::vector<AddrRange> _ranges)
+    : SlavePort(_name, &_link), link(_link), masterPort(_masterPort),
+      ranges(_ranges.begin(), _ranges.end()), reqTokens(_req_tokens),
+      reqBufferLimit(_req_tokens), respFlitsReserved(0),
+      respBufferLimit(_resp_limit), retryReq(false),
+      sendEvent(*this), creditEvent(*this)
+{
+}
+
+SerialLink::SerialLinkMasterPort::SerialLinkMasterPort(const std::string& _name,
+                                           SerialLink& _link,
+                                           SerialLinkSlavePort& _slavePort)
+    : MasterPort(_name, &_link), link(_link), slavePort(_slavePort),
+      sendEvent(*this)
+{
+}
+
+SerialLink::SerialLink(Params *p)
+    : MemObject(p),
+      slavePort(p->name + ".slave", *this, masterPort,
+                p->req_size, p->resp_size, p->ranges),
+      masterPort(p->name + ".master", *this, slavePort),
+      delay(ticksToCycles(p->delay)),
+      flitSize(p->flit_size),
+      flitCycles(divCeil(p->flit_size * 8, p->serialization_unit)),
+      creditDelay(p->credit_delay),
+      errorRate(p->error_rate),
+      retryDelay(p->retry_delay),
+      reqLaneFree(0),
+      respLaneFree(0)
+{
+    if (p->serialization_unit == 0)
+        fatal("SerialLink %s: serialization_unit must be > 0\n", name());
+    // With error_rate >= 1 no packet would ever pass the CRC check
+    fatal_if(errorRate < 0 || errorRate >= 1,
+             "SerialLink %s: error_rate must be in [0, 1), not %f\n", name(), errorRate);
+}
+
+BaseMasterPort&
+SerialLink::getMasterPort(const std::string &if_name, PortID idx)
+{
+    if (if_name == "master")
+        return masterPort;
+    else
+        // pass it along to our super class
+        return MemObject::getMasterPort(if_name, idx);
+}
+
+BaseSlavePort&
+SerialLink::getSlavePort(const std::string &if_name, PortID idx)
+{
+    if (if_name == "slave")
+        return slavePort;
+    else
+        // pass it along to our super class
+        return MemObject::getSlavePort(if_name, idx);
+}
+
+void
+SerialLink::init()
+{
+    // make sure both sides are connected
+    if (!slavePort.isConnected() || !masterPort.isConnected())
+        fatal("Both ports of a serial link must be connected.\n");
+
+    // notify the master side  of our address ranges
+    slavePort.sendRangeChange();
+}
+
+unsigned
+SerialLink::packetFlits(unsigned data_bytes) const
+{
+    // header and tail share one flit
+    return 1 + divCeil(data_bytes, flitSize);
+}
+
+Tick
+SerialLink::serialize(Tick& lane_free, unsigned flits, bool is_req)
+{
+    Tick start = std::max(clockEdge(), lane_free);
+    Tick duration = flits * flitCycles * clockPeriod();
+
+    // every failed transmission costs the whole packet plus the retry delay
+    unsigned attempts = 1;
+    while (errorRate > 0 && random_mt.random<double>() < errorRate)
+        attempts++;
+
+    lane_free = start + attempts * duration + (attempts - 1) * retryDelay;
+
+    if (is_req) {
+        reqPackets++;
+        reqFlits += flits;
+        reqLaneBusy += attempts * duration;
+        reqRetries += attempts - 1;
+    } else {
+        respPackets++;
+        respFlits += flits;
+        respLaneBusy += attempts * duration;
+        respRetries += attempts - 1;
+    }
+
+    DPRINTF(SerialLink, "%s %d flits, %d attempts, lane free at %d\n",
+            is_req ? "request" : "response", flits, attempts, lane_free);
+
+    return lane_free + delay * clockPeriod();
+}
+
+bool
+SerialLink::SerialLinkMasterPort::recvTimingResp(PacketPtr pkt)
+{
+    // the response tokens were reserved when the request was accepted
+    // on the slave side, so we are guaranteed to have space for it
+    DPRINTF(SerialLink, "recvTimingResp: %s addr 0x%x\n",
+            pkt->cmdString(), pkt->getAddr());
+
+    // @todo: We need to pay for this and not just zero it out
+    pkt->firstWordDelay = pkt->lastWordDelay = 0;
+
+    unsigned flits = link.packetFlits(pkt->hasData() ? pkt->getSize() : 0);
+    Tick t = link.serialize(link.respLaneFree, flits, false);
+
+    slavePort.schedTimingResp(pkt, t);
+
+    return true;
+}
+
+bool
+SerialLink::SerialLinkSlavePort::recvTimingReq(PacketPtr pkt)
+{
+    DPRINTF(SerialLink, "recvTimingReq: %s addr 0x%x\n",
+            pkt->cmdString(), pkt->getAddr());
+
+    // we should not see a timing request if we are already in a retry
+    assert(!retryReq);
+
+    unsigned flits = link.packetFlits(pkt->hasData() ? pkt->getSize() : 0);
+
+    // tokens of the response (if any)
+    bool expects_response = pkt->needsResponse() &&
+        !pkt->memInhibitAsserted();
+    unsigned resp_flits = 0;
+    if (expects_response)
+        resp_flits = link.packetFlits(pkt->isRead() ? pkt->getSize() : 0);
+
+    // a packet larger than the buffers would never get its tokens
+    if (flits > reqBufferLimit || resp_flits > respBufferLimit)
+        fatal("SerialLink %s: %d+%d flits do not fit in the buffers, "
+              "increase req_size/resp_size\n", link.name(), flits,
+              resp_flits);
+
+    DPRINTF(SerialLink, "Request tokens: %d, response flits reserved: %d\n",
+            reqTokens, respFlitsReserved);
+
+    if (reqTokens < flits) {
+        DPRINTF(SerialLink, "Not enough request tokens\n");
+        link.tokenStalls++;
+        retryReq = true;
+    } else if (respFlitsReserved + resp_flits > respBufferLimit) {
+        DPRINTF(SerialLink, "Response buffer full\n");
+        link.respBufferStalls++;
+        retryReq = true;
+    } else {
+        reqTokens -= flits;
+        respFlitsReserved += resp_flits;
+
+        // @todo: We need to pay for this and not just zero it out
+        pkt->firstWordDelay = pkt->lastWordDelay = 0;
+
+        Tick t = link.serialize(link.reqLaneFree, flits, true);
+        masterPort.schedTimingReq(pkt, t, flits, resp_flits);
+    }
+
+    return !retryReq;
+}
+
+void
+SerialLink::SerialLinkSlavePort::retryStalledReq()
+{
+    if (retryReq) {
+        DPRINTF(SerialLink, "Request waiting for retry, now retrying\n");
+        retryReq = false;
+        sendRetry();
+    }
+}
+
+void
+SerialLink::SerialLinkSlavePort::returnCredits(unsigned flits, Tick when)
+{
+    // the credit delay is fixed, so the returns are ordered in time
+    creditReturns.push_back(std::make_pair(when, flits));
+    if (!creditEvent.scheduled())
+        link.schedule(creditEvent, when);
+}
+
+void
+SerialLink::SerialLinkSlavePort::processCredits()
+{
+    while (!creditReturns.empty() &&
+           creditReturns.front().first <= curTick()) {
+        reqTokens += creditReturns.front().second;
+        creditReturns.pop_front();
+    }
+
+    if (!creditReturns.empty())
+        link.schedule(creditEvent, creditReturns.front().first);
+
+    retryStalledReq();
+}
+
+void
+SerialLink::SerialLinkMasterPort::schedTimingReq(PacketPtr pkt, Tick when,
+                                                 unsigned flits,
+                                                 unsigned resp_flits)
+{
+    // If we expect to see a response, we need to restore the source
+    // and destination field that is potentially changed by a second
+    // crossbar
+    if (!pkt->memInhibitAsserted() && pkt->needsResponse()) {
+        // Update the sender state so we can deal with the response
+        // appropriately
+        pkt->pushSenderState(new RequestState(pkt->getSrc(), resp_flits));
+    }
+
+    // If we're about to put this packet at the head of the queue, we
+    // need to schedule an event to do the transmit.  Otherwise there
+    // should already be an event scheduled for sending the head
+    // packet.
+    if (transmitList.empty()) {
+        link.schedule(sendEvent, when);
+    }
+
+    transmitList.push_back(DeferredPacket(pkt, when, flits));
+}
+
+
+void
+SerialLink::SerialLinkSlavePort::schedTimingResp(PacketPtr pkt, Tick when)
+{
+    // This is a response for a request we forwarded earlier.  The
+    // corresponding request state should be stored in the packet's
+    // senderState field.
+    RequestState *req_state =
+        dynamic_cast<RequestState*>(pkt->popSenderState());
+    assert(req_state != NULL);
+    pkt->setDest(req_state->origSrc);
+    unsigned resp_flits = req_state->respFlits;
+    delete req_state;
+
+    // the link assumes that at least one crossbar has set the
+    // destination field of the packet
+    assert(pkt->isDestValid());
+    DPRINTF(SerialLink, "response, new dest %d\n", pkt->getDest());
+
+    if (transmitList.empty()) {
+        link.schedule(sendEvent, when);
+    }
+
+    transmitList.push_back(DeferredPacket(pkt, when, resp_flits));
+}
+
+void
+SerialLink::SerialLinkMasterPort::trySendTiming()
+{
+    assert(!transmitList.empty());
+
+    DeferredPacket req = transmitList.front();
+
+    assert(req.tick <= curTick());
+
+    PacketPtr pkt = req.pkt;
+
+    DPRINTF(SerialLink, "trySend request addr 0x%x, queue size %d\n",
+            pkt->getAddr(), transmitList.size());
+
+    if (sendTimingReq(pkt)) {
+        // send successful
+        transmitList.pop_front();
+        DPRINTF(SerialLink, "trySend request successful\n");
+
+        // If there are more packets to send, schedule event to try again.
+        if (!transmitList.empty()) {
+            DeferredPacket next_req = transmitList.front();
+            DPRINTF(SerialLink, "Scheduling next send\n");
+            link.schedule(sendEvent, std::max(next_req.tick,
+                                              link.clockEdge()));
+        }
+
+        // the buffer space of this request is free again, give the
+        // tokens back to the sender
+        slavePort.returnCredits(req.flits, curTick() + link.creditDelay);
+    }
+
+    // if the send failed, then we try again once we receive a retry,
+    // and therefore there is no need to take any action
+}
+
+void
+SerialLink::SerialLinkSlavePort::trySendTiming()
+{
+    assert(!transmitList.empty());
+
+    DeferredPacket resp = transmitList.front();
+
+    assert(resp.tick <= curTick());
+
+    PacketPtr pkt = resp.pkt;
+
+    DPRINTF(SerialLink, "trySend response addr 0x%x, reserved %d\n",
+            pkt->getAddr(), respFlitsReserved);
+
+    if (sendTimingResp(pkt)) {
+        // send successful
+        transmitList.pop_front();
+        DPRINTF(SerialLink, "trySend response successful\n");
+
+        assert(respFlitsReserved >= resp.flits);
+        respFlitsReserved -= resp.flits;
+
+        // If there are more packets to send, schedule event to try again.
+        if (!transmitList.empty()) {
+            DeferredPacket next_resp = transmitList.front();
+            DPRINTF(SerialLink, "Scheduling next send\n");
+            link.schedule(sendEvent, std::max(next_resp.tick,
+                                              link.clockEdge()));
+        }
+
+        // a request stalled on the response buffer may fit now
+        retryStalledReq();
+    }
+
+    // if the send failed, then we try again once we receive a retry,
+    // and therefore there is no need to take any action
+}
+
+void
+SerialLink::SerialLinkMasterPort::recvRetry()
+{
+    trySendTiming();
+}
+
+void
+SerialLink::SerialLinkSlavePort::recvRetry()
+{
+    trySendTiming();
+}
+
+Tick
+SerialLink::SerialLinkSlavePort::recvAtomic(PacketPtr pkt)
+{
+    return link.delay * link.clockPeriod() + masterPort.sendAtomic(pkt);
+}
+
+void
+SerialLink::SerialLinkSlavePort::recvFunctional(PacketPtr pkt)
+{
+    pkt->pushLabel(name());
+
+    // check the response queue
+    for (auto i = transmitList.begin();  i != transmitList.end(); ++i) {
+        if (pkt->checkFunctional((*i).pkt)) {
+            pkt->makeResponse();
+            return;
+        }
+    }
+
+    // also check the master port's request queue
+    if (masterPort.checkFunctional(pkt)) {
+        return;
+    }
+
+    pkt->popLabel();
+
+    // fall through if pkt still not satisfied
+    masterPort.sendFunctional(pkt);
+}
+
+bool
+SerialLink::SerialLinkMasterPort::checkFunctional(PacketPtr pkt)
+{
+    bool found = false;
+    auto i = transmitList.begin();
+
+    while(i != transmitList.end() && !found) {
+        if (pkt->checkFunctional((*i).pkt)) {
+            pkt->makeResponse();
+            found = true;
+        }
+        ++i;
+    }
+
+    return found;
+}
+
+AddrRangeList
+SerialLink::SerialLinkSlavePort::getAddrRanges() const
+{
+    return ranges;
+}
+
+void
+SerialLink::regStats()
+{
+    MemObject::regStats();
+
+    reqPackets
+        .name(name() + ".reqPackets")
+        .desc("Number of packets sent on the request lane");
+
+    respPackets
+        .name(name() + ".respPackets")
+        .desc("Number of packets sent on the response lane");
+
+    reqFlits
+        .name(name() + ".reqFlits")
+        .desc("Number of flits sent on the request lane");
+
+    respFlits
+        .name(name() + ".respFlits")
+        .desc("Number of flits sent on the response lane");
+
+    reqLaneBusy
+        .name(name() + ".reqLaneBusy")
+        .desc("Ticks the request lane has been busy (including retries)");
+
+    respLaneBusy
+        .name(name() + ".respLaneBusy")
+        .desc("Ticks the response lane has been busy (including retries)");
+
+    reqLaneUtilization
+        .name(name() + ".reqLaneUtilization")
+        .desc("Utilization of the request lane (%)")
+        .precision(1);
+    reqLaneUtilization = 100 * reqLaneBusy / simTicks;
+
+    respLaneUtilization
+        .name(name() + ".respLaneUtilization")
+        .desc("Utilization of the response lane (%)")
+        .precision(1);
+    respLaneUtilization = 100 * respLaneBusy / simTicks;
+
+    reqRetries
+        .name(name() + ".reqRetries")
+        .desc("Number of link-level retries on the request lane");
+
+    respRetries
+        .name(name() + ".respRetries")
+        .desc("Number of link-level retries on the response lane");
+
+    tokenStalls
+        .name(name() + ".tokenStalls")
+        .desc("Number of requests refused for lack of request tokens");
+
+    respBufferStalls
+        .name(name() + ".respBufferStalls")
+        .desc("Number of requests refused for lack of response buffer");
+}
+
+SerialLink *
+SerialLinkParams::create()
+{
+    return new SerialLink(this);
+}
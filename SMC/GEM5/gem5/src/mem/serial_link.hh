@@ -0,0 +1,279 @@
+/**
+ * @file
+ * Declaration of a serial link (similar to the Bridge) which splits the
+ * packets into flits and uses token based flow control.
+ */
+
+#ifndef __MEM_SERIAL_LINK_HH__
+#define __MEM_SERIAL_LINK_HH__
+
+#include <deque>
+
+#include "base/statistics.hh"
+#include "base/types.hh"
+#include "mem/mem_object.hh"
+#include "params/SerialLink.hh"
+
+/**
+ * A serial link connects a master and a slave through two separate
+ * lanes: one for the requests and one for the responses. Each packet is
+ * split into flits (one flit for header and tail, plus the data), and
+ * the flits of a packet occupy the lane for flit_size*8/serialization_unit
+ * cycles each. Packets on the same lane are serialized one after the
+ * other, so the requests and the responses never compete for the same
+ * lane.
+ *
+ * The flow control is based on tokens: the sender of the requests owns
+ * req_size tokens (one per flit of the buffer at the other side of the
+ * link), consumes them when it sends a request, and receives them back
+ * (after credit_delay) when the request leaves that buffer. The tokens
+ * of the responses are reserved when the request is accepted, so a
+ * response never has to wait for buffer space. If there are not enough
+ * tokens, the request is refused and a retry is sent later.
+ *
+ * With error_rate > 0, every transmission of a packet fails the CRC
+ * check with that probability and the packet is sent again after
+ * retry_delay (link-level retry), occupying the lane once more.
+ */
+class SerialLink : public MemObject
+{
+  protected:
+
+    /**
+     * Sender state of the requests which expect a response. It keeps
+     * the original source and the response tokens reserved for it.
+     */
+    class RequestState : public Packet::SenderState
+    {
+
+      public:
+
+        const PortID origSrc;
+        const unsigned respFlits;
+
+        RequestState(PortID orig_src, unsigned resp_flits)
+            : origSrc(orig_src), respFlits(resp_flits)
+        { }
+
+    };
+
+    /**
+     * A deferred packet stores a packet along with its arrival time
+     * at the other side of the link and its number of flits
+     */
+    class DeferredPacket
+    {
+
+      public:
+
+        const Tick tick;
+        const PacketPtr pkt;
+        const unsigned flits;
+
+        DeferredPacket(PacketPtr _pkt, Tick _tick, unsigned _flits)
+            : tick(_tick), pkt(_pkt), flits(_flits)
+        { }
+    };
+
+    // Forward declaration to allow the slave port to have a pointer
+    class SerialLinkMasterPort;
+
+    /**
+     * The port on the side that sends the requests and receives the
+     * responses. It owns the request tokens and the response buffer.
+     */
+    class SerialLinkSlavePort : public SlavePort
+    {
+      private:
+
+        /** The link to which this port belongs. */
+        SerialLink& link;
+
+        /** Master port on the other side of the link. */
+        SerialLinkMasterPort& masterPort;
+
+        /** Address ranges to pass through the link */
+        const AddrRangeList ranges;
+
+        /** Responses which have arrived and are waiting to be sent. */
+        std::deque<DeferredPacket> transmitList;
+
+        /** Request tokens (free flits at the other side of the link). */
+        unsigned reqTokens;
+
+        /** Size of the request buffer at the other side (flits). */
+        const unsigned reqBufferLimit;
+
+        /** Response flits reserved for the outstanding requests. */
+        unsigned respFlitsReserved;
+
+        /** Size of the response buffer (flits). */
+        const unsigned respBufferLimit;
+
+        /** If we should send a retry when tokens become available. */
+        bool retryReq;
+
+        /** Tokens on their way back to this side of the link. */
+        std::deque<std::pair<Tick, unsigned> > creditReturns;
+
+        /** Send the response at the head of transmitList. */
+        void trySendTiming();
+
+        /** Send event for the response queue. */
+        EventWrapper<SerialLinkSlavePort,
+                     &SerialLinkSlavePort::trySendTiming> sendEvent;
+
+        /** Collect the returned tokens and retry a stalled request. */
+        void processCredits();
+
+        /** Event of the tokens reaching this side of the link. */
+        EventWrapper<SerialLinkSlavePort,
+                     &SerialLinkSlavePort::processCredits> creditEvent;
+
+      public:
+
+        SerialLinkSlavePort(const std::string& _name, SerialLink& _link,
+                            SerialLinkMasterPort& _masterPort,
+                            unsigned _req_tokens, unsigned _resp_limit,
+                            std::vector<AddrRange> _ranges);
+
+        /**
+         * Queue a response which arrives at this side of the link at
+         * the given tick, and schedule a send if necessary.
+         */
+        void schedTimingResp(PacketPtr pkt, Tick when);
+
+        /** Give back request tokens to this side of the link. */
+        void returnCredits(unsigned flits, Tick when);
+
+        /** Retry the stalled request (if any). */
+        void retryStalledReq();
+
+      protected:
+
+        bool recvTimingReq(PacketPtr pkt);
+
+        void recvRetry();
+
+        Tick recvAtomic(PacketPtr pkt);
+
+        void recvFunctional(PacketPtr pkt);
+
+        AddrRangeList getAddrRanges() const;
+    };
+
+    /**
+     * The port on the side that forwards the requests and sends back
+     * the responses. It holds the receive buffer of the requests.
+     */
+    class SerialLinkMasterPort : public MasterPort
+    {
+      private:
+
+        /** The link to which this port belongs. */
+        SerialLink& link;
+
+        /** The slave port on the other side of the link. */
+        SerialLinkSlavePort& slavePort;
+
+        /** Requests which have arrived and are waiting to be sent. */
+        std::deque<DeferredPacket> transmitList;
+
+        /** Send the request at the head of transmitList. */
+        void trySendTiming();
+
+        /** Send event for the request queue. */
+        EventWrapper<SerialLinkMasterPort,
+                     &SerialLinkMasterPort::trySendTiming> sendEvent;
+
+      public:
+
+        SerialLinkMasterPort(const std::string& _name, SerialLink& _link,
+                             SerialLinkSlavePort& _slavePort);
+
+        /**
+         * Queue a request which arrives at this side of the link at
+         * the given tick, and schedule a send if necessary.
+         */
+        void schedTimingReq(PacketPtr pkt, Tick when, unsigned flits,
+                            unsigned resp_flits);
+
+        /**
+         * Check a functional request against the packets in our
+         * request queue.
+         */
+        bool checkFunctional(PacketPtr pkt);
+
+      protected:
+
+        bool recvTimingResp(PacketPtr pkt);
+
+        void recvRetry();
+    };
+
+    /** Slave port of the link. */
+    SerialLinkSlavePort slavePort;
+
+    /** Master port of the link. */
+    SerialLinkMasterPort masterPort;
+
+    /** Static latency of the link. */
+    const Cycles delay;
+
+    /** Flit size (bytes). */
+    const unsigned flitSize;
+
+    /** Cycles needed to serialize one flit on a lane. */
+    const Cycles flitCycles;
+
+    /** Latency of the token return. */
+    const Tick creditDelay;
+
+    /** Probability of a CRC failure and the time lost for a retry. */
+    const double errorRate;
+    const Tick retryDelay;
+
+    /** The lanes are busy until these ticks. */
+    Tick reqLaneFree;
+    Tick respLaneFree;
+
+    /** Number of flits of a packet carrying data_bytes. */
+    unsigned packetFlits(unsigned data_bytes) const;
+
+    /**
+     * Serialize flits on a lane (including the link-level retries)
+     * and return the tick at which they reach the other side.
+     */
+    Tick serialize(Tick& lane_free, unsigned flits, bool is_req);
+
+    // Stats
+    Stats::Scalar reqPackets;
+    Stats::Scalar respPackets;
+    Stats::Scalar reqFlits;
+    Stats::Scalar respFlits;
+    Stats::Scalar reqLaneBusy;
+    Stats::Scalar respLaneBusy;
+    Stats::Formula reqLaneUtilization;
+    Stats::Formula respLaneUtilization;
+    Stats::Scalar reqRetries;
+    Stats::Scalar respRetries;
+    Stats::Scalar tokenStalls;
+    Stats::Scalar respBufferStalls;
+
+  public:
+
+    virtual BaseMasterPort& getMasterPort(const std::string& if_name,
+                                          PortID idx = InvalidPortID);
+    virtual BaseSlavePort& getSlavePort(const std::string& if_name,
+                                        PortID idx = InvalidPortID);
+
+    virtual void init();
+
+    virtual void regStats();
+
+    typedef SerialLinkParams Params;
+
+    SerialLink(Params *p);
+};
+
+#endif //__MEM_SERIAL_LINK_HH__
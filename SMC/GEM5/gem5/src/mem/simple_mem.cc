@@ -72,8 +72,9 @@ SimpleMemory::init()
 Tick
 SimpleMemory::recvAtomic(PacketPtr pkt)
 {
+    Tick atomic_latency = hmcAtomicLatency(pkt);
     access(pkt);
-    return pkt->memInhibitAsserted() ? 0 : getLatency();
+    return pkt->memInhibitAsserted() ? 0 : getLatency() + atomic_latency;
 }
 
 void
@@ -152,6 +153,7 @@ SimpleMemory::recvTimingReq(PacketPtr pkt)
     // go ahead and deal with the packet and put the response in the
     // queue if there is one
     bool needsResponse = pkt->needsResponse();
+    Tick atomic_latency = hmcAtomicLatency(pkt);
     recvAtomic(pkt);
     // turn packet around to go back to requester if response expected
     if (needsResponse) {
@@ -161,7 +163,8 @@ SimpleMemory::recvTimingReq(PacketPtr pkt)
         // to keep things simple (and in order), we put the packet at
         // the end even if the latency suggests it should be sent
         // before the packet(s) before it
-        packetQueue.push_back(DeferredPacket(pkt, curTick() + getLatency()));
+        packetQueue.push_back(DeferredPacket(pkt, curTick() + getLatency() +
+                                             atomic_latency));
         if (!retryResp && !dequeueEvent.scheduled())
             schedule(dequeueEvent, packetQueue.back().tick);
     } else {
@@ -270,10 +270,17 @@ BaseXBar::Layer<SrcType,DstType>::retryWaiting()
     // update the state
     state = RETRY;
 
-    // set the retrying port to the front of the retry list and pop it
-    // off the list
-    SrcType* retryingPort = waitingForLayer.front();
-    waitingForLayer.pop_front();
+    // set the retrying port to the front of the retry list (or the
+    // one chosen by the weighted arbitration) and pop it off the list
+    SrcType* retryingPort;
+    if (weights.empty()) {
+        retryingPort = waitingForLayer.front();
+        waitingForLayer.pop_front();
+    } else {
+        auto winner = pickWeighted();
+        retryingPort = *winner;
+        waitingForLayer.erase(winner);
+    }
 
     // tell the port to retry, which in some cases ends up calling the
     // layer again
@@ -597,6 +604,39 @@ BaseXBar::Layer<SrcType,DstType>::drain(DrainManager *dm)
     return 0;
 }
 
+template <typename SrcType, typename DstType>
+void
+BaseXBar::Layer<SrcType,DstType>::setWeights(
+    const std::vector<unsigned>& _weights)
+{
+    weights = _weights;
+    credits = _weights;
+}
+
+template <typename SrcType, typename DstType>
+typename std::deque<SrcType*>::iterator
+BaseXBar::Layer<SrcType,DstType>::pickWeighted()
+{
+    for (int round = 0; round < 2; ++round) {
+        for (auto p = waitingForLayer.begin(); p != waitingForLayer.end();
+             ++p) {
+            assert((*p)->getId() < (PortID)weights.size());
+            unsigned& c = credits[(*p)->getId()];
+            if (c > 0) {
+                --c;
+                return p;
+            }
+        }
+
+        // all the waiting ports have used their share, start a new
+        // round
+        credits = weights;
+    }
+
+    // only ports with a null weight are waiting
+    return waitingForLayer.begin();
+}
+
 template <typename SrcType, typename DstType>
 void
 BaseXBar::Layer<SrcType,DstType>::regStats()
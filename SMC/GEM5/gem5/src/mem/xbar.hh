@@ -173,6 +173,16 @@ class BaseXBar : public MemObject
          */
         void recvRetry();
 
+        /**
+         * Arbitrate between the waiting ports with weighted round
+         * robin instead of FIFO. The weights are indexed by the id of
+         * the source ports, and an empty vector restores the FIFO
+         * order.
+         *
+         * @param _weights Weight of each source port
+         */
+        void setWeights(const std::vector<unsigned>& _weights);
+
         /**
          * Register stats for the layer
          */
@@ -180,6 +190,20 @@ class BaseXBar : public MemObject
 
       private:
 
+        /**
+         * Pick the port to retry among the waiting ones. The first
+         * waiting port (in arrival order) which has credits left in
+         * the current round wins, and a new round starts when none
+         * of the waiting ports has credits left.
+         */
+        typename std::deque<SrcType*>::iterator pickWeighted();
+
+        /** Arbitration weight of each source port (empty for FIFO). */
+        std::vector<unsigned> weights;
+
+        /** Grants left to each source port in the current round. */
+        std::vector<unsigned> credits;
+
         /** The destination port this layer converges at. */
         DstType& port;
 
@@ -55,7 +55,7 @@ from m5.params import *
 # There are a few things we need that aren't in params.__all__ since
 # normal users don't need them
 from m5.params import ParamDesc, VectorParamDesc, \
-     isNullPointer, SimObjectVector, Port
+     isNullPointer, SimObjectVector, VectorParamValue, Port
 
 from m5.proxy import *
 from m5.proxy import isproxy
@@ -1065,6 +1065,63 @@ class SimObject(object):
             return memo_dict[self]
         return self.__class__(_ancestor = self, **kwargs)
 
+    # Create a vector of n instances of this class in one go.  The
+    # values in shared_params are converted and checked only once and
+    # the resulting parameter values are shared by all the instances,
+    # e.g.:
+    #
+    # vaults = HMCVault.replicate(32, { 'tCK' : '1.6ns',
+    #                                   'clk_domain' : vault_clk_domain },
+    #                             per_index = lambda i: { 'range' : r[i] })
+    #
+    # SimObject values (such as clock domains) are shared rather than
+    # cloned, so a single domain serves the whole vector.  Vector
+    # values get a private copy of the list per instance, so that
+    # appending to one of them (e.g. ranges) does not affect the
+    # others.  per_index(i), if given, returns a dict of the
+    # parameters that differ between instances, which are set through
+    # the normal (checked) assignment path.
+    @classmethod
+    def replicate(cls, n, shared_params = {}, per_index = None):
+        shared = {}
+        hr_shared = {}
+        for key,val in shared_params.iteritems():
+            param = cls._params.get(key)
+            if not param:
+                raise AttributeError, "Class %s has no parameter %s" \
+                      % (cls.__name__, key)
+            try:
+                value = param.convert(val)
+            except Exception, e:
+                msg = "%s\nError setting param %s.%s to %s\n" % \
+                      (e, cls.__name__, key, val)
+                e.args = (msg, )
+                raise
+            shared[key] = value
+            if not (isSimObjectOrVector(value) or\
+                    isinstance(value, m5.proxy.BaseProxy)):
+                hr_shared[key] = val
+
+        objs = []
+        for i in xrange(n):
+            obj = cls()
+            for key,value in shared.iteritems():
+                if not isSimObjectOrVector(value) and \
+                   isinstance(value, VectorParamValue):
+                    value = type(value)(value)
+                obj._values[key] = value
+                # the first instance adopts unparented shared objects,
+                # exactly as a regular assignment would do
+                if isSimObjectOrVector(value) and not value.has_parent():
+                    obj.add_child(key, value)
+            for key,val in hr_shared.iteritems():
+                obj._hr_values[key] = val
+            if per_index:
+                for key,val in per_index(i).iteritems():
+                    setattr(obj, key, val)
+            objs.append(obj)
+        return SimObjectVector(objs)
+
     def _get_port_ref(self, attr):
         # Return reference that can be assigned to another port
         # via __setattr__.  There is only ever one reference
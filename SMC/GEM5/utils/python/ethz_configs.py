@@ -24,6 +24,15 @@ def ethz_config_pim( test_sys, options ):
     pim_sys = build_pim_system(options, test_mem_mode, TestCPUClass)
     test_sys.pim_sys = pim_sys
 
+    # The DMA bandwidth is reported relative to the sum of the vault bandwidths
+    if ( GEM5_MEMTYPE == "HMCVault" ):
+        vault_bw = (DRAM_BUS_WIDTH * DRAM_BURST_LENGTH / 8.0) / float(DRAM_tBURST[:-2])  # Bytes/ns = GB/s
+        for dma in (pim_sys.dma if isinstance(pim_sys.dma, list) else [pim_sys.dma]):
+            dma.ref_bandwidth = vault_bw * len(test_sys.mem_ctrls)
+        max_burst = pim_dma_max_burst(test_sys.mem_ctrls)
+        if ( PIM_DMA_BURST_SIZE_B > max_burst ):
+            ethz_print_err("PIM_DMA_BURST_SIZE_B (" + str(PIM_DMA_BURST_SIZE_B) + ") spans more than one vault row or stripe (max: " + str(max_burst) + ")")
+
     pim_sys.p2s = Bridge(ranges=test_sys.mem_ranges, delay='0.01ns', req_size=32, resp_size=32)
     pim_sys.s2p = Bridge(ranges=pim_device_range, delay='0.01ns', req_size=32, resp_size=32)
 
@@ -75,39 +84,120 @@ def ethz_print_smc_config( system, options ):
     # print CPU parameters
     # ethz_pretty_print_to_file
 	
+####################################
+# HMC atomic commands executed in the vaults, the opcodes are the HMC_CMD_*
+#  values of SW/PIM/resident/definitions.h
+#  (name, opcode, operand width in bytes (0: word of the PIM), returns the old value, latency in vault cycles, energy in pJ)
+def ethz_hmc_atomic_table():
+    return [
+        ('inc',   '1', 0,  False, 1, ATOMIC_INC_ENERGY),
+        ('fadd',  '2', 4,  False, 3, ATOMIC_FADD_ENERGY),
+        ('min',   '3', 4,  False, 1, ATOMIC_MIN_ENERGY),
+        ('cas',   '4', 0,  True,  1, ATOMIC_CAS_ENERGY),
+        ('or',    '5', 0,  True,  1, ATOMIC_BITWISE_ENERGY),
+        ('and',   '6', 0,  True,  1, ATOMIC_BITWISE_ENERGY),
+        ('add16', '7', 16, False, 2, ATOMIC_ADD16_ENERGY),
+        ('minr',  '8', 4,  True,  1, ATOMIC_MIN_ENERGY),
+    ]
+
+####################################
+# Columns of the atomic table, as the parameters of the vaults
+def ethz_hmc_atomic_params():
+    table = ethz_hmc_atomic_table()
+    tCK = float(DRAM_tCK[:-2])     # ns
+    return {
+        'hmc_atomic_names'      : [op[0] for op in table],
+        'hmc_atomic_opcodes'    : [ord(op[1]) for op in table],
+        'hmc_atomic_widths'     : [op[2] for op in table],
+        'hmc_atomic_returns'    : [op[3] for op in table],
+        'hmc_atomic_latency'    : [str(op[4] * tCK) + 'ns' for op in table],
+        'hmc_atomic_energy'     : [op[5] for op in table],
+    }
+
+####################################
+# Parameters of an SMC vault based on given parameters in _gem5_params
+#  The clock domain is not included, so that it can be shared by all vaults
+def ethz_smc_vault_params():
+		params = {
+			'page_policy'			: 'open_adaptive' if DRAM_PAGE_POLICY == 'OPEN' else 'close_adaptive',
+			'channels'				: N_INIT_PORT,
+			'ranks_per_channel'		: N_MEM_DIES,          # Each DRAM layer is one rank
+			'addr_mapping'			: GEM5_ADDR_MAPPING,
+			'device_size'			: DRAM_LAYER_SIZE_MB,
+			'device_bus_width'		: DRAM_BUS_WIDTH,
+			'burst_length'			: DRAM_BURST_LENGTH,
+			'device_rowbuffer_size'	: DRAM_ROW_BUFFER_SIZE,
+			'banks_per_rank'		: DRAM_BANKS_PER_DIE,
+			'tCK'					: DRAM_tCK,
+			'tBURST'				: DRAM_tBURST,
+			'tRCD'					: DRAM_tRCD,
+			'tCL'					: DRAM_tCL,
+			'tRP'					: DRAM_tRP,
+			'tRAS'					: DRAM_tRAS,
+			'tRRD'					: DRAM_tRRD,
+			'tRFC'					: DRAM_tRFC,
+			'tWR'					: DRAM_tWR,
+			'tRTP'					: DRAM_tRTP,
+			'tREFI'					: DRAM_tREFI,
+			'tRFC_pb'				: DRAM_tRFC_PB,
+			'refresh_policy'		: GEM5_VAULT_REFRESH_POLICY,
+			'refresh_pausing'		: GEM5_VAULT_REFRESH_PAUSING == "TRUE",
+			'refresh_pause_segments'	: GEM5_VAULT_REFRESH_PAUSE_SEGMENTS,
+			'write_buffer_size'		: GEM5_VAULT_WBUFFER_SIZE,
+			'read_buffer_size'		: GEM5_VAULT_RBUFFER_SIZE,
+			'mem_sched_policy'		: DRAM_SCHEDULING_POLICY_GEM5,
+			'frfcfs_cap'			: GEM5_VAULT_FRFCFS_CAP,
+			'batch_cap'				: GEM5_VAULT_BATCH_CAP,
+			'low_priority_masters'	: GEM5_VAULT_LOW_PRIORITY_MASTERS.split(','),
+			'write_high_thresh_perc'	: GEM5_VAULT_WRITE_HIGH_THRESH_PERC,
+			'write_low_thresh_perc'	: GEM5_VAULT_WRITE_LOW_THRESH_PERC,
+			'min_writes_per_switch'	: GEM5_VAULT_MIN_WRITES_PER_SWITCH,
+			'static_frontend_latency'	: VAULTCTRL_FRONTEND_LATENCY,
+			'static_backend_latency'	: VAULTCTRL_BACKEND_LATENCY,
+			'prefetch_buffer_entries'	: GEM5_VAULT_PREFETCH_ENTRIES,
+			'prefetch_trigger'		: GEM5_VAULT_PREFETCH_TRIGGER,
+			'prefetch_latency'		: VAULT_PREFETCH_LATENCY,
+			'prefetch_energy'		: VAULT_PREFETCH_BURST_ENERGY,
+			#'activation_limit'	: ?,
+			#'tCS'	: ?,
+			#'tWTR'	: ?,
+			#'tRTW'	: ?,
+		}
+		params.update(ethz_hmc_atomic_params())
+		return params
+
 ####################################
 # Config SMC based on given parameters in _gem5_params
 def ethz_config_smc_vault( vault ):
-		vault.page_policy = 'open_adaptive' if DRAM_PAGE_POLICY == 'OPEN' else 'close_adaptive'
-		vault.channels = N_INIT_PORT
-		vault.ranks_per_channel = N_MEM_DIES          # Each DRAM layer is one rank
-		vault.addr_mapping = GEM5_ADDR_MAPPING
-		vault.device_size = DRAM_LAYER_SIZE_MB
-		vault.device_bus_width = DRAM_BUS_WIDTH
-		vault.burst_length = DRAM_BURST_LENGTH
-		vault.device_rowbuffer_size = DRAM_ROW_BUFFER_SIZE
-		vault.banks_per_rank = DRAM_BANKS_PER_DIE
-		vault.tCK   = DRAM_tCK
-		vault.tBURST= DRAM_tBURST
-		vault.tRCD  = DRAM_tRCD 
-		vault.tCL   = DRAM_tCL
-		vault.tRP   = DRAM_tRP  
-		vault.tRAS  = DRAM_tRAS 
-		vault.tRRD  = DRAM_tRRD 
-		vault.tRFC  = DRAM_tRFC 
-		vault.tWR   = DRAM_tWR  
-		vault.tRTP  = DRAM_tRTP
-		vault.tREFI = DRAM_tREFI
-		vault.write_buffer_size = GEM5_VAULT_WBUFFER_SIZE
-		vault.read_buffer_size =  GEM5_VAULT_RBUFFER_SIZE
-		vault.mem_sched_policy=DRAM_SCHEDULING_POLICY_GEM5
+		for key, value in ethz_smc_vault_params().iteritems():
+			setattr(vault, key, value)
 		vault.clk_domain = SrcClockDomain(clock = VAULT_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
-		vault.static_frontend_latency = VAULTCTRL_FRONTEND_LATENCY
-		vault.static_backend_latency = VAULTCTRL_BACKEND_LATENCY
-		#vault.activation_limit=?
-		#vault.tCS = '?';
-		#vault.tWTR = '?';
-		#vault.tRTW = '?';
+
+####################################
+# Create N_TARG_PORT identical serial links sharing one clock domain
+def ethz_create_serial_links( test_sys ):
+    test_sys.seriallink_clk_domain = SrcClockDomain(clock=SERIALLINKS_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
+    if ( GEM5_SERIALLINK_MODEL == "SERIALLINK" ):
+        test_sys.seriallink = SerialLink.replicate(N_TARG_PORT, {
+            'ranges'                : test_sys.mem_ranges,
+            'req_size'              : GEM5_LINK_TOKENS_REQ,
+            'resp_size'             : GEM5_LINK_TOKENS_RSP,
+            'serialization_unit'    : SERIALLINKS_NUM_LANES_PER_LINK,
+            'flit_size'             : GEM5_LINK_FLIT_SIZE_B,
+            'delay'                 : GEM5_LINK_STATIC_LATENCY,
+            'credit_delay'          : GEM5_LINK_STATIC_LATENCY,
+            'error_rate'            : GEM5_LINK_ERROR_RATE,
+            'retry_delay'           : GEM5_LINK_RETRY_LATENCY,
+            'clk_domain'            : test_sys.seriallink_clk_domain })
+    else:
+        test_sys.seriallink = Bridge.replicate(N_TARG_PORT, {
+            'ranges'                : test_sys.mem_ranges,
+            'req_size'              : GEM5_LINK_BUFFER_SIZE_REQ,
+            'resp_size'             : GEM5_LINK_BUFFER_SIZE_RSP,
+            'serialization_enable'  : True,
+            'serialization_unit'    : SERIALLINKS_NUM_LANES_PER_LINK,
+            'delay'                 : GEM5_LINK_STATIC_LATENCY,
+            'clk_domain'            : test_sys.seriallink_clk_domain })
 
 ####################################
 # Configure system memory based on the given parameters
@@ -136,18 +226,14 @@ def ethz_config_memory( test_sys, options ):
         #     delay=GEM5_LINK_STATIC_LATENCY) for i in xrange(N_TARG_PORT)]
 
         # Serial Links
-        test_sys.seriallink =[ Bridge(ranges = test_sys.mem_ranges, 
-            req_size=(GEM5_LINK_BUFFER_SIZE_REQ),
-            resp_size=(GEM5_LINK_BUFFER_SIZE_RSP),
-            serialization_enable=True,
-            serialization_unit=SERIALLINKS_NUM_LANES_PER_LINK,
-            delay=GEM5_LINK_STATIC_LATENCY) for i in xrange(N_TARG_PORT)]
+        ethz_create_serial_links(test_sys)
 
         if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
-            test_sys.Lmon =[ CommMonitor() for i in xrange(N_TARG_PORT)]       
+            test_sys.Lmon = CommMonitor.replicate(N_TARG_PORT)
             
         # SMC Controller
-        test_sys.smccontroller=LoadDistributor( width=SERIALLINKS_NUM_LANES_PER_LINK * SERIALLINKS_NUM_LINKS/8, header_cycles=8 )
+        test_sys.smccontroller=LoadDistributor( width=SERIALLINKS_NUM_LANES_PER_LINK * SERIALLINKS_NUM_LINKS/8, header_cycles=8,
+            distribution_policy=GEM5_LOAD_DISTRIBUTION_POLICY, vault_bits=NBITS_CH, offset_bits=NBITS_OF )
         test_sys.smccontroller.clk_domain = SrcClockDomain(clock=SERIALLINKS_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
 
         if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
@@ -172,7 +258,6 @@ def ethz_config_memory( test_sys, options ):
                 test_sys.smccontroller.master = test_sys.seriallink[i].slave
 
             test_sys.seriallink[i].master = test_sys.smcxbar.slave
-            test_sys.seriallink[i].clk_domain = SrcClockDomain(clock=SERIALLINKS_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
 
     # Standalone PIM Cluster Simulation
     ################################
@@ -203,15 +288,11 @@ def ethz_config_memory( test_sys, options ):
             #     delay=GEM5_LINK_STATIC_LATENCY) for i in xrange(N_TARG_PORT)]
 
             # Serial Links
-            test_sys.seriallink =[ Bridge(ranges = test_sys.mem_ranges, 
-                req_size=(GEM5_LINK_BUFFER_SIZE_REQ),
-                resp_size=(GEM5_LINK_BUFFER_SIZE_RSP),
-                serialization_enable=True,
-                serialization_unit=SERIALLINKS_NUM_LANES_PER_LINK,
-                delay=GEM5_LINK_STATIC_LATENCY) for i in xrange(N_TARG_PORT)]
+            ethz_create_serial_links(test_sys)
                
             # SMC Controller
-            test_sys.smccontroller=LoadDistributor( width=SERIALLINKS_NUM_LANES_PER_LINK * SERIALLINKS_NUM_LINKS/8, header_cycles=8 )
+            test_sys.smccontroller=LoadDistributor( width=SERIALLINKS_NUM_LANES_PER_LINK * SERIALLINKS_NUM_LINKS/8, header_cycles=8,
+                distribution_policy=GEM5_LOAD_DISTRIBUTION_POLICY, vault_bits=NBITS_CH, offset_bits=NBITS_OF )
             test_sys.smccontroller.clk_domain = SrcClockDomain(clock=SERIALLINKS_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
 
             # test_sys.smccontroller_pipeline.master = test_sys.smccontroller.slave
@@ -219,7 +300,6 @@ def ethz_config_memory( test_sys, options ):
             for i in xrange(N_TARG_PORT):
                 test_sys.smccontroller.master = test_sys.seriallink[i].slave
                 test_sys.seriallink[i].master = test_sys.smcxbar.slave
-                test_sys.seriallink[i].clk_domain = SrcClockDomain(clock=SERIALLINKS_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
 
             # test_sys.Hmon.master = test_sys.smccontroller_pipeline.slave
             test_sys.Hmon.master = test_sys.smccontroller.slave
@@ -231,7 +311,11 @@ def ethz_config_memory( test_sys, options ):
     else:
         options.mem_channels = N_INIT_PORT
 
-    ethz_config_mem(options, test_sys)
+    if ( SMC_NUM_CUBES > 1 ):
+        import ethz_topology
+        ethz_topology.ethz_config_cubes(options, test_sys)
+    else:
+        ethz_config_mem(options, test_sys)
     if ( HAVE_PIM_DEVICE == "TRUE" ):
         ethz_config_pim(test_sys, options)
 
@@ -247,6 +331,35 @@ def ethz_config_memory( test_sys, options ):
         for i in xrange(N_TARG_PORT):
             test_sys.seriallink[i].ranges.append(pim_device_range);
 
+    # All the masters of the SMC crossbar are connected now
+    if ( GEM5_SMCXBAR_QOS == "TRUE" ):
+        ethz_config_smcxbar_qos(test_sys)
+
+####################################
+# Per-master QoS of the SMC crossbar: the PIM device and the host (serial
+#  links, or the monitor of the standalone cluster) get their own arbitration
+#  weights and bandwidth caps, with one entry per slave port of the crossbar
+def ethz_config_smcxbar_qos( test_sys ):
+    pim_port = None
+    if ( HAVE_PIM_DEVICE == "TRUE" and MOVE_PIM_TO_HOST == "FALSE" ):
+        pim_port = test_sys.pim_sys.p2s
+
+    weights = []
+    bandwidth = []
+    for port in test_sys.smcxbar.slave.elements:
+        if ( pim_port is not None and port.peer.simobj is pim_port ):
+            weights.append(GEM5_SMCXBAR_QOS_PIM_WEIGHT)
+            bandwidth.append(GEM5_SMCXBAR_QOS_PIM_BW)
+        else:
+            weights.append(GEM5_SMCXBAR_QOS_HOST_WEIGHT)
+            bandwidth.append(GEM5_SMCXBAR_QOS_HOST_BW)
+
+    test_sys.smcxbar.qos_weights = weights
+    test_sys.smcxbar.qos_bandwidth = bandwidth
+    test_sys.smcxbar.qos_burst = [GEM5_SMCXBAR_QOS_BURST] * len(weights)
+    ethz_print_val("SMC XBar QoS weights", weights)
+    ethz_print_val("SMC XBar QoS bandwidth caps", bandwidth)
+
 # Copied from MemConfig.ethz_config_mem and modified
 ####################################
 def ethz_config_mem(options, system):
@@ -272,11 +385,25 @@ def ethz_config_mem(options, system):
     # For every range (most systems will only have one), create an
     # array of controllers and set their parameters to match their
     # address mapping in the case of a DRAM
-    for r in system.mem_ranges:
-        for i in xrange(nbr_mem_ctrls):
-            mem_ctrls.append(ethz_create_mem_ctrl(cls, r, i, nbr_mem_ctrls,
-                                             intlv_bits,
-                                             system.cache_line_size.value))
+    if ( cls.__name__ == "HMCVault" ):
+        # The vaults only differ in their address range, so we build them
+        # in bulk, sharing the parameter values and a single clock domain
+        system.vault_clk_domain = SrcClockDomain(clock = VAULT_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
+        shared = ethz_smc_vault_params()
+        shared['channels'] = nbr_mem_ctrls
+        shared['clk_domain'] = system.vault_clk_domain
+        for r in system.mem_ranges:
+            vaults = cls.replicate(nbr_mem_ctrls, shared)
+            intlv_low_bit = ethz_intlv_low_bit(cls, vaults[0], system.cache_line_size.value)
+            for i in xrange(nbr_mem_ctrls):
+                vaults[i].range = ethz_intlv_range(r, i, intlv_bits, intlv_low_bit)
+            mem_ctrls += vaults
+    else:
+        for r in system.mem_ranges:
+            for i in xrange(nbr_mem_ctrls):
+                mem_ctrls.append(ethz_create_mem_ctrl(cls, r, i, nbr_mem_ctrls,
+                                                 intlv_bits,
+                                                 system.cache_line_size.value))
 
     system.mem_ctrls = mem_ctrls
     
@@ -299,11 +426,6 @@ def ethz_create_mem_ctrl(cls, r, i, nbr_mem_ctrls, intlv_bits, cache_line_size):
 	to create an array of controllers.
 	"""
 
-	import math
-	# The default behaviour is to interleave on cache line granularity
-	cache_line_bit = int(math.log(cache_line_size, 2)) - 1
-	intlv_low_bit = cache_line_bit
-
 	# Create an instance so we can figure out the address
 	# mapping and row-buffer size
 	ctrl = cls()
@@ -347,29 +469,37 @@ def ethz_create_mem_ctrl(cls, r, i, nbr_mem_ctrls, intlv_bits, cache_line_size):
 		# for
 		ctrl.channels = nbr_mem_ctrls
 
-		# If the channel bits are appearing after the column
-		# bits, we need to add the appropriate number of bits
-		# for the row buffer size
-		if ctrl.addr_mapping.value == 'RoRaBaChCo':
-			# This computation only really needs to happen
-			# once, but as we rely on having an instance we
-			# end up having to repeat it for each and every
-			# one
-			rowbuffer_size = ctrl.device_rowbuffer_size.value * \
-				ctrl.devices_per_rank.value
-
-			intlv_low_bit = int(math.log(rowbuffer_size, 2)) - 1
-			
-			
+	intlv_low_bit = ethz_intlv_low_bit(cls, ctrl, cache_line_size)
 
 	# We got all we need to configure the appropriate address
 	# range
-	ctrl.range = m5.objects.AddrRange(r.start, size = r.size(),
+	ctrl.range = ethz_intlv_range(r, i, intlv_bits, intlv_low_bit)
+	return ctrl
+
+####################################
+# Lowest address bit used for channel interleaving of the controller ctrl
+def ethz_intlv_low_bit(cls, ctrl, cache_line_size):
+	import math
+	# The default behaviour is to interleave on cache line granularity
+	intlv_low_bit = int(math.log(cache_line_size, 2)) - 1
+
+	# If the channel bits are appearing after the column
+	# bits, we need to add the appropriate number of bits
+	# for the row buffer size
+	if issubclass(cls, m5.objects.DRAMCtrl) and ctrl.addr_mapping.value == 'RoRaBaChCo':
+		rowbuffer_size = ctrl.device_rowbuffer_size.value * \
+			ctrl.devices_per_rank.value
+		intlv_low_bit = int(math.log(rowbuffer_size, 2)) - 1
+	return intlv_low_bit
+
+####################################
+# Address range of the i-th interleaved controller in r
+def ethz_intlv_range(r, i, intlv_bits, intlv_low_bit):
+	return m5.objects.AddrRange(r.start, size = r.size(),
 					intlvHighBit = \
 						intlv_low_bit + intlv_bits,
 					intlvBits = intlv_bits,
 					intlvMatch = i)
-	return ctrl
 
 ####################################
 def ethz_perform_sanity_checks(system):
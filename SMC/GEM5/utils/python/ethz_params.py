@@ -0,0 +1,448 @@
+#!/usr/bin/python
+# Derive the gem5 python parameters of a scenario case from the environment
+#  exported by UTILS/default_params.sh, the scenario and the case.
+# This replaces the echo/perl pipeline that used to live in smc.sh: every
+#  derived value (frequencies, latencies, row buffer size, ...) is computed
+#  in-process and the whole table is validated before anything is written.
+#
+# Usage (from smc.sh):
+#   ethz_params.py <M5_OUTDIR> [<CACHE_DIR>]
+#       writes <M5_OUTDIR>/_gem5_params.py and <M5_OUTDIR>/_smc_params.txt
+#       if <CACHE_DIR> is given, the derived values are stored there by the
+#       digest of their inputs and reused by the following cases of the sweep
+#
+# Usage (from python):
+#   import ethz_params
+#   P = ethz_params.derive_params()          # dict NAME -> value
+#   P["VAULT_CLOCK_FREQUENCY"]              # "0.357142857142857GHz"
+import os
+import re
+import sys
+import hashlib
+
+##################
+BLUE = '\033[94m'
+GREEN = '\033[92m'
+YELLOW = '\033[93m'
+RED = '\033[91m'
+NOCOLOR = '\033[0m'
+##################
+
+GEM5_PARAMS_FILE = "_gem5_params.py"
+SMC_PARAMS_FILE = "_smc_params.txt"
+
+####################################
+class ParamError(Exception):
+    pass
+
+####################################
+# Format a number the same way "perl -l -e print(...)" does, so the generated
+#  files are identical to the ones produced by the old shell pipeline
+def perl_num(x):
+    return '%.15g' % x
+
+####################################
+# Read-only view of the raw environment, recording every variable it is asked
+#  for, so that missing inputs are reported all together
+class RawEnv:
+    def __init__(self, environ):
+        self.environ = environ
+        self.missing = []
+        self.used = {}
+
+    def s(self, name):
+        v = self.environ.get(name, "")
+        if ( v == "" ):
+            if ( name not in self.missing ):
+                self.missing.append(name)
+            return "1"     # Placeholder, reported by derive()
+        self.used[name] = v
+        return v
+
+    def f(self, name):
+        v = self.s(name)
+        try:
+            return float(v)
+        except ValueError:
+            raise ParamError("%s=%s is not a number" % (name, v))
+
+    def i(self, name):
+        v = self.s(name)
+        try:
+            return int(v, 0)
+        except ValueError:
+            raise ParamError("%s=%s is not an integer" % (name, v))
+
+####################################
+# Parameter table: (type, NAME, function of the raw environment)
+#  str parameters are quoted in _gem5_params.py, int and float parameters are not
+#  Entries are kept in the same order as the old smc.sh template
+def _reg(name):
+    return lambda e: e.i(name) + e.i("PIM_ADDRESS_BASE")
+
+def _raw(name, suffix=""):
+    return lambda e: e.s(name) + suffix
+
+GEM5_PARAMS = [
+    ("str", "ARCH",                            _raw("ARCH")),
+    ("str", "OUTDIR",                          _raw("M5_OUTDIR")),
+    ("int", "N_INIT_PORT",                     _raw("N_INIT_PORT")),
+    ("int", "N_TARG_PORT",                     _raw("N_TARG_PORT")),
+    ("int", "GEM5_VAULT_WBUFFER_SIZE",         _raw("GEM5_VAULT_WBUFFER_SIZE")),
+    ("int", "GEM5_VAULT_RBUFFER_SIZE",         _raw("GEM5_VAULT_RBUFFER_SIZE")),
+    ("int", "GEM5_NUMCPU",                     _raw("GEM5_NUMCPU")),
+    ("str", "GEM5_ADDR_MAPPING",               _raw("GEM5_ADDR_MAPPING")),
+    ("str", "GEM5_ENABLE_COMM_MONITORS",       _raw("GEM5_ENABLE_COMM_MONITORS")),
+    ("str", "GEM5_PERIODIC_STATS_DUMP",        _raw("GEM5_PERIODIC_STATS_DUMP")),
+    ("int", "GEM5_PERIODIC_STATS_DUMP_PERIOD", _raw("GEM5_PERIODIC_STATS_DUMP_PERIOD")),
+    ("str", "DRAM_LAYER_SIZE_MB",              _raw("DRAM_LAYER_SIZE_MB", "MB")),
+    ("str", "DRAM_CHANNEL_SIZE_MB",            _raw("DRAM_CHANNEL_SIZE_MB", "MB")),
+    ("int", "DRAM_BUS_WIDTH",                  _raw("DRAM_BUS_WIDTH")),
+    ("int", "HOST_BURST_SIZE_B",               _raw("HOST_BURST_SIZE_B")),
+    ("int", "SMC_BURST_SIZE_B",                _raw("SMC_BURST_SIZE_B")),
+    ("int", "AXI_DATA_W",                      _raw("AXI_DATA_W")),
+    ("str", "VAULT_CLOCK_FREQUENCY",           lambda e: perl_num(1.0 / e.f("DRAM_tCK")) + "GHz"),
+    ("str", "SMCXBAR_CLOCK_FREQUENCY",         lambda e: perl_num(1.0 / e.f("CLK_PERIOD_SYS")) + "GHz"),
+    ("str", "HOST_CLOCK_FREQUENCY",            _raw("HOST_CLOCK_FREQUENCY_GHz", "GHz")),
+    ("str", "SERIALLINKS_CLOCK_FREQUENCY",     _raw("SERIALLINKS_CLOCK_FREQUENCY_GHz", "GHz")),
+    ("int", "SERIALLINKS_NUM_LINKS",           _raw("SERIALLINKS_NUM_LINKS")),
+    ("int", "SERIALLINKS_NUM_LANES_PER_LINK",  _raw("SERIALLINKS_NUM_LANES_PER_LINK")),
+    ("str", "DRAM_PAGE_POLICY",                _raw("DRAM_PAGE_POLICY")),
+    ("int", "DRAM_BURST_LENGTH",               lambda e: perl_num(e.f("AXI_DATA_W") / e.f("DRAM_BUS_WIDTH"))),
+    ("str", "DRAM_ROW_BUFFER_SIZE",            lambda e: perl_num(2 ** e.f("DRAM_column_size") * e.f("DRAM_BUS_WIDTH") / 8) + "B"),
+    ("int", "DRAM_BANKS_PER_VAULT",            _raw("DRAM_BANKS_PER_VAULT")),
+    ("int", "N_MEM_DIES",                      _raw("N_MEM_DIES")),
+    ("int", "DRAM_BANKS_PER_DIE",              _raw("DRAM_BANKS_PER_DIE")),
+    ("str", "DRAM_tBURST",                     lambda e: perl_num((e.f("AXI_DATA_W") / e.f("DRAM_BUS_WIDTH")) * e.f("DRAM_tCK") / 2) + "ns"),
+    ("str", "DRAM_tRCD",                       _raw("DRAM_tRCD", "ns")),
+    ("str", "DRAM_tWR",                        _raw("DRAM_tWR", "ns")),
+    ("str", "DRAM_tCL",                        _raw("DRAM_tCL", "ns")),
+    ("str", "DRAM_tCK",                        _raw("DRAM_tCK", "ns")),
+    ("str", "DRAM_tRP",                        _raw("DRAM_tRP", "ns")),
+    ("str", "DRAM_tRAS",                       _raw("DRAM_tRAS", "ns")),
+    ("str", "DRAM_tRTP",                       _raw("DRAM_tRTP", "ns")),
+    ("str", "DRAM_tRRD",                       _raw("DRAM_tRRD", "ns")),
+    ("str", "DRAM_tRFC",                       _raw("DRAM_tRFC", "ns")),
+    ("str", "DRAM_tRFC_PB",                    _raw("DRAM_tRFC_PB", "ns")),
+    ("str", "DRAM_tREFI",                      _raw("DRAM_tREFI", "us")),
+    ("int", "GEM5_TOTAL_SIMULATION_PERIOD",    _raw("GEM5_TOTAL_SIMULATION_PERIOD")),
+    ("int", "GEM5_REPORT_PERIOD_ps",           _raw("GEM5_REPORT_PERIOD_ps")),
+    ("int", "MAX_INFLIGHT_TRANS",              _raw("MAX_INFLIGHT_TRANS")),
+    ("int", "GEM5_MAX_BUFFER_SIZE",            _raw("GEM5_MAX_BUFFER_SIZE")),
+    ("int", "GEM5_SYNCH_PERIOD_ps",            _raw("GEM5_SYNCH_PERIOD_ps")),
+    ("int", "GEM5_SHORT_SLEEP_ns",             _raw("GEM5_SHORT_SLEEP_ns")),
+    ("int", "GEM5_LONG_SLEEP_ns",              _raw("GEM5_LONG_SLEEP_ns")),
+    ("int", "GEM5_TRAFFIC_ITT_ps",             _raw("GEM5_TRAFFIC_ITT_ps")),
+    ("str", "GEM5_TRAFFIC_MODE",               _raw("GEM5_TRAFFIC_MODE")),
+    ("str", "GEM5_TRAFFIC_PRINT_INJECTED",     _raw("GEM5_TRAFFIC_PRINT_INJECTED")),
+    ("str", "GEM5_TRAFFIC_PRINT_RECEIVED",     _raw("GEM5_TRAFFIC_PRINT_RECEIVED")),
+    ("int", "GEM5_TRAFFIC_NUM_TRANS",          _raw("GEM5_TRAFFIC_NUM_TRANS")),
+    ("str", "SCENARIO_CASE_DIR",               _raw("SCENARIO_CASE_DIR")),
+    ("str", "TOTAL_MEM_SIZE_MB",               _raw("TOTAL_MEM_SIZE_MB", "MB")),
+    ("str", "DRAM_SCHEDULING_POLICY_GEM5",     _raw("DRAM_SCHEDULING_POLICY_GEM5")),
+    ("int", "GEM5_VAULT_FRFCFS_CAP",           _raw("GEM5_VAULT_FRFCFS_CAP")),
+    ("int", "GEM5_VAULT_BATCH_CAP",            _raw("GEM5_VAULT_BATCH_CAP")),
+    ("str", "GEM5_VAULT_LOW_PRIORITY_MASTERS", _raw("GEM5_VAULT_LOW_PRIORITY_MASTERS")),
+    ("int", "GEM5_VAULT_WRITE_HIGH_THRESH_PERC", _raw("GEM5_VAULT_WRITE_HIGH_THRESH_PERC")),
+    ("int", "GEM5_VAULT_WRITE_LOW_THRESH_PERC", _raw("GEM5_VAULT_WRITE_LOW_THRESH_PERC")),
+    ("int", "GEM5_VAULT_MIN_WRITES_PER_SWITCH", _raw("GEM5_VAULT_MIN_WRITES_PER_SWITCH")),
+    ("int", "GEM5_VAULT_PREFETCH_ENTRIES",     _raw("GEM5_VAULT_PREFETCH_ENTRIES")),
+    ("str", "GEM5_VAULT_PREFETCH_TRIGGER",     _raw("GEM5_VAULT_PREFETCH_TRIGGER")),
+    ("str", "GEM5_VAULT_REFRESH_POLICY",       _raw("GEM5_VAULT_REFRESH_POLICY")),
+    ("str", "GEM5_VAULT_REFRESH_PAUSING",      _raw("GEM5_VAULT_REFRESH_PAUSING")),
+    ("int", "GEM5_VAULT_REFRESH_PAUSE_SEGMENTS", _raw("GEM5_VAULT_REFRESH_PAUSE_SEGMENTS")),
+    ("str", "GEM5_MEMTYPE",                    _raw("GEM5_MEMTYPE")),
+    ("int", "NBITS_CH",                        _raw("NBITS_CH")),
+    ("int", "NBITS_LB",                        _raw("NBITS_LB")),
+    ("int", "NBITS_OF",                        _raw("NBITS_OF")),
+    ("int", "NBITS_RC",                        _raw("NBITS_RC")),
+    ("int", "DRAM_COLUMNS_PER_ROW",            _raw("DRAM_COLUMNS_PER_ROW")),
+    ("str", "GEM5_SIMPLEMEMORY_LATENCY",       _raw("GEM5_SIMPLEMEMORY_LATENCY")),
+    ("str", "GEM5_SIMPLEMEMORY_BW",            _raw("GEM5_SIMPLEMEMORY_BW")),
+    ("int", "GEM5_SMCCONTROLLER_BUFFER_SIZE_REQ", _raw("GEM5_SMCCONTROLLER_BUFFER_SIZE_REQ")),
+    ("int", "GEM5_SMCCONTROLLER_BUFFER_SIZE_RSP", _raw("GEM5_SMCCONTROLLER_BUFFER_SIZE_RSP")),
+    ("str", "GEM5_LOAD_DISTRIBUTION_POLICY",   _raw("GEM5_LOAD_DISTRIBUTION_POLICY")),
+    ("str", "GEM5_SMCXBAR_QOS",                _raw("GEM5_SMCXBAR_QOS")),
+    ("int", "GEM5_SMCXBAR_QOS_HOST_WEIGHT",    _raw("GEM5_SMCXBAR_QOS_HOST_WEIGHT")),
+    ("int", "GEM5_SMCXBAR_QOS_PIM_WEIGHT",     _raw("GEM5_SMCXBAR_QOS_PIM_WEIGHT")),
+    ("str", "GEM5_SMCXBAR_QOS_HOST_BW",        lambda e: perl_num(e.f("GEM5_SMCXBAR_QOS_HOST_BW_GBs")) + "GB/s"),
+    ("str", "GEM5_SMCXBAR_QOS_PIM_BW",         lambda e: perl_num(e.f("GEM5_SMCXBAR_QOS_PIM_BW_GBs")) + "GB/s"),
+    ("str", "GEM5_SMCXBAR_QOS_BURST",          _raw("GEM5_SMCXBAR_QOS_BURST_B", "B")),
+    ("str", "GEM5_SMCCONTROLLER_LATENCY",      lambda e: perl_num(e.f("GEM5_SMCCONTROLLER_LATENCY_cy") / e.f("HOST_CLOCK_FREQUENCY_GHz")) + "ns"),
+    ("str", "VAULTCTRL_FRONTEND_LATENCY",      lambda e: perl_num(e.f("GEM5_VAULTCTRL_FRONTEND_LATENCY_cy") * e.f("DRAM_tCK")) + "ns"),
+    ("str", "VAULTCTRL_BACKEND_LATENCY",       lambda e: perl_num(e.f("GEM5_VAULTCTRL_BACKEND_LATENCY_cy") * e.f("DRAM_tCK")) + "ns"),
+    ("str", "VAULT_PREFETCH_LATENCY",          lambda e: perl_num(e.f("GEM5_VAULT_PREFETCH_LATENCY_cy") * e.f("DRAM_tCK")) + "ns"),
+    ("float", "VAULT_PREFETCH_BURST_ENERGY",   lambda e: perl_num(e.f("VAULT_PREFETCH_ENERGY_PER_BIT") * e.f("AXI_DATA_W"))),
+    ("float", "ATOMIC_INC_ENERGY",             _raw("ATOMIC_INC_ENERGY")),
+    ("float", "ATOMIC_FADD_ENERGY",            _raw("ATOMIC_FADD_ENERGY")),
+    ("float", "ATOMIC_MIN_ENERGY",             _raw("ATOMIC_MIN_ENERGY")),
+    ("float", "ATOMIC_CAS_ENERGY",             _raw("ATOMIC_CAS_ENERGY")),
+    ("float", "ATOMIC_BITWISE_ENERGY",         _raw("ATOMIC_BITWISE_ENERGY")),
+    ("float", "ATOMIC_ADD16_ENERGY",           _raw("ATOMIC_ADD16_ENERGY")),
+    ("int", "GEM5_LINK_BUFFER_SIZE_REQ",       _raw("GEM5_LINK_BUFFER_SIZE_REQ")),
+    ("int", "GEM5_LINK_BUFFER_SIZE_RSP",       _raw("GEM5_LINK_BUFFER_SIZE_RSP")),
+    ("str", "GEM5_LINK_STATIC_LATENCY",        lambda e: perl_num(e.f("GEM5_SERDES_LATENCY_ns") + e.f("GEM5_LINK_LATENCY_ns")) + "ns"),
+    ("str", "GEM5_SERIALLINK_MODEL",           _raw("GEM5_SERIALLINK_MODEL")),
+    ("int", "GEM5_LINK_FLIT_SIZE_B",           _raw("GEM5_LINK_FLIT_SIZE_B")),
+    ("int", "GEM5_LINK_TOKENS_REQ",            lambda e: e.i("GEM5_LINK_BUFFER_SIZE_REQ") * (1 + e.i("HOST_BURST_SIZE_B") // e.i("GEM5_LINK_FLIT_SIZE_B"))),
+    ("int", "GEM5_LINK_TOKENS_RSP",            lambda e: e.i("GEM5_LINK_BUFFER_SIZE_RSP") * (1 + e.i("HOST_BURST_SIZE_B") // e.i("GEM5_LINK_FLIT_SIZE_B"))),
+    ("float", "GEM5_LINK_ERROR_RATE",          lambda e: perl_num(e.f("GEM5_LINK_ERROR_RATE"))),
+    ("str", "GEM5_LINK_RETRY_LATENCY",         lambda e: perl_num(2 * (e.f("GEM5_SERDES_LATENCY_ns") + e.f("GEM5_LINK_LATENCY_ns"))) + "ns"),
+    ("int", "SMC_NUM_CUBES",                   _raw("SMC_NUM_CUBES")),
+    ("str", "SMC_CUBE_TOPOLOGY",               _raw("SMC_CUBE_TOPOLOGY")),
+    ("str", "GEM5_PASSTHROUGH_LINK_LATENCY",   lambda e: perl_num(e.f("GEM5_SERDES_LATENCY_ns") + e.f("GEM5_PASSTHROUGH_LATENCY_ns")) + "ns"),
+    ("int", "GEM5_TRAFFIC_IDLE_PERIOD_ps",     _raw("GEM5_TRAFFIC_IDLE_PERIOD_ps")),
+    ("int", "GEM5_TRAFFIC_ACTIVE_PERIOD_ps",   _raw("GEM5_TRAFFIC_ACTIVE_PERIOD_ps")),
+    ("str", "GEM5_RECORD_INJECTED_TRACES",     _raw("GEM5_RECORD_INJECTED_TRACES")),
+    ("str", "GEM5_RECORD_FILE_NAME",           _raw("GEM5_RECORD_FILE_NAME")),
+    ("str", "GEM5_EXTRAIMAGE",                 _raw("GEM5_EXTRAIMAGE")),
+    ("str", "HAVE_LISTENERS",                  _raw("HAVE_LISTENERS")),
+    ("str", "HAVE_PIM_DEVICE",                 _raw("HAVE_PIM_DEVICE")),
+    ("str", "MOVE_PIM_TO_HOST",                _raw("MOVE_PIM_TO_HOST")),
+    ("str", "DRAMSIM2_ENABLE_DEBUG",           _raw("DRAMSIM2_ENABLE_DEBUG")),
+    ("str", "DRAMSIM2_ENABLE_TIMESTAMP",       _raw("DRAMSIM2_ENABLE_TIMESTAMP")),
+    ("str", "HMON_DUMP_ADDRESS",               _raw("HMON_DUMP_ADDRESS")),
+]
+
+# Only generated when HAVE_PIM_DEVICE is TRUE
+GEM5_PIM_PARAMS = [
+    ("str", "PIM_CLOCK_FREQUENCY",             _raw("PIM_CLOCK_FREQUENCY_GHz", "GHz")),
+    ("str", "GEM5_PIM_KERNEL",                 _raw("GEM5_PIM_KERNEL")),
+    ("int", "PIM_DEBUG_ADDR",                  _reg("PIM_DEBUG_REG")),
+    ("int", "PIM_ERROR_ADDR",                  _reg("PIM_ERROR_REG")),
+    ("int", "PIM_INTR_ADDR",                   _reg("PIM_INTR_REG")),
+    ("int", "PIM_COMMAND_ADDR",                _reg("PIM_COMMAND_REG")),
+    ("int", "PIM_STATUS_ADDR",                 _reg("PIM_STATUS_REG")),
+    ("int", "PIM_SLICETABLE_ADDR",             _reg("PIM_SLICETABLE")),
+    ("int", "PIM_SLICECOUNT_ADDR",             _reg("PIM_SLICECOUNT")),
+    ("int", "PIM_SLICEVSTART_ADDR",            _reg("PIM_SLICEVSTART")),
+    ("int", "PIM_ADDRESS_BASE",                lambda e: e.i("PIM_ADDRESS_BASE")),
+    ("str", "PIM_ADDRESS_SIZE",                _raw("PIM_ADDRESS_SIZE")),
+    ("str", "PIM_SPM_ACCESSTIME_ns",           _raw("PIM_SPM_ACCESSTIME_ns", "ns")),
+    ("str", "PIM_SPM_BW_Gbps",                 _raw("PIM_SPM_BW_Gbps", "GB/s")),
+    ("int", "PIM_NUM_CORES",                   _raw("PIM_NUM_CORES")),
+    ("str", "PIM_SPM_ORGANIZATION",            _raw("PIM_SPM_ORGANIZATION")),
+    ("int", "PIM_SPM_NUM_BANKS",               _raw("PIM_SPM_NUM_BANKS")),
+    ("int", "PIM_SPM_BANK_INTERLEAVE_B",       _raw("PIM_SPM_BANK_INTERLEAVE_B")),
+    ("str", "PIM_DMA_ORGANIZATION",            _raw("PIM_DMA_ORGANIZATION")),
+    ("int", "PIM_M5_ADDR",                     _reg("PIM_M5_REG")),
+    ("int", "PIM_M5_D1_ADDR",                  _reg("PIM_M5_D1_REG")),
+    ("int", "PIM_M5_D2_ADDR",                  _reg("PIM_M5_D2_REG")),
+    ("int", "PIM_VREG_ADDR",                   _reg("PIM_VREG")),
+    ("int", "PIM_VREG_SIZE",                   _raw("PIM_VREG_SIZE")),
+    ("int", "PIM_SREG_ADDR",                   _reg("PIM_SREG")),
+    ("int", "PIM_SREG_COUNT",                  _raw("PIM_SREG_COUNT")),
+    ("int", "PIM_DTLB_IDEAL_REFILL_ADDR",      _reg("PIM_DTLB_IDEAL_REFILL")),
+    ("int", "PIM_DTLB_IDEAL_REFILL_REG",       _raw("PIM_DTLB_IDEAL_REFILL")),
+    ("str", "PIM_DTLB_DO_IDEAL_REFILL",        _raw("PIM_DTLB_DO_IDEAL_REFILL")),
+    ("int", "HMC_ATOMIC_INCR",                 _raw("HMC_ATOMIC_INCR")),
+    ("int", "HMC_ATOMIC_IMIN",                 _raw("HMC_ATOMIC_IMIN")),
+    ("int", "HMC_ATOMIC_FADD",                 _raw("HMC_ATOMIC_FADD")),
+    ("int", "HMC_OPERAND",                     _raw("HMC_OPERAND")),
+    ("int", "HMC_SWAP_OPERAND",                _raw("HMC_SWAP_OPERAND")),
+    ("int", "HMC_ATOMIC_OPCODE",               _raw("HMC_ATOMIC_OPCODE")),
+    ("int", "HMC_ATOMIC_TARGET",               _raw("HMC_ATOMIC_TARGET")),
+    ("int", "HMC_RESULT",                      _raw("HMC_RESULT")),
+    ("int", "PIM_DTLB_SIZE",                   _raw("PIM_DTLB_SIZE")),
+    ("int", "PIM_DTLB_ASSOC",                  _raw("PIM_DTLB_ASSOC")),
+    ("str", "PIM_DTLB_REPLACEMENT",            _raw("PIM_DTLB_REPLACEMENT")),
+    ("int", "PIM_DTLB_HIT_LATENCY_cy",         _raw("PIM_DTLB_HIT_LATENCY_cy")),
+    ("int", "PIM_DTLB_L2_SIZE",                _raw("PIM_DTLB_L2_SIZE")),
+    ("int", "PIM_DTLB_L2_ASSOC",               _raw("PIM_DTLB_L2_ASSOC")),
+    ("int", "PIM_DTLB_L2_HIT_LATENCY_cy",      _raw("PIM_DTLB_L2_HIT_LATENCY_cy")),
+    ("int", "PIM_DTLB_WALK_CACHE_SIZE",        _raw("PIM_DTLB_WALK_CACHE_SIZE")),
+    ("int", "PIM_DTLB_WALK_CACHE_LATENCY_cy",  _raw("PIM_DTLB_WALK_CACHE_LATENCY_cy")),
+    ("str", "PIM_DTLB_PREFETCHER",             _raw("PIM_DTLB_PREFETCHER")),
+    ("int", "PIM_DTLB_PREFETCH_DEGREE",        _raw("PIM_DTLB_PREFETCH_DEGREE")),
+    ("str", "OS_PAGE_SHIFT",                   _raw("OS_PAGE_SHIFT")),
+    ("str", "PIM_DTLB_DUMP_ADDRESS",           _raw("PIM_DTLB_DUMP_ADDRESS")),
+    ("str", "SMON_DUMP_ADDRESS",               _raw("SMON_DUMP_ADDRESS")),
+    ("int", "PIM_DMA_MEM_ADDR_ADDR",           _reg("PIM_DMA_MEM_ADDR")),
+    ("int", "PIM_DMA_SPM_ADDR_ADDR",           _reg("PIM_DMA_SPM_ADDR")),
+    ("int", "PIM_DMA_NUMBYTES_ADDR",           _reg("PIM_DMA_NUMBYTES")),
+    ("int", "PIM_DMA_COMMAND_ADDR",            _reg("PIM_DMA_COMMAND")),
+    ("int", "PIM_DMA_STATUS_ADDR",             _reg("PIM_DMA_STATUS")),
+    ("int", "PIM_DMA_CLI_ADDR",                _reg("PIM_DMA_CLI")),
+    ("int", "PIM_DMA_DESC_ADDR_ADDR",          _reg("PIM_DMA_DESC_ADDR")),
+    ("int", "PIM_DMA_DESC_COUNT_ADDR",         _reg("PIM_DMA_DESC_COUNT")),
+    ("int", "PIM_DMA_NUM_CHANNELS",            _raw("PIM_DMA_NUM_CHANNELS")),
+    ("int", "PIM_HOST_IRQ",                    lambda e: e.i("PIM_HOST_IRQ") if e.s("PIM_HOST_WAIT_INTERRUPT") == "TRUE" else 0),
+    ("int", "PIM_DMA_MAX_OUTSTANDING",         _raw("PIM_DMA_MAX_OUTSTANDING")),
+    ("int", "PIM_DMA_BURST_SIZE_B",            _raw("PIM_DMA_BURST_SIZE_B")),
+    ("int", "HMC_ATOMIC_INCR_ADDR",            _reg("HMC_ATOMIC_INCR")),
+    ("int", "PIM_COPROCESSOR_CMD_ADDR",        _reg("PIM_COPROCESSOR_CMD")),
+]
+
+GEM5_TAIL_PARAMS = [
+    ("str", "HAVE_PIM_CLUSTER",                _raw("HAVE_PIM_CLUSTER")),
+]
+
+####################################
+def param_table(environ=None):
+    if environ is None:
+        environ = os.environ
+    table = list(GEM5_PARAMS)
+    if ( environ.get("HAVE_PIM_DEVICE", "") in ("TRUE", "True") ):
+        table += GEM5_PIM_PARAMS
+    table += GEM5_TAIL_PARAMS
+    return table
+
+####################################
+INT_EXPRESSION = re.compile(r"^[-+*/%() 0-9a-fA-FxX]+$")
+
+####################################
+# These change from one case of the sweep to the other, they are left out of
+#  the digest so that the rest of the table can be shared between the cases
+PER_CASE_PARAMS = ("OUTDIR", "SCENARIO_CASE_DIR")
+PER_CASE_INPUTS = ("M5_OUTDIR", "SCENARIO_CASE_DIR")
+
+# Derived tables already computed by this process, indexed by inputs_digest()
+_derived_cache = {}
+
+####################################
+# Digest of all the raw variables that the table may read (except the per-case ones)
+def inputs_digest(environ=None):
+    if environ is None:
+        environ = os.environ
+    e = RawEnv(environ)
+    for (t, name, fn) in GEM5_PARAMS + GEM5_PIM_PARAMS + GEM5_TAIL_PARAMS:
+        try:
+            fn(e)
+        except (ParamError, ZeroDivisionError):
+            pass
+    h = hashlib.sha1()
+    for name in sorted(e.used.keys()):
+        if ( name not in PER_CASE_INPUTS ):
+            h.update((name + "=" + e.used[name] + "\n").encode("utf-8"))
+    return h.hexdigest()
+
+####################################
+# Compute and validate the parameters shared by all the cases with the same inputs
+def _derive_shared(environ):
+    e = RawEnv(environ)
+    params = []
+    for (t, name, fn) in param_table(environ):
+        if ( name not in PER_CASE_PARAMS ):
+            params.append((t, name, fn(e)))
+
+    if ( len(e.missing) > 0 ):
+        raise ParamError("parameter(s) not found in the environment: " + " ".join(e.missing))
+
+    # int parameters may still be simple arithmetic expressions (e.g. 2*50000/1000)
+    #  which are evaluated when gem5 imports _gem5_params
+    for (t, name, value) in params:
+        if ( t == "int" and not INT_EXPRESSION.match(str(value)) ):
+            raise ParamError("%s = %s is not an integer" % (name, value))
+    if ( e.f("DRAM_tCK") <= 0 or e.f("CLK_PERIOD_SYS") <= 0 or e.f("HOST_CLOCK_FREQUENCY_GHz") <= 0 ):
+        raise ParamError("clock periods and frequencies must be positive")
+    if ( e.i("AXI_DATA_W") % e.i("DRAM_BUS_WIDTH") != 0 ):
+        raise ParamError("AXI_DATA_W must be a multiple of DRAM_BUS_WIDTH")
+    return params
+
+####################################
+# Put the per-case parameters back in their place in the table
+def _with_per_case(shared, environ):
+    e = RawEnv(environ)
+    per_case = {}
+    for (t, name, fn) in param_table(environ):
+        if ( name in PER_CASE_PARAMS ):
+            per_case[name] = (t, name, fn(e))
+    if ( len(e.missing) > 0 ):
+        raise ParamError("parameter(s) not found in the environment: " + " ".join(e.missing))
+
+    params = list(shared) + list(per_case.values())
+    order = dict((name, i) for (i, (t, name, fn)) in enumerate(param_table(environ)))
+    params.sort(key=lambda p: order[p[1]])
+    return params
+
+####################################
+# Compute all the parameters from the raw environment
+#  Returns a list of (type, NAME, value) in the order of the table
+#  Raises ParamError if any of the inputs is missing or malformed
+def derive(environ=None, digest=None):
+    if environ is None:
+        environ = os.environ
+    if digest is None:
+        digest = inputs_digest(environ)
+    if digest not in _derived_cache:
+        _derived_cache[digest] = _derive_shared(environ)
+    return _with_per_case(_derived_cache[digest], environ)
+
+####################################
+# Same as derive(), but as a dictionary NAME -> value
+def derive_params(environ=None):
+    return dict((name, value) for (t, name, value) in derive(environ))
+
+####################################
+def format_gem5_params(params):
+    lines = ["", "# Automatically generated by ethz_params.py", "#*********************************"]
+    for (t, name, value) in params:
+        if ( t == "str" ):
+            lines.append("%s = \"%s\"" % (name, value))
+        else:
+            lines.append("%s = %s" % (name, value))
+    return "\n".join(lines) + "\n"
+
+####################################
+def format_smc_params(params):
+    lines = []
+    for (t, name, value) in params:
+        lines.append(str(value) + "\t\t\t\t" + name)
+    return "\n".join(lines) + "\n"
+
+####################################
+# The cache file keeps the shared part of the table, one "type NAME value" per line
+def _load_cached(cached):
+    params = []
+    fi = open(cached, "r")
+    for line in fi:
+        (t, name, value) = line.rstrip("\n").split("\t", 2)
+        params.append((t, name, value))
+    fi.close()
+    return params
+
+def _store_cached(cached, params):
+    fo = open(cached, "w")
+    for (t, name, value) in params:
+        if ( name not in PER_CASE_PARAMS ):
+            fo.write("%s\t%s\t%s\n" % (t, name, value))
+    fo.close()
+
+####################################
+# Write _gem5_params.py and _smc_params.txt in outdir
+#  If cache_dir is given, the shared part of the table is taken from a
+#  previous case with the same inputs instead of being derived again
+def write_params(outdir, cache_dir=None, environ=None):
+    if environ is None:
+        environ = os.environ
+    digest = inputs_digest(environ)
+    cached = None
+    if cache_dir is not None:
+        cached = os.path.join(cache_dir, "_gem5_params_" + digest + ".txt")
+
+    if cached is not None and os.path.isfile(cached) and digest not in _derived_cache:
+        _derived_cache[digest] = _load_cached(cached)
+    params = derive(environ, digest)
+    if cached is not None and not os.path.isfile(cached):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        _store_cached(cached, params)
+
+    fo = open(os.path.join(outdir, GEM5_PARAMS_FILE), "w")
+    fo.write(format_gem5_params(params))
+    fo.close()
+    fo = open(os.path.join(outdir, SMC_PARAMS_FILE), "w")
+    fo.write(format_smc_params(params))
+    fo.close()
+    return digest
+
+####################################
+if __name__ == "__main__":
+    if ( len(sys.argv) < 2 ):
+        sys.stderr.write("usage: ethz_params.py <M5_OUTDIR> [<CACHE_DIR>]\n")
+        sys.exit(1)
+    try:
+        write_params(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    except (ParamError, ZeroDivisionError) as err:
+        sys.stderr.write(RED + "Error: " + str(err) + NOCOLOR + "\n")
+        sys.exit(1)
@@ -32,11 +32,59 @@ def makeStandalonePIMSystem(mem_mode, num_cpus = 1):
 	self.pimbus.use_default_range = True
 	return self
 
+##############################################################################
+# Parameters of the DTLB of each PIM core
+def configure_pim_dtlb(dtlb):
+    dtlb.original_ranges = AddrRange(0x00000000, size=PIM_ADDRESS_SIZE)
+    dtlb.remapped_ranges = AddrRange(PIM_ADDRESS_BASE, size=PIM_ADDRESS_SIZE)
+    dtlb.OS_PAGE_SHIFT = OS_PAGE_SHIFT   # Page shift of the guest OS
+    dtlb.TLB_SIZE = PIM_DTLB_SIZE
+    dtlb.TLB_ASSOC = PIM_DTLB_ASSOC
+    dtlb.TLB_REPLACEMENT = PIM_DTLB_REPLACEMENT
+    dtlb.TLB_HIT_LATENCY = PIM_DTLB_HIT_LATENCY_cy
+    dtlb.L2_TLB_SIZE = PIM_DTLB_L2_SIZE
+    dtlb.L2_TLB_ASSOC = PIM_DTLB_L2_ASSOC
+    dtlb.L2_TLB_HIT_LATENCY = PIM_DTLB_L2_HIT_LATENCY_cy
+    dtlb.WALK_CACHE_SIZE = PIM_DTLB_WALK_CACHE_SIZE
+    dtlb.WALK_CACHE_LATENCY = PIM_DTLB_WALK_CACHE_LATENCY_cy
+    dtlb.PREFETCHER = PIM_DTLB_PREFETCHER
+    dtlb.PREFETCH_DEGREE = PIM_DTLB_PREFETCH_DEGREE
+    dtlb.DUMP_ADDRESS = True if (PIM_DTLB_DUMP_ADDRESS=="TRUE") else False
+    dtlb.IDEAL_REFILL = True if (PIM_DTLB_DO_IDEAL_REFILL=="TRUE") else False
+    dtlb.PIM_DTLB_IDEAL_REFILL_REG = PIM_DTLB_IDEAL_REFILL_REG
+    dtlb.HMC_ATOMIC_INCR = HMC_ATOMIC_INCR
+    dtlb.HMC_ATOMIC_IMIN = HMC_ATOMIC_IMIN
+    dtlb.HMC_ATOMIC_FADD = HMC_ATOMIC_FADD
+    dtlb.HMC_OPERAND = HMC_OPERAND
+    dtlb.HMC_SWAP_OPERAND = HMC_SWAP_OPERAND
+    dtlb.HMC_ATOMIC_OPCODE = HMC_ATOMIC_OPCODE
+    dtlb.HMC_ATOMIC_TARGET = HMC_ATOMIC_TARGET
+    dtlb.HMC_RESULT = HMC_RESULT
+
+##############################################################################
+# Largest DMA burst served by one vault: a burst is routed by its start address,
+#  so it must stay in one row and in one stripe of the interleaved vaults
+def pim_dma_max_burst(mem_ctrls):
+    ctrl = mem_ctrls[0]
+    limit = ctrl.device_rowbuffer_size.value * ctrl.devices_per_rank.value
+    if ( ctrl.range.intlvBits > 0 ):
+        limit = min(limit, 2 ** (ctrl.range.intlvHighBit - ctrl.range.intlvBits + 1))
+    return limit
+
 ##############################################################################
 def build_pim_system(options, mem_mode, cpu_class):
 	
     pim_sys = makeStandalonePIMSystem(mem_mode)
 
+    # Multi-core PIM: the cores share the SPM through a PIMXBar, which can
+    #  model a multiported SPM (ideal accesses) or a banked one (conflicts)
+    if ( PIM_NUM_CORES > 1 or PIM_SPM_ORGANIZATION != "SHARED" ):
+        pim_sys.pimbus = PIMXBar(header_cycles=1, width=4, use_default_range=True)
+        pim_sys.pimbus.ideal_spm_access = (PIM_SPM_ORGANIZATION == "MULTIPORTED")
+        if ( PIM_SPM_ORGANIZATION == "BANKED" ):
+            pim_sys.pimbus.spm_banks = PIM_SPM_NUM_BANKS
+            pim_sys.pimbus.spm_bank_interleave = PIM_SPM_BANK_INTERLEAVE_B
+
     # Create a top-level voltage domain
     pim_sys.voltage_domain = VoltageDomain(voltage = options.sys_voltage)
 
@@ -54,22 +102,31 @@ def build_pim_system(options, mem_mode, cpu_class):
 
     pim_sys.kernel = binary(GEM5_PIM_KERNEL)
     if ( mem_mode == "atomic" ):
-        pim_sys.cpu = AtomicSimpleCPU(clk_domain=pim_sys.clk_domain, cpu_id=0)
+        cpus = [AtomicSimpleCPU(clk_domain=pim_sys.clk_domain, cpu_id=i) for i in range(PIM_NUM_CORES)]
     else:
-        #pim_sys.cpu = TimingSimpleCPU(clk_domain=pim_sys.clk_domain, cpu_id=0)
-        pim_sys.cpu = cpu_class(clk_domain=pim_sys.clk_domain, cpu_id=0)
+        #cpus = [TimingSimpleCPU(clk_domain=pim_sys.clk_domain, cpu_id=i) for i in range(PIM_NUM_CORES)]
+        cpus = [cpu_class(clk_domain=pim_sys.clk_domain, cpu_id=i) for i in range(PIM_NUM_CORES)]
 
     # ethz_print_val("Host Class", cpu_class);
     # ethz_print_val("PIM  Class", type(pim_sys.cpu));
 
-    pim_sys.itlb = ethz_TLB()
-    pim_sys.dtlb = ethz_TLB()
+    # One ITLB and one DTLB per core (system.pim_sys.dtlb0, dtlb1, ... if more than one core)
+    itlbs = [ethz_TLB() for i in range(PIM_NUM_CORES)]
+    dtlbs = [ethz_TLB() for i in range(PIM_NUM_CORES)]
     pim_sys.stlb = ethz_TLB()
 
-    pim_sys.dma = ethz_DMA()
-    pim_sys.dma.dma = pim_sys.pimbus.slave
-    pim_sys.dma.pio = pim_sys.pimbus.master
-    pim_sys.dma.PIM_DMA_STATUS_ADDR = PIM_DMA_STATUS_ADDR
+    # Either a DMA per core or a shared one
+    if ( PIM_DMA_ORGANIZATION == "PRIVATE" and PIM_NUM_CORES > 1 ):
+        dmas = [ethz_DMA() for i in range(PIM_NUM_CORES)]
+    else:
+        dmas = [ethz_DMA()]
+    for dma in dmas:
+        dma.dma = pim_sys.pimbus.slave
+        dma.pio = pim_sys.pimbus.master
+        dma.PIM_DMA_STATUS_ADDR = PIM_DMA_STATUS_ADDR
+        dma.num_channels = PIM_DMA_NUM_CHANNELS
+        dma.max_outstanding = PIM_DMA_MAX_OUTSTANDING
+        dma.burst_size = PIM_DMA_BURST_SIZE_B
 
     if options.cpu_type == "arm_detailed":
         try:
@@ -78,35 +135,37 @@ def build_pim_system(options, mem_mode, cpu_class):
             print "arm_detailed is unavailable. Did you compile the O3 model?"
             sys.exit(1)
 
-    pim_sys.cpu.createInterruptController()
-    ### pim_sys.cpu.connectAllPorts(pim_sys.pimbus)	# Erfan: I have brought the contents of this function here ...
-
-    # if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
-    #     pim_sys.Dmon = CommMonitor()
-    #     pim_sys.cpu.dcache_port = pim_sys.Dmon.slave
-    #     pim_sys.Dmon.master = pim_sys.dtlb.slave
-    # else:
-    pim_sys.cpu.dcache_port = pim_sys.dtlb.slave
-
-    pim_sys.dtlb.master = pim_sys.pimbus.slave
-
-    # if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
-    #     pim_sys.Imon= CommMonitor()
-    #     pim_sys.cpu.icache_port = pim_sys.Imon.slave
-    #     pim_sys.Imon.master = pim_sys.itlb.slave
-    # else:
-    pim_sys.cpu.icache_port = pim_sys.itlb.slave
-
-    pim_sys.itlb.master = pim_sys.pimbus.slave
-    # Default ranges for the TLBs
-    pim_sys.itlb.original_ranges = AddrRange(0x00000000, size=PIM_ADDRESS_SIZE)
-    pim_sys.dtlb.original_ranges = AddrRange(0x00000000, size=PIM_ADDRESS_SIZE)
-    pim_sys.itlb.remapped_ranges = AddrRange(PIM_ADDRESS_BASE, size=PIM_ADDRESS_SIZE)
-    pim_sys.dtlb.remapped_ranges = AddrRange(PIM_ADDRESS_BASE, size=PIM_ADDRESS_SIZE)
-    pim_sys.dtlb.OS_PAGE_SHIFT = OS_PAGE_SHIFT   # Page shift of the guest OS
-    pim_sys.dtlb.TLB_SIZE = PIM_DTLB_SIZE
-    pim_sys.dtlb.DUMP_ADDRESS = True if (PIM_DTLB_DUMP_ADDRESS=="TRUE") else False
-    pim_sys.dtlb.IDEAL_REFILL = True if (PIM_DTLB_DO_IDEAL_REFILL=="TRUE") else False
+    for i in range(PIM_NUM_CORES):
+        cpus[i].createInterruptController()
+        ### cpus[i].connectAllPorts(pim_sys.pimbus)	# Erfan: I have brought the contents of this function here ...
+
+        # if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
+        #     pim_sys.Dmon = CommMonitor()
+        #     pim_sys.cpu.dcache_port = pim_sys.Dmon.slave
+        #     pim_sys.Dmon.master = pim_sys.dtlb.slave
+        # else:
+        cpus[i].dcache_port = dtlbs[i].slave
+
+        dtlbs[i].master = pim_sys.pimbus.slave
+
+        # if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
+        #     pim_sys.Imon= CommMonitor()
+        #     pim_sys.cpu.icache_port = pim_sys.Imon.slave
+        #     pim_sys.Imon.master = pim_sys.itlb.slave
+        # else:
+        cpus[i].icache_port = itlbs[i].slave
+
+        itlbs[i].master = pim_sys.pimbus.slave
+        # Default ranges for the TLBs
+        itlbs[i].original_ranges = AddrRange(0x00000000, size=PIM_ADDRESS_SIZE)
+        itlbs[i].remapped_ranges = AddrRange(PIM_ADDRESS_BASE, size=PIM_ADDRESS_SIZE)
+        configure_pim_dtlb(dtlbs[i])
+
+    # A single core keeps the original names (system.pim_sys.cpu, dtlb, ...)
+    pim_sys.cpu = cpus if ( PIM_NUM_CORES > 1 ) else cpus[0]
+    pim_sys.itlb = itlbs if ( PIM_NUM_CORES > 1 ) else itlbs[0]
+    pim_sys.dtlb = dtlbs if ( PIM_NUM_CORES > 1 ) else dtlbs[0]
+    pim_sys.dma = dmas if ( len(dmas) > 1 ) else dmas[0]
 
     # Pointer to the slice table
     pim_sys.stlb.original_ranges = AddrRange(0x00000000, size=PIM_ADDRESS_SIZE)
@@ -137,14 +196,14 @@ def build_pim_system(options, mem_mode, cpu_class):
     pim_sys.pim_memory.PIM_DMA_NUMBYTES_ADDR = PIM_DMA_NUMBYTES_ADDR
     pim_sys.pim_memory.PIM_DMA_COMMAND_ADDR = PIM_DMA_COMMAND_ADDR
     pim_sys.pim_memory.PIM_DMA_CLI_ADDR = PIM_DMA_CLI_ADDR
+    pim_sys.pim_memory.PIM_DMA_DESC_ADDR_ADDR = PIM_DMA_DESC_ADDR_ADDR
+    pim_sys.pim_memory.PIM_DMA_DESC_COUNT_ADDR = PIM_DMA_DESC_COUNT_ADDR
     pim_sys.pim_memory.PIM_DTLB_IDEAL_REFILL_ADDR = PIM_DTLB_IDEAL_REFILL_ADDR
     pim_sys.pim_memory.HMC_ATOMIC_INCR_ADDR = HMC_ATOMIC_INCR_ADDR
     pim_sys.pim_memory.PIM_COPROCESSOR_CMD_ADDR = PIM_COPROCESSOR_CMD_ADDR
-    pim_sys.dtlb.PIM_DTLB_IDEAL_REFILL_REG = PIM_DTLB_IDEAL_REFILL_REG
-    pim_sys.dtlb.HMC_ATOMIC_INCR = HMC_ATOMIC_INCR
-    pim_sys.dtlb.HMC_ATOMIC_IMIN = HMC_ATOMIC_IMIN
-    pim_sys.dtlb.HMC_ATOMIC_FADD = HMC_ATOMIC_FADD
-    pim_sys.dtlb.HMC_OPERAND = HMC_OPERAND
+    pim_sys.pim_memory.PIM_NUM_CORES = PIM_NUM_CORES
+    pim_sys.pim_memory.PIM_DMA_PER_CORE = (len(dmas) > 1)
+    pim_sys.pim_memory.PIM_HOST_IRQ = PIM_HOST_IRQ
     pim_sys.pim_memory.SYSTEM_NUM_CPU = GEM5_NUMCPU
     pim_sys.pim_memory.port = pim_sys.pimbus.default
     pim_sys.kernel_addr_check = False;		# Do not check for correct location of kernel (we do address translation in TLB)
@@ -152,10 +211,12 @@ def build_pim_system(options, mem_mode, cpu_class):
     # Specify the architecture in the components
     if ( ARCH=="arm64"):
         pim_sys.pim_memory.pim_arch = 64
-        pim_sys.dtlb.pim_arch = 64
+        for dtlb in dtlbs:
+            dtlb.pim_arch = 64
     elif (ARCH=="arm"):
         pim_sys.pim_memory.pim_arch = 32
-        pim_sys.dtlb.pim_arch = 32
+        for dtlb in dtlbs:
+            dtlb.pim_arch = 32
     else:
         raise ValueError('ARCH is incorrect!');
 
@@ -0,0 +1,119 @@
+# Multi-cube SMC topologies built on top of ethz_configs.py
+#
+# The host side is the same as in the single cube: membus -> smccontroller
+#  -> N_TARG_PORT serial links -> smcxbar of the first cube. Every other cube
+#  has its own crossbar (cubexbar) and N_INIT_PORT vaults, and is reached
+#  through pass-through links (Bridges) between the crossbars:
+#
+#  CHAIN: smcxbar -> passthrough[0] -> cubexbar[0] -> passthrough[1] -> cubexbar[1] ...
+#  STAR:  smcxbar -> passthrough[k] -> cubexbar[k]   (for every k)
+#
+# Each cube holds a contiguous block of the memory (1/SMC_NUM_CUBES of it),
+#  which is interleaved across its own vaults. So the ranges seen by every
+#  crossbar are either the full interleaved set of its vaults, or the
+#  (non-interleaved) blocks of the cubes behind its pass-through links.
+import m5
+import m5.objects
+from m5.objects import *
+import ethz_utils
+from ethz_utils import *
+import ethz_configs
+from ethz_configs import *
+import _gem5_params
+from _gem5_params import *
+
+####################################
+# Address range of the cube c in r (a contiguous block)
+def ethz_cube_range(r, c):
+    size = r.size() / SMC_NUM_CUBES
+    return m5.objects.AddrRange(r.start + c * size, size = size)
+
+####################################
+# Ranges served behind the pass-through link which leads to the cube c
+def ethz_passthrough_ranges(cube_ranges, c):
+    if ( SMC_CUBE_TOPOLOGY == "CHAIN" ):
+        cubes = range(c, SMC_NUM_CUBES)
+    else:
+        cubes = [c]
+    return [ cube_ranges[k] for k in cubes ]
+
+####################################
+# Create the vaults of all cubes, and the crossbars and pass-through links
+#  of the cubes other than the first one (which uses system.smcxbar)
+def ethz_config_cubes(options, system):
+    import math
+    nbr_mem_ctrls = options.mem_channels
+    vault_bits = int(math.log(nbr_mem_ctrls, 2))
+    cube_bits = int(math.log(SMC_NUM_CUBES, 2))
+    if 2 ** vault_bits != nbr_mem_ctrls:
+        ethz_print_err("Number of memory channels must be a power of 2")
+    if 2 ** cube_bits != SMC_NUM_CUBES:
+        ethz_print_err("SMC_NUM_CUBES must be a power of 2")
+    if ( len(system.mem_ranges) != 1 ):
+        ethz_print_err("Multi-cube topologies support only one memory range")
+    if ( options.mem_type != "HMCVault" ):
+        ethz_print_err("Multi-cube topologies are only supported with HMCVault")
+    if ( HAVE_PIM_CLUSTER == "TRUE" ):
+        ethz_print_err("Multi-cube topologies are not supported with HAVE_PIM_CLUSTER")
+    if ( SMC_CUBE_TOPOLOGY != "CHAIN" and SMC_CUBE_TOPOLOGY != "STAR" ):
+        ethz_print_err("Illegal SMC_CUBE_TOPOLOGY: " + SMC_CUBE_TOPOLOGY)
+
+    r = system.mem_ranges[0]
+    cls = MemConfig.get(options.mem_type)
+
+    # Vaults of all the cubes share the parameters and the clock domain
+    system.vault_clk_domain = SrcClockDomain(clock = VAULT_CLOCK_FREQUENCY, voltage_domain = VoltageDomain(voltage = '1V'))
+    shared = ethz_smc_vault_params()
+    shared['channels'] = nbr_mem_ctrls      # Stripes of each vault range (within its cube)
+    shared['clk_domain'] = system.vault_clk_domain
+    vaults = cls.replicate(nbr_mem_ctrls * SMC_NUM_CUBES, shared)
+    intlv_low_bit = ethz_intlv_low_bit(cls, vaults[0], system.cache_line_size.value)
+    cube_ranges = [ ethz_cube_range(r, c) for c in xrange(SMC_NUM_CUBES) ]
+    for i in xrange(len(vaults)):
+        vaults[i].range = ethz_intlv_range(cube_ranges[i / nbr_mem_ctrls], i % nbr_mem_ctrls, vault_bits, intlv_low_bit)
+    system.mem_ctrls = vaults
+
+    # Crossbars of the cubes behind the first one
+    n = SMC_NUM_CUBES - 1
+    system.cubexbar = NoncoherentXBar.replicate(n, {
+        'width'         : AXI_DATA_W/8,
+        'header_cycles' : 1,
+        'clk_domain'    : system.smcxbar.clk_domain })
+
+    # Pass-through links between the cubes
+    system.passthrough = Bridge.replicate(n, {
+        'req_size'              : GEM5_LINK_BUFFER_SIZE_REQ,
+        'resp_size'             : GEM5_LINK_BUFFER_SIZE_RSP,
+        'serialization_enable'  : True,
+        'serialization_unit'    : SERIALLINKS_NUM_LANES_PER_LINK,
+        'delay'                 : GEM5_PASSTHROUGH_LINK_LATENCY,
+        'clk_domain'            : system.seriallink_clk_domain },
+        per_index = lambda k: { 'ranges' : ethz_passthrough_ranges(cube_ranges, k+1) })
+
+    # One monitor at the entrance of each cube (the first cube is measured by Lmon)
+    if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
+        system.Cmon = CommMonitor.replicate(n)
+
+    for k in xrange(n):
+        if ( SMC_CUBE_TOPOLOGY == "CHAIN" and k > 0 ):
+            upstream = system.cubexbar[k-1]
+        else:
+            upstream = system.smcxbar
+        upstream.master = system.passthrough[k].slave
+        if ( GEM5_ENABLE_COMM_MONITORS == "TRUE" ):
+            system.passthrough[k].master = system.Cmon[k].slave
+            system.Cmon[k].master = system.cubexbar[k].slave
+        else:
+            system.passthrough[k].master = system.cubexbar[k].slave
+
+    # Connect the vaults to the crossbar of their cube
+    for i in xrange(len(system.mem_ctrls)):
+        c = i / nbr_mem_ctrls
+        if ( c == 0 ):
+            system.mem_ctrls[i].port = system.smcxbar.master
+        else:
+            system.mem_ctrls[i].port = system.cubexbar[c-1].master
+
+    ethz_print_val("system.cache_line_size.value (bytes)", system.cache_line_size.value);
+    ethz_print_val("number of cubes", str(SMC_NUM_CUBES) + " (" + SMC_CUBE_TOPOLOGY + ")");
+    ethz_print_val("number of vaults per cube", nbr_mem_ctrls);
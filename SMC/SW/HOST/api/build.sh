@@ -10,9 +10,25 @@ echo -e "
 #define PIM_STATUS_REG		$PIM_STATUS_REG
 #define PIM_COMMAND_REG		$PIM_COMMAND_REG
 #define PIM_SREG		$PIM_SREG
+#define PIM_SREG_COUNT		$PIM_SREG_COUNT
 #define PIM_VREG		$PIM_VREG
 #define PIM_VREG_SIZE		$PIM_VREG_SIZE
 #define PIM_M5_REG		$PIM_M5_REG
+#define PIM_CMDQ_RING		$PIM_CMDQ_RING
+#define PIM_CMDQ_HEAD		$PIM_CMDQ_HEAD
+#define PIM_CMDQ_TAIL		$PIM_CMDQ_TAIL
+#define PIM_CMDQ_SIZE		$PIM_CMDQ_SIZE
+#define PIM_TEXT_OFFSET		$PIM_TEXT_OFFSET
+#define PIM_KCACHE_OFFSET	$PIM_KCACHE_OFFSET
+#define PIM_KCACHE_SLOTS	$PIM_KCACHE_SLOTS
+#define PIM_KCACHE_SLOT_SIZE	$(PIM_KCACHE_SLOT_SIZE)
+#define PIM_KCACHE_TAG		$PIM_KCACHE_TAG
+#define PIM_KCACHE_USED		$PIM_KCACHE_USED
+#define PIM_KCACHE_ACTIVE	$PIM_KCACHE_ACTIVE
+#define PIM_KCACHE_LOAD		$PIM_KCACHE_LOAD
+#define PIM_POLL_MIN_ns		$PIM_HOST_POLL_MIN_ns
+#define PIM_POLL_MAX_ns		$PIM_HOST_POLL_MAX_ns
+$(set_if_true $PIM_HOST_WAIT_INTERRUPT "#define PIM_WAIT_INTERRUPT")
 $(set_if_true $DEBUG_PIM_API "#define DEBUG_API")
 " > _params.hh
 
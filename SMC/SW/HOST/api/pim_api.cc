@@ -2,7 +2,12 @@
 #include "definitions.h"
 #include <unistd.h>		// getpagesize
 #include <string.h>		// memcpy
+#include <iterator>		// istreambuf_iterator
+#include <algorithm>		// min
 #include "defs.h"
+#ifdef __aarch64__
+#include <arm_neon.h>		// uint64x2_t
+#endif
 
 uint8_t  PIMAPI::CMD_DEMO = PIM_COMMAND_DEMO;
 uint8_t  PIMAPI::CMD_RUN_KERNEL = PIM_COMMAND_RUN_KERNEL;
@@ -10,16 +15,107 @@ uint8_t  PIMAPI::M5_ENABLE_PACKET_LOG = PIM_ENABLE_PACKET_LOG;
 uint8_t  PIMAPI::M5_DISABLE_PACKET_LOG = PIM_DISABLE_PACKET_LOG;
 uint8_t  PIMAPI::M5_TIME_STAMP = PIM_TIME_STAMP;
 uint8_t  PIMAPI::M5_EXIT = PIM_EXIT_GEM5;
+unsigned PIMAPI::SHARED_CACHED = PIM_SHARED_CACHED;
+unsigned PIMAPI::SHARED_UNCACHED = PIM_SHARED_UNCACHED;
+
+//*********************************************
+/*
+  Copy words to (from) the uncached registers of PIM with the widest access
+  of the host: each aligned pair of words is one transaction on the link
+  (a 16B NEON st1/ld1 on ARMv8, an 8B strd/ldrd on ARMv7).
+  Return the number of transactions.
+*/
+static unsigned store_words( volatile ulong_t* dst, const ulong_t* src, unsigned count )
+{
+	unsigned i = 0, n = 0;
+#if defined(__aarch64__) || defined(__arm__)
+	if ( count > 0 && (unsigned long)dst % (2*sizeof(ulong_t)) != 0 )
+	{
+		dst[0] = src[0];
+		i = n = 1;
+	}
+	for ( ; i+1 < count; i += 2, n++ )
+	{
+#ifdef __aarch64__
+		uint64x2_t v = vld1q_u64((const uint64_t*)(src+i));
+		asm volatile("st1 {%1.2d}, [%0]" :: "r"(dst+i), "w"(v) : "memory");
+#else
+		uint64_t v = src[i] | ((uint64_t)src[i+1] << 32);
+		asm volatile("strd %Q1, %R1, [%0]" :: "r"(dst+i), "r"(v) : "memory");
+#endif
+	}
+#endif
+	for ( ; i < count; i++, n++ )
+		dst[i] = src[i];
+	return n;
+}
+
+static unsigned load_words( ulong_t* dst, volatile const ulong_t* src, unsigned count )
+{
+	unsigned i = 0, n = 0;
+#if defined(__aarch64__) || defined(__arm__)
+	if ( count > 0 && (unsigned long)src % (2*sizeof(ulong_t)) != 0 )
+	{
+		dst[0] = src[0];
+		i = n = 1;
+	}
+	for ( ; i+1 < count; i += 2, n++ )
+	{
+#ifdef __aarch64__
+		uint64x2_t v;
+		asm volatile("ld1 {%0.2d}, [%1]" : "=w"(v) : "r"(src+i) : "memory");
+		vst1q_u64((uint64_t*)(dst+i), v);
+#else
+		uint64_t v;
+		asm volatile("ldrd %Q0, %R0, [%1]" : "=r"(v) : "r"(src+i) : "memory");
+		dst[i] = (ulong_t)v;
+		dst[i+1] = (ulong_t)(v >> 32);
+#endif
+	}
+#endif
+	for ( ; i < count; i++, n++ )
+		dst[i] = src[i];
+	return n;
+}
+
+//*********************************************
+PIMFuture::PIMFuture(PIMTask* _task, ulong_t _ticket)
+: task(_task), ticket(_ticket), _done(false)
+{
+}
+
+//*********************************************
+bool PIMFuture::done()
+{
+	return _done;
+}
+
+//*********************************************
+ulong_t PIMFuture::get_sreg( unsigned i )
+{
+	ASSERT_DBG( _done && i < PIM_SREG_COUNT );
+	return sreg[i];
+}
 
 //*********************************************
 PIMAPI::PIMAPI()
-: pim_va(NULL), pim_fd(-1)
+: pim_va(NULL), pim_fd(-1), cmdq_head(0), cmdq_tail(0)
 {
 	API_INFO("Written by Erfan Azarkhish - Debugging Enabled");
 	open_device();
 	mmap_device();
     /* Reset statistics */
     stat_offload_size = 0;
+    stat_status_polls = 0;
+    stat_commands = 0;
+    stat_sreg_calls = 0;
+    stat_sreg_accesses = 0;
+    stat_kcache_hits = 0;
+    stat_kcache_misses = 0;
+    stat_kcache_saved = 0;
+    stat_shared_size = 0;
+    stat_shared_pages = 0;
+    stat_shared_flushes = 0;
 	PIMTask::PAGE_SIZE = getpagesize();
 	/* Calculate page shift based on page size */
 	unsigned p=PIMTask::PAGE_SIZE;
@@ -45,10 +141,15 @@ PIMAPI::PIMAPI()
 //*********************************************
 PIMAPI::~PIMAPI()
 {
+	// The pages of the tasks must stay pinned while PIM works on them
+	wait_all();
 	for (unsigned j=0; j<tasks.size(); j++)
 	{
 		delete tasks[j];
 	}
+	// The driver frees the shared buffers when the device is closed
+	for (unsigned j=0; j<shared.size(); j++)
+		munmap((void*)shared[j].first, shared[j].second);
 	API_INFO("API was killed successfully!");
 }
 
@@ -90,7 +191,7 @@ void PIMAPI::mmap_device()
 //*********************************************
 void PIMAPI::start_computation(uint8_t command)
 {
-    ASSERT_DBG(current_time_stamp==5)
+    ASSERT_DBG(pending.empty())
 	API_INFO("STARTING COMPUTATION ...");
 	give_command(command);
 	wake_up();
@@ -99,19 +200,21 @@ void PIMAPI::start_computation(uint8_t command)
 //*********************************************
 void PIMAPI::wait_for_completion()
 {
-    ASSERT_DBG(current_time_stamp==5)
+	#ifdef PIM_WAIT_INTERRUPT
+	// Sleep in the driver until the completion interrupt of PIM
 	uint8_t status = 0;
-	timespec short_sleep, sleep_rem;
-	short_sleep.tv_sec=0;
-	short_sleep.tv_nsec=50;
-
-	do 
+	if ( read(pim_fd, &status, 1) == 1 )
 	{
-		nanosleep(&short_sleep, &sleep_rem);
-		status = check_status();
 		API_INFO("PIM_STATUS_REG=%c", status );
 	}
-	while ( status != PIM_STATUS_DONE );
+	else
+	{
+		API_ALERT("The completion interrupt is not available, polling PIM_STATUS_REG instead");
+		poll_for_completion();
+	}
+	#else
+	poll_for_completion();
+	#endif
 
 	// API_INFO("NOTICE: WE ARE RELEASING EVERYTHING! BUT THIS IS NOT GOOD, LATER ONLY RELEASE WHEN NECESSARY");
 	// /*
@@ -134,6 +237,185 @@ void PIMAPI::wait_for_completion()
 	give_command(PIM_COMMAND_NOP);
 }
 
+//*********************************************
+void PIMAPI::poll_for_completion()
+{
+	// Adaptive backoff: the sleep between two reads of PIM_STATUS_REG is doubled each time
+	uint8_t status = 0;
+	timespec short_sleep, sleep_rem;
+	short_sleep.tv_sec=0;
+	short_sleep.tv_nsec=PIM_POLL_MIN_ns;
+
+	do 
+	{
+		nanosleep(&short_sleep, &sleep_rem);
+		status = check_status();
+		stat_status_polls++;
+		API_INFO("PIM_STATUS_REG=%c", status );
+		short_sleep.tv_nsec = std::min(2*short_sleep.tv_nsec, (long)PIM_POLL_MAX_ns);
+	}
+	while ( status != PIM_STATUS_DONE );
+}
+
+//*********************************************
+PIMFuture* PIMAPI::submit( PIMTask* task, uint8_t command )
+{
+	API_INFO("Submitting command %c of task [%s] (#%ld)", command, task->getName(), cmdq_head);
+	// The slice table is replaced for a new task, so PIM must not be running
+	if ( !task->offloaded )
+	{
+		wait_all();
+		allocate_task(task);
+	}
+
+	// Wait for a free entry
+	while ( cmdq_head - cmdq_tail >= PIM_CMDQ_SIZE )
+		wait(pending.front());
+
+	// Build the entry here, and store each word of it only once
+	ulong_t regs[PIM_SREG_COUNT] = {0};
+	for (unsigned i=0; i<task->data.size(); i++)
+		regs[task->data[i]->reg] = task->data[i]->v_addr;
+	for (unsigned i=0; i<task->args.size(); i++)
+		regs[task->args[i].first] = task->args[i].second;
+	volatile ulong_t* entry = cmdq_entry(cmdq_head);
+	stat_sreg_accesses += store_words(entry+PIM_CMDQ_SREG, regs, PIM_SREG_COUNT);
+	entry[PIM_CMDQ_COMMAND] = command;
+	stat_sreg_accesses++;
+
+	// PIM must see the whole entry before the new head
+	__sync_synchronize();
+	cmdq_head++;
+	*((volatile ulong_t*)(pim_va+PIM_CMDQ_HEAD)) = cmdq_head;
+	wake_up();
+
+	PIMFuture* future = new PIMFuture(task, cmdq_head-1);
+	pending.push_back(future);
+	stat_commands++;
+	return future;
+}
+
+//*********************************************
+bool PIMAPI::poll( PIMFuture* future )
+{
+	collect();
+	return future->done();
+}
+
+//*********************************************
+void PIMAPI::wait( PIMFuture* future )
+{
+	timespec short_sleep, sleep_rem;
+	short_sleep.tv_sec=0;
+	short_sleep.tv_nsec=PIM_POLL_MIN_ns;
+	#ifdef PIM_WAIT_INTERRUPT
+	bool interrupt = true;
+	#endif
+
+	while ( !poll(future) )
+	{
+		// PIM has gone to sleep before the wake-up of the last commands
+		if ( check_status() == PIM_STATUS_SLEEP )
+			wake_up();
+
+		#ifdef PIM_WAIT_INTERRUPT
+		// Sleep in the driver until the completion interrupt of this command (or a timeout)
+		if ( interrupt && ioctl(pim_fd, PIM_IOCTL_WAIT_COMMAND, future->ticket) >= 0 )
+			continue;
+		interrupt = false;
+		#endif
+
+		// Adaptive backoff (see poll_for_completion)
+		nanosleep(&short_sleep, &sleep_rem);
+		stat_status_polls++;
+		short_sleep.tv_nsec = std::min(2*short_sleep.tv_nsec, (long)PIM_POLL_MAX_ns);
+	}
+}
+
+//*********************************************
+void PIMAPI::wait_all()
+{
+	// The commands are finished in order
+	if ( !pending.empty() )
+		wait(pending.back());
+}
+
+//*********************************************
+void* PIMAPI::alloc_shared( ulong_t size, unsigned flags )
+{
+	// The slice table is replaced when the buffer is mapped, so PIM must not be running
+	wait_all();
+	PIMSharedAlloc req;
+	req.size = size;
+	req.flags = flags;
+	req.offset = 0;
+	if ( ioctl(pim_fd, PIM_IOCTL_ALLOC_SHARED, &req) < 0 )
+	{
+		API_ALERT("Error happened in ioctl: (PIM_IOCTL_ALLOC_SHARED) %ld(B)", size);
+		throw std::exception();
+	}
+
+	// The offset of the buffer is a cookie given by the driver
+	void* addr = mmap(NULL, req.size, PROT_READ|PROT_WRITE, MAP_SHARED, pim_fd, req.offset);
+	if ( addr == MAP_FAILED )
+	{
+		API_ALERT("Memory map of the shared buffer failed");
+		perror("mmap");
+		throw std::exception();
+	}
+	API_INFO("Shared buffer mapped at address %lx (%ld B, %s)", (ulong_t)addr, req.size, (flags == SHARED_UNCACHED) ? "uncached" : "cached");
+	shared.push_back(std::make_pair((ulong_t)addr, req.size));
+	stat_shared_size += req.size;
+	return addr;
+}
+
+//*********************************************
+void PIMAPI::flush_shared( void* addr, ulong_t size )
+{
+	ulong_t range[2] = { (ulong_t)addr, size };
+	if ( ioctl(pim_fd, PIM_IOCTL_FLUSH_SHARED, range) < 0 )
+	{
+		API_ALERT("Error happened in ioctl: (PIM_IOCTL_FLUSH_SHARED) %lx", (ulong_t)addr);
+		return;
+	}
+	stat_shared_flushes++;
+}
+
+//*********************************************
+bool PIMAPI::is_shared(PIMPage* page)
+{
+	ulong_t start = page->v_pn_start << PIMTask::PAGE_SHIFT;
+	ulong_t end = start + (page->count << PIMTask::PAGE_SHIFT);
+	for (unsigned i=0; i<shared.size(); i++)
+		if ( start >= shared[i].first && end <= shared[i].first + shared[i].second )
+			return true;
+	return false;
+}
+
+//*********************************************
+volatile ulong_t* PIMAPI::cmdq_entry(ulong_t n)
+{
+	ASSERT_DBG( PIM_CMDQ_RING + PIM_CMDQ_SIZE*(PIM_CMDQ_SREG+PIM_SREG_COUNT)*sizeof(ulong_t) <= PHY_SIZE );
+	return (volatile ulong_t*)(pim_va+PIM_CMDQ_RING) + (n % PIM_CMDQ_SIZE)*(PIM_CMDQ_SREG+PIM_SREG_COUNT);
+}
+
+//*********************************************
+void PIMAPI::collect()
+{
+	ulong_t tail = *((volatile ulong_t*)(pim_va+PIM_CMDQ_TAIL));
+	while ( cmdq_tail < tail )
+	{
+		ASSERT_DBG( !pending.empty() );
+		PIMFuture* future = pending.front();
+		pending.pop_front();
+		volatile ulong_t* entry = cmdq_entry(cmdq_tail);
+		stat_sreg_accesses += load_words(future->sreg, entry+PIM_CMDQ_SREG, PIM_SREG_COUNT);
+		future->_done = true;
+		API_INFO("Command #%ld of task [%s] is done", cmdq_tail, future->task->getName());
+		cmdq_tail++;
+	}
+}
+
 //*********************************************
 void PIMAPI::write_vreg( uint8_t* value )
 {
@@ -151,15 +433,37 @@ void PIMAPI::read_vreg( uint8_t* value )
 //*********************************************
 void PIMAPI::write_sreg( unsigned index, ulong_t value )
 {
-    ASSERT_DBG(current_time_stamp==3)
 	API_INFO("  SREG[%d] = 0x%lx", index, value );
-	((ulong_t*)(pim_va+PIM_SREG))[index] = value;
+	ASSERT_DBG( index < PIM_SREG_COUNT );
+	((volatile ulong_t*)(pim_va+PIM_SREG))[index] = value;
+	stat_sreg_calls++;
+	stat_sreg_accesses++;
 }
 
 //*********************************************
 ulong_t PIMAPI::read_sreg( unsigned index )
 {
-	return ((ulong_t*)(pim_va+PIM_SREG))[index];
+	ASSERT_DBG( index < PIM_SREG_COUNT );
+	stat_sreg_calls++;
+	stat_sreg_accesses++;
+	return ((volatile ulong_t*)(pim_va+PIM_SREG))[index];
+}
+
+//*********************************************
+void PIMAPI::write_sregs( unsigned first, const ulong_t* values, unsigned count )
+{
+	API_INFO("  SREG[%d..%d] = 0x%lx ...", first, first+count-1, count ? values[0] : 0 );
+	ASSERT_DBG( first+count <= PIM_SREG_COUNT );
+	stat_sreg_calls++;
+	stat_sreg_accesses += store_words((volatile ulong_t*)(pim_va+PIM_SREG) + first, values, count);
+}
+
+//*********************************************
+void PIMAPI::read_sregs( unsigned first, ulong_t* values, unsigned count )
+{
+	ASSERT_DBG( first+count <= PIM_SREG_COUNT );
+	stat_sreg_calls++;
+	stat_sreg_accesses += load_words(values, (volatile ulong_t*)(pim_va+PIM_SREG) + first, count);
 }
 
 //*********************************************
@@ -176,6 +480,33 @@ uint8_t PIMAPI::read_byte(ulong_t offset)
 	return *((uint8_t*)(pim_va+offset));
 }
 
+//*********************************************
+void PIMAPI::write_block(ulong_t offset, const uint8_t* data, ulong_t size)
+{
+	ASSERT_DBG( offset+size <= PHY_SIZE );
+	// Bytes up to the first aligned word, then whole words, then the tail
+	while ( size > 0 && offset % sizeof(ulong_t) != 0 )
+	{
+		write_byte(offset++, *data++);
+		size--;
+	}
+	volatile ulong_t* dst = (volatile ulong_t*)(pim_va+offset);
+	while ( size >= sizeof(ulong_t) )
+	{
+		ulong_t word;
+		memcpy(&word, data, sizeof(ulong_t));	// data may be unaligned
+		*dst++ = word;
+		data += sizeof(ulong_t);
+		offset += sizeof(ulong_t);
+		size -= sizeof(ulong_t);
+	}
+	while ( size > 0 )
+	{
+		write_byte(offset++, *data++);
+		size--;
+	}
+}
+
 //*********************************************
 uint8_t PIMAPI::check_status()
 {
@@ -203,11 +534,167 @@ void PIMAPI::wake_up()
 //*********************************************
 void PIMAPI::offload_kernel(char* name)
 {
-    ASSERT_DBG(current_time_stamp==1)
+	// PIM must not be running the previous kernel
+	wait_all();
 	API_INFO("Offloading kernel: %s", name);
-	std::ifstream kf(name);
+	std::ifstream kf(name, std::ios::binary);
+	if ( !kf )
+	{
+		API_ALERT("Cannot open the kernel: %s", name);
+		throw std::exception();
+	}
+
+	// The binary images start with the magic number of their first section
+	uint32_t magic = 0;
+	kf.read((char*)&magic, sizeof(magic));
+	bool is_image = ( kf.gcount() == sizeof(magic) && magic == PIM_KIMG_MAGIC );
+	kf.clear();
+	kf.seekg(0);
+
+	KernelSections sections;
+	if ( is_image )
+		read_kernel_image(kf, sections);
+	else
+		read_kernel_hex(kf, sections);
+	if ( sections.empty() )
+	{
+		API_INFO("Nothing to offload (the kernel is built into the resident code).");
+		return;
+	}
+
+	ulong_t size = 0;
+	for (unsigned i=0; i<sections.size(); i++)
+		size += sections[i].second.size();
+	ulong_t hash = kernel_hash(sections);
+	volatile ulong_t* tag  = (volatile ulong_t*)(pim_va+PIM_KCACHE_TAG);
+	volatile ulong_t* used = (volatile ulong_t*)(pim_va+PIM_KCACHE_USED);
+
+	// The same kernel is still in .text and .rodata
+	if ( *((volatile ulong_t*)(pim_va+PIM_KCACHE_ACTIVE)) == hash )
+	{
+		API_INFO("The kernel is already loaded.");
+		stat_kcache_hits++;
+		stat_kcache_saved += size;
+		return;
+	}
+
+	// Without the cache, write the kernel to .text and .rodata directly
+	if ( !kcache_fits(sections) )
+	{
+		for (unsigned i=0; i<sections.size(); i++)
+			write_block(sections[i].first, &sections[i].second[0], sections[i].second.size());
+		*((volatile ulong_t*)(pim_va+PIM_KCACHE_ACTIVE)) = hash;
+		stat_offload_size += size;
+		stat_kcache_misses++;
+		API_INFO("Offloading completed.");
+		return;
+	}
+
+	// Look up the kernel, and find the least recently used slot
+	int slot = -1;
+	unsigned lru = 0;
+	ulong_t clock = 0;
+	for (unsigned i=0; i<PIM_KCACHE_SLOTS; i++)
+	{
+		if ( tag[i] == hash )
+			slot = i;
+		if ( used[i] < used[lru] )
+			lru = i;
+		clock = std::max(clock, (ulong_t)used[i]);
+	}
+
+	if ( slot >= 0 )
+	{
+		API_INFO("The kernel was found in slot %d of the kernel cache.", slot);
+		stat_kcache_hits++;
+		stat_kcache_saved += size;
+	}
+	else
+	{
+		// Replace the slot (its tag is invalid until the kernel is complete)
+		slot = lru;
+		API_INFO("Writing the kernel to slot %d of the kernel cache.", slot);
+		tag[slot] = 0;
+		ulong_t base = PIM_KCACHE_OFFSET + slot*PIM_KCACHE_SLOT_SIZE - PIM_TEXT_OFFSET;
+		for (unsigned i=0; i<sections.size(); i++)
+			write_block(base + sections[i].first, &sections[i].second[0], sections[i].second.size());
+		__sync_synchronize();
+		tag[slot] = hash;
+		stat_offload_size += size;
+		stat_kcache_misses++;
+	}
+	used[slot] = clock + 1;
+	kcache_load(slot);
+	API_INFO("Offloading completed.");
+}
+
+//*********************************************
+ulong_t PIMAPI::kernel_hash(const KernelSections& sections)
+{
+	// FNV-1a over the addresses and the contents of the sections
+	uint64_t hash = 14695981039346656037ULL;
+	for (unsigned i=0; i<sections.size(); i++)
+	{
+		uint64_t addr = sections[i].first;
+		for (unsigned j=0; j<sizeof(addr); j++)
+			hash = (hash ^ ((addr >> (8*j)) & 0xFF)) * 1099511628211ULL;
+		for (unsigned j=0; j<sections[i].second.size(); j++)
+			hash = (hash ^ sections[i].second[j]) * 1099511628211ULL;
+	}
+	ulong_t folded = (ulong_t)(hash ^ (hash >> 32));
+	return folded ? folded : 1;
+}
+
+//*********************************************
+bool PIMAPI::kcache_fits(const KernelSections& sections)
+{
+	if ( PIM_KCACHE_SLOTS == 0 )
+		return false;
+	for (unsigned i=0; i<sections.size(); i++)
+		if ( sections[i].first < PIM_TEXT_OFFSET ||
+			 sections[i].first + sections[i].second.size() > PIM_TEXT_OFFSET + PIM_KCACHE_SLOT_SIZE )
+			return false;
+	return true;
+}
+
+//*********************************************
+void PIMAPI::kcache_load(unsigned slot)
+{
+	ASSERT_DBG( slot < PIM_KCACHE_SLOTS );
+	*((volatile ulong_t*)(pim_va+PIM_KCACHE_LOAD)) = slot;
+	start_computation(PIM_COMMAND_LOAD_KERNEL);
+	wait_for_completion();
+}
+
+//*********************************************
+void PIMAPI::read_kernel_image(std::ifstream& kf, KernelSections& sections)
+{
+	std::vector<uint8_t> image((std::istreambuf_iterator<char>(kf)), std::istreambuf_iterator<char>());
+	ulong_t pos = 0;
+
+	while ( pos + PIM_KIMG_HDR_SIZE <= image.size() )
+	{
+		uint32_t magic, size;
+		uint64_t addr;
+		memcpy(&magic, &image[pos], 4);
+		memcpy(&size,  &image[pos+4], 4);
+		memcpy(&addr,  &image[pos+8], 8);
+		pos += PIM_KIMG_HDR_SIZE;
+		if ( magic != PIM_KIMG_MAGIC || pos + size > image.size() )
+		{
+			API_ALERT("Corrupted kernel image at byte %lu", pos - PIM_KIMG_HDR_SIZE);
+			throw std::exception();
+		}
+		std::cout << "@ADDR: " << addr << " @SIZE: " << size << std::endl;
+		sections.push_back(std::make_pair((ulong_t)addr, std::vector<uint8_t>(image.begin()+pos, image.begin()+pos+size)));
+		pos += (size + PIM_KIMG_ALIGN - 1) / PIM_KIMG_ALIGN * PIM_KIMG_ALIGN;
+	}
+}
+
+//*********************************************
+void PIMAPI::read_kernel_hex(std::ifstream& kf, KernelSections& sections)
+{
 	std::string line, term;
-	ulong_t load_offset=-1;
     #ifdef DEBUG_API
     ulong_t load_size=-1;
     #endif
@@ -222,7 +709,7 @@ void PIMAPI::offload_kernel(char* name)
 			if ( term == "@ADDR" )
 			{
 				iss >> term;
-				load_offset = atoi(term.c_str());
+				sections.push_back(std::make_pair((ulong_t)atoi(term.c_str()), std::vector<uint8_t>()));
 				std::cout << "@ADDR: " << term << " ";
 			}
 			else
@@ -244,49 +731,20 @@ void PIMAPI::offload_kernel(char* name)
 			else
 			{
 				value = strtol(term.c_str(), NULL, 16);
-// 				// Compare
-// 				char READ = read_byte(load_offset);
-// 				if( value != READ )
-// 				{
-// 					cout << std::hex << (int)value;
-// 					cout << " " << std::hex << (int)READ << endl;
-// 				}
-				write_byte(load_offset, value);
-                stat_offload_size++;
+				ASSERT_DBG( !sections.empty() );
+				sections.back().second.push_back(value);
 				num_bytes++;
-				load_offset++;
 			}
 		}
 	}
-	API_INFO("Offloading completed.");
 }
 
 //*********************************************
 void PIMAPI::offload_task(PIMTask* task)
 {
-    ASSERT_DBG(current_time_stamp==3)
 	API_INFO("Offloading task [%s] to the PIM device", task->getName());
-	tasks.push_back(task);
-	task->updatePages();
-	task->print();
-	ulong_t count = task->vpages.size();
-	ASSERT_DBG(count*2 < PIM_IOCTL_MAX_ARGS);
-
-	/*
-	The virtual address range must be contiguous, so in the user application,
-	we must make sure that all our data structures fall in the same virtual page range
-	 */
-	ASSERT_DBG(count == 1);
-
-	/* Store the pointers and sizes in the ioctl_arg structure */
-	ioctl_arg[0] = count*2;
-	ulong_t i=0;
-	while ( i < count )
-	{
-		ioctl_arg[2*i+1] = (task->vpages[i]->v_pn_start) << PIMTask::PAGE_SHIFT; // Virtual Address (Aligned to page borders)
-		ioctl_arg[2*i+2] = task->vpages[i]->count;		// Page Count
-		i++;
-	}
+	// PIM must not be running when the slice table is replaced
+	wait_all();
 
 	/*
 	  Send pointers to this task's data sets to PIM via its scalar
@@ -297,42 +755,126 @@ void PIMAPI::offload_task(PIMTask* task)
 	  adding PIM_HOST_OFFSET to it
 	*/
 	API_INFO("Sending data pointers to PIM ...");
+	ulong_t regs[PIM_SREG_COUNT];
+	bool used[PIM_SREG_COUNT] = {false};
 	for (unsigned i=0; i<task->data.size(); i++)
 	{
 		unsigned long translated = (unsigned long)task->data[i]->v_addr; // + PIM_HOST_OFFSET;		(REMOVED BY ERFAN)
-		write_sreg(task->data[i]->reg, translated );
+		ASSERT_DBG( task->data[i]->reg < PIM_SREG_COUNT );
+		regs[task->data[i]->reg] = translated;
+		used[task->data[i]->reg] = true;
 		//API_INFO("  SREG[%d] = 0x%x = Pointer to Data[%d]", task->data[i]->reg, translated, i);
-	}	
-
-	/* 
-	  Contact the driver to:
-	  Pin these pages into the memory
-	  Create a SliceTable based on these pages
-	  Send a pointer to the SliceTable to PIM
-	 */
-	long success = ioctl(pim_fd,PIM_IOCTL_ALLOCATE_DATA, ioctl_arg);
-	if ( !success )
-	{
-		API_ALERT("Passing arguments to ioctl was not successful! TODO add retry later");
-		return;
-	}	
-	else if ( success < 0 )
+	}
+	// One batch per run of adjacent registers (the others may hold the arguments written by the user)
+	for (unsigned first=0; first<PIM_SREG_COUNT; )
 	{
-		API_ALERT("Error happened in ioctl: %ld", success);
-		return;
+		if ( !used[first] ) { first++; continue; }
+		unsigned last = first;
+		while ( last+1 < PIM_SREG_COUNT && used[last+1] )
+			last++;
+		write_sregs(first, regs+first, last-first+1);
+		first = last+1;
 	}
 
+	if ( !task->offloaded )
+		allocate_task(task);
 	API_INFO("Task was offloaded successfully.");
 }
 
+//*********************************************
+void PIMAPI::allocate_task(PIMTask* task)
+{
+	ASSERT_DBG(pending.empty());
+	tasks.push_back(task);
+	task->updatePages();
+	task->print();
+
+	// The shared buffers are already in the slice table
+	vector<PIMPage*> vpages;
+	for (unsigned i=0; i<task->vpages.size(); i++)
+	{
+		if ( is_shared(task->vpages[i]) )
+			stat_shared_pages += task->vpages[i]->count;
+		else
+			vpages.push_back(task->vpages[i]);
+	}
+	ulong_t count = vpages.size();
+
+	/*
+	The virtual address ranges of a task (and of different tasks) can be
+	discontiguous, the driver accumulates them in the same slice table.
+	Each ioctl carries up to (PIM_IOCTL_MAX_ARGS-1)/2 ranges.
+	 */
+	for ( ulong_t first=0; first<count; first+=(PIM_IOCTL_MAX_ARGS-1)/2 )
+	{
+		ulong_t n = std::min(count-first, (ulong_t)(PIM_IOCTL_MAX_ARGS-1)/2);
+
+		/* Store the pointers and sizes in the ioctl_arg structure */
+		ioctl_arg[0] = n*2;
+		for ( ulong_t i=0; i<n; i++ )
+		{
+			ioctl_arg[2*i+1] = (vpages[first+i]->v_pn_start) << PIMTask::PAGE_SHIFT; // Virtual Address (Aligned to page borders)
+			ioctl_arg[2*i+2] = vpages[first+i]->count;		// Page Count
+		}
+
+		/* 
+		  Contact the driver to:
+		  Pin these pages into the memory
+		  Create a SliceTable based on all pinned pages
+		  Send a pointer to the SliceTable to PIM
+		 */
+		long success = ioctl(pim_fd,PIM_IOCTL_ALLOCATE_DATA, ioctl_arg);
+		if ( !success )
+		{
+			API_ALERT("Passing arguments to ioctl was not successful! TODO add retry later");
+			return;
+		}	
+		else if ( success < 0 )
+		{
+			API_ALERT("Error happened in ioctl: %ld", success);
+			return;
+		}
+	}
+	task->offloaded = true;
+}
+
 void PIMAPI::report_statistics()
 {
     cout << "********************* API STATISTICS ******************" << endl;
 
     cout <<"softwarestat.kernel.offloadsize\t" << stat_offload_size << " (B)" << endl;
-    cout <<"softwarestat.task.datasize\t" << tasks[0]->stat_datasize << " (B)" << endl;
-    cout <<"softwarestat.task.pagesize\t" << tasks[0]->vpages[0]->count * PIMTask::PAGE_SIZE << " (B)" << endl;
-    cout <<"softwarestat.task.overhead\t" << (((float)(tasks[0]->vpages[0]->count*PIMTask::PAGE_SIZE)/(float)(tasks[0]->stat_datasize))-1.0)*100.0 << " (Percent)" << endl;
+    cout <<"softwarestat.status.polls\t" << stat_status_polls << endl;
+    cout <<"softwarestat.queue.commands\t" << stat_commands << endl;
+    cout <<"softwarestat.sreg.calls\t" << stat_sreg_calls << endl;
+    cout <<"softwarestat.sreg.accesses\t" << stat_sreg_accesses << endl;
+    cout <<"softwarestat.kcache.hits\t" << stat_kcache_hits << endl;
+    cout <<"softwarestat.kcache.misses\t" << stat_kcache_misses << endl;
+    cout <<"softwarestat.kcache.savedsize\t" << stat_kcache_saved << " (B)" << endl;
+    cout <<"softwarestat.shared.size\t" << stat_shared_size << " (B)" << endl;
+    cout <<"softwarestat.shared.pages\t" << stat_shared_pages << endl;
+    cout <<"softwarestat.shared.flushes\t" << stat_shared_flushes << endl;
+
+    // All tasks together
+    ulong_t datasize = 0, pagesize = 0;
+    for (unsigned i=0; i<tasks.size(); i++)
+    {
+        datasize += tasks[i]->stat_datasize;
+        for (unsigned j=0; j<tasks[i]->vpages.size(); j++)
+            pagesize += tasks[i]->vpages[j]->count * PIMTask::PAGE_SIZE;
+    }
+    cout <<"softwarestat.task.count\t" << tasks.size() << endl;
+    cout <<"softwarestat.task.datasize\t" << datasize << " (B)" << endl;
+    cout <<"softwarestat.task.pagesize\t" << pagesize << " (B)" << endl;
+    if ( datasize )
+        cout <<"softwarestat.task.overhead\t" << (((float)(pagesize)/(float)(datasize))-1.0)*100.0 << " (Percent)" << endl;
+
+    PIMSliceStats stats;
+    if ( slice_stats(&stats) )
+    {
+        cout <<"softwarestat.slices.span\t" << stats.span << endl;
+        cout <<"softwarestat.slices.avgsize\t" << stats.avg_slice_size << " (B)" << endl;
+        cout <<"softwarestat.slices.maxsize\t" << stats.max_slice_size << " (B)" << endl;
+    }
 
     long success = ioctl(pim_fd,PIM_IOCTL_REPORT_STATS, 0);
     if ( success <=0 )
@@ -342,12 +884,20 @@ void PIMAPI::report_statistics()
     }
 }
 
+//*********************************************
+bool PIMAPI::slice_stats(PIMSliceStats* stats)
+{
+    if ( ioctl(pim_fd, PIM_IOCTL_SLICE_STATS, stats) < 0 )
+    {
+        API_ALERT("Error happened in ioctl: (PIM_IOCTL_SLICE_STATS)");
+        return false;
+    }
+    return true;
+}
+
 //*********************************************
 void PIMAPI::record_time_stamp(uint8_t ID)
 {
-    #ifdef DEBUG_API
-    current_time_stamp = ID;
-    #endif
     give_m5_command(PIMAPI::M5_TIME_STAMP+ID);
 }
 
@@ -14,10 +14,32 @@
 #include <fstream>
 #include <iostream>
 #include <exception>
+#include <deque>
 #include "pim_task.hh"	// PIMTask, PIMData
 #include "pim_utils.hh"
 #include <iostream>
 
+struct PIMSliceStats;		// defs.h (driver)
+
+/*****************************************************/
+// A command submitted to the command queue of PIM (see PIMAPI::submit)
+class PIMFuture
+{
+public:
+	PIMFuture(PIMTask* task, ulong_t ticket);
+
+	bool done();						// PIM has finished this command (updated by PIMAPI::poll and PIMAPI::wait)
+	ulong_t get_sreg( unsigned i );		// SREG[i] after the execution of this command (results)
+
+	PIMTask* task;						// The task of this command
+	ulong_t ticket;						// Number of this command in the command queue
+
+private:
+	friend class PIMAPI;
+	bool _done;
+	ulong_t sreg[PIM_SREG_COUNT];
+};
+
 /*****************************************************/
 // PIM API class
 // Notice: this class can be linked as a static library to the user level application
@@ -28,17 +50,47 @@ public:
 	~PIMAPI();							// Close the PIM device and deallocate the memory
 
 	/* Offload methods */
-	void offload_kernel(char* name);	// Offload a kernel.hex code to the device
+	void offload_kernel(char* name);	// Offload a kernel.kimg (or kernel.hex) code to the device
+										// (only a load command if the kernel is in the kernel cache of PIM)
 	void offload_task(PIMTask* task);	// Offload a task to the PIM device (but not execute it yet)
 
 	/* Start/stop the computation task */
 	void start_computation( uint8_t command );	// Wake the PIM up and give command to execute	[NON-BLOCKING]
 	void wait_for_completion();					// Wait until PIM finishes executino 			[BLOCKING]
+													// (sleeps until the completion interrupt, or polls with adaptive backoff)
 
 	/* Commands to give to the PIM device (start_computation) */
 	static uint8_t CMD_RUN_KERNEL; 		// Run the previously offloaded kernel
 	static uint8_t CMD_DEMO;			// Run a preprogrammed Vector Addition: R3 = R1 + R2
 
+	/*
+	  Asynchronous offloading through the command queue of PIM (PIM_CMDQ_SIZE entries).
+	  Each command gets the data pointers and the arguments of its task in its SREGs,
+	  and PIM executes the commands in order. The first submit of a task pins its
+	  pages, which waits until the queue is empty.
+	  Notice: a future must not be deleted before it is done.
+	*/
+	PIMFuture* submit( PIMTask* task, uint8_t command );	// Enqueue a command 			[NON-BLOCKING, unless the queue is full]
+	bool poll( PIMFuture* future );						// Has PIM finished this command?	[NON-BLOCKING]
+	void wait( PIMFuture* future );						// Wait until PIM finishes this command	[BLOCKING]
+	void wait_all();									// Wait until the command queue is empty	[BLOCKING]
+
+	/*
+	  Zero-copy buffers shared with PIM: physically contiguous memory allocated by
+	  the driver and mapped in the application (up to the largest page order of the OS).
+	  A buffer is in the slice table as soon as it is allocated, so a task with all of
+	  its data in shared buffers is offloaded without pinning pages or flushing caches.
+	  SHARED_UNCACHED buffers are always coherent with PIM. The ranges of SHARED_CACHED
+	  buffers must be flushed after the host writes them and before it reads the results.
+	  Notice: the buffers are mapped in the mmap area, far from the static region of the
+	  apps (allocate_region), and the slice table covers all ranges between the lowest and
+	  the highest one. So the data of the tasks should be either all shared or all static.
+	*/
+	static unsigned SHARED_CACHED;
+	static unsigned SHARED_UNCACHED;
+	void* alloc_shared( ulong_t size, unsigned flags = SHARED_CACHED );	// Allocate and map a shared buffer	[BLOCKING, waits until the queue is empty]
+	void flush_shared( void* addr, ulong_t size );						// Flush a range of a shared buffer (only if cached)
+
 	/* 
 	  Direct communication with vector registers of PIM.
 	  Size : PIM_VREG_SIZE x (8b)
@@ -54,6 +106,13 @@ public:
 	void write_sreg( unsigned i, ulong_t value ); 	// Write a value to SR[i]  [HOST->PIM]
 	ulong_t read_sreg( unsigned i ); 				// Read a value from SR[i] [PIM->HOST]
 
+	/*
+	  Batched access to the scalar registers: SR[first] ... SR[first+count-1]
+	  are copied with one wide store (load) per aligned pair of registers.
+	*/
+	void write_sregs( unsigned first, const ulong_t* values, unsigned count );	// [HOST->PIM]
+	void read_sregs ( unsigned first, ulong_t* values, unsigned count );		// [PIM->HOST]
+
 	/*
 	Communicating with gem5 (for debugging)
 	*/
@@ -63,6 +122,7 @@ public:
 	static uint8_t M5_EXIT;
 	void give_m5_command(uint8_t command);			// Give a command to gem5 (for debugging only)
     void report_statistics();                       // Report software statistics
+    bool slice_stats(PIMSliceStats* stats);          // Statistics of the slice table (from the driver)
     void record_time_stamp(uint8_t ID);             // Record timestamp of gem5 and reset stats
 
 protected:
@@ -74,6 +134,7 @@ protected:
 	// Write and Read to/from the PIM device's registers
 	inline void write_byte(ulong_t offset, uint8_t data);
 	inline uint8_t read_byte(ulong_t offset);
+	void write_block(ulong_t offset, const uint8_t* data, ulong_t size);	// Wide aligned stores
 	
 private:
 
@@ -83,6 +144,37 @@ private:
 	//Map the whole physical range to userspace
 	void mmap_device();
 
+	// Poll PIM_STATUS_REG until PIM is done (adaptive backoff between PIM_POLL_MIN_ns and PIM_POLL_MAX_ns)
+	void poll_for_completion();
+
+	// Sections of a kernel (load address, contents)
+	typedef std::vector< std::pair<ulong_t, std::vector<uint8_t> > > KernelSections;
+
+	// Read the sections of a binary kernel image (*.kimg) or a hex dump (*.hex)
+	void read_kernel_image(std::ifstream& kf, KernelSections& sections);
+	void read_kernel_hex(std::ifstream& kf, KernelSections& sections);
+
+	// Hash of the sections of a kernel (never 0, the tag of the empty slots)
+	static ulong_t kernel_hash(const KernelSections& sections);
+
+	// Can the kernel be stored in a slot of the kernel cache? (only .text and .rodata)
+	bool kcache_fits(const KernelSections& sections);
+
+	// Copy a slot of the kernel cache to .text and .rodata (PIM must not be running)
+	void kcache_load(unsigned slot);
+
+	// Pin the pages of a task and update the slice table (PIM must not be running)
+	void allocate_task(PIMTask* task);
+
+	// Are the pages in a shared buffer? (they are never pinned)
+	bool is_shared(PIMPage* page);
+
+	// Entry of the command queue for the command number n
+	volatile ulong_t* cmdq_entry(ulong_t n);
+
+	// Copy the results of the finished commands to their futures
+	void collect();
+
 	// Pointer to the mmapped region of the PIM device
 	char* pim_va;
 
@@ -95,12 +187,28 @@ private:
 	// List of current tasks
 	vector<PIMTask*> tasks;
 
+	// Buffers shared with PIM (address, size)
+	vector< std::pair<ulong_t, ulong_t> > shared;
+
+	// Futures of the commands in the command queue (in order)
+	std::deque<PIMFuture*> pending;
+
+	// Number of commands submitted and collected (PIM_CMDQ_HEAD and PIM_CMDQ_TAIL as seen by the host)
+	ulong_t cmdq_head;
+	ulong_t cmdq_tail;
+
     /* statistics */
     ulong_t stat_offload_size;   // Size of the offloaded binary (B)
-
-    #ifdef DEBUG_API
-    unsigned current_time_stamp; // (only in debug mode)
-    #endif
+    ulong_t stat_status_polls;   // Number of reads of PIM_STATUS_REG while waiting for completion
+    ulong_t stat_commands;       // Number of commands submitted to the command queue
+    ulong_t stat_sreg_calls;     // Number of calls to the SREG access methods
+    ulong_t stat_sreg_accesses;  // Number of uncached SREG transactions (including the command queue)
+    ulong_t stat_kcache_hits;    // Number of kernels found in the kernel cache (or already loaded)
+    ulong_t stat_kcache_misses;  // Number of kernels written to PIM
+    ulong_t stat_kcache_saved;   // Size of the kernels not written thanks to the cache (B)
+    ulong_t stat_shared_size;    // Size of the shared buffers (B)
+    ulong_t stat_shared_pages;   // Number of pages of the tasks which were not pinned thanks to the shared buffers
+    ulong_t stat_shared_flushes; // Number of flushes of the shared buffers
 };
 
 #endif // _PIM_API_H_
@@ -9,6 +9,7 @@ PIMTask::PIMTask(string _name)
 {
 	name = _name;
 	_updated = false;
+	offloaded = false;
     stat_datasize = 0;
 }
 
@@ -56,6 +57,13 @@ void PIMTask::addData(void* addr, unsigned long size, unsigned reg)
 	data.push_back(d);
 }
 
+//*********************************************
+void PIMTask::addArg(unsigned reg, ulong_t value)
+{
+    API_INFO("Task.AddArg Reg:%d Value:0x%lx", reg, value);
+	args.push_back(make_pair(reg, value));
+}
+
 //*********************************************
 void PIMTask::print()
 {
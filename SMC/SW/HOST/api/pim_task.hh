@@ -47,6 +47,13 @@ public:
 	*/
 	void addData(void* addr, unsigned long size, unsigned reg);
 
+	/*
+	  Add a scalar argument to the commands submitted with this task (PIMAPI::submit)
+	  @reg: index of PIM's SREG to hold this value
+	  @value: value of the argument
+	*/
+	void addArg(unsigned reg, ulong_t value);
+
 	// Recalculate the allocated pages and merge the adjacent ones
 	void updatePages();
 
@@ -62,6 +69,12 @@ public:
 	// The virtual pages occupied by this task (Sorted List)
 	vector<PIMPage*> 	vpages;
 
+	// The scalar arguments of this task (SREG index, value)
+	vector< pair<unsigned, ulong_t> > args;
+
+	// The pages of this task have been pinned by the driver
+	bool offloaded;
+
 	// Page size of the OS
 	static unsigned PAGE_SIZE;
 
@@ -6,8 +6,9 @@ echo -e "
 #define NUM_TURNS $OFFLOADED_NUM_TURNS
 #define ARRAY_SIZE $OFFLOADED_ARRAY_SIZE
 #define WALK_STEP	$OFFLOADED_WALK_STEP
-#define FILE_NAME \"${OFFLOADED_KERNEL_NAME}.hex\"
+#define FILE_NAME \"${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT}\"
 #define REQUIRED_MEM_SIZE ($OFFLOADED_ARRAY_SIZE*sizeof(ulong_t))
+$(if [ $OFFLOADED_SHARED_BUFFER != NONE ]; then echo "#define SHARED_BUFFER PIMAPI::SHARED_$OFFLOADED_SHARED_BUFFER"; fi)
 $(set_if_true $INITIALIZE_ARRAY "#define INITIALIZE_ARRAY")
 $(set_if_true $DEBUG_PIM_APP "#define DEBUG_APP")
 $(set_if_true $OFFLOAD_THE_KERNEL "#define OFFLOAD_THE_KERNEL")
@@ -13,9 +13,14 @@ using namespace std;
 
 TYPE* A;
 
-void create_array()
+void create_array(PIMAPI* pim)
 {
+    #ifdef SHARED_BUFFER
+    cout << "Allocating the array in a shared buffer (zero-copy) ..." << endl;
+    A = (TYPE*)pim->alloc_shared(ARRAY_SIZE*sizeof(TYPE), SHARED_BUFFER);
+    #else
     A = (TYPE*)allocate_region(ARRAY_SIZE*sizeof(TYPE));
+    #endif
     #ifdef INITIALIZE_ARRAY
     cout << "Initializing array[i] to ..." << endl;
     for ( unsigned i=0; i< ARRAY_SIZE; i++)
@@ -23,6 +28,9 @@ void create_array()
     #else
     cout << "array is uninitialized!" << endl;
     #endif
+    #ifdef SHARED_BUFFER
+    pim->flush_shared(A, ARRAY_SIZE*sizeof(TYPE));  // Only if cached
+    #endif
 }
 
 ulong_t golden()
@@ -44,7 +52,7 @@ int main(int argc, char *argv[])
     init_region();
     PIMAPI *pim = new PIMAPI(); /* Instatiate the PIM API */ 
     cout << "(main.cpp): Kernel Name: " << FILE_NAME << endl;
-    create_array();
+    create_array(pim);
 
      cout << "(main.cpp): Offloading the computation kernel ... " << endl;
     ____TIME_STAMP(1);
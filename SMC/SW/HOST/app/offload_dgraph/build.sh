@@ -7,7 +7,7 @@ echo -e "
 #define NAME \"$OFFLOADED_KERNEL_NAME\"
 #define NODES $OFFLOADED_GRAPH_NODES
 #define DENSITY $OFFLOADED_GRAPH_DENSITY
-#define FILE_NAME \"${OFFLOADED_KERNEL_NAME}.hex\"
+#define FILE_NAME \"${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT}\"
 #define MAX_WEIGHT $OFFLOADED_GRAPH_MAX_WEIGHT
 #define PAGERANK_MAX_ITERATIONS $PAGERANK_MAX_ITERATIONS
 #define PAGERANK_MAX_ERROR $PAGERANK_MAX_ERROR
@@ -1,6 +1,8 @@
 #!/bin/bash
 
 if [ $OFFLOADED_KERNEL_NAME == sgraph_bfs ]; then step=7; else step=1; fi
+# The layout packs the successor lists (and the weights) in new CSR arrays (see layout.hh)
+if [ $OFFLOADED_GRAPH_LAYOUT != NONE ]; then LAYOUT_SIZE="+ 2*(NODES*MAX_OUTDEGREE*sizeof(node*) + NODES*SMC_BURST_SIZE_B + (1<<(NBITS_CH+NBITS_OF)))"; fi
 echo -e "
 #include \"defs.hh\"
 #define $OFFLOADED_KERNEL_NAME
@@ -8,12 +10,15 @@ echo -e "
 #define NAME \"$OFFLOADED_KERNEL_NAME\"
 #define NODES $OFFLOADED_GRAPH_NODES
 #define MAX_OUTDEGREE $OFFLOADED_GRAPH_MAX_OUTDEGREE
-#define FILE_NAME \"${OFFLOADED_KERNEL_NAME}.hex\"
+#define FILE_NAME \"${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT}\"
 #define PAGERANK_MAX_ITERATIONS $PAGERANK_MAX_ITERATIONS
 #define BFS_MAX_ITERATIONS $BFS_MAX_ITERATIONS
 #define PAGERANK_MAX_ERROR $PAGERANK_MAX_ERROR
 #define step $step
-#define REQUIRED_MEM_SIZE (NODES*sizeof(node) + NODES*MAX_OUTDEGREE*sizeof(node*) + NODES*MAX_OUTDEGREE*sizeof(ulong_t) $QUEUE_SIZE )
+#define NBITS_CH $NBITS_CH
+#define NBITS_OF $NBITS_OF
+#define GRAPH_LAYOUT GRAPH_LAYOUT_$OFFLOADED_GRAPH_LAYOUT
+#define REQUIRED_MEM_SIZE (NODES*sizeof(node) + NODES*MAX_OUTDEGREE*sizeof(node*) + NODES*MAX_OUTDEGREE*sizeof(ulong_t) $QUEUE_SIZE $LAYOUT_SIZE )
 #define MAX_WEIGHT $OFFLOADED_GRAPH_MAX_WEIGHT
 $(set_if_true $DEBUG_PIM_APP "#define DEBUG_APP")
 $(set_if_true $OFFLOAD_THE_KERNEL "#define OFFLOAD_THE_KERNEL")
@@ -0,0 +1,210 @@
+#ifndef LAYOUT_H_SGRAPH
+#define LAYOUT_H_SGRAPH
+
+#include "_app_params.h"
+#include "defs.hh"
+#include <vector>
+#include <deque>
+#include <algorithm>
+
+/*
+  Layout of the graph in memory (GRAPH_LAYOUT, see OFFLOADED_GRAPH_LAYOUT):
+  The nodes are renumbered, so that the nodes which are updated together are
+  close to each other in memory:
+    NONE:   keep the graph as it was created
+    DEGREE: sort by in-degree (most of the updates go to a few packed nodes)
+    BFS:    breadth-first order of the successors (from node 0)
+    RCM:    reverse Cuthill-McKee of the undirected graph (small bandwidth)
+  Then the successor lists (and the weights) are packed in CSR arrays in the
+  new order. The CSR arrays start at a full interleaving stripe of the vaults
+  (2^(NBITS_CH+NBITS_OF) bytes), and a list which fits in a burst (2^NBITS_OF
+  bytes) never crosses a burst boundary, so it is read from a single vault.
+*/
+#define GRAPH_LAYOUT_NONE       0
+#define GRAPH_LAYOUT_DEGREE     1
+#define GRAPH_LAYOUT_BFS        2
+#define GRAPH_LAYOUT_RCM        3
+
+vector<ulong_t> layout_degree;     // Degree of the nodes (for the sorts)
+
+bool layout_more_degree(ulong_t a, ulong_t b) { return layout_degree[a] > layout_degree[b]; }
+bool layout_less_degree(ulong_t a, ulong_t b) { return layout_degree[a] < layout_degree[b]; }
+
+// Index of a successor of a node
+#define succ_index(i, j)   ((ulong_t)(nodes[i].successors[j] - nodes))
+
+// Average distance between the nodes and their successors (in nodes)
+float graph_edge_span()
+{
+    float span = 0;
+    ulong_t edges = 0;
+    for ( ulong_t i=0; i<NODES; i++ )
+        for ( ulong_t j=0; j<nodes[i].out_degree; j++ )
+        {
+            ulong_t s = succ_index(i, j);
+            span += ( s > i ) ? s - i : i - s;
+            edges++;
+        }
+    return edges ? span/edges : 0;
+}
+
+//##############################################################################
+// The new order of the nodes: order[k] is the old index of the node k
+void layout_order_degree(vector<ulong_t>& order)
+{
+    layout_degree.assign(NODES, 0);
+    for ( ulong_t i=0; i<NODES; i++ )
+        for ( ulong_t j=0; j<nodes[i].out_degree; j++ )
+            layout_degree[succ_index(i, j)]++;
+    for ( ulong_t i=0; i<NODES; i++ )
+        order.push_back(i);
+    stable_sort(order.begin(), order.end(), layout_more_degree);
+}
+
+void layout_order_bfs(vector<ulong_t>& order)
+{
+    vector<bool> visited(NODES, false);
+    deque<ulong_t> q;
+    for ( ulong_t r=0; r<NODES; r++ )
+    {
+        if ( visited[r] )
+            continue;
+        visited[r] = true;
+        q.push_back(r);
+        while ( !q.empty() )
+        {
+            ulong_t v = q.front();
+            q.pop_front();
+            order.push_back(v);
+            for ( ulong_t j=0; j<nodes[v].out_degree; j++ )
+            {
+                ulong_t s = succ_index(v, j);
+                if ( !visited[s] )
+                {
+                    visited[s] = true;
+                    q.push_back(s);
+                }
+            }
+        }
+    }
+}
+
+void layout_order_rcm(vector<ulong_t>& order)
+{
+    // Undirected neighbors
+    vector< vector<ulong_t> > adj(NODES);
+    for ( ulong_t i=0; i<NODES; i++ )
+        for ( ulong_t j=0; j<nodes[i].out_degree; j++ )
+        {
+            adj[i].push_back(succ_index(i, j));
+            adj[succ_index(i, j)].push_back(i);
+        }
+    layout_degree.resize(NODES);
+    for ( ulong_t i=0; i<NODES; i++ )
+        layout_degree[i] = adj[i].size();
+
+    // Each component starts from its node of minimum degree
+    vector<ulong_t> by_degree;
+    for ( ulong_t i=0; i<NODES; i++ )
+        by_degree.push_back(i);
+    stable_sort(by_degree.begin(), by_degree.end(), layout_less_degree);
+
+    vector<bool> visited(NODES, false);
+    deque<ulong_t> q;
+    for ( ulong_t r=0; r<NODES; r++ )
+    {
+        if ( visited[by_degree[r]] )
+            continue;
+        visited[by_degree[r]] = true;
+        q.push_back(by_degree[r]);
+        while ( !q.empty() )
+        {
+            ulong_t v = q.front();
+            q.pop_front();
+            order.push_back(v);
+            stable_sort(adj[v].begin(), adj[v].end(), layout_less_degree);
+            for ( ulong_t j=0; j<adj[v].size(); j++ )
+                if ( !visited[adj[v][j]] )
+                {
+                    visited[adj[v][j]] = true;
+                    q.push_back(adj[v][j]);
+                }
+        }
+    }
+    reverse(order.begin(), order.end());
+}
+
+//##############################################################################
+// Allocate a region aligned to align bytes (a power of 2)
+void* allocate_region_aligned(ulong_t size, ulong_t align)
+{
+    ulong_t p = (ulong_t)allocate_region(size + align);
+    return (void*)((p + align - 1) & ~(align - 1));
+}
+
+// Renumber the nodes and pack the successor lists (and the weights) in CSR arrays
+void apply_graph_layout()
+{
+    #if GRAPH_LAYOUT != GRAPH_LAYOUT_NONE
+    cout << "(layout): Average edge span before the layout: " << graph_edge_span() << " nodes" << endl;
+
+    vector<ulong_t> order;
+    #if GRAPH_LAYOUT == GRAPH_LAYOUT_DEGREE
+    layout_order_degree(order);
+    #elif GRAPH_LAYOUT == GRAPH_LAYOUT_BFS
+    layout_order_bfs(order);
+    #elif GRAPH_LAYOUT == GRAPH_LAYOUT_RCM
+    layout_order_rcm(order);
+    #endif
+    ASSERT_DBG( order.size() == NODES );
+    vector<ulong_t> pos(NODES);
+    for ( ulong_t k=0; k<NODES; k++ )
+        pos[order[k]] = k;
+
+    // Offsets of the lists in the CSR arrays (bytes)
+    const ulong_t burst = 1UL << NBITS_OF;
+    const ulong_t stripe = 1UL << (NBITS_CH + NBITS_OF);
+    vector<ulong_t> offset(NODES);
+    ulong_t size = 0;
+    for ( ulong_t k=0; k<NODES; k++ )
+    {
+        ulong_t bytes = nodes[order[k]].out_degree * sizeof(node*);
+        if ( bytes <= burst && size % burst + bytes > burst )
+            size += burst - size % burst;
+        offset[k] = size;
+        size += bytes;
+    }
+    char* csr = (char*)allocate_region_aligned(size, stripe);
+    #ifdef sgraph_bellman_ford
+    char* wcsr = (char*)allocate_region_aligned(size, stripe);
+    #endif
+
+    // The old lists are still in place, and the old successors are found from their pointers
+    vector<node> old(nodes, nodes + NODES);
+    for ( ulong_t k=0; k<NODES; k++ )
+    {
+        node& n = nodes[k];
+        n = old[order[k]];
+        n.ID = k;
+        n.successors = n.out_degree ? (node**)(csr + offset[k]) : NULL;
+        for ( ulong_t j=0; j<n.out_degree; j++ )
+            n.successors[j] = &nodes[pos[old[order[k]].successors[j] - nodes]];
+        #ifdef sgraph_bellman_ford
+        n.weights = n.out_degree ? (ulong_t*)(wcsr + offset[k]) : NULL;
+        for ( ulong_t j=0; j<n.out_degree; j++ )
+            n.weights[j] = old[order[k]].weights[j];
+        #endif
+    }
+    successors_list = (node**)csr;
+    successors_size = size;
+    #ifdef sgraph_bellman_ford
+    weights_list = (ulong_t*)wcsr;
+    weights_size = size;
+    #endif
+
+    reset_graph_stats();
+    cout << "(layout): Average edge span after the layout: " << graph_edge_span() << " nodes" << endl;
+    #endif
+}
+
+#endif
@@ -8,6 +8,7 @@
 #include "app_utils.hh"     // This must be included before anything else
 using namespace std;
 #include "utils.hh"
+#include "layout.hh"
 
 /************************************************/
 // Main
@@ -19,6 +20,7 @@ int main(int argc, char *argv[])
     cout << "(main.cpp): Kernel Name: " << FILE_NAME << endl;
     cout << "(main.cpp): Create the graph with " << NODES << " nodes ..." << endl;
     create_graph();
+    apply_graph_layout();
     // print_list_of_lists();
 
     cout << "(main.cpp): Offloading the computation kernel ... " << endl;
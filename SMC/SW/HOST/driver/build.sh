@@ -18,6 +18,9 @@ echo -e "
 #define PIM_M5_REG	$PIM_M5_REG
 #define PIM_M5_D1_REG	$PIM_M5_D1_REG
 #define PIM_M5_D2_REG	$PIM_M5_D2_REG
+#define PIM_STATUS_REG	$PIM_STATUS_REG
+#define PIM_CMDQ_TAIL	$PIM_CMDQ_TAIL
+#define PIM_HOST_IRQ	$( [ $PIM_HOST_WAIT_INTERRUPT == TRUE ] && echo $PIM_HOST_IRQ || echo 0 )
 #define PIM_HOST_OFFSET	$PIM_HOST_OFFSET
 #define pim_arch $pim_arch
 $(set_if_true $DEBUG_PIM_DRIVER "#define DEBUG_DRIVER")
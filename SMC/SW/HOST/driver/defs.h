@@ -10,10 +10,40 @@
 #define PIM_IOCTL_ALLOCATE_DATA     _IOW(PIM_IOCTL_MAGIC,0xB1,unsigned)
 #define PIM_IOCTL_RELEASE_ALL_DATA   _IO(PIM_IOCTL_MAGIC,0xB2)
 #define PIM_IOCTL_REPORT_STATS       _IO(PIM_IOCTL_MAGIC,0xB3)
+#define PIM_IOCTL_WAIT_COMMAND       _IO(PIM_IOCTL_MAGIC,0xB4)	// arg: number of the command in the command queue
+#define PIM_IOCTL_SLICE_STATS       _IOR(PIM_IOCTL_MAGIC,0xB5,PIMSliceStats)
+#define PIM_IOCTL_ALLOC_SHARED      _IOWR(PIM_IOCTL_MAGIC,0xB6,PIMSharedAlloc)
+#define PIM_IOCTL_FLUSH_SHARED      _IOW(PIM_IOCTL_MAGIC,0xB7,unsigned)	// arg: virtual address and size of the range
 
 // Maximum number of (unsigned long) arguments to pass to ioctl
 // Notice: the first argument is the number of arguments being passed
-#define PIM_IOCTL_MAX_ARGS 			8
+// (PIM_IOCTL_ALLOCATE_DATA: up to 16 ranges of address and page count)
+#define PIM_IOCTL_MAX_ARGS 			33
+
+// Statistics of the slice table (PIM_IOCTL_SLICE_STATS)
+typedef struct PIMSliceStats {
+    unsigned long pages;            // Number of pages pinned
+    unsigned long span;             // Number of entries of the slice table (pinned pages and gaps)
+    unsigned long slices;           // Number of slices (runs of physically contiguous pages)
+    unsigned long huge_pages;       // Number of pinned pages which belong to huge pages
+    unsigned long avg_slice_size;   // Average size of the slices (bytes)
+    unsigned long max_slice_size;   // Size of the largest slice (bytes)
+} PIMSliceStats;
+
+// Flags of the buffers shared with PIM (PIM_IOCTL_ALLOC_SHARED)
+#define PIM_SHARED_CACHED           0   // Mapped cached, the user flushes the ranges shared with PIM (PIM_IOCTL_FLUSH_SHARED)
+#define PIM_SHARED_UNCACHED         1   // Mapped uncached, never flushed
+
+// Maximum number of buffers shared with PIM
+#define PIM_MAX_SHARED              16
+
+// A buffer shared with PIM (PIM_IOCTL_ALLOC_SHARED)
+// Notice: the user maps the buffer by calling mmap on the device at the returned offset
+typedef struct PIMSharedAlloc {
+    unsigned long size;             // [in]  Size of the buffer (bytes, rounded up to whole pages)
+    unsigned long flags;            // [in]  PIM_SHARED_CACHED or PIM_SHARED_UNCACHED
+    unsigned long offset;           // [out] Offset of the buffer for mmap (a small cookie, see PIM_SHARED_MMAP_OFFSET)
+} PIMSharedAlloc;
 
 /*****************************************************/
 // Bit Manipulation Functions
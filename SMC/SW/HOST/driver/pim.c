@@ -12,10 +12,14 @@
 #include <linux/wait.h>
 #include <linux/device.h>
 #include <linux/slab.h>		/* kmalloc */
+#include <linux/vmalloc.h>	/* vzalloc */
 //#include <asm/cacheflush.h>     /* __cpuc_flush_dcache_area, outer_cache.flush_range */
 //#include <asm/outercache.h>
 #include <linux/highmem.h>      /* kmap, kunmap */
 #include <linux/pagemap.h>      /* page_cache_release() */
+#include <linux/poll.h>         /* poll_table */
+#include <linux/of.h>           /* of_find_compatible_node */
+#include <linux/of_irq.h>       /* irq_create_of_mapping */
 
 #include "pim.h"
 #include "_params.h"
@@ -24,6 +28,9 @@
 /*****************************************************/
 /* Performance Counters and statistics */
 unsigned stat_numslices;  // Number of slices in the slice table
+unsigned stat_numirqs;    // Number of completion interrupts received
+unsigned stat_hugepages;  // Number of pinned pages which belong to huge pages
+ulong_t stat_maxslice;    // Size of the largest slice (bytes)
 
 /*****************************************************/
 // File operations
@@ -35,6 +42,7 @@ struct file_operations pim_fops = {
 	.llseek = pim_llseek,
 	.read = pim_read,
 	.write = pim_write,
+	.poll = pim_poll,
 	.mmap = pim_mmap };
 
 // Static variables
@@ -43,11 +51,16 @@ static Pages pages;						// List of the pinned pages
 static struct class *pimclass;			// Class of our device
 static Slice* slicetable;       		// Slice Table
 static ulong_t slicetable_paddr;			// Physical address of the slice-table
+static unsigned slicetable_order;		// Page order of the slice-table
+static Slice* slices;					// The slices of the slice-table, one entry per slice (sorted by virtual address)
 static ulong_t max_user_va;				// Maximum VA used by user (Used for overlap check in AARCH64 systems)
+static SharedBuffer shared[PIM_MAX_SHARED];	// Buffers shared with the user (zero-copy)
+static unsigned num_shared;				// Number of shared buffers
+static int pim_irq = 0;					// Linux IRQ of the completion interrupt (0: not available)
+static DECLARE_WAIT_QUEUE_HEAD(pim_wq);	// Readers waiting for the completion of PIM
 
 // Recurrency checks (For now, only one user can use the driver)
 static int pim_init_count = 0;
-static int pim_ioctl_allocate = 0;
 
 // VM_RESERVERD for mmap
 #ifndef VM_RESERVED
@@ -63,12 +76,21 @@ static int __init pim_init(void)
 	pimdevice.min = 0;
     pim_init_count++;
     ASSERT(pim_init_count == 1); // For now, only one user can use the driver
-	pages.list = NULL;
+	pages.ranges = NULL;
+	pages.num_ranges = 0;
 	pages.physical_addr = NULL;
 	pages.count = 0;
+	pages.span = 0;
+	pages.gaps = 0;
+	slicetable = NULL;
+	slices = NULL;
 	max_user_va = 0;
+	num_shared = 0;
     /* Reset statistics */
     stat_numslices = 0;
+    stat_numirqs = 0;
+    stat_hugepages = 0;
+    stat_maxslice = 0;
 	/* Checking integer size of the system. Because we must work both with ARMv7 and ARMv8 */
 	PIM_INFO("sizeof(int)=%ld", (unsigned long)sizeof(int));
 	PIM_INFO("sizeof(int*)=%ld", (unsigned long)sizeof(int*));
@@ -116,6 +138,9 @@ static int __init pim_init(void)
 	pimdevice.mem = ioremap_nocache(PHY_BASE, PHY_SIZE);
 	PIM_INFO("PIM physical range [%lx:%lx] mapped to kernel space @ %lx",(ulong_t)PHY_BASE, (ulong_t)(PHY_BASE+PHY_SIZE-1), (unsigned long)pimdevice.mem);
 
+	// Without the interrupt, the users have to poll PIM_STATUS_REG
+	pim_request_irq();
+
 	return 0;
 }
 
@@ -124,6 +149,8 @@ static int __init pim_init(void)
 static void __exit pim_exit(void)
 {
 	PIM_INFO("pim_exit");
+	if ( pim_irq )
+		free_irq(pim_irq, &pimdevice);
 	cdev_del(&pimdevice.cdev);
 	unregister_chrdev_region(pimdevice.dev, PIM_MOD_DEV_NO);
 	PIM_ALERT("Unloading device driver for PIM");
@@ -142,6 +169,9 @@ long pim_ioctl(struct file *filp, unsigned int cmd, unsigned long arg)
 	int err = 0;
 	long retval = 1; // success
 	unsigned num_ranges = 0;
+	PIMSliceStats stats;
+	PIMSharedAlloc alloc;
+	SharedBuffer* b;
 	ulong_t ioctl_arg[PIM_IOCTL_MAX_ARGS];
 	ulong_t ioctl_arg_size = 0;
 	PIM_INFO("pim_ioctl");
@@ -152,7 +182,7 @@ long pim_ioctl(struct file *filp, unsigned int cmd, unsigned long arg)
 		PIM_ALERT("Illegal command type in received in ioctl");
 		return -ENOTTY;
 	}
-	if ( (_IOC_NR(cmd) < 0xB0) | (_IOC_NR(cmd) > 0xB3) )
+	if ( (_IOC_NR(cmd) < 0xB0) | (_IOC_NR(cmd) > 0xB7) )
 	{
 		PIM_ALERT("Illegal command number received in ioctl");
 		return -ENOTTY;
@@ -178,11 +208,9 @@ long pim_ioctl(struct file *filp, unsigned int cmd, unsigned long arg)
 		PIM_INFO("ioctl: hello");
 	break;
 	//*******************
-	case PIM_IOCTL_ALLOCATE_DATA:	// Offload data to the PIM device
+	case PIM_IOCTL_ALLOCATE_DATA:	// Offload data to the PIM device (can be repeated, the ranges are accumulated)
 
 		PIM_INFO("ioctl: allocate data");
-        pim_ioctl_allocate++;
-        ASSERT(pim_ioctl_allocate == 1); // For now, this functionality works only once
 		/* Copy the first byte only, this bytes indicates the number of bytes remaining to get from user space */
 		if ( copy_from_user(ioctl_arg, (void __user *)arg, sizeof(ulong_t)) )
 			return -EFAULT;
@@ -201,37 +229,36 @@ long pim_ioctl(struct file *filp, unsigned int cmd, unsigned long arg)
 			return -EFAULT;
 		}
 
-		num_ranges = ioctl_arg_size/2;
-		ASSERT(pages.count == 0);
-		ASSERT(num_ranges == 1);	// For now, we must have one contiguous range in the user
-
 		/* Get user pages */
+		num_ranges = ioctl_arg_size/2;
 		for ( i=0; i< num_ranges; i++)
 		{
 			PIM_INFO("ioctl: range start:%lx, count:%ld", ioctl_arg[2*i+1], ioctl_arg[2*i+2] );
-			pim_get_user_pages(ioctl_arg[2*i+1], ioctl_arg[2*i+2]); // TODO: Later: check protection flags of TLB
+			if ( pim_range_pinned(ioctl_arg[2*i+1], ioctl_arg[2*i+2]) )
+				continue;	// e.g. the data shared by several tasks
+			b = pim_find_shared_vaddr(ioctl_arg[2*i+1]);
+			if ( b && ioctl_arg[2*i+1] + ioctl_arg[2*i+2]*PAGE_SIZE <= b->vaddr + b->size )
+				continue;	// A shared buffer (never pinned)
+			err = pim_get_user_pages(ioctl_arg[2*i+1], ioctl_arg[2*i+2]); // TODO: Later: check protection flags of TLB
+			if ( err )
+				return err;
 		}
 
 		/* 
 		  Create a page table and send its pointer to PIM.
 		  Also, flush the caches to make sure the most recent data
 		  is accessible by PIM
+		  Notice: the previous slice table is replaced, so PIM must not
+		  be running (the API drains the command queue before this)
 		 */
-		pim_create_slice_table(ioctl_arg[1]);
+		err = pim_create_slice_table();
+		if ( err )
+			return err;
 	break;
 	//*******************
 	case PIM_IOCTL_RELEASE_ALL_DATA:	// Release all the pages
 		PIM_INFO("ioctl: release all data");
-		for (i=0; i<pages.count; i++) 
-		{
-			PIM_INFO("RELEASE PAGE[%d]: PHYSICAL ADDR: 0x%lx  PAGE STRUCT: 0x%lx", i, (ulong_t)pages.physical_addr[i], (ulong_t)(pages.list[i]) );
-			if (!PageReserved(pages.list[i])) 
-				SetPageDirty(pages.list[i]);
-			else
-				PIM_WARN("Page was reserved!");
-			page_cache_release(pages.list[i]); 
-			kfree(pages.list);
-		}
+		pim_release_user_pages();
 	break;
     //*******************
     case PIM_IOCTL_REPORT_STATS:   // Report gathered statistics to the screen
@@ -239,7 +266,56 @@ long pim_ioctl(struct file *filp, unsigned int cmd, unsigned long arg)
     printk("softwarestat.pages.count\t%d\n", pages.count);
     printk("softwarestat.slices.count\t%d\n", stat_numslices);
     printk("softwarestat.slices.reduction\t%d\n", pages.count - stat_numslices);
+    printk("softwarestat.irqs.count\t%d\n", stat_numirqs);
+    printk("softwarestat.ranges.count\t%d\n", pages.num_ranges);
+    printk("softwarestat.slices.hugepages\t%d\n", stat_hugepages);
+    printk("softwarestat.shared.count\t%d\n", num_shared);
     break;
+	//*******************
+	case PIM_IOCTL_SLICE_STATS:	// Copy the statistics of the slice table to the user
+		stats.pages = pages.count;
+		stats.span = pages.span;
+		stats.slices = stat_numslices;
+		stats.huge_pages = stat_hugepages;
+		stats.avg_slice_size = stat_numslices ? (ulong_t)(pages.span - pages.gaps)*PAGE_SIZE/stat_numslices : 0;
+		stats.max_slice_size = stat_maxslice;
+		if ( copy_to_user((void __user *)arg, &stats, sizeof(stats)) )
+			return -EFAULT;
+	break;
+	//*******************
+	case PIM_IOCTL_WAIT_COMMAND:	// Block until PIM finishes the command number arg of the command queue
+		if ( !pim_irq )
+			return -ENODEV;	// The user should poll PIM_CMDQ_TAIL instead
+		/*
+		  PIM_CMDQ_TAIL is only read again when PIM interrupts us. The timeout
+		  returns 0 to the user, who can wake PIM up again in case it has
+		  missed the interrupt of the last command
+		*/
+		retval = wait_event_interruptible_timeout(pim_wq, pim_read_ulong_t(PIM_CMDQ_TAIL) > arg, PIM_WAIT_TIMEOUT);
+		if ( retval < 0 )
+			return -ERESTARTSYS;
+		retval = ( retval > 0 );
+	break;
+	//*******************
+	case PIM_IOCTL_ALLOC_SHARED:	// Allocate a buffer shared with PIM (then the user maps it with mmap)
+		PIM_INFO("ioctl: allocate shared buffer");
+		if ( copy_from_user(&alloc, (void __user *)arg, sizeof(alloc)) )
+			return -EFAULT;
+		err = pim_alloc_shared(&alloc);
+		if ( err )
+			return err;
+		if ( copy_to_user((void __user *)arg, &alloc, sizeof(alloc)) )
+			return -EFAULT;
+	break;
+	//*******************
+	case PIM_IOCTL_FLUSH_SHARED:	// Flush a range of a shared buffer (written by the user, or by PIM)
+		PIM_INFO("ioctl: flush shared buffer");
+		if ( copy_from_user(ioctl_arg, (void __user *)arg, 2*sizeof(ulong_t)) )
+			return -EFAULT;
+		err = pim_flush_shared(ioctl_arg[0], ioctl_arg[1]);
+		if ( err )
+			return err;
+	break;
 	//*******************
 	default:
 		return -ENOTTY;
@@ -250,10 +326,24 @@ long pim_ioctl(struct file *filp, unsigned int cmd, unsigned long arg)
 
 /*****************************************************/
 // READ
+// Block until PIM is done with the current command, and return PIM_STATUS_REG (1 byte)
 ssize_t pim_read(struct file *filp, char __user *buff, size_t count, loff_t *f_pos)
 {
+	char status;
 	PIM_INFO("pim_read");
-	return -EINVAL;
+	if ( !pim_irq )
+		return -ENODEV;	// The user should poll PIM_STATUS_REG instead
+	if ( count < 1 )
+		return -EINVAL;
+
+	// PIM_STATUS_REG is only read again when PIM interrupts us
+	if ( wait_event_interruptible(pim_wq, pim_read_byte(PIM_STATUS_REG) == PIM_STATUS_DONE) )
+		return -ERESTARTSYS;
+
+	status = PIM_STATUS_DONE;
+	if ( copy_to_user(buff, &status, 1) )
+		return -EFAULT;
+	return 1;
 }
 
 /*****************************************************/
@@ -264,6 +354,19 @@ ssize_t pim_write(struct file *filp, const char __user *buff, size_t count, loff
 	return -EINVAL;  
 }
 
+/*****************************************************/
+// POLL
+unsigned int pim_poll(struct file *filp, poll_table *wait)
+{
+	PIM_INFO("pim_poll");
+	if ( !pim_irq )
+		return POLLERR;
+	poll_wait(filp, &pim_wq, wait);
+	if ( pim_read_byte(PIM_STATUS_REG) == PIM_STATUS_DONE )
+		return POLLIN | POLLRDNORM;
+	return 0;
+}
+
 /*****************************************************/
 // LLSEEK
 loff_t pim_llseek(struct file *filp, loff_t off, int whence)
@@ -294,7 +397,17 @@ int pim_mmap(struct file *filp, struct vm_area_struct *vma)
 	ulong_t off = vma->vm_pgoff << PAGE_SHIFT;
 	ulong_t vsize = vma->vm_end - vma->vm_start;
 	ulong_t psize = PHY_SIZE - off;
+	ulong_t index;
 	PIM_INFO("pim_mmap");
+
+	// The offsets of the shared buffers are cookies (see PIM_SHARED_MMAP_OFFSET)
+	if ( off >= PIM_SHARED_MMAP_OFFSET(0) && off < PIM_SHARED_MMAP_OFFSET(PIM_MAX_SHARED) )
+	{
+		index = (off - PIM_SHARED_MMAP_OFFSET(0)) >> PAGE_SHIFT;
+		if ( index >= num_shared )
+			return -EINVAL;
+		return pim_mmap_shared(&shared[index], vma);
+	}
 	
 	if (vsize > psize)
 		return -EINVAL; /*  spans too high */
@@ -314,8 +427,8 @@ int pim_release(struct inode *p_inode, struct file * p_file)
 {
 	PIM_INFO("pim_release");
 	//kfree(p_file->private_data);
-	kfree(pages.physical_addr);
-	kfree(pages.list);
+	pim_release_user_pages();
+	pim_free_shared();	// The user has unmapped them
 	return 0;
 }
 
@@ -336,21 +449,34 @@ MODULE_DESCRIPTION("PIM Device Driver");
   @addr_start: address of the first page (must be page aligned)
   @n_pages: number of pages to pin
 
-  Resulting pages are stored in pages global variable
+  Resulting pages are appended to the ranges of the pages global variable
+  (the ranges may be discontiguous, and they may overlap)
   On success returns 0
 */
 int pim_get_user_pages(ulong_t addr_start, ulong_t n_pages)
 {
-	ulong_t result;
+	long result;
 	unsigned write = 1;	// TODO: Later TLB protection
+	PinnedRange* r;
 	#ifdef DEBUG_DRIVER
-	max_user_va = addr_start + n_pages*PAGE_SIZE -1;
+	if ( addr_start + n_pages*PAGE_SIZE -1 > max_user_va )
+		max_user_va = addr_start + n_pages*PAGE_SIZE -1;
 	PIM_INFO("Maximum VA used by the user: 0x%lx", max_user_va);
 	#endif
 
+	// One more range
+	r = (PinnedRange*)krealloc(pages.ranges, (pages.num_ranges+1)*sizeof(PinnedRange), GFP_KERNEL);
+	if (r == NULL)
+	{
+		PIM_WARN("Memory allocation failed!");
+		return -ENOMEM;
+	}
+	pages.ranges = r;
+	r = &pages.ranges[pages.num_ranges];
+
 	// what get_user_pages returns
-	pages.list = (struct page **)kmalloc((size_t)(n_pages*sizeof(struct page *)),GFP_KERNEL);
-	if (pages.list == NULL)
+	r->list = (struct page **)kmalloc((size_t)(n_pages*sizeof(struct page *)),GFP_KERNEL);
+	if (r->list == NULL)
 	{
 		PIM_WARN("Memory allocation failed!");
 		return -ENOMEM;
@@ -359,44 +485,277 @@ int pim_get_user_pages(ulong_t addr_start, ulong_t n_pages)
 	// get pointers to user-space buffers and lock them into memory
 	PIM_INFO("Trying to get mmap_sem ...");
 	down_read(&current->mm->mmap_sem);
-	result = get_user_pages(current, current->mm, addr_start, n_pages, write, 0, pages.list, NULL);
+	result = get_user_pages(current, current->mm, addr_start, n_pages, write, 0, r->list, NULL);
 	up_read(&current->mm->mmap_sem);
 	if (result != n_pages)
 	{
 		PIM_WARN("Could not get requested user-space virtual addresses");
 		PIM_WARN("   Requested: %ld, Obtained: %ld", n_pages, result); 
+		while ( result > 0 )
+			page_cache_release(r->list[--result]);
+		kfree(r->list);
 		return -ENOMEM;
 	}
 	PIM_INFO("Successfully pinned %ld user pages.", n_pages);
-	pages.count = n_pages;
+	r->vaddr = addr_start;
+	r->count = n_pages;
+	pages.num_ranges++;
+	pages.count += n_pages;
+	return 0;
+}
+
+/*
+  Unpin all pages (they are marked dirty, since PIM may have written them)
+  and free the slice table
+*/
+void pim_release_user_pages()
+{
+	unsigned i, j;
+	for (i=0; i<pages.num_ranges; i++)
+	{
+		PinnedRange* r = &pages.ranges[i];
+		for (j=0; j<r->count; j++) 
+		{
+			PIM_INFO("RELEASE PAGE[%d][%d]: VIRTUAL ADDR: 0x%lx  PAGE STRUCT: 0x%lx", i, j, r->vaddr + j*PAGE_SIZE, (ulong_t)(r->list[j]) );
+			if (!PageReserved(r->list[j])) 
+				SetPageDirty(r->list[j]);
+			else
+				PIM_WARN("Page was reserved!");
+			page_cache_release(r->list[j]); 
+		}
+		kfree(r->list);
+	}
+	kfree(pages.ranges);
+	vfree(pages.physical_addr);
+	vfree(slices);
+	if ( slicetable )
+		free_pages((ulong_t)slicetable, slicetable_order);
+	pages.ranges = NULL;
+	pages.num_ranges = 0;
+	pages.physical_addr = NULL;
+	pages.count = 0;
+	pages.span = 0;
+	pages.gaps = 0;
+	slicetable = NULL;
+	slices = NULL;
+	stat_numslices = 0;
+}
+
+/*
+  Find the slice holding a virtual address, with a binary search in the
+  sorted slices (the gaps between the ranges have no slices)
+  Returns NULL if the address has not been pinned
+*/
+Slice* pim_find_slice(ulong_t vaddr)
+{
+	unsigned lo = 0, hi = stat_numslices, mid;
+	while ( lo < hi )
+	{
+		mid = (lo + hi) / 2;
+		if ( vaddr < slices[mid].vaddr )
+			hi = mid;
+		else if ( vaddr >= slices[mid].vaddr + slices[mid].size )
+			lo = mid + 1;
+		else
+			return &slices[mid];
+	}
+	return NULL;
+}
+
+/*
+  Check if all pages of a range are already in the slice table
+  (then the range does not need to be pinned again)
+*/
+int pim_range_pinned(ulong_t addr_start, ulong_t n_pages)
+{
+	ulong_t addr_end = addr_start + n_pages*PAGE_SIZE;
+	Slice* s;
+	while ( addr_start < addr_end )
+	{
+		s = pim_find_slice(addr_start);
+		if ( s == NULL )
+			return 0;
+		addr_start = s->vaddr + s->size;
+	}
+	return 1;
+}
+
+/*
+  Allocate a physically contiguous buffer to be shared with PIM (zero-copy)
+  The user maps it with mmap at req->offset (a cookie), which adds it to the
+  slice table. Its pages are never pinned, and the caches are
+  not flushed for it with the slice table: the user flushes the ranges of a
+  cached buffer (pim_flush_shared) and an uncached one is always coherent.
+  On success returns 0
+*/
+int pim_alloc_shared(PIMSharedAlloc* req)
+{
+	SharedBuffer* b;
+	ulong_t kaddr;
+	unsigned order = get_order(req->size);
+	if ( req->size == 0 || order >= MAX_ORDER || req->flags > PIM_SHARED_UNCACHED )
+	{
+		PIM_ALERT("Illegal shared buffer: %ld(B) flags: %ld", req->size, req->flags);
+		return -EINVAL;
+	}
+	if ( num_shared == PIM_MAX_SHARED )
+	{
+		PIM_WARN("Too many shared buffers (%d)", PIM_MAX_SHARED);
+		return -ENOMEM;
+	}
+	kaddr = __get_free_pages(GFP_KERNEL | __GFP_ZERO, order);
+	if ( kaddr == 0 )
+	{
+		PIM_WARN("__get_free_pages failed (shared buffer of order %d)", order);
+		return -ENOMEM;
+	}
+
+	b = &shared[num_shared++];
+	b->paddr = (ulong_t)virt_to_phys((void*)kaddr);
+	b->vaddr = 0;
+	b->size = PAGE_SIZE << order;
+	b->order = order;
+	b->flags = req->flags;
+	req->size = b->size;
+	req->offset = PIM_SHARED_MMAP_OFFSET(num_shared-1);
+
+	// The buffer has been zeroed through the cached linear map of the kernel: these lines must
+	// not be evicted later on top of the data written by PIM (or by uncached stores of the user)
+	pim_flush_range(b->paddr, b->size);
+	PIM_INFO("Shared buffer %d: PA [0x%lx, 0x%lx] %s", num_shared-1, b->paddr, b->paddr+b->size-1,
+		(b->flags == PIM_SHARED_UNCACHED) ? "uncached" : "cached");
 	return 0;
 }
 
+/*
+  Map a shared buffer (as a whole, only once) to the user space, and add it
+  to the slice table
+  Notice: the slice table is replaced, so PIM must not be running
+*/
+int pim_mmap_shared(SharedBuffer* b, struct vm_area_struct *vma)
+{
+	int err;
+	ulong_t vsize = vma->vm_end - vma->vm_start;
+	if ( b->vaddr || vsize != b->size )
+		return -EINVAL;
+
+	vma->vm_flags |= VM_RESERVED;
+	if ( b->flags == PIM_SHARED_UNCACHED )
+		vma->vm_page_prot = pgprot_noncached(vma->vm_page_prot);
+	if ( remap_pfn_range(vma, vma->vm_start, b->paddr >> PAGE_SHIFT, vsize, vma->vm_page_prot) )
+		return -EAGAIN;
+	b->vaddr = vma->vm_start;
+	PIM_INFO("Shared buffer: VA [0x%lx, 0x%lx] ---> PA [0x%lx, 0x%lx]", b->vaddr, b->vaddr+b->size-1, b->paddr, b->paddr+b->size-1);
+
+	err = pim_create_slice_table();
+	if ( err )
+		b->vaddr = 0;	// The mapping fails
+	return err;
+}
+
+/*
+  Find the shared buffer holding a physical address
+  Returns NULL if there is none
+*/
+SharedBuffer* pim_find_shared(ulong_t paddr)
+{
+	unsigned i;
+	for (i=0; i<num_shared; i++)
+		if ( paddr >= shared[i].paddr && paddr < shared[i].paddr + shared[i].size )
+			return &shared[i];
+	return NULL;
+}
+
+/*
+  Find the mapped shared buffer holding a virtual address
+  Returns NULL if there is none
+*/
+SharedBuffer* pim_find_shared_vaddr(ulong_t vaddr)
+{
+	unsigned i;
+	for (i=0; i<num_shared; i++)
+		if ( shared[i].vaddr && vaddr >= shared[i].vaddr && vaddr < shared[i].vaddr + shared[i].size )
+			return &shared[i];
+	return NULL;
+}
+
+/*
+  Flush the caches for a range of a shared buffer (user virtual address),
+  e.g. after the user has written it, or before the user reads the results of PIM
+  Nothing to do for the uncached buffers
+*/
+int pim_flush_shared(ulong_t vaddr, ulong_t size)
+{
+	SharedBuffer* b = pim_find_shared_vaddr(vaddr);
+	if ( b == NULL || size == 0 || vaddr + size > b->vaddr + b->size )
+	{
+		PIM_ALERT("Illegal range of a shared buffer: 0x%lx %ld(B)", vaddr, size);
+		return -EINVAL;
+	}
+	if ( b->flags == PIM_SHARED_CACHED )
+		pim_flush_range(b->paddr + (vaddr - b->vaddr), size);
+	return 0;
+}
+
+/*
+  Free all shared buffers (the user must have unmapped them)
+*/
+void pim_free_shared()
+{
+	unsigned i;
+	for (i=0; i<num_shared; i++)
+		free_pages((ulong_t)phys_to_virt(shared[i].paddr), shared[i].order);
+	num_shared = 0;
+}
+
 /*
   Create a Page Table to be used by the PIM device. This structure is 
   placed in the main memory and a pointer to it is passed to PIM. Whenever
   a miss occurs in the TLB of PIM, It should access this structure and 
   update its TLB rules based on this structure
-  @vaddr_start: start address of this slice table in the user virtual address
-  Notice: This slice table is associated with a contiguous virtual region
+  Notice: PIM indexes the slice table with the virtual page number, so the
+  table covers all pinned ranges, from the first page of the lowest one to
+  the last page of the highest one. The pages of the gaps between the ranges
+  get empty slices (size 0), which PIM must never access.
+  Each run of physically contiguous pages (e.g. a transparent huge page) is
+  merged into one slice, and all entries of the run point to it, so one
+  refill of PIM's TLB covers the whole run. The driver also keeps the slices
+  sorted by virtual address (one entry per slice) for its own lookups.
+  The mapped shared buffers are covered like the pinned ranges.
 */
 
-int pim_create_slice_table(ulong_t vaddr_start)
+int pim_create_slice_table()
 {
 	unsigned i, j, c, order;
+	ulong_t vstart = ~0UL, vend = 0, span;
+	PinnedRange* r;
+	SharedBuffer* b;
 	//ulong_t* p;
 	// void * kaddr;
-	ASSERT(pages.count);
 
-	// Allocate some space for holding the physical addresses of the pages
-	pages.physical_addr = (ulong_t*)kmalloc(pages.count*sizeof(ulong_t), GFP_KERNEL);
-	ASSERT_RET(pages.physical_addr, "kmalloc failed (pages.physical_addr)", -ENOMEM);
-
-	/* Get the physical address for all pages */
-	for (i=0; i<pages.count; i++) 
+	// The virtual range covered by the slice table (the pinned ranges and the mapped shared buffers)
+	for (i=0; i<pages.num_ranges; i++)
+	{
+		r = &pages.ranges[i];
+		if ( r->vaddr < vstart )
+			vstart = r->vaddr;
+		if ( r->vaddr + r->count*PAGE_SIZE > vend )
+			vend = r->vaddr + r->count*PAGE_SIZE;
+	}
+	for (i=0; i<num_shared; i++)
+	{
+		b = &shared[i];
+		if ( b->vaddr == 0 )
+			continue;
+		if ( b->vaddr < vstart )
+			vstart = b->vaddr;
+		if ( b->vaddr + b->size > vend )
+			vend = b->vaddr + b->size;
+	}
+	if ( vend == 0 )
 	{
-		pages.physical_addr[i] = (ulong_t)page_to_phys(pages.list[i]);
-		//PIM_INFO("PAGE[%d]: PHYSICAL ADDR: 0x%lx  PAGE STRUCT: 0x%lx", i, pages.physical_addr[i], (ulong_t)pages.list[i] );
+		PIM_WARN("No pages have been pinned or shared");
+		return -EINVAL;
 	}
 
 	/* 
@@ -407,10 +766,58 @@ int pim_create_slice_table(ulong_t vaddr_start)
 
 	  Notice: SliceTable also must be aligned to cache boundaries, otherwise it won't
 	  be flushed properly
+	  Notice: the span is checked before its size is computed (it may not even fit
+	  in a word), and the current slice table is kept if the new one is rejected
 	 */
-	order = PAGE_ORDER(pages.count*sizeof(Slice));
-	ASSERT(order <= 10); // Limit of the OS
+	span = (vend - vstart) >> PAGE_SHIFT;
+	if ( span > (PAGE_SIZE << (MAX_ORDER-1)) / sizeof(Slice) ) // Limit of the OS (the slice table must be physically contiguous)
+	{
+		PIM_ALERT("The pinned ranges are too far apart (VA [0x%lx, 0x%lx], %ld pages)", vstart, vend-1, span);
+		return -ENOMEM;
+	}
+	order = get_order(span*sizeof(Slice));
+	pages.vstart = vstart;
+	pages.span = span;
+
+	// Replace the previous slice table (PIM is not running)
+	vfree(pages.physical_addr);
+	vfree(slices);
+	if ( slicetable )
+		free_pages((ulong_t)slicetable, slicetable_order);
+	slicetable = NULL;
+
+	// Allocate some space for holding the physical addresses of the pages, and the sorted slices (only used by the driver)
+	pages.physical_addr = (ulong_t*)vzalloc(pages.span*sizeof(ulong_t));
+	slices = (Slice*)vzalloc(pages.span*sizeof(Slice));
+	if ( pages.physical_addr == NULL || slices == NULL )
+	{
+		PIM_ALERT("vzalloc failed (%ld pages)", pages.span);
+		return -ENOMEM;
+	}
+
+	/* Get the physical address for all pages (the overlapping ranges write the same pages) */
+	stat_hugepages = 0;
+	for (i=0; i<pages.num_ranges; i++)
+	{
+		r = &pages.ranges[i];
+		for (j=0; j<r->count; j++) 
+		{
+			ulong_t* p = &pages.physical_addr[((r->vaddr - pages.vstart) >> PAGE_SHIFT) + j];
+			if ( *p == 0 && PageCompound(r->list[j]) )
+				stat_hugepages++;	// Physically contiguous with the rest of its huge page
+			*p = (ulong_t)page_to_phys(r->list[j]);
+			//PIM_INFO("PAGE[%d][%d]: PHYSICAL ADDR: 0x%lx  PAGE STRUCT: 0x%lx", i, j, (ulong_t)page_to_phys(r->list[j]), (ulong_t)r->list[j] );
+		}
+	}
+	for (i=0; i<num_shared; i++)
+	{
+		b = &shared[i];
+		for (j=0; b->vaddr && j<(b->size >> PAGE_SHIFT); j++)
+			pages.physical_addr[((b->vaddr - pages.vstart) >> PAGE_SHIFT) + j] = b->paddr + j*PAGE_SIZE;
+	}
+
     slicetable = (Slice*)__get_free_pages(GFP_KERNEL, order);
+    slicetable_order = order;
 
     ASSERT_RET(slicetable, "__get_free_pages failed (slicetable)", -ENOMEM);
 	slicetable_paddr = (ulong_t)virt_to_phys(slicetable);
@@ -418,29 +825,43 @@ int pim_create_slice_table(ulong_t vaddr_start)
     i=0; // I
     j=0; // J
     stat_numslices = 0;
-	while (i<pages.count)
+    stat_maxslice = 0;
+    pages.gaps = 0;
+	while (i<pages.span)
 	{
         c=1;
+        if ( pages.physical_addr[i] == 0 )
+        {
+            // A gap between the ranges (not pinned)
+            slicetable[i].vaddr = (ulong_t)(pages.vstart + PAGE_SIZE*(i));
+            slicetable[i].paddr = 0;
+            slicetable[i].size = 0;
+            pages.gaps++;
+            i++;
+            continue;
+        }
         #ifdef PIM_MERGE_SLICES
-        if( i<pages.count-1 )
-            while (pages.physical_addr[i+c-1] + PAGE_SIZE == pages.physical_addr[i+c]) c++; // Number of contiguous slices up to now
+        while (i+c<pages.span && pages.physical_addr[i+c-1] + PAGE_SIZE == pages.physical_addr[i+c]) c++; // Number of contiguous slices up to now
         #endif
 
         // Merge the contiguous slices
         for (j=0; j<c; j++)
         {
-            slicetable[i+j].vaddr = (ulong_t)(vaddr_start + PAGE_SIZE*(i)); // + PIM_HOST_OFFSET; // Translated to PIM VA;		(REMOVED BY ERFAN)
+            slicetable[i+j].vaddr = (ulong_t)(pages.vstart + PAGE_SIZE*(i)); // + PIM_HOST_OFFSET; // Translated to PIM VA;		(REMOVED BY ERFAN)
             slicetable[i+j].paddr = (ulong_t)(pages.physical_addr[i]);
             slicetable[i+j].size = PAGE_SIZE*(c);
         }
+        slices[stat_numslices] = slicetable[i];
+        if ( slicetable[i].size > stat_maxslice )
+            stat_maxslice = slicetable[i].size;
         stat_numslices++;
         i += c;
 	}
 
 	// Print the Slice Table
 	PIM_INFO("-------------------------PIM SLICE TABLE-----------------------------------");
-	PIM_INFO("  Page Order: %d", order);
-	for (i=0; i<pages.count; i++) 
+	PIM_INFO("  Page Order: %d  Ranges: %d", order, pages.num_ranges);
+	for (i=0; i<pages.span; i++) 
 		PIM_INFO("0x%lx: SLICE[%d]: VA [0x%lx, 0x%lx] ---> PA [0x%lx, 0x%lx]  %ld(B)", (ulong_t)(&slicetable[i]),
         i, (ulong_t)slicetable[i].vaddr, (ulong_t)(slicetable[i].vaddr+slicetable[i].size-1), (ulong_t)slicetable[i].paddr,
         ((ulong_t)slicetable[i].paddr+slicetable[i].size-1), slicetable[i].size);
@@ -449,9 +870,9 @@ int pim_create_slice_table(ulong_t vaddr_start)
     // Check if the contiguous regions have been merged
     #ifdef DEBUG_DRIVER
     c=0;
-    for (i=0; i<pages.count-1; i++) 
-        if (pages.physical_addr[i] + PAGE_SIZE == pages.physical_addr[i+1]) c++; // Number of contiguous slices up to now
-    PIM_INFO("#pages:%d   #slices:%d   #merges:%d", pages.count, stat_numslices, c);
+    for (i=0; i<pages.span-1; i++) 
+        if (pages.physical_addr[i] && pages.physical_addr[i] + PAGE_SIZE == pages.physical_addr[i+1]) c++; // Number of contiguous slices up to now
+    PIM_INFO("#pages:%d   #span:%ld   #slices:%d   #merges:%d", pages.count, pages.span, stat_numslices, c);
 
     // p = (ulong_t*)slicetable;
     // for (i=0; i<pages.count*3; i++)
@@ -464,8 +885,8 @@ int pim_create_slice_table(ulong_t vaddr_start)
 	   whenever a miss occurs in its TLBs.
 	*/
     pim_write_ulong_t(PIM_SLICETABLE,  slicetable_paddr);
-    pim_write_ulong_t(PIM_SLICECOUNT,  pages.count);
-    pim_write_ulong_t(PIM_SLICEVSTART, slicetable[0].vaddr);
+    pim_write_ulong_t(PIM_SLICECOUNT,  pages.span);
+    pim_write_ulong_t(PIM_SLICEVSTART, pages.vstart);
 	// Debug:
 	PIM_INFO("PIM_SLICETABLE:  0x%lx", pim_read_ulong_t(PIM_SLICETABLE));
 	PIM_INFO("PIM_SLICECOUNT:    %ld", pim_read_ulong_t(PIM_SLICECOUNT));
@@ -485,6 +906,53 @@ int pim_create_slice_table(ulong_t vaddr_start)
 	return 0;
 }
 
+/*
+  Map the completion interrupt of PIM (a shared peripheral interrupt of
+  the GIC, which is not described in the device tree) and request it.
+  On failure, pim_irq stays 0 and the users have to poll.
+*/
+int pim_request_irq()
+{
+#if PIM_HOST_IRQ
+	int err;
+	struct of_phandle_args irq_data;
+	irq_data.np = of_find_compatible_node(NULL, NULL, "arm,cortex-a15-gic");
+	if ( irq_data.np == NULL )
+	{
+		PIM_WARN("Cannot find the interrupt controller, the users have to poll PIM_STATUS_REG");
+		return -ENODEV;
+	}
+	irq_data.args_count = 3;
+	irq_data.args[0] = 0;					// SPI
+	irq_data.args[1] = PIM_HOST_IRQ - 32;	// SPIs start from 32
+	irq_data.args[2] = IRQ_TYPE_EDGE_RISING;
+	pim_irq = irq_create_of_mapping(&irq_data);
+	of_node_put(irq_data.np);
+	if ( !pim_irq )
+	{
+		PIM_WARN("Cannot map the interrupt %d, the users have to poll PIM_STATUS_REG", PIM_HOST_IRQ);
+		return -EINVAL;
+	}
+
+	err = request_irq(pim_irq, pim_irq_handler, 0, "PIM", &pimdevice);
+	if ( err )
+	{
+		PIM_WARN("Cannot request the interrupt %d (%d), the users have to poll PIM_STATUS_REG", PIM_HOST_IRQ, err);
+		pim_irq = 0;
+		return err;
+	}
+	PIM_INFO("Completion interrupt: %d (Linux IRQ %d)", PIM_HOST_IRQ, pim_irq);
+#endif
+	return 0;
+}
+
+irqreturn_t pim_irq_handler(int irq, void *dev_id)
+{
+	stat_numirqs++;
+	wake_up_interruptible(&pim_wq);
+	return IRQ_HANDLED;
+}
+
 /*
   Direct read and write to the memory mapped region of PIM
   These two functions directly communicate with PIM's SPM
@@ -516,32 +984,23 @@ ulong_t pim_read_ulong_t(ulong_t offset)
   Flush the caches to make sure the most recent data in the SliceTable
   is accessible by the PIM device.
   For every page in slicetable, it will flush the whole range
+  (except for the shared buffers, see pim_alloc_shared)
 */
 int pim_cache_flush()
 {
-	/*
-	gem5 does not implement the cache flush instructions of ARM.
-	So we use a simulation hack to do it.
-	*/
 	ulong_t i;
+	SharedBuffer* b;
 	PIM_INFO("Flushing the caches using a simulation hack");
-	for (i=0; i<pages.count; i++) 
+	for (i=0; i<stat_numslices; i++) 
 	{
-		//PIM_INFO("Flushed L2: pages.physical_addr[%ld]=0x%lx", i, pages.physical_addr[i]);
-		pim_write_ulong_t(PIM_M5_D1_REG, (ulong_t)(pages.physical_addr[i]));
-        pim_write_ulong_t(PIM_M5_D2_REG, (ulong_t)(pages.physical_addr[i]+PAGE_SIZE-1));
-        // This is necessary to maintain the order of the transactions
-        pim_read_ulong_t(PIM_M5_D1_REG);
-        pim_read_ulong_t(PIM_M5_D2_REG);
-		pim_write_byte(PIM_M5_REG, PIM_HOST_CACHE_FLUSH_HACK);
+		b = pim_find_shared(slices[i].paddr);
+		if ( b && slices[i].paddr + slices[i].size <= b->paddr + b->size )
+			continue;
+		//PIM_INFO("Flushed L2: slices[%ld].paddr=0x%lx", i, slices[i].paddr);
+		pim_flush_range(slices[i].paddr, slices[i].size);
 	}
 	PIM_INFO("Flushing the slice-table itself");
-	pim_write_ulong_t(PIM_M5_D1_REG, (ulong_t)(slicetable_paddr));
-	pim_write_ulong_t(PIM_M5_D2_REG, (ulong_t)(slicetable_paddr + pages.count*sizeof(Slice)-1));
-    // This is necessary to maintain the order of the transactions
-    pim_read_ulong_t(PIM_M5_D1_REG);
-    pim_read_ulong_t(PIM_M5_D2_REG);
-	pim_write_byte(PIM_M5_REG, PIM_HOST_CACHE_FLUSH_HACK);
+	pim_flush_range(slicetable_paddr, pages.span*sizeof(Slice));
 
 //  PIM_INFO("Flushing the slice-table itself");
 //	void * kaddr;
@@ -582,3 +1041,18 @@ int pim_cache_flush()
 	PIM_INFO("Cache Flush Done!");
 	return 0;
 }
+
+/*
+  Flush the caches for a physical range
+  gem5 does not implement the cache flush instructions of ARM.
+  So we use a simulation hack to do it (once for each range).
+*/
+void pim_flush_range(ulong_t paddr, ulong_t size)
+{
+	pim_write_ulong_t(PIM_M5_D1_REG, paddr);
+	pim_write_ulong_t(PIM_M5_D2_REG, paddr+size-1);
+	// This is necessary to maintain the order of the transactions
+	pim_read_ulong_t(PIM_M5_D1_REG);
+	pim_read_ulong_t(PIM_M5_D2_REG);
+	pim_write_byte(PIM_M5_REG, PIM_HOST_CACHE_FLUSH_HACK);
+}
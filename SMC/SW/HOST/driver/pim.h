@@ -19,6 +19,12 @@ If host is AARCH, then PIM is AARCH
 // Number of contiguous minor numbers allocated for this module
 #define PIM_MOD_DEV_NO		1
 
+// Timeout of PIM_IOCTL_WAIT_COMMAND (jiffies)
+#define PIM_WAIT_TIMEOUT	(HZ/100)
+
+// Offset of mmap for the shared buffer i (a cookie which fits in a 32b off_t, far from PHY_BASE)
+#define PIM_SHARED_MMAP_OFFSET(i)	(PHY_SIZE + ((ulong_t)(i) << PAGE_SHIFT))
+
 /*****************************************************/
 // Messages and Debugging facilities
 
@@ -74,13 +80,27 @@ typedef struct {
 } PIMDevice;
 
 /*
-List of pages pinned for use by the PIM device, along with their
-physical address
+A contiguous virtual range pinned for use by the PIM device
+*/
+typedef struct {
+    ulong_t vaddr;                  // Virtual address of the first page
+    unsigned count;                 // Number of pages
+    struct page** list;             // Pinned pages of this range
+} PinnedRange;
+
+/*
+List of the ranges pinned for use by the PIM device (in the order of
+allocation, they may be discontiguous), along with the physical address
+of the pages in the slice table
 */
 typedef struct {
-    struct page** list;             // Pages pinned for use by the PIM device
+    PinnedRange* ranges;            // Ranges pinned for use by the PIM device
+    unsigned num_ranges;            // Number of ranges
     unsigned count;                 // Number of pages pinned
-    ulong_t *physical_addr;      // Physical address of each page
+    ulong_t vstart;                 // Virtual address of the first page of the slice table
+    ulong_t span;                   // Number of pages covered by the slice table (pinned or not)
+    unsigned gaps;                  // Number of pages of the slice table which are not pinned
+    ulong_t *physical_addr;      // Physical address of each page of the slice table (0: not pinned)
 } Pages;
 
 /*
@@ -96,6 +116,19 @@ typedef struct {
     ulong_t   size;                   // Size of the slice (multiple pages)
 } Slice;
 
+/*
+A physically contiguous buffer allocated by the driver and mapped by the
+user (zero-copy). Its pages are never pinned, and it is added to the slice
+table as soon as it is mapped.
+*/
+typedef struct {
+    ulong_t paddr;                  // Physical address of the buffer
+    ulong_t vaddr;                  // Virtual address of the buffer in the user space (0: not mapped yet)
+    ulong_t size;                   // Size of the buffer (whole pages)
+    unsigned order;                 // Page order of the buffer
+    unsigned flags;                 // PIM_SHARED_CACHED or PIM_SHARED_UNCACHED
+} SharedBuffer;
+
 /*****************************************************/
 // PIM file operations
 
@@ -120,14 +153,44 @@ int pim_mmap(struct file *filp, struct vm_area_struct *vma);
 // LLSEEK
 loff_t pim_llseek(struct file *filp, loff_t off, int whence);
 
+// POLL
+unsigned int pim_poll(struct file *filp, poll_table *wait);
+
 /*****************************************************/
 // Utilities
 
-// Pin user pages into memory
+// Pin user pages into memory (appended to the pinned ranges)
 int pim_get_user_pages(ulong_t addr_start, ulong_t n_pages);
 
-// Create a slice table based on the pinned pages
-int pim_create_slice_table(ulong_t vaddr_start);
+// Unpin all pages and free the slice table
+void pim_release_user_pages(void);
+
+// Create a slice table based on the pinned pages (covering all pinned ranges)
+int pim_create_slice_table(void);
+
+// Find the slice holding a virtual address (binary search, NULL if not pinned)
+Slice* pim_find_slice(ulong_t vaddr);
+
+// Check if all pages of a range are already pinned
+int pim_range_pinned(ulong_t addr_start, ulong_t n_pages);
+
+// Allocate a physically contiguous buffer to be mapped by the user
+int pim_alloc_shared(PIMSharedAlloc* req);
+
+// Map a shared buffer to the user space and add it to the slice table
+int pim_mmap_shared(SharedBuffer* b, struct vm_area_struct *vma);
+
+// Find the shared buffer at a physical address (NULL if there is none)
+SharedBuffer* pim_find_shared(ulong_t paddr);
+
+// Find the mapped shared buffer holding a virtual address (NULL if there is none)
+SharedBuffer* pim_find_shared_vaddr(ulong_t vaddr);
+
+// Flush a range of a shared buffer (user virtual address)
+int pim_flush_shared(ulong_t vaddr, ulong_t size);
+
+// Free all shared buffers
+void pim_free_shared(void);
 
 // Write 1 byte to the memory mapped region of PIM
 void pim_write_byte(ulong_t offset, char data);
@@ -144,4 +207,13 @@ ulong_t pim_read_ulong_t(ulong_t offset);
 // Flush the caches for all pages in the pages.list
 int pim_cache_flush(void);
 
+// Flush the caches for a physical range [paddr, paddr+size-1]
+void pim_flush_range(ulong_t paddr, ulong_t size);
+
+// Map and request the completion interrupt of PIM (PIM_HOST_IRQ)
+int pim_request_irq(void);
+
+// Completion interrupt of PIM: wake up the readers
+irqreturn_t pim_irq_handler(int irq, void *dev_id);
+
 #endif // _PIM_DEVICE_DRIVER_
@@ -125,3 +125,88 @@
     }
 
 #endif  
+
+/******************************************************************************/
+#ifdef kernel_sg
+
+    #define A_ping (ping+XFER_SIZE*0)
+    #define B_ping (ping+XFER_SIZE*1)
+    #define C_ping (ping+XFER_SIZE*2)
+    #define A_pong (pong+XFER_SIZE*0)
+    #define B_pong (pong+XFER_SIZE*1)
+    #define C_pong (pong+XFER_SIZE*2)
+
+    void execute_kernel()
+    {
+        /*
+        Same as kernel_best, but the transfers are submitted through the
+        DMA descriptor ring: the A and B blocks of the next iteration share
+        one DMA resource (DMA_RES0), and the write back uses DMA_RES1.
+        Set PIM_DMA_NUM_CHANNELS > 1 to serve A and B concurrently.
+
+        SREG[0]: A Matrix (Virtual Pointer)
+        SREG[1]: B Matrix (Virtual Pointer)
+        SREG[2]: C Matrix (Virtual Pointer)
+        SREG[3]: Size
+        */
+        uint8_t *A, *B, *C;    // Notice: because of the DMA transfers, A, B, and C must be uint8_t* and not ulong_t*
+        ulong_t S, SS;
+        ulong_t x, j;
+        ulong_t num_bursts;
+
+        // Ping-pong buffering
+        volatile uint8_t* ping;
+        volatile uint8_t* pong;
+        volatile uint8_t* swap;
+
+        // Descriptors (on the stack, in the SPM)
+        dma_desc_t fill_desc[2];
+        dma_desc_t wb_desc;
+
+        A = (uint8_t*) PIM_SREG[0];
+        B = (uint8_t*) PIM_SREG[1];
+        C = (uint8_t*) PIM_SREG[2];
+        S = PIM_SREG[3];
+
+        SS = S*S;
+        ping = &PIM_VREG[0];
+        pong = &PIM_VREG[0] + MAX_XFER_SIZE*3;
+
+        // First we have to fill the ping buffer (only once)
+        DMA_DESC(fill_desc[0], A, A_ping, XFER_SIZE, PIM_DMA_READ, DMA_RES0 );
+        DMA_DESC(fill_desc[1], B, B_ping, XFER_SIZE, PIM_DMA_READ, DMA_RES0 );
+        DMA_SUBMIT(fill_desc, 2);
+        DMA_WAIT( DMA_RES0);
+
+        num_bursts = SS*sizeof(ulong_t)/XFER_SIZE;
+        for (x=0; x<num_bursts; x++)
+        {
+            // Fill Pong (Request)
+            if ( x+1 < num_bursts ) // Boundary
+            {
+                DMA_DESC(fill_desc[0], A+(x+1)*XFER_SIZE, A_pong, XFER_SIZE, PIM_DMA_READ, DMA_RES0 );
+                DMA_DESC(fill_desc[1], B+(x+1)*XFER_SIZE, B_pong, XFER_SIZE, PIM_DMA_READ, DMA_RES0 );
+                DMA_SUBMIT(fill_desc, 2);
+            }
+
+            // Work on Ping's data
+            for ( j=0; j< XFER_SIZE/sizeof(ulong_t); j++ )
+                ((ulong_t*)C_ping)[j] = ((ulong_t*)A_ping)[j] + ((ulong_t*)B_ping)[j];
+
+            // Write back the result of Ping
+            DMA_WAIT( DMA_RES1);
+            DMA_DESC(wb_desc, C+x*XFER_SIZE, C_ping, XFER_SIZE, PIM_DMA_WRITE, DMA_RES1 );
+            DMA_SUBMIT(&wb_desc, 1);
+
+            // Wait for Pong to finish
+            DMA_WAIT( DMA_RES0);
+
+            // Swap ping and pong
+            swap = ping;
+            ping = pong;
+            pong = swap;
+        }
+        DMA_WAIT( DMA_RES1);
+    }
+
+#endif
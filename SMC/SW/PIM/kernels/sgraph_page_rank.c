@@ -496,6 +496,101 @@
 
 #endif
 
+/******************************************************************************/
+/* Same as dma2, with the tiled streams of the resident code (see tiles.h) */
+#ifdef kernel_tiles
+
+    void execute_kernel()
+    {
+        unsigned j;
+        ulong_t i, n, NODES, MAX_ITERATIONS, count;
+        node* nodes;
+        volatile node* tile;
+        float diff, delta, f, MAX_ERROR;
+        float* pf;
+        #ifdef USE_HMC_ATOMIC_CMD
+        uint32_t* t;
+        #endif
+        pim_tiles s;
+
+        /* PIM Scalar Registers
+        SREG[0]: nodes
+        SREG[1]: ---
+        SREG[2]: number of nodes
+        SREG[3]: retval (output from PIM)
+        SREG[4]: MAXIMUM ERROR
+        SREG[5]: MAXIMUM ITERATIONS
+        */
+
+        nodes = (node*)PIM_SREG[0];
+        NODES = PIM_SREG[2];
+        pf = (float*)(&(PIM_SREG[4]));
+        MAX_ERROR = *(pf);
+        MAX_ITERATIONS = PIM_SREG[5];
+
+        pim_print_hex("NODES", NODES);
+        pim_print_hex("MAX ITERATIONS", MAX_ITERATIONS);
+        pim_print_msg("MAX_ERROR:");
+        #ifdef DEBUG_RESIDENT
+        PIM_SREG[0] = PIM_SREG[4];
+        PIM_COPROCESSOR_CMD = CMD_FPRINT;
+        #endif
+
+        for ( i=0; i<NODES; i++ )
+        {
+            nodes[i].page_rank = 1.0 / (float)NODES;
+            nodes[i].next_rank = 0.15 / (float)NODES;
+        }
+
+        count = 0;
+        diff = 0.0;
+        do {
+            /* Scatter the ranks (the nodes are only read) */
+            pim_tiles_begin(&s, nodes, sizeof(node), NODES, &PIM_VREG[0], XFER_SIZE, PIM_TILES_READ_ONLY);
+            while ( (tile = pim_tiles_next(&s, &n)) )
+                for ( i=0; i<n; i++ )
+                {
+                    delta = 0.85 * tile[i].page_rank / (float)tile[i].out_degree;
+                    #ifdef USE_HMC_ATOMIC_CMD
+                    t = (uint32_t*)&delta;
+                    HMC_OPERAND = *t;
+                    for ( j=0; j<tile[i].out_degree; j++ ) // for node.successors
+                        HMC_ATOMIC___FADD(tile[i].successors[j]->next_rank);
+                    #else
+                    for ( j=0; j<tile[i].out_degree; j++ ) // for node.successors
+                        tile[i].successors[j]->next_rank += delta;
+                    #endif
+                }
+            pim_tiles_end(&s);
+
+            /* Update the ranks (the nodes are written back) */
+            diff = 0.0;
+            pim_tiles_begin(&s, nodes, sizeof(node), NODES, &PIM_VREG[0], XFER_SIZE, PIM_TILES_WRITE_BACK);
+            while ( (tile = pim_tiles_next(&s, &n)) )
+                for ( i=0; i<n; i++ )
+                {
+                    /* absolute value */
+                    f = tile[i].next_rank - tile[i].page_rank;
+                    if ( f < 0 )
+                        f = -f;
+                    diff += f;
+                    tile[i].page_rank = tile[i].next_rank;
+                    tile[i].next_rank = 0.15 / (float)NODES;
+                }
+            pim_tiles_end(&s);
+
+            #ifdef DEBUG_RESIDENT
+            pim_print_hex("iteration", count);
+            pim_print_msg("error:");
+            PIM_SREG[0] = *((ulong_t*)&diff);
+            PIM_COPROCESSOR_CMD = CMD_FPRINT;
+            #endif
+        } while (++count < MAX_ITERATIONS && diff > MAX_ERROR);
+        PIM_SREG[3] = (ulong_t)(diff * 1000000.0);
+    }
+
+#endif
+
 /******************************************************************************/
 /* This contains the most advanced use for DMA */
 #ifdef kernel_best
@@ -25,6 +25,12 @@ echo -e "
 #define PIM_VREG_SIZE $PIM_VREG_SIZE
 #define PIM_SREG_COUNT $PIM_SREG_COUNT
 #define SIZEOF_ULONG $SIZEOF_ULONG
+#define PIM_NUM_CORES $PIM_NUM_CORES
+#define PIM_CMDQ_SIZE $PIM_CMDQ_SIZE
+#define PIM_TEXT_OFFSET $PIM_TEXT_OFFSET
+#define PIM_KCACHE_OFFSET $PIM_KCACHE_OFFSET
+#define PIM_KCACHE_SLOTS $PIM_KCACHE_SLOTS
+#define PIM_KCACHE_SLOT_SIZE $(PIM_KCACHE_SLOT_SIZE)
 $(set_if_true $DEBUG_PIM_RESIDENT "#define DEBUG_RESIDENT")
 " > _params.h
 
@@ -43,7 +49,7 @@ load_model system/pim_bare_metal_link.sh > resident.ld
 if [ $1 == "7" ]; then	# PIM is ARMv7
 
 	print_msg " > Boot loader ..."
-	${PIM_CROSS_COMPILE}gcc -mfloat-abi=softfp -march=armv7-a -fno-builtin -nostdinc -o boot.o -c boot_arm7.S -Wall $PIM_OPT_LEVEL
+	${PIM_CROSS_COMPILE}gcc -mfloat-abi=softfp -march=armv7-a -fno-builtin -nostdinc -o boot.o -c boot_arm7.S -Wall $PIM_OPT_LEVEL -DPIM_CORE_STACK_SIZE=$PIM_CORE_STACK_SIZE
 	print_msg " > Resident code ..."
 	${PIM_CROSS_COMPILE}gcc -c -march=armv7-a resident.c -o resident.o -mno-thumb-interwork -fno-stack-protector -fPIC -Wall $PIM_OPT_LEVEL -fno-toplevel-reorder
 	${PIM_CROSS_COMPILE}gcc -c -march=armv7-a resident.c -o resident.s -mno-thumb-interwork -fno-stack-protector -fPIC -S -Wall $PIM_OPT_LEVEL -fno-toplevel-reorder
@@ -54,7 +60,7 @@ if [ $1 == "7" ]; then	# PIM is ARMv7
 ################################################################################################
 elif [ $1 == "8" ]; then	# PIM is ARMv8
 	print_msg " > Boot loader ..."
-	${PIM_CROSS_COMPILE}gcc -march=armv8-a -nostdinc -o boot.o -c boot_arm8.S -Wall $PIM_OPT_LEVEL -DCNTFRQ=0x01800000 -DSYSREGS_BASE=0x1c010000 -DGIC_DIST_BASE=0x2c001000 -DGIC_CPU_BASE=0x2c002000 
+	${PIM_CROSS_COMPILE}gcc -march=armv8-a -nostdinc -o boot.o -c boot_arm8.S -Wall $PIM_OPT_LEVEL -DCNTFRQ=0x01800000 -DSYSREGS_BASE=0x1c010000 -DGIC_DIST_BASE=0x2c001000 -DGIC_CPU_BASE=0x2c002000 -DPIM_CORE_STACK_SIZE=$PIM_CORE_STACK_SIZE
 	
 	#-fno-builtin
 	#-DUART_BASE=0x1c090000
@@ -96,16 +102,40 @@ if [ $BUILD_RESIDENT == TRUE ]; then					# Build the main resident code
 	get_symbol_addr PIM_DMA_COMMAND resident.elf
     get_symbol_addr PIM_DMA_STATUS resident.elf
     get_symbol_addr PIM_DMA_CLI resident.elf
+    get_symbol_addr PIM_DMA_DESC_ADDR resident.elf
+    get_symbol_addr PIM_DMA_DESC_COUNT resident.elf
     get_symbol_addr HMC_ATOMIC_INCR resident.elf
     get_symbol_addr HMC_ATOMIC_IMIN resident.elf
     get_symbol_addr HMC_ATOMIC_FADD resident.elf
     get_symbol_addr HMC_OPERAND resident.elf
+    get_symbol_addr HMC_SWAP_OPERAND resident.elf
+    get_symbol_addr HMC_ATOMIC_OPCODE resident.elf
+    get_symbol_addr HMC_ATOMIC_TARGET resident.elf
+    get_symbol_addr HMC_RESULT resident.elf
 	get_symbol_addr PIM_COPROCESSOR_CMD resident.elf
+	get_symbol_addr PIM_CLUSTER_EPOCH resident.elf
+	get_symbol_addr PIM_CLUSTER_STARTED resident.elf
+	get_symbol_addr PIM_CLUSTER_BARRIER resident.elf
+	get_symbol_addr PIM_CLUSTER_SENSE resident.elf
+	get_symbol_addr PIM_WORK_NEXT resident.elf
+	get_symbol_addr PIM_CLUSTER_COMMAND resident.elf
+	get_symbol_addr PIM_CMDQ_RING resident.elf
+	get_symbol_addr PIM_CMDQ_HEAD resident.elf
+	get_symbol_addr PIM_CMDQ_TAIL resident.elf
+	get_symbol_addr PIM_KCACHE_TAG resident.elf
+	get_symbol_addr PIM_KCACHE_USED resident.elf
+	get_symbol_addr PIM_KCACHE_ACTIVE resident.elf
+	get_symbol_addr PIM_KCACHE_LOAD resident.elf
 
 	pim_print_mem_map	# Print the memory map
 	# Check if the size of these sections fit in available regions
 	check_section_size $(echo $((16#${text_size:2})))   $(PIM_TEXT_SIZE) ".text"
 	check_section_size $(echo $((16#${rodata_size:2}))) $(PIM_RODATA_SIZE) ".rodata"
+	check_section_size $(($PIM_KCACHE_OFFSET + $PIM_KCACHE_SLOTS * $(PIM_KCACHE_SLOT_SIZE))) $(conv_to_bytes $PIM_ADDRESS_SIZE) "kernel cache"
+	# The stacks of the cores grow down from stack_top towards .bss
+	get_symbol_addr __bss_end__ resident.elf
+	get_symbol_addr stack_top resident.elf
+	check_section_size $(($__bss_end__)) $(($stack_top - $PIM_NUM_CORES * $PIM_CORE_STACK_SIZE)) ".bss (below the stacks of the cores)"
 	
 	# Disassembly output (for debugging purposes)
 	${PIM_CROSS_COMPILE}objdump -S --disassemble resident.elf > resident.elf.disasm
@@ -141,22 +171,40 @@ else													# Build the kernel to be offloaded
 	check_symbol_addr PIM_DMA_COMMAND resident.elf	
 	check_symbol_addr PIM_DMA_STATUS resident.elf
     check_symbol_addr PIM_DMA_CLI resident.elf
+    check_symbol_addr PIM_DMA_DESC_ADDR resident.elf
+    check_symbol_addr PIM_DMA_DESC_COUNT resident.elf
 	check_symbol_addr HMC_ATOMIC_INCR resident.elf
     check_symbol_addr HMC_ATOMIC_IMIN resident.elf
     check_symbol_addr HMC_ATOMIC_FADD resident.elf
     check_symbol_addr HMC_OPERAND resident.elf
+    check_symbol_addr HMC_SWAP_OPERAND resident.elf
+    check_symbol_addr HMC_ATOMIC_OPCODE resident.elf
+    check_symbol_addr HMC_ATOMIC_TARGET resident.elf
+    check_symbol_addr HMC_RESULT resident.elf
 	check_symbol_addr PIM_COPROCESSOR_CMD resident.elf
+	check_symbol_addr PIM_CLUSTER_EPOCH resident.elf
+	check_symbol_addr PIM_CLUSTER_STARTED resident.elf
+	check_symbol_addr PIM_CLUSTER_BARRIER resident.elf
+	check_symbol_addr PIM_CLUSTER_SENSE resident.elf
+	check_symbol_addr PIM_WORK_NEXT resident.elf
+	check_symbol_addr PIM_CLUSTER_COMMAND resident.elf
+	check_symbol_addr PIM_CMDQ_RING resident.elf
+	check_symbol_addr PIM_CMDQ_HEAD resident.elf
+	check_symbol_addr PIM_CMDQ_TAIL resident.elf
+	check_symbol_addr PIM_KCACHE_TAG resident.elf
+	check_symbol_addr PIM_KCACHE_USED resident.elf
+	check_symbol_addr PIM_KCACHE_ACTIVE resident.elf
+	check_symbol_addr PIM_KCACHE_LOAD resident.elf
 	
-	print_msg " > Dump the required section to $2.hex"
+	print_msg " > Dump the required section to $2.$OFFLOADED_KERNEL_FORMAT"
 # 	get_symbol_addr execute_kernel resident.elf
 # 	get_symbol_size execute_kernel resident.elf
 	if [ $OFFLOAD_THE_KERNEL == TRUE ]; then
-		hexdump_section resident.elf "text"   $2.hex
-		hexdump_section resident.elf "rodata" $2.hex
+		hexdump_sections resident.elf $2.$OFFLOADED_KERNEL_FORMAT "text" "rodata"
 	else
-		touch $2.hex		# Because we are not actually offloading anything
+		touch $2.$OFFLOADED_KERNEL_FORMAT		# Because we are not actually offloading anything
 	fi
-	#hexdump_section resident.elf "symtab" $2.hex		TODO THIS IS NOT NECESSARY
+	#hexdump_section resident.elf "symtab" $2.$OFFLOADED_KERNEL_FORMAT		TODO THIS IS NOT NECESSARY
 	# Check if the size of these sections fit in available regions
 	check_section_size $(echo $((16#${text_size:2})))   $(PIM_TEXT_SIZE) ".text"
 	check_section_size $(echo $((16#${rodata_size:2}))) $(PIM_RODATA_SIZE) ".rodata"
@@ -0,0 +1,97 @@
+#ifndef _PIM_DEVICE_CLUSTER_
+#define _PIM_DEVICE_CLUSTER_
+
+#include "registers.h"
+
+/*
+  Multi-core PIM device (PIM_NUM_CORES > 1):
+  All cores run the resident program from the same image, each one on its
+  own stack (PIM_CORE_STACK_SIZE bytes below the stack of the previous core).
+  Core 0 handles the commands of the host, the other cores (workers) sleep
+  until core 0 starts a new epoch. Kernels which define PIM_PARALLEL_KERNEL
+  are executed by all cores, and they can split their work-items with
+  PIM_FOR_EACH_WORK_ITEM (static), pim_core_range (static, contiguous) or
+  pim_next_work_item (dynamic). Other kernels are only executed by core 0.
+  Notice: each core should use its own DMA resource (DMA_RES_CORE), since
+  the DMA status register is shared by all cores.
+*/
+
+volatile ulong_t PIM_CLUSTER_EPOCH;      // Incremented by core 0 for each command
+volatile ulong_t PIM_CLUSTER_STARTED;    // Number of workers which have started the current epoch
+volatile ulong_t PIM_CLUSTER_BARRIER;    // Number of cores arrived at the barrier
+volatile ulong_t PIM_CLUSTER_SENSE;      // Flipped when all cores arrive at the barrier
+volatile ulong_t PIM_WORK_NEXT;          // Next work-item for the dynamic dispatch
+volatile ulong_t PIM_CLUSTER_COMMAND;    // Command of the current epoch
+
+//*************************************
+// ID of the current core (affinity level 0 of MPIDR)
+static inline unsigned pim_core_id()
+{
+#if PIM_NUM_CORES > 1
+	ulong_t mpidr;
+	#if SIZEOF_ULONG == 4
+	__asm__ volatile("mrc p15, 0, %0, c0, c0, 5" : "=r"(mpidr));
+	#else
+	__asm__ volatile("mrs %0, mpidr_el1" : "=r"(mpidr));
+	#endif
+	return mpidr & 0xFF;
+#else
+	return 0;
+#endif
+}
+
+// DMA resource of the current core
+#define DMA_RES_CORE    ((uint8_t)(1 << pim_core_id()))
+
+//*************************************
+// Wait until all cores have arrived (sense-reversing barrier)
+void pim_barrier()
+{
+#if PIM_NUM_CORES > 1
+	ulong_t sense = PIM_CLUSTER_SENSE;
+	if ( __sync_add_and_fetch(&PIM_CLUSTER_BARRIER, 1) == PIM_NUM_CORES )
+	{
+		PIM_CLUSTER_BARRIER = 0;
+		PIM_CLUSTER_SENSE = !sense;
+	}
+	else
+		while ( PIM_CLUSTER_SENSE == sense );
+#endif
+}
+
+//*************************************
+// Dynamic dispatch: returns the next work-item, or n if there is nothing left
+ulong_t pim_next_work_item(ulong_t n)
+{
+	ulong_t i = __sync_fetch_and_add(&PIM_WORK_NEXT, 1);
+	return ( i < n ) ? i : n;
+}
+
+// Static dispatch: the work-items are interleaved across the cores
+#define PIM_FOR_EACH_WORK_ITEM(i, n) for ( i=pim_core_id(); i<(n); i+=PIM_NUM_CORES )
+
+// Static dispatch: each core gets a contiguous range of the work-items [*first, *first + *count) (e.g. to stream it, see tiles.h)
+void pim_core_range(ulong_t n, ulong_t* first, ulong_t* count)
+{
+	ulong_t c = pim_core_id();
+	ulong_t q = n / PIM_NUM_CORES;
+	ulong_t r = n % PIM_NUM_CORES;
+	*first = c*q + ( c < r ? c : r );
+	*count = q + ( c < r ? 1 : 0 );
+}
+
+//*************************************
+// Called by core 0 before running a command: wake up the workers and make sure all of them have started
+void pim_cluster_start(uint8_t command)
+{
+#if PIM_NUM_CORES > 1
+	PIM_CLUSTER_COMMAND = command;
+	PIM_WORK_NEXT = 0;
+	PIM_CLUSTER_STARTED = 0;
+	PIM_CLUSTER_EPOCH++;
+	while ( PIM_CLUSTER_STARTED != PIM_NUM_CORES-1 )
+		PIM_INTR_REG = PIM_INTR_TRIGGER;    // The workers may have missed the interrupt of the host
+#endif
+}
+
+#endif // _PIM_DEVICE_CLUSTER_
@@ -15,12 +15,17 @@
 #define PIM_COMMAND_HALT        'H' // Halt execution
 #define PIM_COMMAND_DEMO        'D' // Demo: VREG = INCR(VREG)
 #define PIM_COMMAND_RUN_KERNEL  'K' // Run the offloaded kernel
+#define PIM_COMMAND_LOAD_KERNEL 'L' // Copy the slot PIM_KCACHE_LOAD of the kernel cache to .text and .rodata
 
 // PIM_STATUS_REG values
 #define PIM_STATUS_SLEEP        'S' // Sleep
 #define PIM_STATUS_BUSY         'B' // Busy executing command
 #define PIM_STATUS_DONE         'D' // Done executing command
 
+// Words of a command queue entry (PIM_CMDQ_RING, see registers.h)
+#define PIM_CMDQ_COMMAND        0   // PIM_COMMAND_* to execute
+#define PIM_CMDQ_SREG           1   // Scalar registers of the command (PIM_SREG_COUNT words), copied back after execution (results)
+
 // PIM_ERROR_REG values
 #define PIM_ERROR_NONE          0x00    // No error
 #define PIM_ERROR_FAIL          0x01    // General failure
@@ -38,6 +43,18 @@
 #define PIM_DMA_READ            0b00000000  // Transfer from Memory to PIM's SPM
 #define PIM_DMA_WRITE           0b10000000  // Transfer from PIM's SPM to Memory
 
+// Words of a DMA descriptor (PIM_DMA_DESC_ADDR points to an array of descriptors)
+#define PIM_DMA_DESC_MEM_ADDR   0   // (Virtual Address) of the main memory location to transfer to/from
+#define PIM_DMA_DESC_SPM_ADDR   1   // Address of the SPM location to transfer to/from
+#define PIM_DMA_DESC_NUMBYTES   2   // Number of bytes to transfer
+#define PIM_DMA_DESC_COMMAND    3   // PIM_DMA_READ or PIM_DMA_WRITE, bitwise or with the DMA resource
+#define PIM_DMA_DESC_STATUS     4   // Written by the DMA when the transfer of this descriptor is completed
+#define PIM_DMA_DESC_WORDS      5   // Size of a descriptor (words)
+
+// PIM_DMA_DESC_STATUS values
+#define PIM_DMA_DESC_PENDING    0x00    // The transfer is not completed yet
+#define PIM_DMA_DESC_DONE       0x01    // The transfer is completed
+
 // DMA Resources ( Bitwise Or with PIM_DMA_COMMAND )
 #define DMA_RES0                0b00000001
 #define DMA_RES1                0b00000010
@@ -61,6 +78,11 @@
 #define HMC_CMD_INC                 '1' // Integer MEM = MEM + 1
 #define HMC_CMD_FADD                '2' // Float   MEM = MEM + HMC_OPERAND
 #define HMC_CMD_MIN                 '3' // Integer MEM = MIN( MEM, HMC_OPERAND )
+#define HMC_CMD_CAS                 '4' // Integer if ( MEM == HMC_OPERAND ) MEM = HMC_SWAP_OPERAND         (returns the old MEM)
+#define HMC_CMD_OR                  '5' // Integer MEM = MEM | HMC_OPERAND                                  (returns the old MEM)
+#define HMC_CMD_AND                 '6' // Integer MEM = MEM & HMC_OPERAND                                  (returns the old MEM)
+#define HMC_CMD_ADD16               '7' // 16 bytes MEM[0:7] += HMC_OPERAND, MEM[8:15] += HMC_SWAP_OPERAND  (signed)
+#define HMC_CMD_MINR                '8' // Integer MEM = MIN( MEM, HMC_OPERAND )                            (returns the old MEM)
 
 // PIM_COPROCESSOR_CMD values
 #define CMD_NOP                      0   // Nop
@@ -75,4 +97,9 @@
 #define CMD_TO_FIXED                 9 // PIM_SREG[1] = int(PIM_SREG[0]*1000000.0)          // Convert to Fixed-point
 #define CMD_CUSTOM_PR1              10 // Custom instruction sequence for PageRank
 
+// Binary kernel image (*.kimg): a list of sections, each one is a header followed by its payload
+#define PIM_KIMG_MAGIC          0x4B4D4950  // "PIMK" at the start of each section
+#define PIM_KIMG_HDR_SIZE       16          // Header: magic (32b), payload size (32b), load address (64b), little endian
+#define PIM_KIMG_ALIGN          8           // The payload is padded to a multiple of this size
+
 #endif // _PIM_DEVICE_DEFINITIONS_
\ No newline at end of file
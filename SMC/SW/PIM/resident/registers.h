@@ -58,6 +58,42 @@ volatile ulong_t PIM_SREG[PIM_SREG_COUNT];         // Scalar Registers (words)
      -------------
 */
 
+/*
+  Command queue (asynchronous offloading):
+  The host writes each command to the next entry of the ring and increments
+  PIM_CMDQ_HEAD. PIM executes the commands in order: PIM_SREG is loaded from
+  the entry before the command and stored back to it afterwards (results),
+  then PIM_CMDQ_TAIL is incremented and PIM_STATUS_REG is set to DONE (which
+  interrupts the host). PIM_STATUS_REG is SLEEP once the queue is empty.
+     ------------------------------
+    | COMMAND | SREG[0] | SREG[1] ...|   <--- PIM_CMDQ_RING[PIM_CMDQ_TAIL % PIM_CMDQ_SIZE]
+     ------------------------------
+*/
+#define PIM_CMDQ_WORDS  (PIM_CMDQ_SREG+PIM_SREG_COUNT)
+volatile ulong_t PIM_CMDQ_RING[PIM_CMDQ_SIZE][PIM_CMDQ_WORDS];    // Entries of the command queue
+volatile ulong_t PIM_CMDQ_HEAD;        // Number of commands written by the host
+volatile ulong_t PIM_CMDQ_TAIL;        // Number of commands finished by PIM
+
+/*
+  Kernel cache:
+  PIM_KCACHE_SLOTS slots of PIM_KCACHE_SLOT_SIZE bytes at PIM_KCACHE_OFFSET of
+  the SPM (above the stacks), each one holds the .text and .rodata of a kernel
+  (from PIM_TEXT_OFFSET). The host writes a kernel to a slot only once, then
+  PIM_COMMAND_LOAD_KERNEL copies it to .text and .rodata inside the SPM. The
+  tags are kept here (not in the host), so the cache persists across the host
+  processes until PIM is rebooted.
+     ---------------------------------------
+    | .text + .rodata (kernel of TAG[0])    |  <--- PIM_KCACHE_OFFSET
+     ---------------------------------------
+    | .text + .rodata (kernel of TAG[1])    |  <--- PIM_KCACHE_OFFSET + PIM_KCACHE_SLOT_SIZE
+     ---------------------------------------
+    | ...                                   |
+*/
+volatile ulong_t PIM_KCACHE_TAG[PIM_KCACHE_SLOTS];     // Hash of the kernel in each slot (0: empty)
+volatile ulong_t PIM_KCACHE_USED[PIM_KCACHE_SLOTS];    // Last use of each slot (LRU replacement by the host)
+volatile ulong_t PIM_KCACHE_ACTIVE;    // Hash of the kernel in .text and .rodata (0: the kernel built into the resident code)
+volatile ulong_t PIM_KCACHE_LOAD;      // Slot to load (PIM_COMMAND_LOAD_KERNEL)
+
 /*
   Registers for communication with gem5 (Debugging and hacks)
 */
@@ -89,6 +125,17 @@ volatile uint8_t PIM_DMA_COMMAND;           // PIM DMA Command Register
 volatile uint8_t PIM_DMA_STATUS;            // Status of the DMA Resources
 volatile uint8_t PIM_DMA_CLI;               // Clear Interrupt Request
 
+/*
+  DMA descriptor ring (scatter-gather):
+  Writing N to PIM_DMA_DESC_COUNT launches the N descriptors starting at
+  PIM_DMA_DESC_ADDR (see PIM_DMA_DESC_* in definitions.h). The descriptors
+  can share a DMA resource, which is freed when all of them are completed,
+  and the status word of each descriptor is set to PIM_DMA_DESC_DONE when
+  its own transfer is completed.
+ */
+volatile ulong_t PIM_DMA_DESC_ADDR;         // Address of the first descriptor (in the SPM)
+volatile ulong_t PIM_DMA_DESC_COUNT;        // Number of descriptors to launch
+
 /*
 Sending atomic commands to the HMC.
 Instead of modifying PIM's ISA, we have devised these registers.
@@ -99,6 +146,10 @@ volatile ulong_t HMC_ATOMIC_INCR;            // Atomic Integer Increment by 1
 volatile ulong_t HMC_ATOMIC_IMIN;            // Atomic Integer Min
 volatile ulong_t HMC_ATOMIC_FADD;            // Atomic Float Add by HMC_OPERAND
 volatile ulong_t HMC_OPERAND;                // Operand for HMC commands
+volatile ulong_t HMC_SWAP_OPERAND;           // Second operand for HMC commands (CAS, ADD16)
+volatile ulong_t HMC_ATOMIC_OPCODE;          // Opcode (HMC_CMD_*) of the commands sent through HMC_ATOMIC_TARGET
+volatile ulong_t HMC_ATOMIC_TARGET;          // Generic atomic command on the written address
+volatile ulong_t HMC_RESULT;                 // Old value returned by the last HMC command (CAS, OR, AND, MINR)
 
 /*
 Arithmetic Coprocessor of PIM (Vector Processor)
@@ -4,6 +4,7 @@
 
 #include "registers.h"
 #include "utils.h"
+#include "tiles.h"
 
 /*
  * Handshaking Mechanism
@@ -15,10 +16,26 @@
  * 		DONE
  * NOP
  * 		IDLE
+ *
+ * Command Queue (see registers.h)
+ * HOST		PIM
+ * ---------------------
+ * HEAD++	
+ * 		BUSY
+ * 		TAIL++, DONE	(for each command)
+ * 		SLEEP		(queue is empty)
  */
 
+// Forward Declarations
+void pim_worker_loop();
+bool kernel_is_parallel();
+
 int c_entry() {
 
+	// The workers of a multi-core PIM device
+	if ( pim_core_id() != 0 )
+		pim_worker_loop();
+
 	// Initialize device registers
 	pim_print_msg("*********** initializing registers ...");
 	initialize_registers();
@@ -37,6 +54,10 @@ int c_entry() {
 			command_done();
 		}
 		else
+		if ( PIM_CMDQ_TAIL != PIM_CMDQ_HEAD )
+			drain_command_queue();
+		else
+		if ( PIM_CMDQ_TAIL == 0 )	// With the queue, the host may wake us up again after we have drained it
 			pim_error("Woke up but no new command has arrived!");
         PIM_DMA_CLI = 0xFF;
 
@@ -47,6 +68,35 @@ int c_entry() {
 	return 0;
 }
 
+//*************************************
+// The main loop of the workers (cores other than core 0)
+void pim_worker_loop()
+{
+	ulong_t epoch = PIM_CLUSTER_EPOCH;
+	while (1)
+	{
+		__asm__("wfi");
+		if ( PIM_CLUSTER_EPOCH == epoch )
+			continue;	// Not a new command
+		epoch = PIM_CLUSTER_EPOCH;
+		__sync_fetch_and_add(&PIM_CLUSTER_STARTED, 1);
+		if ( PIM_CLUSTER_COMMAND == PIM_COMMAND_RUN_KERNEL && kernel_is_parallel() )
+			execute_kernel();
+		pim_barrier();
+	}
+}
+
 // The computation kernel
 // Note: Must be placed after the c_entry function, for dynamic offloading
 #include "kernel.c"
+
+// Is the offloaded kernel executed by all cores?
+// Note: Must be placed after the computation kernel, so that it is offloaded along with it
+bool kernel_is_parallel()
+{
+	#ifdef PIM_PARALLEL_KERNEL
+	return true;
+	#else
+	return false;
+	#endif
+}
@@ -0,0 +1,121 @@
+#ifndef _PIM_DEVICE_TILES_
+#define _PIM_DEVICE_TILES_
+
+#include "utils.h"
+
+/*
+  Tiled streaming of an array (in the main memory) through the SPM:
+  The array is split into tiles of at most xfer_size bytes (whole elements).
+  The next tile is prefetched by the DMA while the current one is processed,
+  and with PIM_TILES_WRITE_BACK each processed tile is written back while the
+  following ones are processed. A stream needs 2 buffers (3 with write back)
+  of xfer_size bytes from spm, and it uses DMA descriptors of its own, so the
+  streams of different cores (or nested streams) do not wait for each other.
+
+    pim_tiles s;
+    volatile node* tile;
+    ulong_t i, n;
+    pim_tiles_begin(&s, nodes, sizeof(node), NODES, &PIM_VREG[0], XFER_SIZE, PIM_TILES_WRITE_BACK);
+    while ( (tile = pim_tiles_next(&s, &n)) )
+        for ( i=0; i<n; i++ )
+            ... tile[i] is nodes[pim_tiles_index(&s)+i] ...
+    pim_tiles_end(&s);
+
+  Notice: the stream (with its descriptors) must be in the SPM, e.g. on the stack.
+*/
+
+#define PIM_TILES_READ_ONLY     false   // The tiles are only read
+#define PIM_TILES_WRITE_BACK    true    // The tiles are written back after being processed
+
+typedef struct
+{
+	uint8_t* mem;               // The array in the main memory
+	ulong_t elem_size;          // Size of an element (bytes)
+	ulong_t size;               // Size of the array (bytes)
+	ulong_t tile;               // Size of a full tile (bytes, a multiple of elem_size)
+	ulong_t curr;               // Offset of the tile being processed
+	ulong_t curr_size;          // Size of the tile being processed (0: none)
+	ulong_t next;               // Offset of the tile being prefetched
+	bool write_back;
+	volatile uint8_t* buf_r;    // Tile being prefetched
+	volatile uint8_t* buf_p;    // Tile being processed
+	volatile uint8_t* buf_w;    // Tile being written back
+	dma_desc_t desc_r;          // Descriptor of the prefetch
+	dma_desc_t desc_w;          // Descriptor of the write back
+} pim_tiles;
+
+// Index of the first element of the current tile in the array
+#define pim_tiles_index(s)  ((s)->curr / (s)->elem_size)
+
+//*************************************
+// Prefetch the tile at s->next to buf_r
+void pim_tiles_fetch(pim_tiles* s)
+{
+	ulong_t n = ( s->size - s->next < s->tile ) ? s->size - s->next : s->tile;
+	DMA_DESC(s->desc_r, s->mem + s->next, s->buf_r, n, PIM_DMA_READ, DMA_RES_CORE);
+	DMA_SUBMIT(&s->desc_r, 1);
+}
+
+//*************************************
+// Start streaming count elements of elem_size bytes from mem, and prefetch the first tile
+void pim_tiles_begin(pim_tiles* s, void* mem, ulong_t elem_size, ulong_t count, volatile uint8_t* spm, ulong_t xfer_size, bool write_back)
+{
+	s->mem = (uint8_t*)mem;
+	s->elem_size = elem_size;
+	s->size = count * elem_size;
+	s->tile = (xfer_size / elem_size) * elem_size;
+	pim_assert(s->tile > 0, "pim_tiles_begin: the elements are larger than xfer_size");
+	s->curr = 0;
+	s->curr_size = 0;
+	s->next = 0;
+	s->write_back = write_back;
+	s->buf_p = spm;
+	s->buf_r = spm + xfer_size;
+	s->buf_w = spm + 2*xfer_size;
+	s->desc_r[PIM_DMA_DESC_STATUS] = PIM_DMA_DESC_DONE;
+	s->desc_w[PIM_DMA_DESC_STATUS] = PIM_DMA_DESC_DONE;
+	if ( s->size > 0 )
+		pim_tiles_fetch(s);
+}
+
+//*************************************
+// Write back the current tile (if needed), then return the next one and its number of elements (NULL at the end)
+void* pim_tiles_next(pim_tiles* s, ulong_t* n)
+{
+	volatile uint8_t* swap;
+	if ( s->write_back && s->curr_size > 0 )
+	{
+		DMA_DESC_WAIT(s->desc_w);   // The previous write back has left buf_w
+		swap = s->buf_w; s->buf_w = s->buf_p; s->buf_p = swap;
+		DMA_DESC(s->desc_w, s->mem + s->curr, s->buf_w, s->curr_size, PIM_DMA_WRITE, DMA_RES_CORE);
+		DMA_SUBMIT(&s->desc_w, 1);
+	}
+	if ( s->next >= s->size )
+	{
+		s->curr_size = 0;
+		*n = 0;
+		return NULL;
+	}
+
+	// The prefetched tile becomes the current one, and buf_p (free) receives the following one
+	DMA_DESC_WAIT(s->desc_r);
+	swap = s->buf_p; s->buf_p = s->buf_r; s->buf_r = swap;
+	s->curr = s->next;
+	s->curr_size = ( s->size - s->curr < s->tile ) ? s->size - s->curr : s->tile;
+	s->next += s->curr_size;
+	if ( s->next < s->size )
+		pim_tiles_fetch(s);
+
+	*n = s->curr_size / s->elem_size;
+	return (void*)s->buf_p;
+}
+
+//*************************************
+// Wait for the transfers of the stream (also when it is left before the end)
+void pim_tiles_end(pim_tiles* s)
+{
+	DMA_DESC_WAIT(s->desc_r);
+	DMA_DESC_WAIT(s->desc_w);
+}
+
+#endif // _PIM_DEVICE_TILES_
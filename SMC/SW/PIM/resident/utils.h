@@ -2,6 +2,7 @@
 #define _PIM_DEVICE_UTILS_
 
 #include "registers.h"
+#include "cluster.h"
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -11,11 +12,24 @@
 #define HMC_ATOMIC___INCR(X)  {HMC_ATOMIC_INCR = (ulong_t)&((X));}
 #define HMC_ATOMIC___IMIN(X)  {HMC_ATOMIC_IMIN = (ulong_t)&((X));}
 #define HMC_ATOMIC___FADD(X)  {HMC_ATOMIC_FADD = (ulong_t)&((X));}
+// Generic HMC commands (see HMC_CMD_* in definitions.h), the ones which return a value evaluate to the old value of X
+#define HMC_ATOMIC___CMD(CMD,X,OP,OP2)  {HMC_OPERAND = (ulong_t)(OP); HMC_SWAP_OPERAND = (ulong_t)(OP2); HMC_ATOMIC_OPCODE = (CMD); HMC_ATOMIC_TARGET = (ulong_t)&((X));}
+#define HMC_ATOMIC___CAS(X,CMP,SWP)     ({HMC_ATOMIC___CMD(HMC_CMD_CAS,X,CMP,SWP); HMC_RESULT;})
+#define HMC_ATOMIC___OR(X,V)            ({HMC_ATOMIC___CMD(HMC_CMD_OR,X,V,0); HMC_RESULT;})
+#define HMC_ATOMIC___AND(X,V)           ({HMC_ATOMIC___CMD(HMC_CMD_AND,X,V,0); HMC_RESULT;})
+#define HMC_ATOMIC___MINR(X,V)          ({HMC_ATOMIC___CMD(HMC_CMD_MINR,X,V,0); HMC_RESULT;})
+#define HMC_ATOMIC___ADD16(X,V0,V1)     HMC_ATOMIC___CMD(HMC_CMD_ADD16,X,V0,V1)
 
 // DMA Request
 #define DMA_REQUEST(MA,SA,NB,CM, RES) {PIM_DMA_MEM_ADDR=(ulong_t)MA; PIM_DMA_SPM_ADDR=(ulong_t)SA; PIM_DMA_NUMBYTES=(ulong_t)NB; PIM_DMA_COMMAND=((CM)|(RES));}
 #define DMA_WAIT(RES) {while(PIM_DMA_STATUS & RES) {__asm__("wfi");PIM_DMA_CLI = 0xFF;}} 
 
+// DMA Descriptors (scatter-gather)
+typedef ulong_t dma_desc_t[PIM_DMA_DESC_WORDS];
+#define DMA_DESC(D,MA,SA,NB,CM,RES) {(D)[PIM_DMA_DESC_MEM_ADDR]=(ulong_t)MA; (D)[PIM_DMA_DESC_SPM_ADDR]=(ulong_t)SA; (D)[PIM_DMA_DESC_NUMBYTES]=(ulong_t)NB; (D)[PIM_DMA_DESC_COMMAND]=((CM)|(RES)); (D)[PIM_DMA_DESC_STATUS]=PIM_DMA_DESC_PENDING;}
+#define DMA_SUBMIT(DS,N) {PIM_DMA_DESC_ADDR=(ulong_t)(DS); PIM_DMA_DESC_COUNT=(ulong_t)N;}
+#define DMA_DESC_WAIT(D) {while(((volatile ulong_t*)(D))[PIM_DMA_DESC_STATUS] != PIM_DMA_DESC_DONE) {__asm__("wfi");PIM_DMA_CLI = 0xFF;}}
+
 typedef enum { false, true } bool;
 
 // Forward Declarations
@@ -158,6 +172,15 @@ void initialize_registers()
     PIM_SLICETABLE = 0;
     PIM_SLICECOUNT = 0;
     PIM_SLICEVSTART = 0;
+    PIM_CMDQ_HEAD = 0;
+    PIM_CMDQ_TAIL = 0;
+    for ( i=0; i< PIM_KCACHE_SLOTS; i++ )
+    {
+        PIM_KCACHE_TAG[i] = 0;
+        PIM_KCACHE_USED[i] = 0;
+    }
+    PIM_KCACHE_ACTIVE = 0;
+    PIM_KCACHE_LOAD = 0;
     PIM_DTLB_IDEAL_REFILL = 0; // Null Pointer
     PIM_M5_D1_REG = 0;
     PIM_M5_D2_REG = 0;
@@ -171,10 +194,16 @@ void initialize_registers()
     PIM_DMA_COMMAND = 0; // NOP
     PIM_DMA_STATUS = 0; // All Free
     PIM_DMA_CLI = 0; // No wait
+    PIM_DMA_DESC_ADDR = 0;
+    PIM_DMA_DESC_COUNT = 0;
     HMC_ATOMIC_INCR = 0; // NOP
     HMC_ATOMIC_IMIN = 0; // NOP
     HMC_ATOMIC_FADD = 0; // NOP
     HMC_OPERAND = 0;
+    HMC_SWAP_OPERAND = 0;
+    HMC_ATOMIC_OPCODE = HMC_CMD_NOP;
+    HMC_ATOMIC_TARGET = 0; // NOP
+    HMC_RESULT = 0;
 
     PIM_COPROCESSOR_CMD = 0;
 
@@ -182,13 +211,33 @@ void initialize_registers()
 }
 
 //*************************************
-inline void execute_command()
+// Copy a slot of the kernel cache to .text and .rodata (see registers.h)
+// Notice: this code is placed before the kernel (see resident.c), so it is overwritten with the same bytes, and PIM has no instruction cache
+void load_cached_kernel()
+{
+	ulong_t i;
+	volatile ulong_t* src;
+	volatile ulong_t* dst = (volatile ulong_t*)PIM_TEXT_OFFSET;
+	if ( PIM_KCACHE_LOAD >= PIM_KCACHE_SLOTS )
+	{
+		pim_error("Illegal slot of the kernel cache");
+		return;
+	}
+	src = (volatile ulong_t*)(PIM_KCACHE_OFFSET + PIM_KCACHE_LOAD*PIM_KCACHE_SLOT_SIZE);
+	for ( i=0; i<PIM_KCACHE_SLOT_SIZE/sizeof(ulong_t); i++ )
+		dst[i] = src[i];
+	PIM_KCACHE_ACTIVE = PIM_KCACHE_TAG[PIM_KCACHE_LOAD];
+}
+
+//*************************************
+inline void execute_command(uint8_t command)
 {
-	switch ( PIM_COMMAND_REG )
+	switch ( command )
 	{
 		case PIM_COMMAND_NOP:			pim_error("Cannot execute NOP command!"); break;
 		case PIM_COMMAND_DEMO:			execute_demo(); break;
 		case PIM_COMMAND_RUN_KERNEL:	execute_kernel(); break;
+		case PIM_COMMAND_LOAD_KERNEL:	load_cached_kernel(); break;
 		case PIM_COMMAND_HALT:			pim_error("Not implemented yet!"); break;
 		default:						pim_error("Illegal command");
 	}
@@ -203,9 +252,12 @@ bool new_command_received()
 	{
 		pim_assert(PIM_STATUS_REG == PIM_STATUS_SLEEP, "PIM received a command while not in sleep mode!");
 		PIM_STATUS_REG = PIM_STATUS_BUSY;
-		execute_command();
+		pim_cluster_start(PIM_COMMAND_REG);    // Wake up the workers (multi-core PIM)
+		execute_command(PIM_COMMAND_REG);
+		pim_barrier();          // Wait for the workers
         /* Indicate end of execution on PIM. This is similar to an interrupt to the host */
-        PIM_M5_REG=PIM_TIME_STAMP+6;
+        if ( PIM_COMMAND_REG != PIM_COMMAND_LOAD_KERNEL )
+            PIM_M5_REG=PIM_TIME_STAMP+6;
 		return true;
 	}
 	return false;
@@ -234,4 +286,30 @@ void command_done()
 	PIM_STATUS_REG = PIM_STATUS_SLEEP;
 }
 
+//*************************************
+// Execute the commands of the command queue until it is empty
+void drain_command_queue()
+{
+	unsigned i;
+	volatile ulong_t* entry;
+	pim_assert(PIM_STATUS_REG != PIM_STATUS_BUSY, "PIM received a command while not in sleep mode!");
+	while ( PIM_CMDQ_TAIL != PIM_CMDQ_HEAD )
+	{
+		PIM_STATUS_REG = PIM_STATUS_BUSY;
+		entry = PIM_CMDQ_RING[PIM_CMDQ_TAIL % PIM_CMDQ_SIZE];
+		for ( i=0; i<PIM_SREG_COUNT; i++ )
+			PIM_SREG[i] = entry[PIM_CMDQ_SREG+i];
+		pim_cluster_start(entry[PIM_CMDQ_COMMAND]);    // Wake up the workers (multi-core PIM)
+		execute_command(entry[PIM_CMDQ_COMMAND]);
+		pim_barrier();          // Wait for the workers
+		for ( i=0; i<PIM_SREG_COUNT; i++ )
+			entry[PIM_CMDQ_SREG+i] = PIM_SREG[i];
+		PIM_CMDQ_TAIL++;
+		/* The host can collect the results of this entry, and it is interrupted */
+		PIM_STATUS_REG = PIM_STATUS_DONE;
+	}
+	// The host wakes us up again if it finds new commands in this state
+	PIM_STATUS_REG = PIM_STATUS_SLEEP;
+}
+
 #endif // _PIM_DEVICE_UTILS_
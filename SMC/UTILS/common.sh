@@ -724,9 +724,8 @@ function calculate_power_for_timestamp
     print_msg "  DRAM Power: DRAMPower"
     dram_pwr=0
     total_bw=0
-    c1=0
-    c2=0
-    c3=0
+    atomic_energy=0
+    prefetch_energy=0
     for (( c=0; c<$N_INIT_PORT; c++ )); do
         #Note: we consider the amount of physical memory that we actually used for our task.
         # So, we don't pay for the power consumed in the unused DRAM memory
@@ -738,12 +737,15 @@ function calculate_power_for_timestamp
         bw=$(get_stat  timestamp$1.system.mem_ctrls$(zpad $c 2).bw_total::total)
         total_bw=`perl -l -e "print ($total_bw + $bw)"`
 
-        # Number of atomic operations done in vaults
+        # Energy of the atomic operations done in vaults (per-command counters x energies of the atomic table)
         if [ $1 == 6 ]; then
-            c1=$(($c1 + $(get_stat  timestamp$1.system.mem_ctrls$(zpad $c 2).atomic_fadd_count)))
-            c2=$(($c2 + $(get_stat  timestamp$1.system.mem_ctrls$(zpad $c 2).atomic_min_count)))
-            c3=$(($c3 + $(get_stat  timestamp$1.system.mem_ctrls$(zpad $c 2).atomic_inc_count)))
+            ae=$(get_stat  timestamp$1.system.mem_ctrls$(zpad $c 2).atomic_energy)
+            atomic_energy=`perl -l -e "print ($atomic_energy + $ae)"` # pJ
         fi
+
+        # Energy of the row prefetch buffer (SRAM), the prefetched DRAM reads are already in averagePower
+        pe=$(get_stat  timestamp$1.system.mem_ctrls$(zpad $c 2).prefetchEnergy)
+        prefetch_energy=`perl -l -e "print ($prefetch_energy + $pe)"` # pJ
     done
     
     set_stat dram_power.$2  $dram_pwr mW
@@ -752,8 +754,10 @@ function calculate_power_for_timestamp
     vaultctr_pwr=`perl -l -e "print ( $total_bw * 8.0 * $VAULTCTRL_ENERGY_PER_BIT /1000.0 /1000.0 /1000.0 )"` # mW {Vault Controllers}
     set_stat vaultctrl_power.$2  $vaultctr_pwr mW
     T=$(get_stat timestamp$1.sim_seconds) # seconds
-    atomic_pwr=`perl -l -e "print ((($c1*$ATOMIC_FADD_ENERGY) + ($c2*$ATOMIC_MIN_ENERGY) + ($c1*$ATOMIC_INC_ENERGY))/$T/ 1000.0 / 1000.0 / 1000.0)"` # mW {atomic operations}
+    atomic_pwr=`perl -l -e "print ($atomic_energy/$T/ 1000.0 / 1000.0 / 1000.0)"` # mW {atomic operations}
     set_stat atomic_power.$2  $atomic_pwr mW
+    prefetch_pwr=`perl -l -e "print ($prefetch_energy/$T/ 1000.0 / 1000.0 / 1000.0)"` # mW {row prefetch buffers}
+    set_stat prefetch_power.$2  $prefetch_pwr mW
 
     #************************************
     print_msg "  Cache Power: CACTI"
@@ -803,6 +807,7 @@ function calculate_power_for_timestamp
             $(get_stat link_power.host)+
             $(get_stat dram_power.host)+
             $(get_stat vaultctrl_power.host)+
+            $(get_stat prefetch_power.host)+
             $(get_stat l2_power.host)+
             $(get_stat cpu0.li_power.host)+
             $(get_stat cpu0.ld_power.host)+
@@ -823,6 +828,7 @@ function calculate_power_for_timestamp
             $(get_stat dram_power.pim)+
             $(get_stat vaultctrl_power.pim)+
             $(get_stat atomic_power.pim)+
+            $(get_stat prefetch_power.pim)+
             $(get_stat smcxbar_power.pim)+
             $(get_stat pimcpu.power.pim)
         )"`  #mW
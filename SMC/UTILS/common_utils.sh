@@ -681,9 +681,9 @@ function recalculate_global_params()
     export DRAM_LAYER_SIZE_b=`perl -l -e "print ($DRAM_BANK_SIZE_b*$DRAM_BANKS_PER_DIE)"`       # DRAM Layer Size in bits
     export DRAM_LAYER_SIZE_B=`perl -l -e "print ($DRAM_LAYER_SIZE_b/8)"`                        # DRAM Layer Size in Bytes
     export DRAM_LAYER_SIZE_MB=`perl -l -e "print ($DRAM_LAYER_SIZE_B/1024/1024)"`               # DRAM Layer Size in (MB)
-    export TOTAL_MEM_SIZE_Mb=`perl -l -e "print ($N_INIT_PORT*$DRAM_CHANNEL_SIZE_b/1024/1024)"` # Total Mmeory Size in the HMC (Mb)
-    export TOTAL_MEM_SIZE_MB=`perl -l -e "print ($N_INIT_PORT*$DRAM_CHANNEL_SIZE_b/1024/1024/8)"`   # Total Mmeory Size in the HMC (MB)
-    export TOTAL_MEM_SIZE_B=`perl -l -e "print ($N_INIT_PORT*$DRAM_CHANNEL_SIZE_B)"`        # Total Mmeory Size in the HMC (Bytes)z
+    export TOTAL_MEM_SIZE_Mb=`perl -l -e "print ($SMC_NUM_CUBES*$N_INIT_PORT*$DRAM_CHANNEL_SIZE_b/1024/1024)"` # Total Mmeory Size in the HMC (Mb)
+    export TOTAL_MEM_SIZE_MB=`perl -l -e "print ($SMC_NUM_CUBES*$N_INIT_PORT*$DRAM_CHANNEL_SIZE_b/1024/1024/8)"`   # Total Mmeory Size in the HMC (MB)
+    export TOTAL_MEM_SIZE_B=`perl -l -e "print ($SMC_NUM_CUBES*$N_INIT_PORT*$DRAM_CHANNEL_SIZE_B)"`        # Total Mmeory Size in the HMC (Bytes)z
     export DRAM_tRC=`perl -l -e "print $DRAM_tRAS+$DRAM_tRP"`;                  # Notice: tRC is not an independent parameter
     export BURST_SIZE_B=`perl -l -e "print ($AXI_DATA_W * $AXI_BURST_LENGTH / 8)"`          # Maximum burst size of the system in bytes
     export SMC_BURST_SIZE_B=$BURST_SIZE_B                               # Cache line size of the system
@@ -993,7 +993,7 @@ function get_section_info()
 	export $1_size=$A
 }
 
-# Dump the binary code only for a specific section in the $3.hex file
+# Dump the binary code only for a specific section in the $3.hex file (or $3.kimg binary image)
 # Notice: the output file will be appended
 #######################################################################################
 # $1: elf binary file name
@@ -1001,13 +1001,30 @@ function get_section_info()
 # $3: output binary file
 function hexdump_section()
 {
-	get_section_info $2 $1
-	
-	ADDR=$(eval echo '${'$2_addr'}')
-	SIZE=$(eval echo '${'$2_size'}')
-	OFF=$(eval echo '${'$2_off'}')
-	printf "Section: $2\t"
-	$SMC_UTILS_DIR/dump_hex.py $1 $3 $OFF $ADDR $SIZE
+	hexdump_sections $1 $3 $2
+}
+
+# Dump the binary code of several sections in the $2.hex file (or $2.kimg binary image) at once
+# Notice: the output file will be appended
+#######################################################################################
+# $1: elf binary file name
+# $2: output binary file
+# $3, $4, ...: section names (without .)
+function hexdump_sections()
+{
+	ELF=$1
+	DST=$2
+	shift 2
+	ARGS=""
+	for S in $@; do
+		get_section_info $S $ELF
+		ADDR=$(eval echo '${'$S'_addr}')
+		SIZE=$(eval echo '${'$S'_size}')
+		OFF=$(eval echo '${'$S'_off}')
+		ARGS="$ARGS $OFF $ADDR $SIZE"
+	done
+	echo "Sections: $@"
+	$SMC_UTILS_DIR/dump_hex.py $ELF $DST $ARGS
 }
 
 
@@ -355,7 +355,19 @@ export GEM5_VAULTCTRL_BACKEND_LATENCY_cy=4		# Static Backend latency of the vaul
 # DRAM Parameters
 export DRAM_BANK_PARALLELISM=FALSE			# TRUE, FALSE (Parameter is only available in RTL, gem5 by default supports it)	(Bank_Level_Parallelism)
 export DRAM_SETUPHOLD_CHECK=TRUE
-export DRAM_SCHEDULING_POLICY_GEM5="fcfs"	# "fcfs", "frfcfs (Only for gem5's DRAMCtrl class)
+export DRAM_SCHEDULING_POLICY_GEM5="fcfs"	# "fcfs", "frfcfs", "frfcfs_cap", "parbs", "priority" (Only for gem5's DRAMCtrl class)
+export GEM5_VAULT_FRFCFS_CAP=4			# frfcfs_cap: younger requests allowed to bypass the oldest one
+export GEM5_VAULT_BATCH_CAP=5			# parbs: requests per master and bank marked in each batch
+export GEM5_VAULT_LOW_PRIORITY_MASTERS="system.pim_sys"	# priority: name prefixes (comma separated) of the masters served last, e.g. the PIM bulk transfers
+export GEM5_VAULT_WRITE_HIGH_THRESH_PERC=85	# (%) write queue occupancy which forces a write drain
+export GEM5_VAULT_WRITE_LOW_THRESH_PERC=50	# (%) write queue occupancy which starts a drain when there are no reads
+export GEM5_VAULT_MIN_WRITES_PER_SWITCH=16	# write bursts drained before switching back to reads
+export GEM5_VAULT_PREFETCH_ENTRIES=0		# Rows held in the prefetch buffer of each vault controller (0: no prefetch)
+export GEM5_VAULT_PREFETCH_TRIGGER="sequential"	# "sequential": two reads in a row to the same DRAM row of a bank, "every_activate": every read that opens a row
+export GEM5_VAULT_PREFETCH_LATENCY_cy=1		# Latency of a read served by the prefetch buffer (Cycles) [Clock = DRAM_tCK]
+export GEM5_VAULT_REFRESH_POLICY="all_bank"	# "all_bank": refresh the whole vault every DRAM_tREFI, "per_bank": refresh one bank at a time, the other banks keep serving requests
+export GEM5_VAULT_REFRESH_PAUSING=FALSE		# TRUE, FALSE: pause the all_bank refreshes to serve the waiting reads
+export GEM5_VAULT_REFRESH_PAUSE_SEGMENTS=4	# Parts of a refresh between which it can be paused
 export DRAM_PAGE_POLICY="CLOSED";		# "OPEN", "CLOSED"
 export DRAM_BUS_WIDTH="128";			# bit  
 export DRAM_BANKS_PER_DIE="2";			# banks in one channel of one memory die
@@ -369,6 +381,7 @@ export DRAM_tRAS="26.0";			# ns	# Row Access Strobe
 export DRAM_tRAP="5.6";				# ns	# Activate to Read with Auto Precharge
 export DRAM_tRCD="6.0";				# ns	# Activate to Read without Autoprecharge
 export DRAM_tRFC="84.6";			# ns	# Refresh Cycle Time
+export DRAM_tRFC_PB="42.3";			# ns	# Per-bank Refresh Cycle Time (only GEM5_VAULT_REFRESH_POLICY=per_bank)
 export DRAM_tRP="6.3";				# ns	# RAS Precharge (Latency of the precharge command)
 export DRAM_tRRD="2.8";				# ns	# Row to Row Activation Delay (Power Related)
 export DRAM_tWR="4.5";				# ns	# Write Recovery Time
@@ -421,6 +434,13 @@ export SERIALLINKS_NUM_LANES_PER_LINK=16	# Number of R+W lanes in each serial li
 export HAVE_LISTENERS="TRUE"			# Listening to telnet or vnc inside gem5
 export GEM5_SMCCONTROLLER_BUFFER_SIZE_REQ=256	# The buffer size of the SMCController inside gem5 (Request)	(Number of packets, not flits)
 export GEM5_SMCCONTROLLER_BUFFER_SIZE_RSP=256	# The buffer size of the SMCController inside gem5 (Response)	(Number of packets, not flits)
+export GEM5_LOAD_DISTRIBUTION_POLICY=round_robin	# {round_robin, least_outstanding, address_hash, vault_affinity} How the SMCController distributes the requests among the serial links
+export GEM5_SMCXBAR_QOS=FALSE			# {TRUE, FALSE} Per-master arbitration weights and bandwidth caps in the SMC crossbar (serial links vs. PIM device)
+export GEM5_SMCXBAR_QOS_HOST_WEIGHT=4		# Arbitration weight of each serial link (host) in the SMC crossbar
+export GEM5_SMCXBAR_QOS_PIM_WEIGHT=1		# Arbitration weight of the PIM device in the SMC crossbar
+export GEM5_SMCXBAR_QOS_HOST_BW_GBs=0		# (GB/s) Bandwidth cap of each serial link in the SMC crossbar (0: no cap)
+export GEM5_SMCXBAR_QOS_PIM_BW_GBs=0		# (GB/s) Bandwidth cap of the PIM device in the SMC crossbar (0: no cap), e.g. to guarantee host bandwidth during bulk DMA
+export GEM5_SMCXBAR_QOS_BURST_B=1024		# (Bytes) Token bucket size of the bandwidth caps (largest burst above the cap)
 
 ################################################################################
 # # Latency parameters
@@ -428,8 +448,17 @@ export GEM5_LINK_BUFFER_SIZE_REQ=16		# The buffer size after the serial links in
 export GEM5_LINK_BUFFER_SIZE_RSP=16		# The buffer size after the serial links inside gem5 (Response)			(Number of packets, not flits)
 export GEM5_SERDES_LATENCY_ns=1.6		# Latency of the SER at the link source, plus DES at the link destination
 export GEM5_LINK_LATENCY_ns=3.2			# Latency of the serial link on the PCB
+export GEM5_SERIALLINK_MODEL=BRIDGE		# {BRIDGE, SERIALLINK} Model of the serial links: Bridge with packet buffers, or SerialLink with flits and tokens
+export GEM5_LINK_FLIT_SIZE_B=16			# Flit size of the serial links (only SERIALLINK), the buffers above are converted to tokens (flits) for the largest packets
+export GEM5_LINK_ERROR_RATE=0			# Probability of a packet failing the CRC check on the serial links, triggering a link-level retry (only SERIALLINK)
 export GEM5_SMCCONTROLLER_LATENCY_cy=8	# Pipeline latency of the SMC Controller (Cycles) [Clock = HOST_CLOCK_FREQUENCY_GHz]
 
+################################################################################
+# # Multi-cube topology (See GEM5/utils/python/ethz_topology.py)
+export SMC_NUM_CUBES=1					# 1, 2, 4, ... Number of cubes (each one has N_INIT_PORT vaults)
+export SMC_CUBE_TOPOLOGY="CHAIN"		# {CHAIN, STAR} How the cubes behind the first one are reached
+export GEM5_PASSTHROUGH_LATENCY_ns=3.2	# Latency of the pass-through link between two cubes (plus GEM5_SERDES_LATENCY_ns)
+
 ################################################################################
 
 # # Host Cache Parameters
@@ -510,8 +539,33 @@ export PIM_VREG_SIZE=0				    # Vector size in bytes to perform vector operation
 export PIM_SREG_COUNT=0				    # Number of scalar registers on PIM
 export GEM5_PIM_KERNEL="NONE"			# Kernel on the pim CPU
 export PIM_DTLB_SIZE=0					# Number of rules in the DTLB
+export PIM_DTLB_ASSOC=0					# Associativity of the DTLB (0: fully associative)
+export PIM_DTLB_REPLACEMENT=LRU			# {LRU, PLRU, Random} Replacement policy of the DTLB (both levels)
+export PIM_DTLB_HIT_LATENCY_cy=0		# Hit latency of the DTLB (PIM cycles)
+export PIM_DTLB_L2_SIZE=0				# Number of rules in the second-level DTLB (0: no second level)
+export PIM_DTLB_L2_ASSOC=0				# Associativity of the second-level DTLB (0: fully associative)
+export PIM_DTLB_L2_HIT_LATENCY_cy=4		# Hit latency of the second-level DTLB (PIM cycles)
+export PIM_DTLB_WALK_CACHE_SIZE=0			# Number of slices cached from the slice table (0: no walk cache)
+export PIM_DTLB_WALK_CACHE_LATENCY_cy=1	# Hit latency of the walk cache (PIM cycles)
+export PIM_DTLB_PREFETCHER=NoPrefetch		# {NoPrefetch, NextSlice, Stride} Prefetcher of the slice table (needs the walk cache)
+export PIM_DTLB_PREFETCH_DEGREE=1			# Number of slices prefetched on each trigger
 export PIM_DTLB_DUMP_ADDRESS="FALSE"	# Dump the data accesses of the DTLB
 export PIM_SPM_ACCESSTIME_ns=NONE		# Access time of the Scratchpad memory on PIM (Bandwidth = 32b x PIM_CLOCK_FREQUENCY Gbps)
+export PIM_NUM_CORES=1					# Number of cores in the PIM device (each one has its own ITLB and DTLB)
+export PIM_SPM_ORGANIZATION=SHARED		# {SHARED, MULTIPORTED, BANKED} SHARED: one port for all cores, MULTIPORTED: ideal accesses, BANKED: bank conflicts are modeled
+export PIM_SPM_NUM_BANKS=4				# Number of banks of the SPM (PIM_SPM_ORGANIZATION=BANKED)
+export PIM_SPM_BANK_INTERLEAVE_B=4		# Interleaving of the SPM banks in bytes (PIM_SPM_ORGANIZATION=BANKED)
+export PIM_DMA_ORGANIZATION=SHARED		# {SHARED, PRIVATE} One DMA shared by all PIM cores or one DMA per core
+export PIM_DMA_NUM_CHANNELS=1			# Number of DMA requests (or descriptors) served concurrently
+export PIM_DMA_MAX_OUTSTANDING=0		# Maximum number of DMA bursts in flight (0: no limit)
+export PIM_HOST_WAIT_INTERRUPT=TRUE		# TRUE: the host sleeps until the completion interrupt of PIM, FALSE: the host polls PIM_STATUS_REG with adaptive backoff
+export PIM_HOST_IRQ=74					# Interrupt of the host GIC raised by PIM on completion (SPI, >= 32)
+export PIM_HOST_POLL_MIN_ns=50			# Polling: first sleep between two reads of PIM_STATUS_REG (doubled after each read)
+export PIM_HOST_POLL_MAX_ns=20000		# Polling: maximum sleep between two reads of PIM_STATUS_REG
+export PIM_CMDQ_SIZE=8					# Number of entries of the command queue in the SPM (asynchronous offloading, see PIMAPI::submit)
+export PIM_KCACHE_SLOTS=4				# Number of kernels cached in the SPM (see PIMAPI::offload_kernel, 0: only the running kernel is remembered)
+export PIM_DMA_BURST_SIZE_B=0			# Size of the DMA bursts, adjacent cache lines are coalesced up to this size (0: SMC_BURST_SIZE_B, at most the vault row size and the vault interleaving)
+export PIM_CORE_STACK_SIZE=0x400		# Stack size of each PIM core (the stacks are placed below each other at the top of the SPM)
 export SMON_DUMP_ADDRESS="FALSE"        # Dumpy all accesses in the SMon
 export HMON_DUMP_ADDRESS="FALSE"        # Dumpy all accesses in the SMon (GATHER TRACES - TRACE GATHERING IN GEM5)
 
@@ -522,6 +576,7 @@ export PIM_GOT_OFFSET=NONE
 export PIM_DATA_OFFSET=NONE
 export PIM_BSS_OFFSET=NONE
 export PIM_STACK_OFFSET=NONE
+export PIM_KCACHE_OFFSET=NONE
 
 export PIM_FIRMWARE_CHECKS=TRUE         # {TRUE, FALSE}
 export DEBUG_PIM_RESIDENT=TRUE			# {TRUE, FALSE}
@@ -533,6 +588,9 @@ export DEBUG_PIM_APP=TRUE				# {TRUE, FALSE}
 export OFFLOADED_KERNEL_NAME=""           # SEE: SMC/SW/PIM/kernels
 export OFFLOADED_KERNEL_SUBNAME="default" # SEE: SMC/SW/PIM/kernels
 export OFFLOAD_THE_KERNEL=TRUE			# TRUE: actually offload the kernel (partial offloading)  FALSE: execute the preloaded kernel
+export OFFLOADED_KERNEL_FORMAT=kimg		# {kimg, hex} kimg: binary image copied with wide stores, hex: text dump written byte by byte
+export OFFLOADED_GRAPH_LAYOUT=NONE		# {NONE, DEGREE, BFS, RCM} Order of the nodes of the sgraph apps in memory (see SMC/SW/HOST/app/offload_sgraph/layout.hh)
+export OFFLOADED_SHARED_BUFFER=NONE		# {NONE, CACHED, UNCACHED} offload_array: allocate the array in a zero-copy buffer shared with PIM (PIMAPI::alloc_shared, at most 4MB)
 export PIM_OPT_LEVEL=""                 # gcc optimization level for PIM  {"", "-O0", "-O3", ...}
 export HOST_OPT_LEVEL=""                # gcc optimization level for Host {"", "-O0", "-O3", ...}
 
@@ -550,6 +608,7 @@ export MEMBUS_ENERGY_PER_BIT=3e-2                   # (pj/bits) energy consumed
 export TOL2BUS_ENERGY_PER_BIT=1.8e-1                # (pj/bits) energy consumed in the Tol2bus
 export SMCCTRL_ENERGY_PER_BIT=10                    # (pj/bits) energy consumed in the SMC Controller
 export VAULTCTRL_ENERGY_PER_BIT=0.75                # (pj/bits) energy consumed in the Vault Controller [FR-FCFS LPDDR2 Controller]
+export VAULT_PREFETCH_ENERGY_PER_BIT=5e-2           # (pj/bits) energy of a write or read of the row prefetch buffer (SRAM) in the Vault Controller
 export CPU_IDLE_POWER_AT_2GHZ=500                   # (mW) idle power in the Cortex A9 processors
 export CPU_ACTIVE_POWER_AT_2GHZ=1700                # (mW) active power in the Cortex A9 processors
 export CPU_LEAKAGE_POWER=60                         # (mW) leakage power in the Cortex A9 processors
@@ -557,6 +616,9 @@ export PIM_PERIPHERAL_POWER=20                      # (mW) power consumed in PIM
 export ATOMIC_FADD_ENERGY=1.8                       # (pj) energy of one atomic operation (floating point add) - 28nm SOI 0.8V TYP 25C
 export ATOMIC_MIN_ENERGY=0.2                        # (pj) energy of one atomic operation (integer min)
 export ATOMIC_INC_ENERGY=0.1                        # (pj) energy of one atomic operation (integer inc)
+export ATOMIC_CAS_ENERGY=0.3                        # (pj) energy of one atomic operation (integer compare-and-swap)
+export ATOMIC_BITWISE_ENERGY=0.1                    # (pj) energy of one atomic operation (integer or/and)
+export ATOMIC_ADD16_ENERGY=0.4                      # (pj) energy of one atomic operation (16-byte add, two 8-byte lanes)
 
 # CPU Energy Models
 export CPU_TLB_ENERGY_PER_ACCESS=0.85               # (pj/acc)  64-entry TLB on the host processors
@@ -1,11 +1,15 @@
 #!/usr/bin/python
 # Get the binary ELF file as input, and then dump a *.hex file starting from the START_ADDRESS up to SIZE bytes
+# for each one of the given sections
+# If the output file is *.kimg, the sections are dumped in the binary kernel image format instead (see PIM_KIMG_* in definitions.h)
 # NOTICE: output file will be appended, and previous dumps will be kept in it
 # 1 = binary file name
-# 2 = dest.hex
+# 2 = dest.hex (or dest.kimg)
 # 3 = off in input binary file
 # 4 = addr in memory
 # 5 = size
+# 6, 7, 8 = off, addr, size of the next section (optional, and so on)
+from __future__ import print_function
 import sys
 ##################
 BLUE = '\033[94m'
@@ -15,51 +19,59 @@ NOCOLOR = '\033[0m'
 ##################
 
 import struct
+import binascii
+import time
+
+PIM_KIMG_MAGIC = 0x4B4D4950
+PIM_KIMG_ALIGN = 8
+
+if len(sys.argv) < 6 or (len(sys.argv) - 3) % 3 != 0:
+	print("Usage: dump_hex.py src dst off addr size [off addr size ...]")
+	exit(1)
 
 src = sys.argv[1]
 dst = sys.argv[2]
-off = sys.argv[3]
-addr = sys.argv[4]
-size = sys.argv[5]
+sections = [sys.argv[i:i+3] for i in range(3, len(sys.argv), 3)]
+binary = dst.endswith(".kimg")
 
+start = time.time()
+total = 0;
+OUT = [];
 src_file = open( src, "rb" )
-A = long(addr, 16);
-S = long(size, 16);
-O = long(off, 16);
+try:
+	for (off, addr, size) in sections:
+		A = int(addr, 16);
+		S = int(size, 16);
+		O = int(off, 16);
 
-print "  File: " + src + "  Offset: " + off + "  Addr: " + addr + "  Size: " + str(S) + " (Bytes)"
+		print("  File: " + src + "  Offset: " + off + "  Addr: " + addr + "  Size: " + str(S) + " (Bytes)")
 
-index = 0;
-count = 0;
-CODE = "";
-try:
-	b = src_file.read(1)
-	while b != "":
-		if ( index >= O ):
-			CODE += b.encode("hex") + " "
-			count += 1
-		if ( index >= O+S-1 ):
-			break;
-		b = src_file.read(1)
-		index += 1;
+		# One read for the whole section
+		src_file.seek(O)
+		RAW = src_file.read(S)
+
+		if ( len(RAW) != S ):
+			print("Number of bytes read from the file does not match the ELF header! READ:" + str(len(RAW)) + " EXPECTED:" + str(S))
+			exit(1)
+
+		if binary:
+			OUT.append(struct.pack("<IIQ", PIM_KIMG_MAGIC, S, A))
+			OUT.append(RAW)
+			OUT.append(b"\0" * (-S % PIM_KIMG_ALIGN))
+		else:
+			# Encode the whole section at once, and separate the bytes with spaces
+			H = binascii.hexlify(RAW).decode("ascii")
+			CODE = " ".join([H[i:i+2] for i in range(0, len(H), 2)])
+			OUT.append(("@ADDR " + str(A) + "\n").encode("ascii"))
+			OUT.append(("@SIZE " + str(S) + "\n").encode("ascii"))
+			OUT.append((CODE + (" " if S else "") + "@END" + "\n").encode("ascii"))
+		total += S
 finally:
 	src_file.close();
-	
-##print CODE
-#if ( count % 2 != 0 ):
-	#print "Error: the length of the binary code must be even! " + str(count)
-	#exit(1)
-	
-if ( count != S ):
-	print "Number of bytes read from the file does not match the ELF header! READ:" + str(count) + " EXPECTED:" + str(S)
-	exit(1)
 
-i=0;
-dst_file = open( dst, "a" )
-dst_file.write("@ADDR " + str(A) + "\n" )
-dst_file.write("@SIZE " + str(S) + "\n" )
-dst_file.write(CODE)
-dst_file.write("@END" + "\n" )
-
-src_file.close()
+dst_file = open( dst, "ab" )
+dst_file.write(b"".join(OUT))
 dst_file.close()
+
+elapsed = time.time() - start
+print("  Dumped " + str(total) + " (Bytes) in " + str(len(sections)) + " section(s) to " + dst + " in %.3f (s)" % elapsed)
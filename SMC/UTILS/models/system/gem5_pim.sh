@@ -33,6 +33,7 @@ export PIM_GOT_OFFSET="0x00005000"
 export PIM_DATA_OFFSET="0x00006000"
 export PIM_BSS_OFFSET="0x00007000"
 export PIM_STACK_OFFSET="0x0000A000"	# Offset of the PIM's stack
+export PIM_KCACHE_OFFSET="0x00010000"	# Offset of the kernel cache (PIM_KCACHE_SLOTS copies of .text and .rodata)
 
 # Host's memory from PIM's point of view (This must be after PIM's SPM)
 export PIM_HOST_OFFSET=0x$(printf "%08X" $(($(conv_to_bytes $PIM_ADDRESS_SIZE))));
@@ -53,6 +54,12 @@ function PIM_RODATA_SIZE()
 	printf $(($PIM_ARRAY_OFFSET - $PIM_RODATA_OFFSET));
 }
 
+# Size of a slot of the kernel cache (.text and .rodata)
+function PIM_KCACHE_SLOT_SIZE()
+{
+	printf $(($PIM_ARRAY_OFFSET - $PIM_TEXT_OFFSET));
+}
+
 # Print PIM's memory map
 function pim_print_mem_map()
 {
@@ -64,6 +71,7 @@ function pim_print_mem_map()
 	PIM_DATA_PHYS=0x$(printf "%X" $((${PIM_ADDRESS_BASE} + ${PIM_DATA_OFFSET})))
 	PIM_BSS_PHYS=0x$(printf "%X" $((${PIM_ADDRESS_BASE} + ${PIM_BSS_OFFSET})))
 	PIM_STACK_PHYS=0x$(printf "%X" $((${PIM_ADDRESS_BASE} + ${PIM_STACK_OFFSET})))
+	PIM_KCACHE_PHYS=0x$(printf "%X" $((${PIM_ADDRESS_BASE} + ${PIM_KCACHE_OFFSET})))
 	PIM_MAX_OFFSET=0x$(printf "%08X" $(($(conv_to_bytes $PIM_ADDRESS_SIZE)-1)));
 	PIM_MAX_PHYS=0x$(printf "%08X" $((${PIM_ADDRESS_BASE} + ${PIM_MAX_OFFSET})))
 	
@@ -78,6 +86,7 @@ function pim_print_mem_map()
 	echo -e "|$(extend "$PIM_DATA_OFFSET" 25 "_")$(extend "$PIM_DATA_PHYS" 25 "_")$(extend ".data" 25 "_")|"
 	echo -e "|$(extend "$PIM_BSS_OFFSET" 25 "_")$(extend "$PIM_BSS_PHYS" 25 "_")$(extend ".bss" 25 "_")|"
 	echo -e "|$(extend "$PIM_STACK_OFFSET" 25 "_")$(extend "$PIM_STACK_PHYS" 25 "_")$(extend ".stack (dir:bss)" 25 "_")|"
+	echo -e "|$(extend "$PIM_KCACHE_OFFSET" 25 "_")$(extend "$PIM_KCACHE_PHYS" 25 "_")$(extend "kernel cache" 25 "_")|"
 	echo -e "|$(extend "$PIM_MAX_OFFSET" 25 "_")$(extend "$PIM_MAX_PHYS" 25 "_")$(extend "SPM End" 25 "_")|"
 	
 	
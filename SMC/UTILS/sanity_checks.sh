@@ -22,4 +22,151 @@ fi
 
 if [ $HAVE_PIM_CLUSTER == TRUE ] && [ $HAVE_PIM_DEVICE == TRUE ]; then
     print_err "These two options cannot coexist! HAVE_PIM_CLUSTER and HAVE_PIM_DEVICE"
-fi
\ No newline at end of file
+fi
+
+if [ $SMC_NUM_CUBES -gt 1 ]; then
+    if [ $GEM5_MEMTYPE != HMCVault ]; then
+        print_err "SMC_NUM_CUBES > 1 is only supported with GEM5_MEMTYPE=HMCVault"
+        exit
+    fi
+    if [ $(( $SMC_NUM_CUBES & ($SMC_NUM_CUBES - 1) )) -ne 0 ]; then
+        print_err "SMC_NUM_CUBES must be a power of 2"
+        exit
+    fi
+fi
+
+if [ $GEM5_SERIALLINK_MODEL != BRIDGE ] && [ $GEM5_SERIALLINK_MODEL != SERIALLINK ]; then
+    print_err "Illegal GEM5_SERIALLINK_MODEL: $GEM5_SERIALLINK_MODEL {BRIDGE, SERIALLINK}"
+    exit
+fi
+
+if [ `perl -l -e "print ($GEM5_LINK_ERROR_RATE < 0 || $GEM5_LINK_ERROR_RATE >= 1 ? 1 : 0)"` -eq 1 ]; then
+    print_err "GEM5_LINK_ERROR_RATE must be in [0, 1): $GEM5_LINK_ERROR_RATE"
+    exit
+fi
+
+if [ $PIM_DTLB_PREFETCHER != NoPrefetch ] && [ $PIM_DTLB_WALK_CACHE_SIZE -le 0 ]; then
+    print_err "PIM_DTLB_PREFETCHER=$PIM_DTLB_PREFETCHER needs a walk cache (PIM_DTLB_WALK_CACHE_SIZE > 0)"
+    exit
+fi
+
+if [ $PIM_NUM_CORES -lt 1 ] || [ $PIM_NUM_CORES -gt 7 ]; then
+    print_err "PIM_NUM_CORES must be between 1 and 7 (each core owns one resource bit of the DMA)"
+    exit
+fi
+
+if [ $PIM_CMDQ_SIZE -lt 1 ]; then
+    print_err "PIM_CMDQ_SIZE must be at least 1 (entries of the command queue)"
+    exit
+fi
+
+if [ $PIM_KCACHE_SLOTS -lt 0 ]; then
+    print_err "PIM_KCACHE_SLOTS must not be negative (slots of the kernel cache)"
+    exit
+fi
+
+if [ $PIM_SPM_ORGANIZATION != SHARED ] && [ $PIM_SPM_ORGANIZATION != MULTIPORTED ] && [ $PIM_SPM_ORGANIZATION != BANKED ]; then
+    print_err "Illegal PIM_SPM_ORGANIZATION: $PIM_SPM_ORGANIZATION {SHARED, MULTIPORTED, BANKED}"
+    exit
+fi
+
+if [ $PIM_DMA_ORGANIZATION != SHARED ] && [ $PIM_DMA_ORGANIZATION != PRIVATE ]; then
+    print_err "Illegal PIM_DMA_ORGANIZATION: $PIM_DMA_ORGANIZATION {SHARED, PRIVATE}"
+    exit
+fi
+
+if [ $PIM_DMA_NUM_CHANNELS -lt 1 ]; then
+    print_err "PIM_DMA_NUM_CHANNELS must be at least 1"
+    exit
+fi
+
+if [ $PIM_DMA_BURST_SIZE_B -ne 0 ] && [ $(( $PIM_DMA_BURST_SIZE_B & ($PIM_DMA_BURST_SIZE_B - 1) )) -ne 0 ]; then
+    print_err "PIM_DMA_BURST_SIZE_B must be a power of 2 (0: SMC_BURST_SIZE_B)"
+    exit
+fi
+
+# A burst is routed by its start address, so it must stay in one row (DRAM_ROW_BUFFER_SIZE in gem5)
+#  of one vault (the vaults are interleaved every HOST_BURST_SIZE_B, except with RoRaBaChCo: every row)
+PIM_DMA_MAX_BURST_B=$(( (1 << $DRAM_column_size) * $DRAM_BUS_WIDTH / 8 ))
+if [ $N_INIT_PORT -gt 1 ] && [ $GEM5_ADDR_MAPPING != RoRaBaChCo ] && [ $HOST_BURST_SIZE_B -lt $PIM_DMA_MAX_BURST_B ]; then
+    PIM_DMA_MAX_BURST_B=$HOST_BURST_SIZE_B
+fi
+if [ $PIM_DMA_BURST_SIZE_B -gt $PIM_DMA_MAX_BURST_B ]; then
+    print_err "PIM_DMA_BURST_SIZE_B ($PIM_DMA_BURST_SIZE_B) must be at most $PIM_DMA_MAX_BURST_B (the vault row size and the vault interleaving)"
+    exit
+fi
+
+if [ $DRAM_SCHEDULING_POLICY_GEM5 != fcfs ] && [ $DRAM_SCHEDULING_POLICY_GEM5 != frfcfs ] && [ $DRAM_SCHEDULING_POLICY_GEM5 != frfcfs_cap ] && [ $DRAM_SCHEDULING_POLICY_GEM5 != parbs ] && [ $DRAM_SCHEDULING_POLICY_GEM5 != priority ]; then
+    print_err "Illegal DRAM_SCHEDULING_POLICY_GEM5: $DRAM_SCHEDULING_POLICY_GEM5 {fcfs, frfcfs, frfcfs_cap, parbs, priority}"
+    exit
+fi
+
+if [ $GEM5_VAULT_WRITE_LOW_THRESH_PERC -ge $GEM5_VAULT_WRITE_HIGH_THRESH_PERC ]; then
+    print_err "GEM5_VAULT_WRITE_LOW_THRESH_PERC must be smaller than GEM5_VAULT_WRITE_HIGH_THRESH_PERC"
+    exit
+fi
+
+if [ $GEM5_VAULT_PREFETCH_TRIGGER != sequential ] && [ $GEM5_VAULT_PREFETCH_TRIGGER != every_activate ]; then
+    print_err "Illegal GEM5_VAULT_PREFETCH_TRIGGER: $GEM5_VAULT_PREFETCH_TRIGGER {sequential, every_activate}"
+    exit
+fi
+
+if [ $PIM_HOST_WAIT_INTERRUPT != TRUE ] && [ $PIM_HOST_WAIT_INTERRUPT != FALSE ]; then
+    print_err "Illegal PIM_HOST_WAIT_INTERRUPT: $PIM_HOST_WAIT_INTERRUPT {TRUE, FALSE}"
+    exit
+fi
+
+if [ $PIM_HOST_WAIT_INTERRUPT == TRUE ] && [ $PIM_HOST_IRQ -lt 32 ]; then
+    print_err "PIM_HOST_IRQ must be a shared peripheral interrupt (>= 32)"
+    exit
+fi
+
+if [ $PIM_HOST_POLL_MIN_ns -lt 1 ] || [ $PIM_HOST_POLL_MAX_ns -lt $PIM_HOST_POLL_MIN_ns ]; then
+    print_err "PIM_HOST_POLL_MIN_ns must be at least 1 and at most PIM_HOST_POLL_MAX_ns"
+    exit
+fi
+
+if [ $OFFLOADED_KERNEL_FORMAT != kimg ] && [ $OFFLOADED_KERNEL_FORMAT != hex ]; then
+    print_err "Illegal OFFLOADED_KERNEL_FORMAT: $OFFLOADED_KERNEL_FORMAT {kimg, hex}"
+    exit
+fi
+
+if [ $OFFLOADED_SHARED_BUFFER != NONE ] && [ $OFFLOADED_SHARED_BUFFER != CACHED ] && [ $OFFLOADED_SHARED_BUFFER != UNCACHED ]; then
+    print_err "Illegal OFFLOADED_SHARED_BUFFER: $OFFLOADED_SHARED_BUFFER {NONE, CACHED, UNCACHED}"
+    exit
+fi
+
+if [ $OFFLOADED_GRAPH_LAYOUT != NONE ] && [ $OFFLOADED_GRAPH_LAYOUT != DEGREE ] && [ $OFFLOADED_GRAPH_LAYOUT != BFS ] && [ $OFFLOADED_GRAPH_LAYOUT != RCM ]; then
+    print_err "Illegal OFFLOADED_GRAPH_LAYOUT: $OFFLOADED_GRAPH_LAYOUT {NONE, DEGREE, BFS, RCM}"
+    exit
+fi
+
+if [ $GEM5_VAULT_REFRESH_POLICY != all_bank ] && [ $GEM5_VAULT_REFRESH_POLICY != per_bank ]; then
+    print_err "Illegal GEM5_VAULT_REFRESH_POLICY: $GEM5_VAULT_REFRESH_POLICY {all_bank, per_bank}"
+    exit
+fi
+
+if [ $GEM5_VAULT_REFRESH_PAUSING != TRUE ] && [ $GEM5_VAULT_REFRESH_PAUSING != FALSE ]; then
+    print_err "Illegal GEM5_VAULT_REFRESH_PAUSING: $GEM5_VAULT_REFRESH_PAUSING {TRUE, FALSE}"
+    exit
+fi
+
+if [ $GEM5_VAULT_REFRESH_PAUSING == TRUE ] && [ $GEM5_VAULT_REFRESH_POLICY != all_bank ]; then
+    print_err "GEM5_VAULT_REFRESH_PAUSING=TRUE needs GEM5_VAULT_REFRESH_POLICY=all_bank"
+    exit
+fi
+
+if [ $GEM5_VAULT_REFRESH_PAUSE_SEGMENTS -lt 1 ]; then
+    print_err "GEM5_VAULT_REFRESH_PAUSE_SEGMENTS must be at least 1"
+    exit
+fi
+
+if [ $GEM5_SMCXBAR_QOS != TRUE ] && [ $GEM5_SMCXBAR_QOS != FALSE ]; then
+    print_err "Illegal GEM5_SMCXBAR_QOS: $GEM5_SMCXBAR_QOS {TRUE, FALSE}"
+    exit
+fi
+
+if [ $GEM5_SMCXBAR_QOS == TRUE ] && [ $GEM5_SMCXBAR_QOS_BURST_B -lt $HOST_BURST_SIZE_B ]; then
+    print_err "GEM5_SMCXBAR_QOS_BURST_B must be at least HOST_BURST_SIZE_B"
+    exit
+fi
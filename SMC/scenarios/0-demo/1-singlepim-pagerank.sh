@@ -86,9 +86,9 @@ do
 	chmod +x ./do
 
     if ! [ $V0 == matrix_add ]; then
-        copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_sgraph/main resident/${OFFLOADED_KERNEL_NAME}.hex 
+        copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_sgraph/main resident/${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT} 
     else
-        copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_matrix/main resident/${OFFLOADED_KERNEL_NAME}.hex 
+        copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_matrix/main resident/${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT} 
     fi
 	returntopwd
 	
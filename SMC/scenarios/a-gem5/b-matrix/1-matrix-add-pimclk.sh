@@ -75,7 +75,7 @@ do
 	" > ./do
 	chmod +x ./do
 
-	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_matrix/main resident/${OFFLOADED_KERNEL_NAME}.hex 
+	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_matrix/main resident/${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT} 
 	returntopwd
 	
 	####################################
@@ -85,7 +85,7 @@ do
 	chmod +x ./do
 
 
-	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_matrix/main resident/${OFFLOADED_KERNEL_NAME}.hex killer_app/killer_app
+	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_matrix/main resident/${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT} killer_app/killer_app
 	returntopwd
 	
 	####################################
@@ -26,6 +26,7 @@ do
 	export OFFLOADED_NUM_TURNS=1				# Number of operations to perform
 	export OFFLOADED_WALK_STEP=64				# Number of operations to perform
 	export INITIALIZE_ARRAY=FALSE
+	export OFFLOADED_SHARED_BUFFER=NONE		# {NONE, CACHED, UNCACHED} Allocate the array in a zero-copy buffer shared with PIM
 	#####################
 	#####################
 # 	export PIM_SPM_ACCESSTIME_ns="0.01"			# This is a very fast register file accessible by PIM in a single cycle
@@ -82,7 +83,7 @@ do
 	chmod +x ./do
 
 
-	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_array/main resident/${OFFLOADED_KERNEL_NAME}.hex 
+	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_array/main resident/${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT} 
 	returntopwd
 	
 	####################################
@@ -6,7 +6,7 @@ GEM5_STATISTICS=(
 "sim_ticks.host"
 )
 
-VALUES0=( default ) # dma1 dma2 dma3 coprocessor )
+VALUES0=( default ) # dma1 dma2 dma3 coprocessor tiles )
 
 for V0 in ${VALUES0[*]}
 do
@@ -75,7 +75,7 @@ do
 	" > ./do
 	chmod +x ./do
 
-	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_sgraph/main resident/${OFFLOADED_KERNEL_NAME}.hex 
+	copy_to_extra_image  driver/pim.ko driver/ins.sh ./do offload_sgraph/main resident/${OFFLOADED_KERNEL_NAME}.${OFFLOADED_KERNEL_FORMAT} 
 	returntopwd
 	
 	####################################
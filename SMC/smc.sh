@@ -38,133 +38,10 @@ fi
 set -e
 
 
-echo -e "
-# Automatically generated by Erfan
-#*********************************
-$(param_python str ARCH $ARCH)
-$(param_python str OUTDIR $M5_OUTDIR)
-$(param_python int N_INIT_PORT $N_INIT_PORT)
-$(param_python int N_TARG_PORT $N_TARG_PORT)
-$(param_python int GEM5_VAULT_WBUFFER_SIZE $GEM5_VAULT_WBUFFER_SIZE)
-$(param_python int GEM5_VAULT_RBUFFER_SIZE $GEM5_VAULT_RBUFFER_SIZE)
-$(param_python int GEM5_NUMCPU $GEM5_NUMCPU)
-$(param_python str GEM5_ADDR_MAPPING $GEM5_ADDR_MAPPING)
-$(param_python str GEM5_ENABLE_COMM_MONITORS $GEM5_ENABLE_COMM_MONITORS)
-$(param_python str GEM5_PERIODIC_STATS_DUMP $GEM5_PERIODIC_STATS_DUMP)
-$(param_python int GEM5_PERIODIC_STATS_DUMP_PERIOD $GEM5_PERIODIC_STATS_DUMP_PERIOD)
-$(param_python str DRAM_LAYER_SIZE_MB "${DRAM_LAYER_SIZE_MB}MB")
-$(param_python str DRAM_CHANNEL_SIZE_MB "${DRAM_CHANNEL_SIZE_MB}MB")
-$(param_python int DRAM_BUS_WIDTH $DRAM_BUS_WIDTH)
-$(param_python int HOST_BURST_SIZE_B $HOST_BURST_SIZE_B)
-$(param_python int SMC_BURST_SIZE_B $SMC_BURST_SIZE_B)
-$(param_python int AXI_DATA_W $AXI_DATA_W )
-$(param_python str VAULT_CLOCK_FREQUENCY "`perl -l -e "print (1.0/$DRAM_tCK)"`GHz")
-$(param_python str SMCXBAR_CLOCK_FREQUENCY "`perl -l -e "print (1.0/$CLK_PERIOD_SYS)"`GHz")
-$(param_python str HOST_CLOCK_FREQUENCY "${HOST_CLOCK_FREQUENCY_GHz}GHz")
-$(param_python str SERIALLINKS_CLOCK_FREQUENCY "${SERIALLINKS_CLOCK_FREQUENCY_GHz}GHz")
-$(param_python int SERIALLINKS_NUM_LINKS $SERIALLINKS_NUM_LINKS)
-$(param_python int SERIALLINKS_NUM_LANES_PER_LINK $SERIALLINKS_NUM_LANES_PER_LINK)
-$(param_python str DRAM_PAGE_POLICY $DRAM_PAGE_POLICY)
-$(param_python int DRAM_BURST_LENGTH `perl -l -e "print ($AXI_DATA_W/$DRAM_BUS_WIDTH)"`)
-$(param_python str DRAM_ROW_BUFFER_SIZE "`perl -l -e "print (2**$DRAM_column_size * $DRAM_BUS_WIDTH / 8 )"`B")
-$(param_python int DRAM_BANKS_PER_VAULT $DRAM_BANKS_PER_VAULT)
-$(param_python int N_MEM_DIES $N_MEM_DIES)
-$(param_python int DRAM_BANKS_PER_DIE $DRAM_BANKS_PER_DIE)
-$(param_python str DRAM_tBURST "`perl -l -e "print (($AXI_DATA_W/$DRAM_BUS_WIDTH)*$DRAM_tCK/2)"`ns" )
-$(param_python str DRAM_tRCD "${DRAM_tRCD}ns" )
-$(param_python str DRAM_tWR "${DRAM_tWR}ns" )
-$(param_python str DRAM_tCL "${DRAM_tCL}ns" )
-$(param_python str DRAM_tCK "${DRAM_tCK}ns" )
-$(param_python str DRAM_tRP "${DRAM_tRP}ns" )
-$(param_python str DRAM_tRAS "${DRAM_tRAS}ns" )
-$(param_python str DRAM_tRTP "${DRAM_tRTP}ns" )
-$(param_python str DRAM_tRRD "${DRAM_tRRD}ns" )
-$(param_python str DRAM_tRFC "${DRAM_tRFC}ns" )
-$(param_python str DRAM_tREFI "${DRAM_tREFI}us" )
-$(param_python int GEM5_TOTAL_SIMULATION_PERIOD $GEM5_TOTAL_SIMULATION_PERIOD)
-$(param_python int GEM5_REPORT_PERIOD_ps $GEM5_REPORT_PERIOD_ps)
-$(param_python int MAX_INFLIGHT_TRANS $MAX_INFLIGHT_TRANS)
-$(param_python int GEM5_MAX_BUFFER_SIZE $GEM5_MAX_BUFFER_SIZE)
-$(param_python int GEM5_SYNCH_PERIOD_ps $GEM5_SYNCH_PERIOD_ps)
-$(param_python int GEM5_SHORT_SLEEP_ns $GEM5_SHORT_SLEEP_ns)
-$(param_python int GEM5_LONG_SLEEP_ns $GEM5_LONG_SLEEP_ns)
-$(param_python int GEM5_TRAFFIC_ITT_ps $GEM5_TRAFFIC_ITT_ps)
-$(param_python str GEM5_TRAFFIC_MODE $GEM5_TRAFFIC_MODE)
-$(param_python str GEM5_TRAFFIC_PRINT_INJECTED $GEM5_TRAFFIC_PRINT_INJECTED)
-$(param_python str GEM5_TRAFFIC_PRINT_RECEIVED $GEM5_TRAFFIC_PRINT_RECEIVED)
-$(param_python int GEM5_TRAFFIC_NUM_TRANS $GEM5_TRAFFIC_NUM_TRANS)
-$(param_python str SCENARIO_CASE_DIR $SCENARIO_CASE_DIR)
-$(param_python str TOTAL_MEM_SIZE_MB "${TOTAL_MEM_SIZE_MB}MB")
-$(param_python str DRAM_SCHEDULING_POLICY_GEM5 $DRAM_SCHEDULING_POLICY_GEM5)
-$(param_python str GEM5_MEMTYPE $GEM5_MEMTYPE)
-$(param_python int NBITS_CH $NBITS_CH)
-$(param_python int NBITS_LB $NBITS_LB)
-$(param_python int NBITS_OF $NBITS_OF)
-$(param_python int NBITS_RC $NBITS_RC)
-$(param_python int DRAM_COLUMNS_PER_ROW $DRAM_COLUMNS_PER_ROW)
-$(param_python str GEM5_SIMPLEMEMORY_LATENCY ${GEM5_SIMPLEMEMORY_LATENCY})
-$(param_python str GEM5_SIMPLEMEMORY_BW ${GEM5_SIMPLEMEMORY_BW})
-$(param_python int GEM5_SMCCONTROLLER_BUFFER_SIZE_REQ $GEM5_SMCCONTROLLER_BUFFER_SIZE_REQ)
-$(param_python int GEM5_SMCCONTROLLER_BUFFER_SIZE_RSP $GEM5_SMCCONTROLLER_BUFFER_SIZE_RSP)
-$(param_python str GEM5_SMCCONTROLLER_LATENCY "`perl -e "print ($GEM5_SMCCONTROLLER_LATENCY_cy/$HOST_CLOCK_FREQUENCY_GHz)"`ns")
-$(param_python str VAULTCTRL_FRONTEND_LATENCY "`perl -e "print ($GEM5_VAULTCTRL_FRONTEND_LATENCY_cy * $DRAM_tCK)"`ns")
-$(param_python str VAULTCTRL_BACKEND_LATENCY "`perl -e "print ($GEM5_VAULTCTRL_BACKEND_LATENCY_cy * $DRAM_tCK)"`ns")
-$(param_python int GEM5_LINK_BUFFER_SIZE_REQ $GEM5_LINK_BUFFER_SIZE_REQ)
-$(param_python int GEM5_LINK_BUFFER_SIZE_RSP $GEM5_LINK_BUFFER_SIZE_RSP)
-$(param_python str GEM5_LINK_STATIC_LATENCY "`perl -e "print ($GEM5_SERDES_LATENCY_ns + $GEM5_LINK_LATENCY_ns)"`ns")
-$(param_python int GEM5_TRAFFIC_IDLE_PERIOD_ps $GEM5_TRAFFIC_IDLE_PERIOD_ps)
-$(param_python int GEM5_TRAFFIC_ACTIVE_PERIOD_ps $GEM5_TRAFFIC_ACTIVE_PERIOD_ps)
-$(param_python str GEM5_RECORD_INJECTED_TRACES $GEM5_RECORD_INJECTED_TRACES)
-$(param_python str GEM5_RECORD_FILE_NAME $GEM5_RECORD_FILE_NAME)
-$(param_python str GEM5_EXTRAIMAGE $GEM5_EXTRAIMAGE)
-$(param_python str HAVE_LISTENERS $HAVE_LISTENERS)
-$(param_python str HAVE_PIM_DEVICE $HAVE_PIM_DEVICE)
-$(param_python str MOVE_PIM_TO_HOST $MOVE_PIM_TO_HOST)
-$(param_python str DRAMSIM2_ENABLE_DEBUG $DRAMSIM2_ENABLE_DEBUG)
-$(param_python str DRAMSIM2_ENABLE_TIMESTAMP $DRAMSIM2_ENABLE_TIMESTAMP)
-$(param_python str HMON_DUMP_ADDRESS $HMON_DUMP_ADDRESS)
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str PIM_CLOCK_FREQUENCY ${PIM_CLOCK_FREQUENCY_GHz}GHz)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str GEM5_PIM_KERNEL $GEM5_PIM_KERNEL)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DEBUG_ADDR $PIM_DEBUG_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_ERROR_ADDR $PIM_ERROR_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_INTR_ADDR  $PIM_INTR_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_COMMAND_ADDR $PIM_COMMAND_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_STATUS_ADDR  $PIM_STATUS_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_SLICETABLE_ADDR $PIM_SLICETABLE+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_SLICECOUNT_ADDR $PIM_SLICECOUNT+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_SLICEVSTART_ADDR $PIM_SLICEVSTART+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_ADDRESS_BASE $PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str PIM_ADDRESS_SIZE $PIM_ADDRESS_SIZE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str PIM_SPM_ACCESSTIME_ns ${PIM_SPM_ACCESSTIME_ns}ns)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str PIM_SPM_BW_Gbps "${PIM_SPM_BW_Gbps}GB/s")")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_M5_ADDR $PIM_M5_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_M5_D1_ADDR $PIM_M5_D1_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_M5_D2_ADDR $PIM_M5_D2_REG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_VREG_ADDR $PIM_VREG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_VREG_SIZE $PIM_VREG_SIZE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_SREG_ADDR $PIM_SREG+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_SREG_COUNT $PIM_SREG_COUNT)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DTLB_IDEAL_REFILL_ADDR $PIM_DTLB_IDEAL_REFILL+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DTLB_IDEAL_REFILL_REG $PIM_DTLB_IDEAL_REFILL)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str PIM_DTLB_DO_IDEAL_REFILL $PIM_DTLB_DO_IDEAL_REFILL)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int HMC_ATOMIC_INCR $HMC_ATOMIC_INCR)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int HMC_ATOMIC_IMIN $HMC_ATOMIC_IMIN)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int HMC_ATOMIC_FADD $HMC_ATOMIC_FADD)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int HMC_OPERAND $HMC_OPERAND)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DTLB_SIZE $PIM_DTLB_SIZE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str OS_PAGE_SHIFT $OS_PAGE_SHIFT)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str PIM_DTLB_DUMP_ADDRESS $PIM_DTLB_DUMP_ADDRESS)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python str SMON_DUMP_ADDRESS $SMON_DUMP_ADDRESS)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DMA_MEM_ADDR_ADDR $PIM_DMA_MEM_ADDR+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DMA_SPM_ADDR_ADDR $PIM_DMA_SPM_ADDR+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DMA_NUMBYTES_ADDR $PIM_DMA_NUMBYTES+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DMA_COMMAND_ADDR $PIM_DMA_COMMAND+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DMA_STATUS_ADDR $PIM_DMA_STATUS+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_DMA_CLI_ADDR $PIM_DMA_CLI+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int HMC_ATOMIC_INCR_ADDR $HMC_ATOMIC_INCR+$PIM_ADDRESS_BASE)")
-$(set_if_true $HAVE_PIM_DEVICE "$(param_python int PIM_COPROCESSOR_CMD_ADDR $PIM_COPROCESSOR_CMD+$PIM_ADDRESS_BASE)")
-$(param_python str HAVE_PIM_CLUSTER $HAVE_PIM_CLUSTER)
-" > $M5_OUTDIR/_gem5_params.py
+# Derive the gem5 parameters in-process (see GEM5/utils/python/ethz_params.py)
+# Generates $M5_OUTDIR/_gem5_params.py and $M5_OUTDIR/_smc_params.txt
+# The derived values are cached in $SCENARIO_HOME_DIR and shared between the cases
+python $GEM5_UTILS_DIR/python/ethz_params.py $M5_OUTDIR $SCENARIO_HOME_DIR/.params_cache
 
 ###############################################################
 if [ $GEM5_SIM_SCRIPT == ./configs/example/ethz_tgen.py ]; then		####### Traffic Based Simulation